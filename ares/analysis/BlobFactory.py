@@ -17,6 +17,8 @@ import numpy as np
 from inspect import ismethod
 from types import FunctionType
 from scipy.interpolate import RectBivariateSpline, interp1d
+from ..util.ChainStore import ChainStore
+from ..util.LRUCache import LRUCache, fingerprint
 from ..util.Pickling import read_pickle_file, write_pickle_file
 try:
     # this runs with no issues in python 2 but raises error in python 3
@@ -62,6 +64,35 @@ def parse_attribute(blob_name, obj_base):
         
     """
                 
+    return get_accessor(blob_name)(obj_base)
+
+# Compiled accessors, by blob name. Names don't depend on the model, so
+# there's no need to ever re-parse them.
+_accessors = {}
+
+def get_accessor(blob_name):
+    """
+    Compile attribute name `blob_name` into a function that retrieves it.
+
+    Plain attribute names are looked up with `getattr`. Anything else
+    (indexing, function calls, etc.) is compiled once and evaluated
+    relative to the object in question.
+
+    Parameters
+    ----------
+    blob_name : str
+        Full name of blob (might be nested), e.g., 'pops[0].SFRD'.
+
+    Returns
+    -------
+    Function that takes an object (usually a simulation) and returns the
+    attribute.
+
+    """
+
+    if blob_name in _accessors:
+        return _accessors[blob_name]
+
     # Check for decimals
     decimals = []
     for i in range(1, len(blob_name) - 1):
@@ -77,34 +108,261 @@ def parse_attribute(blob_name, obj_base):
             s += marker
         else:
             s += blob_name[i]
-                
-    attr_split = []
+
+    steps = []
     for element in s.split('.'):
-        attr_split.append(element.replace(marker, '.'))
-              
-    if len(attr_split) == 1: 
-        s = attr_split[0]
-        return eval('obj_base.{!s}'.format(s))
+        element = element.replace(marker, '.')
+        if re.match(r"^[A-Za-z_][A-Za-z0-9_]*$", element):
+            steps.append((True, element))
+        else:
+            steps.append((False, compile('obj_base.{!s}'.format(element),
+                '<blob {!s}>'.format(blob_name), 'eval')))
 
-    # Nested attribute
-    blob_attr = None
-    obj_list = [obj_base]
-    for i in range(len(attr_split)):
-        
-        # One particular chunk of the attribute name
-        s = attr_split[i]
-        
-        new_obj = eval('obj_base.{!s}'.format(s))
-        obj_list.append(new_obj)
+    def accessor(obj_base):
+        for is_name, step in steps:
+            if is_name:
+                obj_base = getattr(obj_base, step)
+            else:
+                obj_base = eval(step, {'obj_base': obj_base})
+        return obj_base
 
-        obj_base = obj_list[-1]
+    _accessors[blob_name] = accessor
 
-        # Need to stop once we see parentheses
-        
-    #if blob is None:
-    #    blob = new_obj
-        
-    return new_obj
+    return accessor
+
+def _is_function(func):
+    return ismethod(func) or isinstance(func, interp1d) or \
+        (type(func) == FunctionType) or hasattr(func, '__call__')
+
+class BlobPlan(object):
+    def __init__(self, blob_names, blob_nd, blob_dims, blob_ivars,
+        blob_ivarn, blob_funcs, blob_kwargs, blob_vectorized):
+        """
+        Compiled version of a set of blob specifications.
+
+        Attribute names are parsed, independent variables converted to
+        arrays, and output shapes worked out just once, rather than for
+        every model. Blob functions declared vectorized (via the
+        `blob_vectorized` parameter) are called once with whole arrays of
+        independent variables; all others are evaluated one element at a
+        time. Plans are shared by all simulations with the same blob
+        specifications (see `BlobPlan.get`).
+
+        Parameters
+        ----------
+        Attributes of the same name from a BlobFactory instance.
+
+        """
+
+        self.entries = []
+        self.shapes = []
+        for i, element in enumerate(blob_names):
+
+            nd = blob_nd[i]
+
+            if nd == 0:
+                self.shapes.append(None)
+            elif nd == 1:
+                x = np.array(blob_ivars[i][0]).squeeze()
+                self.shapes.append((len(element),) + x.shape)
+            else:
+                xarr, yarr = list(map(np.array, blob_ivars[i]))
+                self.shapes.append((len(element), xarr.size, yarr.size))
+
+            group = []
+            for j, key in enumerate(element):
+
+                fname = blob_funcs[i][j]
+
+                if blob_kwargs[i] is None or blob_kwargs[i][j] is None:
+                    kw = {}
+                else:
+                    kw = blob_kwargs[i][j]
+
+                entry = {'nd': nd, 'key': key, 'kw': kw,
+                    'vectorized': blob_vectorized[i][j]}
+
+                if nd == 0:
+                    # In this case, the accessor returns a value, not a
+                    # function to be applied to ivars.
+                    if fname is None:
+                        entry['get'] = get_accessor(key)
+                    else:
+                        entry['get'] = get_accessor(fname)
+                elif nd == 1:
+                    entry['x'] = x
+                    entry['xn'] = blob_ivarn[i][0]
+
+                    # Assume the independent variable is redshift unless
+                    # a function is provided
+                    if fname is None:
+                        entry['get'] = None
+                    elif isinstance(fname, basestring):
+                        entry['get'] = get_accessor(fname)
+                    else:
+                        raise ValueError('pretty sure this is broken!')
+                else:
+                    # Must have blob_funcs for this case
+                    entry['x'] = xarr
+                    entry['y'] = yarr
+                    entry['xn'], entry['yn'] = blob_ivarn[i]
+                    entry['get'] = get_accessor(fname)
+
+                group.append(entry)
+
+            self.entries.append(group)
+
+    @staticmethod
+    def get(blob_names, blob_nd, blob_dims, blob_ivars, blob_ivarn,
+        blob_funcs, blob_kwargs, blob_vectorized):
+        """
+        Retrieve plan for these blob specifications, compiling it if need be.
+        """
+
+        key = fingerprint((blob_names, blob_ivars, blob_ivarn, blob_funcs,
+            blob_kwargs, blob_vectorized))
+
+        plan = _plans.get(key)
+
+        if plan is None:
+            plan = BlobPlan(blob_names, blob_nd, blob_dims, blob_ivars,
+                blob_ivarn, blob_funcs, blob_kwargs, blob_vectorized)
+            _plans.put(key, plan)
+
+        return plan
+
+    def __call__(self, sim):
+        """
+        Generate blobs for simulation `sim`.
+
+        Returns
+        -------
+        List of arrays, one per blob group (see `BlobFactory.blobs`).
+
+        """
+
+        # Only need to do this once per simulation
+        history = {}
+
+        blobs = []
+        for i, group in enumerate(self.entries):
+
+            # 0-D blobs can be anything, so collect them first.
+            if self.shapes[i] is None:
+                blobs.append(np.array([entry['get'](sim) for entry in group]))
+                continue
+
+            out = np.empty(self.shapes[i])
+            for j, entry in enumerate(group):
+                if entry['nd'] == 1:
+                    out[j] = self._blob_1d(sim, entry, history)
+                else:
+                    out[j] = self._blob_2d(sim, entry)
+
+            blobs.append(out)
+
+        return blobs
+
+    def _blob_1d(self, sim, entry, history):
+        x = entry['x']
+
+        if entry['get'] is None:
+            key = entry['key']
+            if key not in sim.history:
+                raise KeyError('Blob {!s} not in history!'.format(key))
+
+            if 'z' not in history:
+                history['z'] = sim.history['z'][-1::-1]
+
+            return np.interp(x, history['z'], sim.history[key][-1::-1])
+
+        func = entry['get'](sim)
+
+        if not _is_function(func):
+            return np.interp(x, func[0], func[1])
+
+        kw = entry['kw']
+        xn = entry['xn']
+
+        def elementwise():
+            try:
+                def func_kw(xx):
+                    _kw = kw.copy()
+                    _kw.update({xn:xx})
+                    return func(**_kw)
+
+                return np.array([func_kw(xx) for xx in x.ravel()]).reshape(
+                    x.shape)
+
+            except TypeError:
+                return np.array(list(map(func, x.ravel()))).reshape(x.shape)
+
+        return self._vectorize(entry, elementwise,
+            lambda: func(**dict(kw, **{xn: x})), x.shape)
+
+    def _blob_2d(self, sim, entry):
+        tmp_f = entry['get'](sim)
+
+        if _is_function(tmp_f):
+            func = tmp_f
+        elif type(tmp_f) is tuple:
+            z, E, flux = tmp_f
+            func = RectBivariateSpline(z, E, flux)
+        else:
+            raise TypeError('Sorry: don\'t understand blob {!s}'.format(
+                entry['key']))
+
+        xarr, yarr = entry['x'], entry['y']
+        xn, yn = entry['xn'], entry['yn']
+        kw = entry['kw']
+
+        # Functions are assumed to be vectorized in `y`, at least.
+        def elementwise():
+            blob = np.empty((xarr.size, yarr.size))
+            for k, x in enumerate(xarr):
+                result = func(**dict(kw, **{xn:x, yn:yarr}))
+
+                # Happens when we save a blob that isn't actually
+                # a PQ (i.e., just a constant). Need to kludge so it
+                # doesn't crash.
+                if type(result) in [int, float, np.float64]:
+                    result = result * np.ones_like(yarr)
+
+                blob[k] = result
+
+            return blob
+
+        return self._vectorize(entry, elementwise,
+            lambda: func(**dict(kw, **{xn: xarr[:,None], yn: yarr[None,:]})),
+            (xarr.size, yarr.size))
+
+    def _vectorize(self, entry, elementwise, vectorized, shape):
+        """
+        Evaluate blob function all at once if it's been declared vectorized,
+        otherwise element by element.
+
+        Agreement with element-wise results is never checked (a function can
+        agree for some models but not others, e.g., if it branches on a
+        parameter), so this is strictly opt-in. We do fall back to
+        element-wise evaluation if the vectorized call fails outright or
+        returns the wrong shape.
+        """
+
+        if not entry['vectorized']:
+            return elementwise()
+
+        try:
+            result = np.asarray(vectorized(), dtype=float)
+        except Exception:
+            return elementwise()
+
+        if result.shape != shape:
+            return elementwise()
+
+        return result
+
+# Compiled plans, shared by all simulations (in this process).
+_plans = LRUCache(maxsize=16)
 
 class BlobFactory(object):
     """
@@ -139,6 +397,7 @@ class BlobFactory(object):
             self._blob_dims = self._blob_nd = None
             self._blob_funcs = None
             self._blob_kwargs = None
+            self._blob_vectorized = None
             return None
         else:
             # Otherwise, figure out how many different kinds (shapes) of
@@ -172,6 +431,7 @@ class BlobFactory(object):
                 self._blob_names = names
                 if self.pf['blob_ivars'] is None:
                     self._blob_ivars = [None] * len(names)
+                    self._blob_ivarn = [None] * len(names)
                 else:
                     self._blob_ivarn = []
                     self._blob_ivars = []
@@ -202,6 +462,7 @@ class BlobFactory(object):
             else:
                 self._blob_names = names
                 self._blob_ivars = [None] * len(names)
+                self._blob_ivarn = [None] * len(names)
 
 
             self._blob_nd = []
@@ -282,6 +543,28 @@ class BlobFactory(object):
         self._blob_funcs = tuple(self._blob_funcs)
         self._blob_kwargs = tuple(self._blob_kwargs)
 
+        # Which blob functions may be called with arrays of independent
+        # variables. Either a single bool, or one entry (None, a bool, or a
+        # list of bools) per blob group.
+        try:
+            vec = self.pf['blob_vectorized']
+        except (KeyError, TypeError):
+            vec = False
+
+        if vec is None or type(vec) is bool:
+            vec = [vec] * len(self._blob_names)
+
+        self._blob_vectorized = []
+        for i, element in enumerate(self._blob_names):
+            if vec[i] is None or type(vec[i]) is bool:
+                self._blob_vectorized.append((bool(vec[i]),) * len(element))
+            else:
+                assert len(vec[i]) == len(element), \
+                    "blob_vectorized must have same length as blob_names!"
+                self._blob_vectorized.append(tuple(map(bool, vec[i])))
+
+        self._blob_vectorized = tuple(self._blob_vectorized)
+
     @property
     def blob_nbytes(self):
         """
@@ -381,6 +664,12 @@ class BlobFactory(object):
         if not hasattr(self, '_blob_kwargs'):
             self._parse_blobs()
         return self._blob_kwargs    
+
+    @property
+    def blob_vectorized(self):
+        if not hasattr(self, '_blob_vectorized'):
+            self._parse_blobs()
+        return self._blob_vectorized
     
     @property
     def blobs(self):
@@ -530,126 +819,19 @@ class BlobFactory(object):
             k = index corresponding to elements of self.blob_ivars[i]
         """
                 
-        self._blobs = []
-        for i, element in enumerate(self.blob_names):
-                                                
-            this_group = []
-            for j, key in enumerate(element):
-                                                                                                                                                                                                                                                                                                                                                                                                                                                                 
-                # 0-D blobs. Need to know name of attribute where stored!
-                if self.blob_nd[i] == 0:
-                    if self.blob_funcs[i][j] is None:
-                        # Assume blob name is the attribute
-                        #blob = self.__getattribute__(key)
-                        blob = parse_attribute(key, self)
-                                                
-                    else:
-                        fname = self.blob_funcs[i][j]
-                                                
-                        # In this case, the return of parse_attribute is
-                        # a value, not a function to be applied to ivars.
-                        blob = parse_attribute(fname, self)
-                        
-                # 1-D blobs. Assume the independent variable is redshift 
-                # unless a function is provided
-                elif self.blob_nd[i] == 1:
-                    # The 0 index is because ivars are kept in a list no
-                    # matter what
-                    x = np.array(self.blob_ivars[i][0]).squeeze()
-                    if (self.blob_funcs[i][j] is None) and (key in self.history):
-                        blob = np.interp(x, self.history['z'][-1::-1],
-                            self.history[key][-1::-1])
-                    elif self.blob_funcs[i][j] is None:
-                        raise KeyError('Blob {!s} not in history!'.format(key))
-                    else:
-                        fname = self.blob_funcs[i][j]
+        self._blobs = self.blob_plan(self)
 
-                        # Name of independent variable
-                        xn = self.blob_ivarn[i][0]
-
-                        if isinstance(fname, basestring):
-                            func = parse_attribute(fname, self)
-                        else:
+    @property
+    def blob_plan(self):
+        """
+        Compiled blob specifications (see `BlobPlan`).
+        """
+        if not hasattr(self, '_blob_plan'):
+            self._blob_plan = BlobPlan.get(self.blob_names, self.blob_nd,
+                self.blob_dims, self.blob_ivars, self.blob_ivarn,
+                self.blob_funcs, self.blob_kwargs, self.blob_vectorized)
+        return self._blob_plan
 
-                            print('hey {!s}'.format(fname))
-                            raise ValueError('pretty sure this is broken!')
-
-                            # fname is a slice, like ('igm_k_heat', 0)
-                            # to retrieve heating rate from H ionizations
-                            _xx = self.history['z'][-1::-1]
-                            _yy = self.history[fname[0]][-1::-1,fname[1]]
-
-                            func = (_xx, _yy)
-
-                        if ismethod(func) or isinstance(func, interp1d) or \
-                            (type(func) == FunctionType) \
-                            or hasattr(func, '__call__'):
-
-                            try:
-                                if self.blob_kwargs[i] is not None:
-                                    kw = self.blob_kwargs[i][j]
-                                else:
-                                    kw = {}
-
-                                def func_kw(xx):
-                                    _kw = kw.copy()
-                                    _kw.update({xn:xx})
-                                    return func(**_kw)
-                                    
-                                blob = np.array([func_kw(xx) for xx in x])
-                                                                
-                            except TypeError:
-                                blob = np.array(list(map(func, x)))
-                            
-                        else:
-                            blob = np.interp(x, func[0], func[1])
-                                                                                                                                  
-                else:
-                                        
-                    # Must have blob_funcs for this case
-                    fname = self.blob_funcs[i][j]
-                    tmp_f = parse_attribute(fname, self)
-                    
-                    xarr, yarr = list(map(np.array, self.blob_ivars[i]))
-                    
-                    if (type(tmp_f) is FunctionType) or ismethod(tmp_f) \
-                        or hasattr(func, '__call__'):
-                        func = tmp_f
-                    elif type(tmp_f) is tuple:
-                        z, E, flux = tmp_f
-                        func = RectBivariateSpline(z, E, flux)
-                    else:
-                        raise TypeError('Sorry: don\'t understand blob {!s}'.format(key))
-                                      
-                    xn, yn = self.blob_ivarn[i]
-                                                            
-                    blob = []
-                    # We're assuming that the functions are vectorized.
-                    # Didn't used to, but it speeds things up (a lot).
-                    for x in xarr:
-                        tmp = []
-                        
-                        if self.blob_kwargs[i] is not None:
-                            kw = self.blob_kwargs[i][j]
-                        else:
-                            kw = {}
-                                                                
-                        kw.update({xn:x, yn:yarr})
-                        result = func(**kw)
-                                
-                        # Happens when we save a blob that isn't actually
-                        # a PQ (i.e., just a constant). Need to kludge so it
-                        # doesn't crash.
-                        if type(result) in [int, float, np.float64]:
-                            result = result * np.ones_like(yarr)
-                        
-                        tmp.extend(result)
-                        blob.append(tmp)
-                                                                                                                        
-                this_group.append(np.array(blob))
-                                
-            self._blobs.append(np.array(this_group))
-            
     @property 
     def blob_data(self):
         if not hasattr(self, '_blob_data'):
@@ -708,6 +890,18 @@ class BlobFactory(object):
     def _get_item(self, name):
         
         i, j, nd, dims = self.blob_info(name)
+        
+        # Subset of elements to read, e.g., ModelSet `skip` and `stop`.
+        rows = getattr(self, '_rows', slice(None))
+        
+        # Columnar output, i.e., ModelFit(output_backend='hdf5')
+        store = ChainStore('{!s}.hdf5'.format(self.prefix))
+        if 'blobs/{!s}'.format(name) in store:
+            data = store.read('blobs/{!s}'.format(name), rows=rows)
+            mask = np.logical_not(np.isfinite(data))
+            masked_data = np.ma.array(data, mask=mask)
+            self.blob_data = {name: masked_data}
+            return masked_data
     
         fn = "{0!s}.blob_{1}d.{2!s}.pkl".format(self.prefix, nd, name)
                                 
@@ -748,24 +942,13 @@ class BlobFactory(object):
                 fn = ddf[0]
                         
         fid = 0
-        to_return = []
+        fns = []
         while True:
             
             if not os.path.exists(fn):
                 break
         
-            all_data = []
-            data_chunks = read_pickle_file(fn, nloads=None, verbose=False)
-            for data_chunk in data_chunks:
-                all_data.extend(data_chunk)
-            del data_chunks
-            
-            print("# Loaded {}".format(fn))
-                
-            # Used to have a squeeze() here for no apparent reason...
-            # somehow it resolved itself.
-            all_data = np.array(all_data, dtype=np.float64)
-            to_return.extend(all_data)
+            fns.append(fn)
             
             if not (by_proc or by_dd):
                 break
@@ -781,6 +964,28 @@ class BlobFactory(object):
                     
                 fn = ddf[fid]
         
+        if hasattr(self, '_read_indexed'):
+            # Memory-mapped, so only the elements we need are read.
+            to_return = self._read_indexed('blob_{0}d.{1!s}'.format(nd, name),
+                fns)[rows]
+        else:
+            to_return = []
+            for fn in fns:
+                all_data = []
+                data_chunks = read_pickle_file(fn, nloads=None, verbose=False)
+                for data_chunk in data_chunks:
+                    all_data.extend(data_chunk)
+                del data_chunks
+            
+                # Used to have a squeeze() here for no apparent reason...
+                # somehow it resolved itself.
+                all_data = np.array(all_data, dtype=np.float64)
+                to_return.extend(all_data)
+                
+            to_return = np.array(to_return)[rows]
+            
+        print("# Loaded {}".format(name))
+        
         mask = np.logical_not(np.isfinite(to_return))
         masked_data = np.ma.array(to_return, mask=mask)
         
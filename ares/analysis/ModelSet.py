@@ -26,6 +26,9 @@ from matplotlib.patches import Rectangle
 from .MultiPhaseMedium import MultiPhaseMedium as aG21
 from ..physics.Constants import nu_0_mhz, erg_per_ev, h_p
 from ..util import labels as default_labels
+from ..util.ChainIndex import ChainIndex
+from ..util.ChainStore import ChainStore
+from ..util.ParameterIndex import ParameterIndex
 from ..util.Pickling import read_pickle_file, write_pickle_file
 import matplotlib.patches as patches
 from ..util.Aesthetics import Labeler
@@ -46,7 +49,7 @@ except:
     basestring = str
 
 try:
-    from scipy.spatial import Delaunay
+    from scipy.spatial import Delaunay, ConvexHull
 except ImportError:
     pass
 
@@ -198,7 +201,7 @@ class ModelSet(BlobFactory):
     @property
     def mask(self):
         if not hasattr(self, '_mask'):
-            self._mask = np.zeros_like(self.chain) # chain.shape[0]?
+            self._mask = np.zeros(self.chain.shape, dtype=bool)
         return self._mask
 
     @mask.setter
@@ -213,66 +216,218 @@ class ModelSet(BlobFactory):
 
     @property
     def skip(self):
+        """
+        Number of elements to ignore at the beginning of the chain.
+        """
         if not hasattr(self, '_skip'):
             self._skip = 0
         return self._skip
 
     @skip.setter
     def skip(self, value):
+        if (self.stop is not None) and (self.stop >= 0):
+            assert value < self.stop
 
-        if hasattr(self, '_skip'):
-            pass
-            #print("WARNING: Running `skip` for (at least) the second time!")
-        else:
-            # On first time, stash away a copy of the original mask
-            if not hasattr(self, '_original_mask'):
-                self._original_mask = self.mask.copy()
-
-            if hasattr(self, '_stop'):
-                mask = self.mask.copy()
-                assert value < self._stop
-            else:
-                mask = self._original_mask.copy()
-
-        self._skip = int(value)
-
-        x = np.arange(0, self.logL.size)
+        self._set_window(int(value), self.stop)
 
-        mask[x < self._skip] = True
-        print("Masked out {} elements using `skip`.".format(self._skip))
-        self.mask = mask
+        print("Skipping first {} elements.".format(self._skip))
 
     @property
     def stop(self):
-        if not hasattr(self._stop):
-            self._stop = 0
+        """
+        Index of first element (from the beginning of the chain) to ignore,
+        i.e., elements [skip:stop] are kept. If None, keep everything after
+        `skip`.
+        """
+        if not hasattr(self, '_stop'):
+            self._stop = None
         return self._stop
 
     @stop.setter
     def stop(self, value):
+        if value is not None:
+            value = int(value)
+            if value >= 0:
+                assert value > self.skip
 
-        if hasattr(self, '_stop'):
-            pass
-            #print("WARNING: Running `stop` for (at least) the second time!")
-        else:
-            # On first time, stash away a copy of the original mask
-            if not hasattr(self, '_original_mask'):
-                self._original_mask = self.mask.copy()
-
-            # If skip has already been called, operate on pre-existing mask.
-            # Otherwise, start from scratch
-            if hasattr(self, '_skip'):
-                mask = self.mask.copy()
-                assert value > self._skip
+        self._set_window(self.skip, value)
+
+        print("Ignoring elements beyond {}.".format(self._stop))
+
+    @property
+    def _rows(self):
+        return slice(self.skip, self.stop)
+
+    def _set_window(self, skip, stop):
+        """
+        Restrict chain, logL, and blobs to elements [skip:stop].
+
+        Nothing is read from disk here: data is sliced as it is read (or, if
+        it has been already, the memory-mapped array is simply re-sliced). Any
+        existing mask is carried over for elements in both the old and new
+        windows.
+        """
+
+        if hasattr(self, '_mask'):
+            N = self._nrows_total
+
+            i1, i2, _ = self._rows.indices(N)
+            j1, j2, _ = slice(skip, stop).indices(N)
+
+            mask = np.zeros((max(j2 - j1, 0),) + self._mask.shape[1:],
+                dtype=self._mask.dtype)
+
+            lo, hi = max(i1, j1), min(i2, j2)
+            if hi > lo:
+                mask[lo-j1:hi-j1] = self._mask[lo-i1:hi-i1]
+
+            self._mask = mask
+
+        self._skip = skip
+        self._stop = stop
+
+        for attr in ['_chain', '_logL', '_L', '_weights',
+            '_parameter_index']:
+            if hasattr(self, attr):
+                delattr(self, attr)
+
+        self._blob_data = {}
+
+    @property
+    def _nrows_total(self):
+        """
+        Number of elements in the chain, ignoring `skip` and `stop`.
+        """
+        if not hasattr(self, '_nrows_total_'):
+            self.chain
+        return self._nrows_total_
+
+    @property
+    def use_index(self):
+        """
+        Convert pickled outputs to memory-mappable files upon first read?
+        See `ares.util.ChainIndex` for details.
+        """
+        if not hasattr(self, '_use_index'):
+            self._use_index = True
+        return self._use_index
+
+    @use_index.setter
+    def use_index(self, value):
+        self._use_index = value
+
+    def _read_indexed(self, name, fns, ndim=None, prefix=None):
+        """
+        Read column `name` from pickle files `fns`, via the index if allowed.
+        """
+
+        if prefix is None:
+            prefix = self.prefix
+
+        index = ChainIndex('{!s}.index'.format(prefix))
+
+        if self.use_index:
+            return index.load(name, fns, ndim=ndim)
+
+        chunks = [chunk for chunk in index._chunks(fns, ndim)]
+
+        if len(chunks) == 0:
+            return np.zeros(0)
+
+        return np.concatenate(chunks, axis=0)
+
+    @property
+    def parameter_index(self):
+        """
+        Index of the chain in parameter space, used to speed up `Slice` and
+        friends. Saved in <prefix>.index (if `use_index` is True), so it is
+        only built once. See `ares.util.ParameterIndex` for details.
+        """
+        if not hasattr(self, '_parameter_index'):
+            if self.use_index:
+                path = '{!s}.index/parameters'.format(self.prefix)
             else:
-                mask = self._original_mask.copy()
+                path = None
 
-        self._stop = int(value)
+            self._parameter_index = ParameterIndex(np.ma.getdata(self.chain),
+                path=path)
 
-        x = np.arange(0, self.logL.size)
+        return self._parameter_index
 
-        print("Masked out {} elements using `stop`.".format(max(x) - self._stop))
-        self.mask = mask
+    def _get_index(self, pars, ivar=None, take_log=False, un_log=False,
+        multiplier=1.):
+        """
+        Return index containing quantities `pars`, and the relevant axes.
+
+        For (untransformed) free parameters this is `parameter_index`, for
+        anything else we build a temporary one.
+        """
+
+        _pars, _take_log, _multiplier, _un_log, _ivar = \
+            self._listify_common_inputs(list(pars), take_log, multiplier,
+            un_log, ivar)
+
+        trivial = np.all([par in self.parameters for par in _pars]) \
+            and (not np.any(_take_log)) and (not np.any(_un_log)) \
+            and np.all(np.array(_multiplier) == 1)
+
+        if trivial:
+            axes = [list(self.parameters).index(par) for par in _pars]
+            return self.parameter_index, axes
+
+        data = self.ExtractData(pars, ivar, take_log, un_log, multiplier)
+
+        points = np.array([np.ma.filled(np.ma.array(data[par], dtype=float),
+            np.nan) for par in pars]).T
+
+        return ParameterIndex(points), list(range(len(pars)))
+
+    @property
+    def elements(self):
+        """
+        Indices of elements of the chain that aren't masked.
+
+        For sets created by `Slice` (and friends), these are straight from
+        the index query, so are available without computing the mask.
+        """
+        if not hasattr(self, '_elements'):
+            self._elements = np.flatnonzero(np.logical_not(self._mask1d))
+        return self._elements
+
+    @property
+    def _mask1d(self):
+        if self.mask.ndim == 2:
+            return np.max(self.mask, axis=1)
+        return self.mask
+
+    def _new_subset(self, elements):
+        """
+        Create new ModelSet containing only `elements` of this one.
+        """
+
+        # Don't keep anything we've already masked.
+        if hasattr(self, '_mask'):
+            elements = elements[np.logical_not(self._mask1d[elements])]
+
+        model_set = self._new_model_set()
+
+        mask = np.ones(self.chain.shape, dtype=bool)
+        mask[elements] = False
+
+        model_set.mask = mask
+        model_set._elements = elements
+
+        return model_set
+
+    def _new_model_set(self):
+        """
+        Create new ModelSet for the same outputs, with same `skip` and `stop`.
+        """
+        model_set = ModelSet(self.prefix)
+        model_set._skip = self.skip
+        model_set._stop = self.stop
+        model_set.use_index = self.use_index
+        return model_set
 
     @property
     def load(self):
@@ -429,6 +584,8 @@ class ModelSet(BlobFactory):
                 self._is_mcmc = True
             elif glob.glob('{!s}.dd*.logL.pkl'.format(self.prefix)):
                 self._is_mcmc = True
+            elif 'logL' in ChainStore('{!s}.hdf5'.format(self.prefix)):
+                self._is_mcmc = True
             else:
                 self._is_mcmc = False
 
@@ -442,6 +599,9 @@ class ModelSet(BlobFactory):
                     read_pickle_file('{!s}.facc.pkl'.format(self.prefix),\
                     nloads=None, verbose=False)
                 self._facc = np.array(self._facc)
+            elif 'facc' in ChainStore('{!s}.hdf5'.format(self.prefix)):
+                self._facc = \
+                    ChainStore('{!s}.hdf5'.format(self.prefix)).read('facc')
             else:
                 self._facc = None
 
@@ -526,6 +686,7 @@ class ModelSet(BlobFactory):
             ##
             # Loop below just in case we're stitching together many MCMCs
             chains = []
+            windowed = False
             for h, path in enumerate(paths):
 
                 have_chain_f = os.path.exists('{!s}/{!s}.chain.pkl'.format(path,
@@ -543,52 +704,26 @@ class ModelSet(BlobFactory):
                         print("# Loading {!s}...".format(fn))
 
                     t1 = time.time()
-                    _chain = read_pickled_chain(fn)
+                    _chain = self._read_indexed('chain', [fn], ndim=2,
+                        prefix='{!s}/{!s}'.format(path, self.fn))
                     t2 = time.time()
 
                     if rank == 0:
                         print("# Loaded {0!s} in {1:.2g} seconds.\n".format(fn,\
                             t2-t1))
 
-                    if hasattr(self, '_mask'):
-                        if self.mask.ndim == 1:
-                            mask2d = np.array([self.mask] * _chain.shape[1]).T
-                        elif self.mask.ndim == 2:
-                            mask2d = self.mask
-                            #mask2d = np.zeros_like(self._chain)
-                    else:
-                        mask2d = 0
-
-                    _chain = np.ma.array(_chain, mask=mask2d)
-
                 # We might have data stored by processor
                 elif os.path.exists('{!s}.000.chain.pkl'.format(self.prefix)):
                     i = 0
-                    full_chain = []
-                    full_mask = []
+                    fns = []
                     fn = '{!s}.000.chain.pkl'.format(self.prefix)
-                    while True:
-
-                        if not os.path.exists(fn):
-                            break
-
-                        try:
-                            this_chain = read_pickled_chain(fn)
-                            full_chain.extend(this_chain.copy())
-                        except ValueError:
-                            #import pickle
-                            #f = open(fn, 'rb')
-                            #data = pickle.load(f)
-                            #f.close()
-                            #print data
-                            print("# Error loading {!s}.".format(fn))
-
+                    while os.path.exists(fn):
+                        fns.append(fn)
                         i += 1
                         fn = '{0!s}.{1!s}.chain.pkl'.format(self.prefix,\
                             str(i).zfill(3))
 
-                    _chain = np.ma.array(full_chain,
-                        mask=np.zeros_like(full_chain))
+                    _chain = self._read_indexed('chain', fns, ndim=2)
 
                     # So we don't have to stitch them together again.
                     # THIS CAN BE REALLY CONFUSING IF YOU, E.G., RUN A NEW
@@ -599,20 +734,14 @@ class ModelSet(BlobFactory):
                     #        '{!s}.chain.pkl'.format(self.prefix), ndumps=1,\
                     #        open_mode='w', safe_mode=False, verbose=False)
                 elif os.path.exists('{!s}.hdf5'.format(self.prefix)):
-                    f = h5py.File('{!s}.hdf5'.format(self.prefix))
-                    _chain = np.array(f[('chain')])
-
-                    if hasattr(self, '_mask'):
-                        if self.mask.ndim == 1:
-                            mask2d = np.repeat(self.mask, 2).reshape(len(self.mask), 2)
-                        else:
-                            mask2d = self.mask#np.zeros_like(self._chain)
-                    else:
-                        mask2d = np.zeros(chain.shape)
-                        self.mask = mask2d
+                    store = ChainStore('{!s}.hdf5'.format(self.prefix))
 
-                    _chain = np.ma.array(chain, mask=mask2d)
-                    f.close()
+                    # Only read the elements we need.
+                    if len(paths) == 1:
+                        _chain = store.read(rows=self._rows)
+                        windowed = True
+                    else:
+                        _chain = store.read()
 
                 # If each "chunk" gets its own file.
                 elif glob.glob('{!s}.dd*.chain.pkl'.format(self.prefix)):
@@ -628,18 +757,18 @@ class ModelSet(BlobFactory):
                         outputs_to_read = sorted(glob.glob(\
                             '{!s}.dd*.chain.pkl'.format(self.prefix)))
 
-                    full_chain = []
-                    if rank == 0:
-                        print("# Loading {!s}.dd*.chain.pkl...".format(self.prefix))
-                        t1 = time.time()
+                    fns = []
                     for fn in outputs_to_read:
                         if not os.path.exists(fn):
                             print("# Found no output: {!s}".format(fn))
                             continue
-                        this_chain = read_pickled_chain(fn)
-                        full_chain.extend(this_chain)
+                        fns.append(fn)
 
-                    _chain = np.ma.array(full_chain, mask=0)
+                    if rank == 0:
+                        print("# Loading {!s}.dd*.chain.pkl...".format(self.prefix))
+                        t1 = time.time()
+
+                    _chain = self._read_indexed('chain', fns, ndim=2)
 
                     if rank == 0:
                         t2 = time.time()
@@ -647,10 +776,31 @@ class ModelSet(BlobFactory):
                             self.prefix, t2 - t1))
                 else:
                     self._chain = None
+                    return self._chain
 
                 chains.append(_chain)
 
-            self._chain = np.concatenate(chains, axis=0)
+            if len(chains) == 1:
+                _chain = chains[0]
+            else:
+                _chain = np.concatenate(chains, axis=0)
+
+            # Apply `skip` and `stop`. This is a view if data is memory-mapped.
+            if windowed:
+                self._nrows_total_ = store.nrows()
+            else:
+                self._nrows_total_ = _chain.shape[0]
+                _chain = _chain[self._rows]
+
+            if hasattr(self, '_mask'):
+                if self.mask.ndim == 1:
+                    mask2d = np.array([self.mask] * _chain.shape[1]).T
+                else:
+                    mask2d = self.mask
+            else:
+                mask2d = 0
+
+            self._chain = np.ma.array(_chain, mask=mask2d)
 
         return self._chain
 
@@ -739,39 +889,21 @@ class ModelSet(BlobFactory):
     def logL(self):
         if not hasattr(self, '_logL'):
             if os.path.exists('{!s}.logL.pkl'.format(self.prefix)):
-                self._logL = \
-                    read_pickled_logL('{!s}.logL.pkl'.format(self.prefix))
-
-                if self.mask.ndim == 2:
-                    N = self.chain.shape[0]
-                    mask1d = np.array([np.max(self.mask[i,:]) for i in range(N)])
-                else:
-                    mask1d = self.mask
-
-                self._logL = np.ma.array(self._logL, mask=mask1d)
+                self._logL = self._read_indexed('logL',
+                    ['{!s}.logL.pkl'.format(self.prefix)], ndim=1)[self._rows]
 
             elif os.path.exists('{!s}.000.logL.pkl'.format(self.prefix)):
                 i = 0
-                full_logL = []
-                full_mask = []
+                fns = []
                 fn = '{!s}.000.logL.pkl'.format(self.prefix)
-                while True:
-
-                    if not os.path.exists(fn):
-                        break
-
-                    try:
-                        this_logL = read_pickled_logL(fn)
-                        full_logL.extend(this_logL.copy())
-                    except ValueError:
-                        print("Error loading {!s}.".format(fn))
-
+                while os.path.exists(fn):
+                    fns.append(fn)
                     i += 1
                     fn = '{0!s}.{1!s}.logL.pkl'.format(self.prefix,\
                         str(i).zfill(3))
 
-                self._logL = np.ma.array(full_logL,
-                    mask=np.zeros_like(full_logL))
+                self._logL = \
+                    self._read_indexed('logL', fns, ndim=1)[self._rows]
 
             elif glob.glob('{!s}.dd*.logL.pkl'.format(self.prefix)):
                 if self.include_checkpoints is not None:
@@ -784,22 +916,29 @@ class ModelSet(BlobFactory):
                     outputs_to_read = sorted(glob.glob(\
                         '{!s}.dd*.logL.pkl'.format(self.prefix)))
 
-                full_chain = []
+                fns = []
                 for fn in outputs_to_read:
                     if not os.path.exists(fn):
                         print("Found no output: {!s}".format(fn))
                         continue
+                    fns.append(fn)
 
-                    full_chain.extend(read_pickled_logL(fn))
+                self._logL = \
+                    self._read_indexed('logL', fns, ndim=1)[self._rows]
 
-                if self.mask.ndim == 2:
-                    N = self.chain.shape[0]
-                    mask1d = np.array([np.max(self.mask[i,:]) for i in range(N)])
-                    self._logL = np.ma.array(full_chain, mask=mask1d)
-                else:
-                    self._logL = np.ma.array(full_chain, mask=self.mask)
+            elif 'logL' in ChainStore('{!s}.hdf5'.format(self.prefix)):
+                self._logL = ChainStore('{!s}.hdf5'.format(self.prefix)).read(
+                    'logL', rows=self._rows)
             else:
                 self._logL = None
+                return self._logL
+
+            if self.mask.ndim == 2:
+                mask1d = np.max(self.mask, axis=1)
+            else:
+                mask1d = self.mask
+
+            self._logL = np.ma.array(self._logL, mask=mask1d)
 
         return self._logL
 
@@ -1071,44 +1210,22 @@ class ModelSet(BlobFactory):
         if len(constraints) == 4:
             Nd = 2
             x1, x2, y1, y2 = constraints
+            bounds = [(x1 - MP, x2 + MP), (y1 - MP, y2 + MP)]
         else:
             Nd = 1
             x1, x2 = constraints
-
-        # Figure out what these values translate to.
-        data = self.ExtractData(pars, ivar, take_log, un_log,
-            multiplier)
+            bounds = [(x1 - MP, x2 + MP)]
 
         # Figure out elements we want
-        xok_ = np.logical_and(data[pars[0]] >= x1, data[pars[0]] <= x2)
-        xok_MP = np.logical_or(np.abs(data[pars[0]] - x1) <= MP,
-            np.abs(data[pars[0]].data - x2) <= MP)
-        xok_pre = np.logical_or(xok_, xok_MP)
-
-        unmasked = np.logical_not(data[pars[0]].mask == 1)
-        xok = np.logical_and(xok_pre, unmasked)
-
-        if Nd == 2:
-            yok_ = np.logical_and(data[pars[1]] >= y1, data[pars[1]] <= y2)
-            yok_MP = np.logical_or(np.abs(data[pars[1]] - y1) <= MP,
-                np.abs(data[pars[1]] - y2) <= MP)
-            yok = np.logical_or(yok_, yok_MP)
-            to_keep = np.logical_and(xok, yok)
-        else:
-            to_keep = np.array(xok)
+        index, axes = self._get_index(pars, ivar, take_log, un_log,
+            multiplier)
 
-        mask = np.logical_not(to_keep)
+        elements = index.range(bounds, axes=axes[0:Nd])
 
         ##
         # CREATE NEW MODELSET INSTANCE
         ##
-        model_set = ModelSet(self.prefix)
-
-        # Set the mask.
-        # Must this be 2-D?
-        mask2d = np.array([mask] * self.chain.shape[1]).T
-
-        model_set.mask = np.logical_or(mask2d, self.mask)
+        model_set = self._new_subset(elements)
 
         i = 0
         while hasattr(self, 'slice_{}'.format(i)):
@@ -1125,7 +1242,7 @@ class ModelSet(BlobFactory):
         ##
         # CREATE NEW MODELSET INSTANCE
         ##
-        model_set = ModelSet(self.prefix)
+        model_set = self._new_model_set()
 
         # Set the mask!
         keep = np.zeros(self.chain.shape[0])
@@ -1149,13 +1266,11 @@ class ModelSet(BlobFactory):
                 else:
                     tmp.append(kw[par])
 
-            tmp = np.array(tmp)
-            loc = np.argwhere(self.chain == tmp)[:,0]
+            loc = self.parameter_index.range([(val, val) for val in tmp])
 
-            if not loc:
+            if loc.size == 0:
                 continue
 
-            assert np.all(np.diff(loc) == 0)
             elements.append(loc[0])
 
         return self.SliceByElement(elements)
@@ -1173,7 +1288,7 @@ class ModelSet(BlobFactory):
             if self.mask[i] == 0 and (set2.mask[i] == 1):
                 mask[i] = 0
 
-        model_set = ModelSet(self.prefix)
+        model_set = self._new_model_set()
 
         # Set the mask!
         model_set.mask = mask
@@ -1189,7 +1304,7 @@ class ModelSet(BlobFactory):
         assert self.parameters == set2.parameters
 
         mask = self.mask * set2.mask
-        model_set = ModelSet(self.prefix)
+        model_set = self._new_model_set()
 
         # Set the mask!
         model_set.mask = mask
@@ -1205,8 +1320,9 @@ class ModelSet(BlobFactory):
         parameters : list
             List of parameters names / blob names defining the (x, y) plane
             of the input polygon.
-        polygon : shapely.geometry.Polygon instance
-            Yep.
+        polygon : shapely.geometry.Polygon instance, np.ndarray
+            Yep. Can also be an array of vertices, with shape
+            (number of vertices, 2).
 
         Returns
         -------
@@ -1214,32 +1330,29 @@ class ModelSet(BlobFactory):
 
         """
 
-        data = self.ExtractData(parameters)
-
-        xdata = data[parameters[0]]
-        ydata = data[parameters[1]]
+        index, axes = self._get_index(parameters)
 
-        assert len(xdata) == len(ydata)
-        assert len(xdata) == self.chain.shape[0]
-
-        mask = np.zeros(self.chain.shape[0])
-        for i in range(len(xdata)):
-            pt = geometry.Point(xdata[i], ydata[i])
+        if hasattr(polygon, 'geoms'):
+            polygons = list(polygon.geoms)
+        else:
+            polygons = [polygon]
 
-            pt_in_poly = polygon.contains(pt) or polygon.touches(pt) \
-                or polygon.intersects(pt)
+        elements = []
+        for pgon in polygons:
+            if hasattr(pgon, 'exterior'):
+                vertices = np.array(pgon.exterior.coords)
+                holes = [np.array(hole.coords) for hole in pgon.interiors]
+            else:
+                vertices, holes = pgon, None
 
-            if not pt_in_poly:
-                mask[i] = 1
+            elements.append(index.polygon(vertices, axes=axes, holes=holes))
 
+        elements = np.unique(np.concatenate(elements))
 
         ##
         # CREATE NEW MODELSET INSTANCE
         ##
-        model_set = ModelSet(self.prefix)
-
-        # Set the mask!
-        model_set.mask = np.logical_or(mask, self.mask)
+        model_set = self._new_subset(elements)
 
         # Save the polygon we used
         model_set.polygon = polygon
@@ -1845,17 +1958,19 @@ class ModelSet(BlobFactory):
         ydata = self.ydata = data[pars[1]].compressed()
 
         # Organize into (x, y) pairs
-        points = list(zip(xdata, ydata))
-
-        # Create polygon object
-        point_collection = geometry.MultiPoint(list(points))
+        points = np.array([xdata, ydata]).T
 
+        # Create polygon object. Only the hull vertices need to go through
+        # shapely, which is very slow for large numbers of points.
         if boundary_type == 'convex':
-            polygon = point_collection.convex_hull
+            hull = ConvexHull(points)
+            polygon = geometry.Polygon(points[hull.vertices])
         elif boundary_type == 'concave':
-            polygon, edge_points = self._alpha_shape(points, alpha)
+            polygon, edge_points = self._alpha_shape(list(map(tuple, points)),
+                alpha)
         elif boundary_type == 'envelope':
-            polygon = point_collection.envelope
+            polygon = geometry.box(xdata.min(), ydata.min(), xdata.max(),
+                ydata.max())
         else:
             raise ValueError('Unrecognized boundary_type={!s}!'.format(\
                 boundary_type))
@@ -4025,10 +4140,8 @@ class ModelSet(BlobFactory):
         i, j, nd, dims = self.blob_info(name)
 
         if (i is None) and (j is None):
-            f = h5py.File('{!s}.hdf5'.format(self.prefix), 'r')
-            arr = np.array(f[('blobs')][name])
-            f.close()
-            return arr
+            store = ChainStore('{!s}.hdf5'.format(self.prefix))
+            return store.read('blobs/{!s}'.format(name), rows=self._rows)
 
         blob = self.get_blob_from_disk(name)
 
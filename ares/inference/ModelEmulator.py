@@ -14,6 +14,8 @@ import time
 import copy
 import numpy as np
 import scipy.stats as stats
+from scipy.optimize import minimize
+from scipy.linalg import cho_factor, cho_solve, solve_triangular
 import matplotlib.pyplot as pl
 import matplotlib.pyplot as plt
 from ..physics.Constants import nu_0_mhz
@@ -21,6 +23,7 @@ from ..analysis import Global21cm as aGS
 from ..util.Aesthetics import labels
 from ..analysis import ModelSet, MultiPanel
 from ..analysis.MultiPlot import add_master_legend
+from ..util.ParameterFile import ParameterFile
 
 try:
     import emupy
@@ -37,14 +40,232 @@ try:
 except ImportError:
     pass    
 
+class GaussianProcessPCA(object):
+    def __init__(self, nmodes=10, nugget=1e-8):
+        """
+        Principal component decomposition of the training data, with a
+        Gaussian process for the weight of each component.
+
+        Needs only numpy and scipy. Its `predict` method has the same
+        signature as that of emupy.Emu, so it can be used in place of one.
+
+        Parameters
+        ----------
+        nmodes : int
+            Maximum number of principal components to keep.
+        nugget : float
+            Jitter added to the diagonal of each covariance matrix, relative
+            to the variance of the component weights.
+
+        """
+        self.nmodes = nmodes
+        self.nugget = nugget
+        self.hyper = None
+
+    def _kernel(self, Za, Zb, theta):
+        lnA, lnl = theta[0], theta[1:-1]
+        d2 = np.sum(((Za[:,None,:] - Zb[None,:,:]) / np.exp(lnl))**2, axis=2)
+        return np.exp(2 * lnA - 0.5 * d2)
+
+    def _nlml(self, theta, Z, w):
+        """
+        Negative log marginal likelihood of weights `w` at points `Z`.
+        """
+        K = self._kernel(Z, Z, theta)
+        K[np.diag_indices_from(K)] += np.exp(2 * theta[-1]) + self.nugget
+
+        try:
+            L = cho_factor(K, lower=True)
+        except np.linalg.LinAlgError:
+            return 1e25
+
+        alpha = cho_solve(L, w)
+
+        return 0.5 * np.dot(w, alpha) + np.sum(np.log(np.diag(L[0]))) \
+            + 0.5 * w.size * np.log(2. * np.pi)
+
+    def fit(self, X, Y, maxiter=None):
+        """
+        Train on parameters `X` and data `Y`.
+
+        Hyperparameters are initialized at their values from the previous
+        call (if any), so re-training after adding a few models is cheap.
+
+        Parameters
+        ----------
+        X : np.ndarray
+            Parameters, shape (number of models, number of parameters).
+        Y : np.ndarray
+            Data, shape (number of models, number of data elements).
+        maxiter : int
+            Maximum number of iterations for the optimization of each set
+            of hyperparameters.
+
+        """
+
+        X = np.atleast_2d(X)
+        Y = np.atleast_2d(Y)
+
+        self.N_samples, self.N_params = X.shape
+        self.N_data = Y.shape[1]
+        self.fid_grid = np.median(X, axis=0)
+
+        # Sphere parameters
+        self._xmu = X.mean(axis=0)
+        self._xsd = X.std(axis=0)
+        self._xsd[self._xsd == 0] = 1.
+        Z = self._Z = (X - self._xmu) / self._xsd
+
+        # Principal components
+        self._ymu = Y.mean(axis=0)
+        dY = Y - self._ymu
+        U, sv, Vt = np.linalg.svd(dY, full_matrices=False)
+
+        nmodes = min(self.nmodes, int(np.sum(sv > sv[0] * 1e-10)))
+        self.modes = Vt[0:nmodes]
+        W = np.dot(dY, self.modes.T)
+
+        # Whatever the truncated modes carried counts as error.
+        resid = dY - np.dot(W, self.modes)
+        self.trunc_var = np.mean(resid**2, axis=0)
+
+        options = {} if maxiter is None else {'maxiter': maxiter}
+        bounds = [(-5., 5.)] + [(-5., 5.)] * self.N_params + [(-12., 0.)]
+
+        hyper = []
+        self._wsd = []
+        self._chol = []
+        self._alpha = []
+        for m in range(nmodes):
+            wsd = np.std(W[:,m])
+            wsd = wsd if wsd > 0 else 1.
+            w = W[:,m] / wsd
+
+            if (self.hyper is not None) and (m < len(self.hyper)) and \
+               (len(self.hyper[m]) == self.N_params + 2):
+                theta0 = self.hyper[m]
+            else:
+                theta0 = np.array([0.] + [0.] * self.N_params + [-6.])
+
+            res = minimize(self._nlml, theta0, args=(Z, w), method='L-BFGS-B',
+                bounds=bounds, options=options)
+
+            theta = res.x
+
+            K = self._kernel(Z, Z, theta)
+            K[np.diag_indices_from(K)] += np.exp(2 * theta[-1]) + self.nugget
+            L = cho_factor(K, lower=True)
+
+            hyper.append(theta)
+            self._wsd.append(wsd)
+            self._chol.append(L)
+            self._alpha.append(cho_solve(L, w))
+
+        self.hyper = hyper
+
+    def predict_weights(self, X):
+        """
+        Mean and standard deviation of the weight of each component.
+
+        Returns
+        -------
+        Tuple: (mean, std), each with shape (number of points, number of
+        modes).
+
+        """
+        Zs = (np.atleast_2d(X) - self._xmu) / self._xsd
+
+        w = np.zeros((Zs.shape[0], len(self.hyper)))
+        werr = np.zeros_like(w)
+        for m, theta in enumerate(self.hyper):
+            Ks = self._kernel(Zs, self._Z, theta)
+            w[:,m] = np.dot(Ks, self._alpha[m]) * self._wsd[m]
+
+            v = solve_triangular(self._chol[m][0], Ks.T, lower=True)
+            var = np.exp(2 * theta[0]) - np.sum(v**2, axis=0)
+            werr[:,m] = np.sqrt(np.maximum(var, 0.)) * self._wsd[m]
+
+        return w, werr
+
+    def predict(self, vals, output=True):
+        """
+        Predict data at parameters `vals`.
+
+        Returns
+        -------
+        Tuple: (prediction, error, covariance, weights, errors on weights),
+        like emupy. The covariance is not computed (None).
+
+        """
+        w, werr = self.predict_weights(vals)
+
+        recon = self._ymu + np.dot(w, self.modes)
+        recon_err = np.sqrt(np.dot(werr**2, self.modes**2) + self.trunc_var)
+
+        return recon, recon_err, None, w, werr
+
+    def correlation(self, Xa, Xb):
+        """
+        Correlation between points according to the kernel of the leading
+        principal component.
+        """
+        Za = (np.atleast_2d(Xa) - self._xmu) / self._xsd
+        Zb = (np.atleast_2d(Xb) - self._xmu) / self._xsd
+        theta = self.hyper[0]
+        return self._kernel(Za, Zb, theta) / np.exp(2 * theta[0])
+
 class ModelEmulator(object): # pragma: no cover
-    def __init__(self, tset):
-        if type(tset) == str:
+    def __init__(self, tset=None):
+        """
+        Emulate some simulation output, e.g., the global 21-cm signal.
+
+        Parameters
+        ----------
+        tset : str, ModelSet
+            Training set. Can be None if the training set is to be built
+            from scratch via `learn`.
+
+        """
+        if tset is None:
+            self.tset = None
+        elif type(tset) == str:
             self.tset = ModelSet(tset)
         else:
             assert isinstance(tset, ModelSet)
             self.tset = tset
 
+        # Defaults, until set by `train` or `learn`.
+        self.field = 'dTb'
+        self.ivarn = 'z'
+        self.lognorm_pars = False
+
+    @property
+    def parameters(self):
+        if not hasattr(self, '_parameters'):
+            self._parameters = self.tset.parameters
+        return self._parameters
+
+    @parameters.setter
+    def parameters(self, value):
+        self._parameters = list(value)
+
+    @property
+    def is_log(self):
+        """
+        For each parameter, whether the emulator takes its log10 (as in the
+        chain of a ModelFit) rather than its value.
+        """
+        if not hasattr(self, '_is_log'):
+            if self.tset is not None:
+                self._is_log = list(self.tset.is_log)
+            else:
+                self._is_log = [False] * len(self.parameters)
+        return self._is_log
+
+    @is_log.setter
+    def is_log(self, value):
+        self._is_log = list(value)
+
     @property
     def vset(self):
         if not hasattr(self, '_vset'):
@@ -75,43 +296,64 @@ class ModelEmulator(object): # pragma: no cover
             
         return mp        
     
-    def train(self, ivars=None, field='dTb', ivar_tol=1e-2, use_pca=False, 
-        nmodes=10, method='poly', lognorm_data=False, lognorm_pars=True,
-        downsample=None, verbose=False):
+    def _get_training_data(self, field='dTb', ivars=None, ivar_tol=1e-2,
+        downsample=None):
         """
-        Run the emulator, obtain an object capable of new predictions.
+        Extract parameters and `field` (at `ivars`) for all models in the
+        training set.
+
+        Returns
+        -------
+        Tuple: (parameters, data), with shapes (number of models, number of
+        parameters) and (number of models, number of ivars).
+
         """
-        
+
         Ns = self.tset.chain.shape[0]
         if downsample is not None:
             Ns = min(Ns, int(downsample))
-            
+
         sample_ids = np.arange(0, Ns)
-        
+
         # Set independent variables for training
         ivar_raw = np.array(self.tset.get_ivars(field)).squeeze()
         if ivars is None:
             ivar_slc = np.ones_like(ivar_raw)
         else:
             ivar_slc = np.zeros_like(ivar_raw)
-            
+
             for ivar in ivars:
                 i = np.argmin(np.abs(ivar - ivar_raw))
                 if abs(ivar_raw[i] - ivar) > ivar_tol:
                     continue
-                    
+
                 ivar_slc[i] = 1
-                
-        # Should be equal to ivars if it was supplied        
+
+        # Should be equal to ivars if it was supplied
         self.ivar_slc = ivar_slc
         ivar_arr = self.ivar_arr = ivar_raw[ivar_slc == 1]
-                
+
         # Read-in the training data and slice it up
         all_data_raw = self.tset.ExtractData(field)[field]
         all_data = all_data_raw[:,ivar_slc == 1]
         dat_grid = np.array([all_data[i] for i in sample_ids])
         par_grid = np.array([self.tset.chain[i,:] for i in sample_ids])
+
+        return par_grid, dat_grid
+
+    def train(self, ivars=None, field='dTb', ivar_tol=1e-2, use_pca=False, 
+        nmodes=10, method='poly', lognorm_data=False, lognorm_pars=True,
+        downsample=None, verbose=False):
+        """
+        Run the emulator, obtain an object capable of new predictions.
+        """
         
+        par_grid, dat_grid = self._get_training_data(field, ivars, ivar_tol,
+            downsample)
+        ivar_arr = self.ivar_arr
+        self.field = field
+        Ns = par_grid.shape[0]
+
         if lognorm_pars:
             self.lognorm_pars = True
             par_grid = np.log(par_grid)
@@ -175,13 +417,13 @@ class ModelEmulator(object): # pragma: no cover
 
         E.train(dat_grid, par_grid, verbose=verbose)
                         
-    def predict(self, vals=None, **kwargs):
-        
+    def predict(self, vals=None, return_err=False, **kwargs):
+
         if vals is None:
             assert kwargs != {}
             
             vals = []
-            for i, par in enumerate(self.tset.parameters):
+            for i, par in enumerate(self.parameters):
                 if par not in kwargs:
                     # Will already have been log-ified if lognorm_pars==True
                     vals.append(self.E.fid_grid[i])
@@ -198,7 +440,10 @@ class ModelEmulator(object): # pragma: no cover
         
         recon, recon_err, recon_cov, recon_w, recon_werr = \
             self.E.predict(vals, output=True)
-        
+
+        if return_err:
+            return recon, recon_err
+
         return recon
         
     def validate(self, pars=None, ivars=None, field='dTb', mp_kwargs={}, fig=1, 
@@ -407,45 +652,360 @@ class ModelEmulator(object): # pragma: no cover
             
         return ax
     
-    def create_simulator(self, defaults):
+    def _to_kwargs(self, x):
+        """
+        Convert a point in parameter space (log10 values for parameters with
+        `is_log`) into simulation keyword arguments.
+        """
+        kw = {}
+        for i, par in enumerate(self.parameters):
+            kw[par] = 10**x[i] if self.is_log[i] else x[i]
+        return kw
+
+    def _from_kwargs(self, defaults, **kwargs):
+        """
+        Convert simulation keyword arguments into a point in parameter space,
+        in the units `predict` expects (which takes care of `lognorm_pars`).
+        """
+        x = []
+        for i, par in enumerate(self.parameters):
+            val = kwargs[par] if par in kwargs else defaults[par]
+            x.append(np.log10(val) if self.is_log[i] else val)
+        return np.array(x)
+
+    def _simulate(self, x):
+        """
+        Run the real simulation at point `x`.
+
+        Returns
+        -------
+        Values of `field` at `ivar_arr`.
+
+        """
+        kw = self.base_kwargs.copy()
+        kw.update(self._to_kwargs(x))
+
+        sim = self.simulator(**kw)
+        sim.run()
+
+        return self._extract(sim)
+
+    def _extract(self, sim):
+        # Histories are in descending redshift
+        z = sim.history[self.ivarn][-1::-1]
+        y = sim.history[self.field][-1::-1]
+        return np.interp(self.ivar_arr, z, y)
+
+    def add(self, X, Y, maxiter=None):
+        """
+        Add models to the training set and re-train.
+
+        Parameters
+        ----------
+        X : np.ndarray
+            Parameters, shape (number of models, number of parameters), in
+            the same units as the chain of a ModelFit (i.e., log10 values
+            for parameters with `is_log`).
+        Y : np.ndarray
+            Values of `field` at `ivar_arr`, shape (number of models,
+            number of ivars).
+
+        """
+
+        X = np.atleast_2d(X)
+        Y = np.atleast_2d(Y)
+
+        if not hasattr(self, 'E'):
+            self.E = GaussianProcessPCA()
+
+        if hasattr(self, 'X'):
+            self.X = np.concatenate((self.X, X))
+            self.Y = np.concatenate((self.Y, Y))
+        else:
+            self.X, self.Y = X, Y
+
+        self.E.fit(self.X, self.Y, maxiter=maxiter)
+
+    def learn(self, simulator, parameters, bounds, is_log=None, base_kwargs=None,
+        field='dTb', ivars=None, ivarn='z', Ninit=None, Nmax=200, batch=5,
+        Ncand=2000, tol=1., nmodes=10, maxiter=50, seed=None, verbose=True):
+        """
+        Build a training set by running simulations where the emulator is
+        least certain, re-training as we go.
+
+        Starting from a Latin hypercube of `Ninit` models (plus the training
+        set, if there is one), each iteration draws `Ncand` random points
+        within `bounds`, runs the `batch` for which the predicted error is
+        largest (while avoiding points too close to one another), and
+        re-trains, until the largest predicted error is below `tol` or
+        `Nmax` simulations have been run. The emulator is a GP on the
+        principal components of `field` (see GaussianProcessPCA).
+
+        Parameters
+        ----------
+        simulator : class
+            e.g., ares.simulations.Global21cm.
+        parameters : list
+            Names of parameters to vary.
+        bounds : list
+            (min, max) for each parameter, in log10 if `is_log`.
+        is_log : list
+            For each parameter, whether it's varied in log10.
+        base_kwargs : dict
+            Parameters held fixed. If None, uses the simulator's defaults.
+        field : str
+            Quantity to emulate, e.g., 'dTb'.
+        ivars : np.ndarray
+            Values of the independent variable (e.g., redshift) at which to
+            emulate `field`. Defaults to those of the training set.
+        ivarn : str
+            Name of the independent variable in simulation histories.
+        Ninit : int
+            Size of the initial Latin hypercube. Default: 4 per parameter,
+            or none if there's a training set.
+        tol : float
+            Target accuracy of the emulator, in the units of `field`.
+        maxiter : int
+            Maximum number of iterations for each hyperparameter optimization
+            after the first.
+
+        Returns
+        -------
+        Number of simulations run.
+
+        """
+
+        self.simulator = simulator
+        self.parameters = parameters
+        self.is_log = [False] * len(parameters) if is_log is None else is_log
+        self.base_kwargs = {} if base_kwargs is None else base_kwargs
+        self.field = field
+        self.ivarn = ivarn
+        self.lognorm_pars = False
+
+        bounds = np.array(bounds, dtype=float)
+        Nd = len(parameters)
+
+        if not hasattr(self, 'E') or not isinstance(self.E, GaussianProcessPCA):
+            self.E = GaussianProcessPCA(nmodes=nmodes)
+
+        rng = np.random.RandomState(seed)
+        scale = lambda u: bounds[:,0] + u * (bounds[:,1] - bounds[:,0])
+
+        # Initial training set
+        if (self.tset is not None) and (not hasattr(self, 'X')):
+            assert list(self.tset.parameters) == list(parameters)
+            X, Y = self._get_training_data(field, ivars)
+        else:
+            X = Y = None
+            if ivars is not None:
+                self.ivar_arr = np.array(ivars)
+            elif not hasattr(self, 'ivar_arr'):
+                raise ValueError('Must supply `ivars` if no training set!')
+
+        if Ninit is None:
+            Ninit = 0 if (X is not None or hasattr(self, 'X')) else 4 * Nd
+
+        if Ninit > 0:
+            # Latin hypercube
+            u = np.array([(rng.permutation(Ninit) + rng.rand(Ninit)) / Ninit \
+                for i in range(Nd)]).T
+            Xlh = scale(u)
+            Ylh = np.array([self._simulate(x) for x in Xlh])
+
+            if X is None:
+                X, Y = Xlh, Ylh
+            else:
+                X, Y = np.concatenate((X, Xlh)), np.concatenate((Y, Ylh))
+
+        if X is not None:
+            self.add(X, Y)
+
+        self.nsim = Ninit
+        self.max_err = []
+        while True:
+            cand = scale(rng.rand(Ncand, Nd))
+            recon, err = self.predict(cand, return_err=True)
+
+            score = np.max(err, axis=1)
+            self.max_err.append(score.max())
+
+            if verbose:
+                print("# Emulator: {} models, max error {:.3g} ({} sims)".format(
+                    self.X.shape[0], score.max(), self.nsim))
+
+            if (score.max() < tol) or (self.nsim >= Nmax):
+                break
+
+            # Choose batch, discounting points correlated with those chosen.
+            new = []
+            for k in range(min(batch, Nmax - self.nsim)):
+                i = np.argmax(score)
+                if score[i] < tol:
+                    break
+                new.append(cand[i])
+                score = score * (1. - self.E.correlation(cand, cand[i])[:,0])
+
+            Ynew = np.array([self._simulate(x) for x in new])
+            self.nsim += len(new)
+
+            self.add(np.array(new), Ynew, maxiter=maxiter)
+
+        return self.nsim
+
+    def create_simulator(self, defaults, tol=None, fallback=None,
+        update_every=None):
         """
         Make an object that acts like an instance of some ares.simulations
         class.
+
+        Parameters
+        ----------
+        defaults : dict
+            Values for any parameters of the emulator not passed to the
+            simulator, e.g., ModelFit's `base_kwargs`.
+        tol : float
+            Maximum tolerable error of the emulator (in the units of
+            `field`) anywhere along `ivar_arr`. Models for which the
+            predicted error is larger are run with `fallback` instead. If
+            None (the default), predictions are never checked, i.e., the
+            emulator is always used, however large its predicted error.
+        fallback : class
+            Real simulator, e.g., ares.simulations.Global21cm. If None, uses
+            the simulator supplied to `learn`.
+        update_every : int
+            If not None, add models run with `fallback` to the training set
+            and re-train after this many have accumulated (separately in
+            each process). Re-training changes the likelihood, so it is
+            only done until `freeze` is called, which ModelFit does once
+            burn-in is complete (or before sampling, if there's no burn-in).
+            Anything learned by worker processes during burn-in is
+            discarded at that point.
+
         """
-        
+
+        if not hasattr(self, 'E'):
+            raise AttributeError('Must train emulator (via `train`, `learn`, '
+                'or `add`) first!')
+        if not hasattr(self, 'ivar_arr'):
+            raise AttributeError('Must set `ivar_arr` first!')
+
         # Needs to know parameter names and indices
-        sim = SimulationEmulator(self.E, self.tset.parameters, 
-            self.ivar_arr, defaults)
+        sim = SimulationEmulator(self, defaults, tol=tol,
+            fallback=fallback, update_every=update_every)
     
         return sim
-    
-  
+
 class SimulationEmulator(object):
-    def __init__(self, emulator, pars, ivars, defaults):
-        self.E = emulator
-        self.parameters = pars
-        self.ivars = ivars
-        self.defaults = np.array([defaults[par] for par in pars])
+    def __init__(self, emulator, defaults, tol=None, fallback=None,
+        update_every=None):
+        """
+        Drop-in replacement for a simulation class, e.g., for use as the
+        `simulator` of a ModelFit.
+
+        Calling an instance with simulation keyword arguments returns an
+        object whose `run` method either predicts the history with the
+        emulator (as an ares.analysis.Global21cm object), or, if the
+        emulator's predicted error exceeds `tol`, runs the real simulation.
+
+        Parameters
+        ----------
+        See `ModelEmulator.create_simulator`.
+
+        """
+        self.emulator = emulator
+        self.defaults = defaults
+        self.tol = tol
+        self.fallback = fallback
+        self.update_every = update_every
+
+        # Counters, for this process.
+        self.nemulated = 0
+        self.nfallback = 0
+
+        # Points run with `fallback` but not yet added to the training set
+        self.pending = [], []
+        self.frozen = False
+
+    @property
+    def parameters(self):
+        return self.emulator.parameters
+
+    @property
+    def ivars(self):
+        return self.emulator.ivar_arr
 
     def __call__(self, **kwargs):
         # This actually mimics the __init__ method of simulation objects
+        return EmulatedSimulation(self, **kwargs)
 
-        arr = self.defaults.copy()
-        for i, par in enumerate(self.parameters):
-            if par not in kwargs:
-                continue
-            arr[i] = kwargs[par]
+    def freeze(self):
+        """
+        Stop re-training the emulator (see `update_every`).
+
+        Samples drawn while the emulator changes don't come from any one
+        distribution, so this must be called before (real) sampling begins.
+        """
+        self.frozen = True
+        self.pending = [], []
+
+    def _learn(self, x, y):
+        if self.frozen:
+            return
+
+        self.pending[0].append(x)
+        self.pending[1].append(y)
+
+        if (self.update_every is None) or \
+           (len(self.pending[0]) < self.update_every):
+            return
+
+        self.emulator.add(np.array(self.pending[0]),
+            np.array(self.pending[1]), maxiter=50)
+        self.pending = [], []
 
-        self.arr = arr
+class EmulatedSimulation(object):
+    def __init__(self, parent, **kwargs):
+        self.parent = parent
+        self.kwargs = kwargs
 
     def run(self):
-        recon = self.E.predict(self.arr)
+        parent = self.parent
+        emu = parent.emulator
 
-        # Create 'history' attribute.
-        hist = {'z': self.ivar_arr, 'dTb': recon.squeeze()}
-        
-        # How to make the routines accessible? Will inheriting aGS work?
-        self.history = aGS(history=hist)
+        x = emu._from_kwargs(parent.defaults, **self.kwargs)
+
+        recon, err = emu.predict(x[None,:], return_err=True)
+
+        fallback = parent.fallback
+        if fallback is None:
+            fallback = getattr(emu, 'simulator', None)
 
+        self.emulated = (parent.tol is None) or (fallback is None) or \
+            (np.max(err) <= parent.tol)
 
+        if self.emulated:
+            z = emu.ivar_arr
+            hist = {'z': z, 'nu': nu_0_mhz / (1. + z), emu.field: recon[0],
+                '{}_err'.format(emu.field): err[0]}
 
+            # Descending redshift, like real simulations
+            order = np.argsort(z)[-1::-1]
+            hist = {key: hist[key][order] for key in hist}
+
+            self.sim = aGS(hist)
+            self.sim.pf = ParameterFile(**self.kwargs)
+            parent.nemulated += 1
+        else:
+            kw = parent.defaults.copy()
+            kw.update(self.kwargs)
+            self.sim = fallback(**kw)
+            self.sim.run()
+            parent.nfallback += 1
+            parent._learn(x, emu._extract(self.sim))
+
+    def __getattr__(self, name):
+        # Everything else comes from the emulated (or real) simulation.
+        if name == 'sim':
+            raise AttributeError('Must `run` first!')
+        return getattr(self.sim, name)
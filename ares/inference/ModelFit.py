@@ -16,6 +16,8 @@ import glob
 import numpy as np
 from ..util import get_hash
 from ..util.MPIPool import MPIPool
+from ..util.ProcessPool import ProcessPool, worker_id
+from .StageCache import StageCache
 from ..physics.Constants import nu_0_mhz
 from ..util.Warnings import not_a_restart
 from ..util.ParameterFile import par_info
@@ -25,6 +27,9 @@ from types import FunctionType#, InstanceType # InstanceType not in Python3
 from ..analysis import ModelSet
 from ..analysis.BlobFactory import BlobFactory
 from ..sources import BlackHole, SynthesisModel
+from ..physics import HaloMassFunction
+from ..util.ChainStore import ChainStore
+from ..util.SharedArrays import share_arrays
 from ..analysis.TurningPoints import TurningPoints
 from ..util.Stats import Gauss1D, GaussND, get_nu, bin_e2c
 from ..util.Pickling import read_pickle_file, write_pickle_file
@@ -87,10 +92,16 @@ jitter_shape_err += " shape (nparameters)"
 
 def_kwargs = {'verbose': False, 'progress_bar': False}
 
+def _procid():
+    # Local worker processes (see ProcessPool) are numbered like MPI ranks.
+    if size > 1:
+        return str(rank).zfill(3)
+    return str(worker_id()).zfill(3)
+
 def checkpoint(prefix, is_blobs=False, checkpoint_by_proc=True,
     **kwargs):
     if checkpoint_by_proc:
-        procid = str(rank).zfill(3)
+        procid = _procid()
 
         # Save parameters
         if not is_blobs:
@@ -109,7 +120,7 @@ def checkpoint(prefix, is_blobs=False, checkpoint_by_proc=True,
 def checkpoint_on_completion(prefix, is_blobs=False, checkpoint_by_proc=True,
     **kwargs):
     if checkpoint_by_proc:
-        procid = str(rank).zfill(3)
+        procid = _procid()
         fn = '{0!s}.{1!s}.checkpt.txt'.format(prefix, procid)
         with open(fn, 'a') as f:
             if is_blobs:
@@ -154,7 +165,8 @@ def _compute_blob_prior(sim, priors_B):
     return np.log(like)
 
 def loglikelihood(pars, prefix, parameters, is_log, prior_set_P, prior_set_B,
-    blank_blob, base_kwargs, checkpoint_by_proc, simulator, fitters, debug):
+    blank_blob, base_kwargs, checkpoint_by_proc, simulator, fitters, debug,
+    memo=None):
 
     #write_memory('1')
 
@@ -179,10 +191,20 @@ def loglikelihood(pars, prefix, parameters, is_log, prior_set_P, prior_set_B,
     if not np.isfinite(lp):
         return -np.inf, blank_blob
 
+    # Have we been here before?
+    if memo is not None:
+        cached = memo.result(pars)
+        if cached is not None:
+            return cached
+
     # Update kwargs
     kw = base_kwargs.copy()
     kw.update(kwargs)
 
+    # Re-use whatever products of previous simulations we can
+    if memo is not None:
+        kw.update(memo.inject(pars))
+
     # Don't save base_kwargs for each proc! Needlessly expensive I/O-wise.
     checkpoint(prefix, False, checkpoint_by_proc, **kwargs)
 
@@ -256,6 +278,9 @@ def loglikelihood(pars, prefix, parameters, is_log, prior_set_P, prior_set_B,
     if PofD == np.inf:
         raise ValueError('+inf obtained in likelihood. Should not happen!')
 
+    if memo is not None:
+        memo.update(pars, sim, PofD, blobs)
+
     #write_memory('3')
 
     del sim, kw, kwargs
@@ -531,6 +556,190 @@ class ModelFit(FitBase):
     def save_hmf(self, value):
         self._save_hmf = value
 
+    @property
+    def nprocs(self):
+        """
+        Number of local processes to use when running without MPI.
+
+        For ModelFit, these evaluate the likelihood for different walkers
+        in parallel (see `ares.util.ProcessPool`). For ModelGrid, see
+        `LoadBalance`. Either way, workers are forked after big lookup tables
+        have been loaded (see `save_hmf` and `save_src`), so they needn't
+        load their own.
+        """
+        if not hasattr(self, '_nprocs'):
+            self._nprocs = None
+        return self._nprocs
+
+    @nprocs.setter
+    def nprocs(self, value):
+        self._nprocs = value
+
+    @property
+    def pool_start_method(self):
+        """
+        How to start worker processes if `nprocs` > 1: 'fork' (default) or
+        'forkserver'. The latter is safer if the main process has threads
+        running, at the cost of sending each worker a (pickled) copy of
+        `base_kwargs` when it starts.
+        """
+        if not hasattr(self, '_pool_start_method'):
+            self._pool_start_method = 'fork'
+        return self._pool_start_method
+
+    @pool_start_method.setter
+    def pool_start_method(self, value):
+        self._pool_start_method = value
+
+    @property
+    def pool_maxtasks(self):
+        """
+        Number of likelihood evaluations each worker performs before being
+        replaced by a fresh process, to limit growth in memory use. If None,
+        workers are never replaced.
+        """
+        if not hasattr(self, '_pool_maxtasks'):
+            self._pool_maxtasks = None
+        return self._pool_maxtasks
+
+    @pool_maxtasks.setter
+    def pool_maxtasks(self, value):
+        self._pool_maxtasks = value
+
+    @property
+    def memoize(self):
+        """
+        Number of simulation products to remember for each stage.
+
+        If > 0, the products of each simulation (the halo mass function,
+        SynthesisModel instances, and pre-computed flux histories) are saved
+        and re-used by later simulations whose proposals only differ in
+        parameters those products don't depend on (see
+        `ares.inference.StageCache`). Each processor has its own cache.
+        """
+        if not hasattr(self, '_memoize'):
+            self._memoize = 0
+        return self._memoize
+
+    @memoize.setter
+    def memoize(self, value):
+        self._memoize = value
+
+    @property
+    def memo_cache(self):
+        """
+        Directory in which to save flux histories if `memoize` > 0, so that
+        processors (and subsequent runs) can share them.
+        """
+        if not hasattr(self, '_memo_cache'):
+            self._memo_cache = None
+        return self._memo_cache
+
+    @memo_cache.setter
+    def memo_cache(self, value):
+        self._memo_cache = value
+
+    @property
+    def memo_cache_size(self):
+        """
+        Disk budget (in bytes) for `memo_cache`. If None, no limit.
+        """
+        if not hasattr(self, '_memo_cache_size'):
+            self._memo_cache_size = None
+        return self._memo_cache_size
+
+    @memo_cache_size.setter
+    def memo_cache_size(self, value):
+        self._memo_cache_size = value
+
+    @property
+    def memo(self):
+        """
+        StageCache used by `loglikelihood`, or None if `memoize` is 0.
+        """
+        if not hasattr(self, '_memo'):
+            if self.memoize:
+                self._memo = StageCache(self.parameters, self.base_kwargs,
+                    maxsize=self.memoize, path=self.memo_cache,
+                    maxbytes=self.memo_cache_size)
+            else:
+                self._memo = None
+        return self._memo
+
+    @property
+    def share_tables(self):
+        """
+        Directory in which to share big lookup tables between processors.
+
+        If not None, arrays belonging to the HaloMassFunction and
+        SynthesisModel instances saved via `save_hmf` and `save_src` are
+        written to memory-mapped files in this directory, and other
+        processors attach to them rather than holding their own copies. Use,
+        e.g., /dev/shm (POSIX shared memory) for processors on one node, or
+        a shared filesystem for runs spanning many nodes.
+        """
+        if not hasattr(self, '_share_tables'):
+            self._share_tables = None
+        return self._share_tables
+
+    @share_tables.setter
+    def share_tables(self, value):
+        self._share_tables = value
+
+    def _find_hmf(self, sim):
+        """
+        Return HaloMassFunction instance used by simulation `sim`.
+        """
+
+        # Can generalize more later...
+        try:
+            hmf = sim.halos
+        except AttributeError:
+            hmf = None
+            for pop in sim.pops:
+                if hasattr(pop, 'halos'):
+                    hmf = pop.halos
+                    break
+
+        if hmf is None:
+            raise AttributeError('No `hmf` attributes available!')
+
+        return hmf
+
+    def _find_srcs(self, sim):
+        """
+        Return list of (population ID string, source) for simulation `sim`.
+        """
+        try:
+            return [('', sim.src)]
+        except AttributeError:
+            return [('{{{}}}'.format(idnum), pop.src) \
+                for idnum, pop in enumerate(sim.pops)]
+
+    def _share_instances(self):
+        """
+        Move arrays of HMF and SPS instances in base_kwargs to `share_tables`.
+        """
+
+        for key, val in self.base_kwargs.items():
+            if not (key.startswith('hmf_instance') or \
+                key.startswith('pop_src_instance')):
+                continue
+
+            # Make sure tables have actually been loaded
+            if isinstance(val, HaloMassFunction):
+                poke = val.tab_dndm
+            elif isinstance(val, SynthesisModel):
+                poke = val.data
+            else:
+                continue
+
+            names = share_arrays(val, self.share_tables)
+
+            if rank == 0:
+                print("# Shared {} arrays of {} via {}.".format(len(names),
+                    key, self.share_tables))
+
     @property
     def save_hist(self):
         if not hasattr(self, '_save_hist'):
@@ -698,6 +907,12 @@ class ModelFit(FitBase):
 
     @property
     def timeout(self):
+        """
+        Maximum time (in seconds) to spend on any one model. Applies to
+        each model in a ModelGrid, and to each likelihood evaluation in a
+        ModelFit run with `nprocs` > 1 (models that time out are assigned
+        a log-likelihood of -inf).
+        """
         if not hasattr(self, '_timeout'):
             self._timeout = None
         return self._timeout
@@ -896,20 +1111,31 @@ class ModelFit(FitBase):
         # Start from last step in pre-restart calculation
 
         try:
-            if self.checkpoint_append:
-                chain = read_pickled_chain('{!s}.chain.pkl'.format(prefix))
+            if self.output_backend == 'hdf5':
+                store = ChainStore('{!s}.hdf5'.format(prefix_restart))
+                if store.nsteps == 0:
+                    raise ValueError('No complete checkpoints!')
+                pos = store.last_position()
             else:
-                # lec = largest existing checkpoint
-                chain = \
-                    read_pickled_chain(self._latest_checkpoint_chain_file(prefix_restart))
+                if self.checkpoint_append:
+                    chain = read_pickled_chain('{!s}.chain.pkl'.format(prefix))
+                else:
+                    # lec = largest existing checkpoint
+                    chain = \
+                        read_pickled_chain(self._latest_checkpoint_chain_file(prefix_restart))
 
-            pos = chain[-((self.nwalkers-1)*self.save_freq)-1::self.save_freq,:]
+                pos = chain[-((self.nwalkers-1)*self.save_freq)-1::self.save_freq,:]
 
         except ValueError:
             print("WARNING: chain empty! Starting from last point in burn-in")
 
-            chain = read_pickled_chain('{!s}.burn.chain.pkl'.format(prefix))
-            prob = read_pickled_logL('{!s}.burn.logL.pkl'.format(prefix))
+            if self.output_backend == 'hdf5':
+                store = ChainStore('{!s}.burn.hdf5'.format(prefix))
+                chain = store.read('chain')
+                prob = store.read('logL')
+            else:
+                chain = read_pickled_chain('{!s}.burn.chain.pkl'.format(prefix))
+                prob = read_pickled_logL('{!s}.burn.logL.pkl'.format(prefix))
             mlpt = chain[np.argmax(prob)]
             pos = sample_ball(mlpt, np.std(chain, axis=0), size=self.nwalkers)
 
@@ -952,6 +1178,42 @@ class ModelFit(FitBase):
     def checkpoint_append(self, value):
         self._checkpoint_append = value
 
+    @property
+    def output_backend(self):
+        """
+        Format for the chain, log-likelihood, acceptance fraction, and blobs.
+
+        Options
+        -------
+        'pickle' : Append pickles to <prefix>.chain.pkl, <prefix>.logL.pkl,
+            etc. (or, with checkpoint_append=False, write one set of files
+            per checkpoint).
+        'hdf5' : Append to chunked, compressed datasets in <prefix>.hdf5.
+            See `ares.util.ChainStore` for details.
+
+        """
+        if not hasattr(self, '_output_backend'):
+            self._output_backend = 'pickle'
+        return self._output_backend
+
+    @output_backend.setter
+    def output_backend(self, value):
+        assert value in ['pickle', 'hdf5'], \
+            "Unrecognized output_backend `{!s}`".format(value)
+        self._output_backend = value
+
+    def _have_output(self, prefix):
+        """
+        Determine whether there's any output from a previous run with
+        this prefix.
+        """
+        if self.output_backend == 'hdf5':
+            return os.path.exists('{!s}.hdf5'.format(prefix))
+        elif self.checkpoint_append:
+            return os.path.exists('{!s}.chain.pkl'.format(prefix))
+        else:
+            return len(glob.glob('{!s}.dd*.pkl'.format(prefix))) > 0
+
     @property
     def counter(self):
         if not hasattr(self, '_counter'):
@@ -980,7 +1242,7 @@ class ModelFit(FitBase):
             # naming convention!
             # These suffixes are always the same
             for suffix in ['logL', 'chain', 'facc', 'pinfo', 'rinfo',
-                'binfo', 'setup', 'load', 'fail', 'timeout']:
+                'binfo', 'setup', 'load', 'fail', 'timeout', 'timing']:
 
                 _fn1 = '{0!s}.{1!s}.pkl'.format(self.prefix, suffix)
 
@@ -996,6 +1258,12 @@ class ModelFit(FitBase):
             if os.path.exists('{!s}.prior_set.hdf5'.format(self.prefix)):
                 os.remove('{!s}.prior_set.hdf5'.format(self.prefix))
 
+            if self.output_backend == 'hdf5':
+                for _fn in ['{!s}.hdf5'.format(self.prefix),
+                    '{!s}.burn.hdf5'.format(self.prefix)]:
+                    if os.path.exists(_fn):
+                        os.remove(_fn)
+
             # These suffixes have their own suffixes
             for _fn in glob.glob('{!s}.blob_*.pkl'.format(self.prefix)):
                 if os.path.exists(_fn):
@@ -1009,7 +1277,11 @@ class ModelFit(FitBase):
         f.close()
 
         # Main output: MCMC chains (flattened)
-        if self.checkpoint_append:
+        if self.output_backend == 'hdf5':
+            # Datasets are created as needed, including for burn-in.
+            ChainStore('{!s}.hdf5'.format(self.prefix)).create(
+                self.parameters, self.is_log, self.nwalkers, clobber=True)
+        elif self.checkpoint_append:
             f = open('{!s}.chain.pkl'.format(prefix_by_proc), 'wb')
             f.close()
 
@@ -1018,11 +1290,13 @@ class ModelFit(FitBase):
             f.close()
 
         # Store acceptance fraction
-        f = open('{!s}.facc.pkl'.format(self.prefix), 'wb')
-        f.close()
+        if self.output_backend != 'hdf5':
+            f = open('{!s}.facc.pkl'.format(self.prefix), 'wb')
+            f.close()
 
         # File for blobs themselves
-        if self.blob_names is not None and self.checkpoint_append:
+        if (self.blob_names is not None) and self.checkpoint_append \
+            and (self.output_backend != 'hdf5'):
 
             for i, group in enumerate(self.blob_names):
                 for blob in group:
@@ -1232,8 +1506,13 @@ class ModelFit(FitBase):
 
         self.prefix = prefix
 
+        if self.output_backend == 'hdf5':
+            fn_main = '{!s}.hdf5'.format(prefix)
+        else:
+            fn_main = '{!s}.chain.pkl'.format(prefix)
+
         if rank == 0:
-            if os.path.exists('{!s}.chain.pkl'.format(prefix)) and (not clobber):
+            if os.path.exists(fn_main) and (not clobber):
                 if not restart:
                     raise IOError(('{!s} exists! Remove manually, set ' +\
                         'clobber=True, or set restart=True to ' +\
@@ -1255,23 +1534,10 @@ class ModelFit(FitBase):
             if clobber:
                 raise IOError("If restart=True, should set clobber=False!")
 
-            # below checks for checkpoint_append==True failure
-            cptapdtrfl = (self.checkpoint_append and\
-                (not os.path.exists('{!s}.chain.pkl'.format(prefix))))
-            # below checks for checkpoint_append==False failure
-            cptapdflsfl = ((not self.checkpoint_append) and\
-                (not glob.glob('{!s}.dd*.pkl'.format(prefix))))
-
-            cptapdtrfl_b = (self.checkpoint_append and\
-                (not os.path.exists('{!s}.burn.chain.pkl'.format(prefix))))
-            # below checks for checkpoint_append==False failure
-            cptapdflsfl_b = ((not self.checkpoint_append) and\
-                (not glob.glob('{!s}.burn.dd*.pkl'.format(prefix))))
-
             # either way, produce error
-            if (cptapdtrfl or cptapdflsfl):
+            if not self._have_output(prefix):
 
-                if (cptapdtrfl_b + cptapdflsfl_b == 0):
+                if self._have_output(prefix + '.burn'):
                     restart_from_burn = True
                 else:
                     raise IOError(("This can't be a restart, {!s}*.pkl not " +\
@@ -1281,7 +1547,22 @@ class ModelFit(FitBase):
             # Is it too dangerous to set clobber=True, here?
             burn_prev = 0
             try:
-                if self.checkpoint_append:
+                if self.output_backend == 'hdf5':
+                    if restart_from_burn:
+                        pref_prev = prefix + '.burn'
+                    else:
+                        pref_prev = prefix
+
+                    fn_last_chain = '{!s}.hdf5'.format(pref_prev)
+
+                    _store = ChainStore(fn_last_chain)
+                    if _store.nsteps == 0:
+                        raise ValueError('No complete checkpoints!')
+
+                    if restart_from_burn:
+                        burn_prev = _store.nsteps
+
+                elif self.checkpoint_append:
                     if restart_from_burn:
                         fn_last_chain = '{!s}.burn.chain.pkl'.format(prefix)
                     else:
@@ -1309,7 +1590,7 @@ class ModelFit(FitBase):
 
             except ValueError:
                 if rank == 0:
-                    has_burn = os.path.exists('{!s}.burn.chain.pkl'.format(prefix))
+                    has_burn = self._have_output(prefix + '.burn')
                     if not has_burn:
                         restart = False
                         clobber = True
@@ -1366,18 +1647,7 @@ class ModelFit(FitBase):
         if self.save_hmf:
             assert 'hmf_instance' not in self.base_kwargs
 
-            # Can generalize more later...
-            try:
-                hmf = sim.halos
-            except AttributeError:
-                hmf = None
-                for pop in sim.pops:
-                    if hasattr(pop, 'halos'):
-                        hmf = pop.halos
-                        break
-
-            if hmf is None:
-                raise AttributeError('No `hmf` attributes available!')
+            hmf = self._find_hmf(sim)
 
             self.base_kwargs['hmf_instance'] = hmf
 
@@ -1395,19 +1665,7 @@ class ModelFit(FitBase):
             # This maybe is unnecessary?
             #assert 'pop_psm_instance' not in self.base_kwargs
 
-            try:
-                srcs = [sim.src]
-                ids = [None]
-            except AttributeError:
-                srcs = [pop.src for pop in sim.pops]
-                ids = range(len(srcs))
-
-            for idnum, src in enumerate(srcs):
-
-                if ids[idnum] is None:
-                    sid = ''
-                else:
-                    sid = '{{{}}}'.format(idnum)
+            for idnum, (sid, src) in enumerate(self._find_srcs(sim)):
 
                 if isinstance(src, SynthesisModel):
                     assert 'pop_Z{}'.format(sid) not in self.parameters
@@ -1426,13 +1684,24 @@ class ModelFit(FitBase):
 
                 self.base_kwargs['pop_src_instance{}'.format(sid)] = src
 
+        if self.share_tables is not None:
+            self._share_instances()
+
+        # Local processes. Must come after the tricks above, so that the
+        # workers inherit whatever tables have been loaded.
+        if (size == 1) and (self.nprocs is not None) and (self.nprocs > 1):
+            self.pool = ProcessPool(self.nprocs,
+                start_method=self.pool_start_method,
+                maxtasks=self.pool_maxtasks, timeout=self.timeout,
+                timeout_value=(-np.inf, self.blank_blob))
+
         ##
         # Initialize sampler
         ##
         args = [self.prefix, self.parameters, self.is_log, self.prior_set_P,
             self.prior_set_B, self.blank_blob,
             self.base_kwargs, self.checkpoint_by_proc,
-            self.simulator, self.fitters, self.debug]
+            self.simulator, self.fitters, self.debug, self.memo]
 
         self.sampler = emcee.EnsembleSampler(self.nwalkers,
             self.Nd, loglikelihood, pool=self.pool, args=args)
@@ -1520,6 +1789,15 @@ class ModelFit(FitBase):
 
 
 
+        # Emulators that learn as they go must stop doing so now, otherwise
+        # the target distribution changes while we sample it. Local workers
+        # are re-started so that they see the frozen emulator.
+        if hasattr(self.simulator, 'freeze') and \
+           (not getattr(self.simulator, 'frozen', True)):
+            self.simulator.freeze()
+            if isinstance(self.pool, ProcessPool):
+                self.pool.stop()
+
         ##
         # MAIN MCMC
         ##
@@ -1564,7 +1842,9 @@ class ModelFit(FitBase):
         Run sampler and handle I/O.
         """
 
-        if restart and (not self.checkpoint_append):
+        if restart and (self.output_backend == 'hdf5'):
+            ct = ChainStore('{!s}.hdf5'.format(prefix)).nsteps
+        elif restart and (not self.checkpoint_append):
             ct = save_freq * (1 + max(self._saved_checkpoints(prefix)))
         else:
             ct = 0
@@ -1637,6 +1917,10 @@ class ModelFit(FitBase):
         # The flattened version of pos_all has
         # shape = (save_freq * nwalkers, ndim)
 
+        if self.output_backend == 'hdf5':
+            self._write_checkpoint_hdf5(data, ct, prefix, save_freq)
+            return
+
         if self.checkpoint_append:
             mode = 'ab'
         else:
@@ -1681,6 +1965,52 @@ class ModelFit(FitBase):
             ndumps=1, open_mode='w', safe_mode=False, verbose=False)
         ##################################################################
 
+    def _write_checkpoint_hdf5(self, data, ct, prefix, save_freq):
+        """
+        Append chain, logL, acceptance fraction, and blobs to <prefix>.hdf5.
+        """
+
+        store = ChainStore('{!s}.hdf5'.format(prefix))
+
+        # e.g., first checkpoint of burn-in
+        if not store.exists:
+            store.create(self.parameters, self.is_log, self.nwalkers)
+
+        # Number of steps taken since the last checkpoint
+        blen = len(data[2])
+
+        if self.blob_names is None:
+            blobs = blob_attrs = None
+        else:
+            blobs = {}
+            blob_attrs = {}
+            for j, group in enumerate(self.blob_names):
+
+                # Only store independent variables if they're rectangular
+                try:
+                    ivar = None if self.blob_ivars[j] is None else \
+                        np.array(self.blob_ivars[j], dtype=float)
+                except (ValueError, TypeError):
+                    ivar = None
+
+                for k, blob in enumerate(group):
+                    # Same ordering as the chain, i.e., walker by walker.
+                    blobs[blob] = np.array([data[2][l][i][j][k] \
+                        for i in range(self.nwalkers) for l in range(blen)],
+                        dtype=float)
+                    blob_attrs[blob] = {'ivar': ivar}
+
+        store.write_checkpoint(blen, np.array(data[0]), np.array(data[1]),
+            facc=self.sampler.acceptance_fraction, blobs=blobs,
+            blob_attrs=blob_attrs)
+
+        print("# Checkpoint #{0}: {1!s}".format(ct // save_freq, time.ctime()))
+
+        ##################################################################
+        write_pickle_file(data[-1], '{!s}.rstate.pkl'.format(prefix),\
+            ndumps=1, open_mode='w', safe_mode=False, verbose=False)
+        ##################################################################
+
     def save_blobs(self, blobs, uncompress=True, prefix=None, dd=None):
         """
         Write blobs to disk.
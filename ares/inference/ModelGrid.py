@@ -13,15 +13,26 @@ and analyzing them.
 from __future__ import print_function
 import signal
 import subprocess
+import multiprocessing
 import numpy as np
-import copy, os, gc, re, time
+import copy, os, gc, re, glob, time
+import hashlib
+try:
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    from concurrent.futures.process import BrokenProcessPool
+except ImportError:
+    # Python 2
+    ProcessPoolExecutor = None
 from ..util.Pickling import read_pickle_file, write_pickle_file
 from .ModelFit import ModelFit
+from ..sources import SynthesisModel
 from ..analysis import ModelSet
 from ..simulations import Global21cm
 from ..util import GridND, ProgressBar
 from ..analysis import Global21cm as _AnalyzeGlobal21cm
 from ..util.ReadData import concatenate
+from ..util.WorkQueue import CostModel, WorkQueue
+from ..util.CompletionIndex import CompletionIndex
 
 try:
     from mpi4py import MPI
@@ -30,6 +41,30 @@ try:
 except ImportError:
     rank = 0
     size = 1
+
+# MPI tags used when load-balancing dynamically
+_TAG_REQUEST = 101
+_TAG_MODEL = 102
+
+# Set by ModelGrid._models_dynamic right before forking workers.
+_grid_for_workers = None
+
+# Each worker keeps its own fcoll splines (see ModelGrid._prep_model).
+_fcoll_for_workers = {}
+
+def _run_model(h):
+    """
+    Run model number `h` of the grid, and time how long it takes.
+
+    .. note:: For use with multiprocessing only.
+    """
+    t1 = time.time()
+
+    # Workers share a rank, so tag checkpoint files with the process ID too.
+    procid = '{0!s}.{1}'.format(str(rank).zfill(3), os.getpid())
+    blobs, failct = _grid_for_workers._run_model(h, _fcoll_for_workers,
+        procid=procid)
+    return h, blobs, failct, time.time() - t1
         
 class ModelGrid(ModelFit):
     """Create an object for setting up and running model grids."""
@@ -66,6 +101,49 @@ class ModelGrid(ModelFit):
             self._simulator = Global21cm
         return self._simulator
             
+    def _share_tables_by_proc(self):
+        """
+        Load HMF (and SPS) tables on root processor and share with the rest.
+        
+        See `share_tables` attribute for details.
+        
+        Returns
+        -------
+        Nothing. Adds `hmf_instance` and, if `save_src` is True, 
+        `pop_src_instance` entries to `base_kwargs`.
+        
+        """
+        
+        if rank == 0:
+            sim = self.simulator(**self.base_kwargs)
+            
+            if 'hmf_instance' not in self.base_kwargs:
+                try:
+                    self.base_kwargs['hmf_instance'] = self._find_hmf(sim)
+                except AttributeError:
+                    pass
+            
+            if self.save_src:
+                for sid, src in self._find_srcs(sim):
+                    key = 'pop_src_instance{}'.format(sid)
+                    if isinstance(src, SynthesisModel) and \
+                        (key not in self.base_kwargs):
+                        self.base_kwargs[key] = src
+            
+            self._share_instances()
+            
+            shared = {key:self.base_kwargs[key] for key in self.base_kwargs \
+                if key.startswith('hmf_instance') or \
+                   key.startswith('pop_src_instance')}
+        else:
+            shared = None
+            
+        # Only filenames are actually sent to other processors    
+        if size > 1:
+            shared = MPI.COMM_WORLD.bcast(shared, root=0)
+        
+        self.base_kwargs.update(shared)
+        
     def _read_restart(self, prefix, procid=None):
         """
         Figure out which models have already been run.
@@ -173,6 +251,136 @@ class ModelGrid(ModelFit):
                         
         return done
             
+    def _grid_signature(self):
+        """
+        Hash of the parameters of all models, used to identify sets of models
+        that aren't grids (e.g., from `set_models` or `ModelSample`).
+        """
+        x = np.array([[kwargs[par] for par in self.parameters] \
+            for kwargs in self.grid.all_kwargs], dtype=float)
+        return hashlib.blake2b(np.ascontiguousarray(x).view(np.uint8),
+            digest_size=16).hexdigest()
+
+    def _read_restart_index(self, prefix):
+        """
+        Figure out which models have already been run, via the completion
+        index (see `ares.util.CompletionIndex`) rather than by reading all
+        previous outputs as in `_read_restart`.
+
+        If the grid has changed since the index was written, models are
+        matched to the new grid axis by axis, so only the axes (not the
+        outputs) need to be read.
+
+        Returns
+        -------
+        Array of ones/zeros, with the shape of the grid (if structured),
+        or one element per model. None if there's no usable index, in
+        which case we'll have to fall back to `_read_restart`.
+
+        """
+
+        done = None
+
+        if rank == 0:
+            index = CompletionIndex(prefix)
+
+            if index.exists:
+                info = index.read()
+            else:
+                info = None
+
+            if (info is None) and (not self.grid.structured):
+                # Outputs from before there was an index.
+                done = self._read_restart_chains(prefix)
+            elif info is None:
+                pass
+            elif self.grid.structured and (info['axes'] is not None):
+                names = [name for name, vals in info['axes']]
+                if names != list(self.grid.axes_names):
+                    raise ValueError('Cannot change axes variables on restart!')
+
+                dims = [len(vals) for name, vals in info['axes']]
+                done_old = np.reshape(info['done'], dims)
+
+                # Where does each element of each (old) axis live now?
+                i_old = []; i_new = []
+                for name, vals in info['axes']:
+                    ax = self.grid.axis(name)
+                    loc = [ax.locate(val, tol=self.tol) for val in vals]
+                    i_old.append(np.array([i for i, j in enumerate(loc) \
+                        if j is not None], dtype=int))
+                    i_new.append(np.array([j for j in loc if j is not None],
+                        dtype=int))
+
+                done = np.zeros(self.grid.shape)
+                done[np.ix_(*i_new)] = done_old[np.ix_(*i_old)]
+            elif (not self.grid.structured) and \
+                (info['signature'] == self._grid_signature()):
+                done = info['done'].astype(float)
+
+        if size > 1:
+            done = MPI.COMM_WORLD.bcast(done, root=0)
+
+        return done
+
+    def _read_restart_chains(self, prefix):
+        """
+        Figure out which of a set of models (not a grid) have already been
+        run by matching them to those in the outputs of all processors.
+
+        Returns
+        -------
+        Array of ones/zeros, one element per model. None if there are no
+        outputs.
+
+        """
+
+        pattern = re.compile(re.escape(prefix) + r'\.\d{3,}\.chain\.pkl$')
+        fns = [fn for fn in glob.glob('{!s}.*.chain.pkl'.format(
+            glob.escape(prefix))) if pattern.match(fn)]
+
+        if (not fns) or (not os.path.exists('{!s}.pinfo.pkl'.format(prefix))):
+            return None
+
+        (axes_names, is_log) = read_pickle_file(\
+            '{!s}.pinfo.pkl'.format(prefix), nloads=1, verbose=False)
+
+        for par in axes_names:
+            if par not in self.grid.axes_names:
+                raise ValueError('Cannot change axes variables on restart!')
+
+        x = np.array([[kwargs[par] for par in axes_names] \
+            for kwargs in self.grid.all_kwargs], dtype=float)
+
+        done = np.zeros(self.grid.size)
+        for fn in sorted(fns):
+            chain = concatenate(read_pickle_file(fn, nloads=None,
+                verbose=False))
+
+            for link in np.reshape(chain, (-1, len(axes_names))):
+                match = np.all(np.isclose(x, link, rtol=self.tol, atol=0),
+                    axis=1)
+                done[match] = 1
+
+        return done
+
+    def _write_restart_index(self, index):
+        """
+        Write completion index for the current grid from `self.done`.
+        """
+
+        if self._done_by_model:
+            done = self.done
+        else:
+            done = np.zeros(self.grid.size)
+
+        if self.grid.structured:
+            axes = [(name, self.grid.axis(name).values) \
+                for name in self.grid.axes_names]
+            index.write(done, axes=axes)
+        else:
+            index.write(done, signature=self._grid_signature())
+
     @property            
     def axes(self):
         return self.grid.axes
@@ -253,8 +461,9 @@ class ModelGrid(ModelFit):
                         
         prefix_by_proc = '{0!s}.{1!s}'.format(self.prefix, str(rank).zfill(3))
 
-        # Reshape assignments so it's Nlinks long.
-        if self.grid.structured:
+        # Reshape assignments so it's Nlinks long. If load-balancing
+        # dynamically, there's no telling ahead of time.
+        if self.grid.structured and self.LB != 4:
             assignments = self._reshape_assignments(self.assignments)
                 
             if restart:
@@ -273,7 +482,7 @@ class ModelGrid(ModelFit):
                         
         super(ModelGrid, self)._prep_from_scratch(clobber, by_proc=True)
             
-        if self.grid.structured:
+        if self.grid.structured and self.LB != 4:
             write_pickle_file(assignments,\
                 '{!s}.load.pkl'.format(self.prefix), ndumps=1, open_mode='w',\
                 safe_mode=False, verbose=False)
@@ -550,6 +759,425 @@ class ModelGrid(ModelFit):
         assert type(value) in [int, bool]
         self._debug = value
     
+    @property
+    def timing_log(self):
+        """
+        Timings from previous runs, used to predict the cost of each model
+        when load-balancing dynamically. Timings of models in the current
+        run are written to <prefix>.timing.pkl, which is read automatically
+        upon restart.
+        """
+        if not hasattr(self, '_timing_log'):
+            self._timing_log = []
+        return self._timing_log
+
+    @timing_log.setter
+    def timing_log(self, value):
+        if isinstance(value, str):
+            value = [value]
+        self._timing_log = list(value)
+
+    @property
+    def cost_model(self):
+        if not hasattr(self, '_cost_model'):
+            self._cost_model = CostModel(self.parameters)
+        return self._cost_model
+
+    @cost_model.setter
+    def cost_model(self, value):
+        self._cost_model = value
+
+    def _load_timings(self, restart):
+        fns = list(self.timing_log)
+        if restart:
+            fns.append('{!s}.timing.pkl'.format(self.prefix))
+
+        loaded = []
+        for fn in fns:
+            if os.path.abspath(fn) in loaded:
+                continue
+
+            N = self.cost_model.load(fn)
+            loaded.append(os.path.abspath(fn))
+
+            if N > 0:
+                print("# Read {0} model timings from {1!s}.".format(N, fn))
+
+    def _prep_model(self, kwargs, fcoll):
+        """
+        Setup a single model.
+
+        Parameters
+        ----------
+        kwargs : dict
+            Parameters that define this model, i.e., an element of
+            `self.grid.all_kwargs`.
+        fcoll : dict
+            Splines for fcoll (and its derivative) computed so far, indexed
+            by their Tmin. Updated in place.
+
+        Returns
+        -------
+        Tuple: (parameters of this model in linear units, dictionary of
+        all parameters to pass to the simulator).
+
+        """
+
+        # Grab Tmin index
+        if self.Tmin_in_grid and self.LB == 1:
+            Tmin_ax = self.grid.axes[self.grid.axisnum(self.Tmin_ax_name)]
+            i_Tmin = Tmin_ax.locate(kwargs[self.Tmin_ax_name])
+        else:
+            i_Tmin = 0
+
+        # Copy kwargs - may need updating with pre-existing lookup tables
+        p = self.base_kwargs.copy()
+        
+        # Log-ify stuff if necessary
+        kw = {}
+        for i, par in enumerate(self.parameters):
+            if self.is_log[i]:
+                kw[par] = 10**kwargs[par]
+            else:
+                kw[par] = kwargs[par]
+        
+        p.update(kw)
+        
+        # Create new splines if we haven't hit this Tmin yet in our model grid.    
+        if self.reuse_splines and \
+            i_Tmin not in fcoll.keys() and (not self.phenomenological):
+            sim = self.simulator(**p)
+                           
+            pops = sim.pops
+            
+            if hasattr(self, 'Tmin_ax_popid'):
+                loc = self.Tmin_ax_popid
+                suffix = '{{{}}}'.format(loc)
+            else:
+                if sim.pf.Npops > 1:
+                    loc = 0
+                    suffix = '{0}'
+                else:    
+                    loc = 0
+                    suffix = ''
+            
+            hmf_pars = {'pop_Tmin{!s}'.format(suffix): sim.pf['pop_Tmin{!s}'.format(suffix)],
+                'fcoll{!s}'.format(suffix): copy.deepcopy(pops[loc].fcoll), 
+                'dfcolldz{!s}'.format(suffix): copy.deepcopy(pops[loc].dfcolldz)}
+            
+            # Save for future iterations
+            fcoll[i_Tmin] = hmf_pars.copy()
+
+            p.update(hmf_pars)
+        # If we already have matching fcoll splines, use them!
+        elif self.reuse_splines and (not self.phenomenological):
+            p.update(fcoll[i_Tmin])
+        else:
+            pass
+
+        return kw, p
+
+    def _run_model(self, h, fcoll, procid=None):
+        """
+        Run model number `h`, i.e., that defined by `self.grid.all_kwargs[h]`.
+
+        Parameters
+        ----------
+        procid : str
+            Identifies checkpoint files. Defaults to this processor's rank.
+
+        Returns
+        -------
+        Tuple: (blobs, number of failures).
+
+        """
+
+        kw, p = self._prep_model(self.grid.all_kwargs[h], fcoll)
+
+        # Write this set of parameters to disk before running 
+        # so we can troubleshoot later if the run never finishes.
+        if procid is None:
+            procid = str(rank).zfill(3)
+
+        fn = '{0!s}.{1!s}.checkpt.pkl'.format(self.prefix, procid)
+        write_pickle_file(kw, fn, ndumps=1, open_mode='w',\
+            safe_mode=False, verbose=False)
+        fn = '{0!s}.{1!s}.checkpt.txt'.format(self.prefix, procid)
+        with open(fn, 'w') as f:
+            print("Simulation began: {!s}".format(time.ctime()), file=f)
+
+        # Kill if model gets stuck
+        if self.timeout is not None:
+            signal.signal(signal.SIGALRM, self._handler)
+            signal.alarm(self.timeout)
+
+        ##
+        # Run simulation!
+        ##   
+        blobs, failct = self._run_sim(kw, p)
+        
+        # Disable the alarm
+        if self.timeout is not None:
+            signal.alarm(0)
+            
+        # If this is missing from a file, we'll know where things went south.
+        fn = '{0!s}.{1!s}.checkpt.txt'.format(self.prefix, procid)
+        with open(fn, 'a') as f:
+            print("Simulation finished: {!s}".format(time.ctime()), file=f)
+
+        return blobs, failct
+
+    def _todo(self, restart):
+        """
+        Indices of models (in `self.grid.all_kwargs`) yet to be run.
+        """
+        if not (restart and self._done_by_model):
+            return np.arange(self.grid.size)
+
+        todo = []
+        for h, kwargs in enumerate(self.grid.all_kwargs):
+            if self.grid.structured:
+                kvec = self.grid.locate_entry(kwargs, tol=self.tol)
+            else:
+                kvec = h
+            if not self.done[kvec]:
+                todo.append(h)
+
+        return np.array(todo, dtype=int)
+
+    def _models(self, restart, fcoll, save_freq, pb=None):
+        """
+        Run all models this processor is responsible for.
+
+        Yields
+        ------
+        Tuple: (model number, dictionary of parameters, blobs, number of
+        failures) for each model, in the order they are completed.
+
+        """
+
+        if self.LB == 4:
+            for result in self._models_dynamic(restart, fcoll, save_freq, pb):
+                yield result
+            return
+
+        for h, kwargs in enumerate(self.grid.all_kwargs):
+            
+            # Where does this model live in the grid?
+            if self.grid.structured:
+                kvec = self.grid.locate_entry(kwargs, tol=self.tol)
+            else:
+                kvec = h
+
+            # Skip if it's a restart and we've already run this model
+            if restart and self._done_by_model:
+                if self.done[kvec]:
+                    continue
+
+            # Skip if this processor isn't assigned to this model     
+            if self.assignments[kvec] != rank:
+                continue
+
+            blobs, failct = self._run_model(h, fcoll)
+
+            yield h, kwargs, blobs, failct
+
+    def _models_dynamic(self, restart, fcoll, save_freq, pb=None):
+        """
+        Run models handed out one at a time, most expensive first.
+
+        With MPI, the root processor does nothing but hand out models to
+        the others as they finish their previous one. Without MPI, models are
+        farmed out to `nprocs` forked processes in the same way (or, if
+        `nprocs` is None, simply run in order of decreasing cost). Either
+        way, the expected cost of each model is predicted from timings of
+        models already run (see `ares.util.WorkQueue`).
+        """
+
+        global _grid_for_workers
+
+        if rank > 0:
+            for result in self._models_by_request(fcoll):
+                yield result
+            return
+
+        x = [[kwargs[par] for par in self.parameters] \
+            for kwargs in self.grid.all_kwargs]
+        queue = WorkQueue(x, self._todo(restart), self.cost_model)
+
+        fn = '{!s}.timing.pkl'.format(self.prefix)
+
+        if size > 1:
+            self._serve_models(queue, save_freq, pb)
+            return
+
+        if (self.nprocs is None) or (self.nprocs < 2):
+            try:
+                for h in queue:
+                    t1 = time.time()
+                    blobs, failct = self._run_model(h, fcoll)
+                    queue.report(h, time.time() - t1)
+
+                    yield h, self.grid.all_kwargs[h], blobs, failct
+
+                    if self.cost_model.Nsamples % save_freq == 0:
+                        self.cost_model.save(fn)
+            finally:
+                self.cost_model.save(fn)
+
+            return
+
+        if ProcessPoolExecutor is None:
+            raise NotImplementedError('Running models on local processes '
+                'requires Python 3.')
+
+        # Keep exactly one model per worker in flight, so that the queue
+        # can be re-ordered right up until each model is handed out.
+        _grid_for_workers = self
+        pool = self._get_pool()
+        pending = {}
+        try:
+            while True:
+                while (len(pending) < self.nprocs) and (len(queue) > 0):
+                    h = queue.next()
+                    pending[pool.submit(_run_model, h)] = h, pool
+
+                if not pending:
+                    break
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in finished:
+                    h, owner = pending.pop(future)
+
+                    try:
+                        h, blobs, failct, dt = future.result()
+                    except MemoryError:
+                        raise MemoryError('This cannot be tolerated!')
+                    except Exception as err:
+                        # Same as a failed simulation in `_run_sim`, except
+                        # there's no timing to report.
+                        blobs, failct = self._record_failure(h, err), 1
+
+                        # A dead worker takes the pool (and everything in
+                        # flight) with it.
+                        if isinstance(err, BrokenProcessPool) and \
+                           (owner is pool):
+                            pool.shutdown(wait=True)
+                            pool = self._get_pool()
+                    else:
+                        queue.report(h, dt)
+
+                    yield h, self.grid.all_kwargs[h], blobs, failct
+
+                    if self.cost_model.Nsamples % save_freq == 0:
+                        self.cost_model.save(fn)
+        finally:
+            pool.shutdown(wait=True)
+            _grid_for_workers = None
+            self.cost_model.save(fn)
+
+    def _get_pool(self):
+        """
+        Pool of `nprocs` forked processes, for `_models_dynamic`.
+        """
+        # Forking is the default on Linux anyway, and Python < 3.7 can't
+        # be told otherwise.
+        try:
+            return ProcessPoolExecutor(self.nprocs,
+                mp_context=multiprocessing.get_context('fork'))
+        except TypeError:
+            return ProcessPoolExecutor(self.nprocs)
+
+    def _record_failure(self, h, err):
+        """
+        Write parameters of model `h` to this processor's "fail" file.
+
+        Returns
+        -------
+        Blank blobs, to stand in for those of model `h`.
+
+        """
+        write_pickle_file(self.grid.all_kwargs[h],
+            '{0!s}.{1!s}.fail.pkl'.format(self.prefix, str(rank).zfill(3)),
+            ndumps=1, open_mode='a', safe_mode=False, verbose=False)
+
+        print("FAILURE: Processor #{0} (model {1}): {2!r}".format(rank, h,
+            err))
+
+        return copy.deepcopy(self.blank_blob)
+
+    def _serve_models(self, queue, save_freq, pb=None):
+        """
+        Hand out models to other processors as they ask for them.
+
+        Each request carries the timing of the model that processor just
+        finished, which is used to update the cost model.
+        """
+
+        comm = MPI.COMM_WORLD
+        status = MPI.Status()
+
+        fn = '{!s}.timing.pkl'.format(self.prefix)
+
+        ct = 0
+        Nactive = size - 1
+        while Nactive > 0:
+            timing, more = comm.recv(source=MPI.ANY_SOURCE,
+                tag=_TAG_REQUEST, status=status)
+
+            if timing is not None:
+                queue.report(*timing)
+                ct += 1
+
+                if pb is not None:
+                    pb.update(ct)
+                if ct % save_freq == 0:
+                    self.cost_model.save(fn)
+
+            # Processor has quit early, e.g., due to `exit_after`.
+            if not more:
+                Nactive -= 1
+                continue
+
+            h = queue.next()
+            comm.send(h, dest=status.Get_source(), tag=_TAG_MODEL)
+
+            if h is None:
+                Nactive -= 1
+
+        self.cost_model.save(fn)
+
+    def _models_by_request(self, fcoll):
+        """
+        Ask the root processor for models to run until there are none left.
+        """
+
+        comm = MPI.COMM_WORLD
+
+        timing = None
+        released = False
+        try:
+            while True:
+                comm.send((timing, True), dest=0, tag=_TAG_REQUEST)
+                timing = None
+
+                h = comm.recv(source=0, tag=_TAG_MODEL)
+
+                if h is None:
+                    released = True
+                    break
+
+                t1 = time.time()
+                blobs, failct = self._run_model(h, fcoll)
+                timing = (h, time.time() - t1)
+
+                yield h, self.grid.all_kwargs[h], blobs, failct
+        finally:
+            # Let the root processor know we won't be asking for more.
+            if not released:
+                comm.send((timing, False), dest=0, tag=_TAG_REQUEST)
+
     def run(self, prefix, clobber=False, restart=False, save_freq=500,
         use_pb=True, use_checks=True, long_run=False, exit_after=None):
         """
@@ -627,13 +1255,26 @@ class ModelGrid(ModelFit):
         else:
             all_restart = any_restart = _all_restart = _restart_actual
                 
+        # With a completion index, we know it's a restart (and which models
+        # are done) regardless of which processors wrote what.
+        index = CompletionIndex(prefix)
+        any_restart = bool(any_restart) or index.exists
+
         # If user says it's not a restart, it's not a restart.        
         any_restart *= restart        
                 
         self.is_restart = any_restart        
-                
+
+        done_index = self._read_restart_index(prefix) if any_restart else None
+
+        # Is `self.done` an array with an element for each model?
+        self._done_by_model = bool(any_restart) and \
+            (self.grid.structured or (done_index is not None))
+
         # Load previous results if this is a restart
-        if any_restart:
+        if any_restart and (done_index is not None):
+            self.done = done_index
+        elif any_restart:
             done = self._read_restart(prefix)
             
             if self.grid.structured:
@@ -697,8 +1338,29 @@ class ModelGrid(ModelFit):
                 
         else:
             Ndone = 0
+
+        # Start a new index, or bring the old one up to date (e.g., if the
+        # grid has changed), before anybody adds to it.
+        if rank == 0:
+            self._write_restart_index(index)
+
+        if size > 1:
+            MPI.COMM_WORLD.Barrier()
                 
-        if any_restart and self.grid.structured:
+        if self.LB == 4:
+            Nleft = self.grid.size
+            if self._done_by_model:
+                Nleft -= int(self.done.sum())
+
+            # Models are handed out on demand, so this is just a guess for
+            # any given worker.
+            if rank > 0:
+                Nleft = int(np.ceil(Nleft / float(size - 1)))
+
+            if rank == 0:
+                self._load_timings(any_restart)
+
+        elif self._done_by_model:
             mine_and_done = np.logical_and(self.assignments == rank,
                                            self.done == 1)
             
@@ -711,7 +1373,7 @@ class ModelGrid(ModelFit):
             print("Processor {} is done already!".format(rank))
         
         # Print out how many models we have (left) to compute
-        if any_restart and self.grid.structured:
+        if self._done_by_model:
             if rank == 0:
                 Ndone = self.done.sum()
                 Ntot = self.done.size
@@ -738,6 +1400,10 @@ class ModelGrid(ModelFit):
         # Make some blank files for data output        
         self.prep_output_files(any_restart, clobber)
 
+        # Load big lookup tables once, let other processors attach to them
+        if self.share_tables is not None:
+            self._share_tables_by_proc()
+
         # Dictionary for hmf tables
         fcoll = {}
         
@@ -745,127 +1411,24 @@ class ModelGrid(ModelFit):
         pb = ProgressBar(Nleft, 'grid', use_pb)
         pb.start()
         
-        chain_all = []; blobs_all = []
+        chain_all = []; blobs_all = []; h_all = []
         
         t1 = time.time()
 
         ct = 0
-        was_done = 0
         failct = 0
 
         # Loop over models, use StellarPopulation.update routine 
         # to speed-up (don't have to re-load HMF spline as many times)
-        for h, kwargs in enumerate(self.grid.all_kwargs):
-            
-            # Where does this model live in the grid?
-            if self.grid.structured:
-                kvec = self.grid.locate_entry(kwargs, tol=self.tol)
-            else:
-                kvec = h
+        for h, kwargs, blobs, _failct in self._models(any_restart, fcoll,
+            save_freq, pb):
 
-            # Skip if it's a restart and we've already run this model
-            if any_restart and self.grid.structured:
-                if self.done[kvec]:
-                    was_done += 1
-                    pb.update(ct)
-                    continue
-
-            # Skip if this processor isn't assigned to this model     
-            # This could be moved above the previous check   
-            if self.assignments[kvec] != rank:
-                pb.update(ct)
-                continue
-
-            # Grab Tmin index
-            if self.Tmin_in_grid and self.LB == 1:
-                Tmin_ax = self.grid.axes[self.grid.axisnum(self.Tmin_ax_name)]
-                i_Tmin = Tmin_ax.locate(kwargs[self.Tmin_ax_name])
-            else:
-                i_Tmin = 0
-
-            # Copy kwargs - may need updating with pre-existing lookup tables
-            p = self.base_kwargs.copy()
-            
-            # Log-ify stuff if necessary
-            kw = {}
-            for i, par in enumerate(self.parameters):
-                if self.is_log[i]:
-                    kw[par] = 10**kwargs[par]
-                else:
-                    kw[par] = kwargs[par]
-            
-            p.update(kw)
-            
-            # Create new splines if we haven't hit this Tmin yet in our model grid.    
-            if self.reuse_splines and \
-                i_Tmin not in fcoll.keys() and (not self.phenomenological):
-                #raise NotImplementedError('help')
-                sim = self.simulator(**p)
-                               
-                pops = sim.pops
-                
-                if hasattr(self, 'Tmin_ax_popid'):
-                    loc = self.Tmin_ax_popid
-                    suffix = '{{{}}}'.format(loc)
-                else:
-                    if sim.pf.Npops > 1:
-                        loc = 0
-                        suffix = '{0}'
-                    else:    
-                        loc = 0
-                        suffix = ''
-                
-                hmf_pars = {'pop_Tmin{!s}'.format(suffix): sim.pf['pop_Tmin{!s}'.format(suffix)],
-                    'fcoll{!s}'.format(suffix): copy.deepcopy(pops[loc].fcoll), 
-                    'dfcolldz{!s}'.format(suffix): copy.deepcopy(pops[loc].dfcolldz)}
-                
-                # Save for future iterations
-                fcoll[i_Tmin] = hmf_pars.copy()
-
-                p.update(hmf_pars)
-            # If we already have matching fcoll splines, use them!
-            elif self.reuse_splines and (not self.phenomenological):
-                                        
-                hmf_pars = {'pop_Tmin{!s}'.format(suffix): fcoll[i_Tmin]['pop_Tmin{!s}'.format(suffix)],
-                    'fcoll{!s}'.format(suffix): fcoll[i_Tmin]['fcoll{!s}'.format(suffix)],
-                    'dfcolldz{!s}'.format(suffix): fcoll[i_Tmin]['dfcolldz{!s}'.format(suffix)]}
-                p.update(hmf_pars)
-            else:
-                pass
-                
-            # Write this set of parameters to disk before running 
-            # so we can troubleshoot later if the run never finishes.
-            procid = str(rank).zfill(3)
-            fn = '{0!s}.{1!s}.checkpt.pkl'.format(self.prefix, procid)
-            write_pickle_file(kw, fn, ndumps=1, open_mode='w',\
-                safe_mode=False, verbose=False)
-            fn = '{0!s}.{1!s}.checkpt.txt'.format(self.prefix, procid)
-            with open(fn, 'w') as f:
-                print("Simulation began: {!s}".format(time.ctime()), file=f)
-
-            # Kill if model gets stuck
-            if self.timeout is not None:
-                signal.signal(signal.SIGALRM, self._handler)
-                signal.alarm(self.timeout)
-
-            ##
-            # Run simulation!
-            ##   
-            blobs, _failct = self._run_sim(kw, p)
             failct += _failct
-            
-            # Disable the alarm
-            if self.timeout is not None:
-                signal.alarm(0)
-                
-            # If this is missing from a file, we'll know where things went south.
-            fn = '{0!s}.{1!s}.checkpt.txt'.format(self.prefix, procid)
-            with open(fn, 'a') as f:
-                print("Simulation finished: {!s}".format(time.ctime()), file=f)
 
             chain = np.array([kwargs[key] for key in self.parameters])
             chain_all.append(chain)
             blobs_all.append(blobs)
+            h_all.append(h)
 
             ct += 1
 
@@ -877,7 +1440,7 @@ class ModelGrid(ModelFit):
 
             # Only record results every save_freq steps
             if ct % save_freq != 0:
-                del p, chain, blobs
+                del chain, blobs
                 gc.collect()
                 continue
 
@@ -898,11 +1461,14 @@ class ModelGrid(ModelFit):
 
             self.save_blobs(blobs_all, False, prefix_by_proc)
 
-            del p, chain, blobs
+            # Only now can these models be considered done.
+            index.mark(h_all, rank)
+
+            del chain, blobs
             del chain_all, blobs_all
             gc.collect()
 
-            chain_all = []; blobs_all = []
+            chain_all = []; blobs_all = []; h_all = []
             
             # If, after the first checkpoint, we only have 'failed' models,
             # raise an error.
@@ -930,6 +1496,8 @@ class ModelGrid(ModelFit):
         
         if blobs_all:
             self.save_blobs(blobs_all, False, prefix_by_proc)
+
+        index.mark(h_all, rank)
         
         print("Processor {0}: Wrote {1!s}.*.pkl ({2!s})".format(rank, prefix,\
             time.ctime()))
@@ -1026,12 +1594,53 @@ class ModelGrid(ModelFit):
         pass
             
     def LoadBalance(self, method=0, par=None):
-        
-        if self.grid.structured:
+        """
+        Determine which processors are to run which models.
+
+        Parameters
+        ----------
+        method : int
+            0 : OFF
+            1 : Minimize the number of values of `par' each processor gets. 
+                Good for, e.g., Tmin.
+            2 : Maximize the number of values of `par' each processor gets.
+                Useful if increasing `par' slows down the calculation.
+            3 : Assign models to processors at random.
+            4 : Dynamic. Nothing is assigned ahead of time: models are handed
+                out one at a time, most expensive first, to whichever
+                processor is free. Costs are predicted from how long models
+                have taken so far (and/or in the runs listed in
+                `timing_log`). With MPI, the root processor does the
+                handing out (and no models). Without MPI, models can be
+                run on `nprocs` local processes.
+        par : str
+            Name of parameter to balance over (methods 1 and 2 only).
+
+        """
+
+        if method == 4:
+            self._dynamic_balance()
+        elif self.grid.structured:
             self._structured_balance(method=method, par=par)
         else: 
             self._unstructured_balance(method=method, par=par)
 
+    def _dynamic_balance(self):
+        """
+        No assignments: processors ask for models as they need them.
+        """
+
+        if size == 2:
+            print("WARNING: dynamic load-balancing with 2 processors " +\
+                "leaves only 1 to run models.")
+
+        self.LB = 4
+
+        if self.grid.structured:
+            self._assignments = -1 * np.ones(self.grid.shape, dtype=int)
+        else:
+            self._assignments = -1 * np.ones(self.grid.size, dtype=int)
+
     def _unstructured_balance(self, method=0, par=None):
                 
         if rank == 0:
@@ -0,0 +1,381 @@
+"""
+
+StageCache.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Mon Oct 19 01:37:12 PDT 2026
+
+Description: Memoization of the expensive stages of a simulation, so that
+MCMC proposals that only change some parameters needn't redo everything.
+
+"""
+
+import re
+import copy
+import uuid
+import numpy as np
+from ..physics import HaloMassFunction
+from ..sources import SynthesisModel
+from ..util.LRUCache import LRUCache
+from ..util.TableCache import TableCache, UncacheableError
+from ..util.SetDefaultParameterValues import HaloMassFunctionParameters, \
+    CosmologyParameters, SynthesisParameters
+
+try:
+    # this runs with no issues in python 2 but raises error in python 3
+    basestring
+except:
+    # this try/except allows for python 2/3 compatible string type checking
+    basestring = str
+
+# Parameters each stage can depend on (if they aren't population-specific)
+_cosmo_pars = set(CosmologyParameters().keys())
+_hmf_pars = set(HaloMassFunctionParameters().keys()) | _cosmo_pars
+_src_pars = set([par.replace('source', 'pop') \
+    for par in SynthesisParameters().keys()]) | _cosmo_pars
+
+# In-memory stores, one per StageCache, which stay put in each process when
+# StageCache objects are pickled (e.g., sent along with each MPI task).
+_stores = {}
+
+def find_solver(sim):
+    """
+    Return UniformBackground instance used by simulation `sim`.
+    """
+    try:
+        return sim.medium.field.solver
+    except AttributeError:
+        return sim.solver
+
+def _popid(par):
+    """
+    Return ID number of population `par` belongs to, or None.
+    """
+    m = re.search(r"\{([0-9]+)\}", par)
+    if m is None:
+        return None
+    return int(m.group(1))
+
+def _prefix(par):
+    return re.sub(r"\{[0-9]+\}", '', par)
+
+class StageCache(object):
+    def __init__(self, parameters, base_kwargs, maxsize=16, path=None,
+        maxbytes=None):
+        """
+        Cache for intermediate products of simulations, keyed by the values
+        of the parameters each depends on.
+
+        The stages, and the parameters they depend on, are:
+
+            + `hmf`: the HaloMassFunction, which depends on the halo mass
+              function and cosmological parameters.
+            + `src{n}`: the SynthesisModel of population #n, which depends on
+              its synthesis parameters (and cosmology).
+            + `rte{n}`: the flux history of population #n, which depends on
+              all of its parameters, those of any populations it's linked
+              to, and any that aren't population-specific (e.g., those that
+              set the redshift grid and optical depth).
+            + `result`: the posterior probability and blobs, which depend on
+              everything.
+
+        Products are injected into subsequent simulations via `hmf_instance`,
+        `pop_src_instance{n}`, and `pop_rte_history{n}`, so a proposal that
+        only changes, e.g., the X-ray properties of population #1 re-uses the
+        UV flux history of population #0. Everything downstream (e.g., the
+        evolution of the IGM) is always re-computed.
+
+        Parameters
+        ----------
+        parameters : list
+            Names of the parameters being varied.
+        base_kwargs : dict
+            Parameters held fixed.
+        maxsize : int
+            Maximum number of entries to hold in memory for each stage.
+        path : str
+            If supplied, flux histories are also saved to (and retrieved
+            from) this directory, so that they can be shared by processors
+            and subsequent runs.
+        maxbytes : int, float
+            Disk budget for `path`, in bytes.
+
+        """
+        self.parameters = list(parameters)
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.path = path
+
+        # Identifies in-memory store
+        self.token = uuid.uuid4().hex
+
+        self.multipop = np.any(['{' in par \
+            for par in self.parameters + list(base_kwargs.keys())])
+
+        self.stages = self._get_stages(base_kwargs)
+
+        if path is not None:
+            # Fixed parameters enter disk cache keys, so different runs don't
+            # get each other's results.
+            fixed = {}
+            for key, val in base_kwargs.items():
+                if ('_instance' in key) or key.startswith('pop_rte_history'):
+                    continue
+                fixed[key] = val
+
+            # If some fixed parameter can't be keyed by value (e.g., it's a
+            # bound method), only keep products in memory.
+            try:
+                self.signature = self.disk.key(**fixed)
+            except UncacheableError:
+                self.path = self.signature = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_disk', None)
+        return state
+
+    def _get_stages(self, base_kwargs):
+        """
+        Figure out which stages to cache and the indices of the parameters
+        each one depends on.
+
+        Returns
+        -------
+        Dictionary of (name of keyword argument, list of indices), with one
+        element for each stage.
+
+        """
+
+        ids = [_popid(par) for par in self.parameters]
+
+        stages = {'result': list(range(len(self.parameters)))}
+
+        if base_kwargs.get('hmf_instance', None) is None:
+            stages['hmf'] = [i for i, par in enumerate(self.parameters) \
+                if par in _hmf_pars]
+
+        # Which populations are there, and which are linked to which?
+        Npops = max([1] + [1 + _popid(key) \
+            for key in list(base_kwargs.keys()) + self.parameters \
+            if _popid(key) is not None])
+
+        links = {n: set([n]) for n in range(Npops)}
+        for key, val in base_kwargs.items():
+            if (_popid(key) is None) or (not isinstance(val, basestring)):
+                continue
+
+            nums = re.findall(r"\{([0-9]+)\}|:([0-9]+)", val)
+            for num in nums:
+                links[_popid(key)].add(int(''.join(num)))
+
+        for n in range(Npops):
+            sid = '{{{}}}'.format(n) if self.multipop else ''
+
+            if base_kwargs.get('pop_src_instance{}'.format(sid),
+                base_kwargs.get('pop_src_instance', None)) is None:
+                stages['src{}'.format(sid)] = [i \
+                    for i, par in enumerate(self.parameters) \
+                    if (ids[i] in [None, n]) and (_prefix(par) in _src_pars)]
+
+            # Populations can feed back on each other this way.
+            if base_kwargs.get('feedback_LW', False):
+                continue
+
+            stages['rte{}'.format(sid)] = [i \
+                for i, par in enumerate(self.parameters) \
+                if (ids[i] is None) or (ids[i] in links[n])]
+
+        return stages
+
+    @property
+    def caches(self):
+        """
+        Dictionary of LRUCache objects, one per stage.
+        """
+        if self.token not in _stores:
+            _stores[self.token] = {stage: LRUCache(self.maxsize) \
+                for stage in self.stages}
+        return _stores[self.token]
+
+    @property
+    def disk(self):
+        if not hasattr(self, '_disk'):
+            self._disk = TableCache(self.path, maxsize=self.maxbytes)
+        return self._disk
+
+    def _key(self, stage, pars):
+        return tuple([float(pars[i]) for i in self.stages[stage]])
+
+    def _disk_key(self, stage, pars):
+        deps = {self.parameters[i]: float(pars[i]) \
+            for i in self.stages[stage]}
+        return self.disk.key(stage.replace('{', '').replace('}', ''),
+            signature=self.signature, deps=deps)
+
+    def result(self, pars):
+        """
+        Retrieve posterior probability and blobs for parameters `pars`.
+
+        Returns
+        -------
+        Tuple (PofD, blobs), or None if `pars` hasn't been seen before.
+
+        """
+        cached = self.caches['result'].get(self._key('result', pars))
+
+        if cached is None:
+            return None
+
+        return cached['PofD'], copy.deepcopy(cached['blobs'])
+
+    def inject(self, pars):
+        """
+        Retrieve whatever products are available for parameters `pars`.
+
+        Returns
+        -------
+        Dictionary of keyword arguments to pass to the simulation.
+
+        """
+
+        kwargs = {}
+        for stage in self.stages:
+            if stage == 'result':
+                continue
+
+            key = self._key(stage, pars)
+            cached = self.caches[stage].get(key)
+
+            if (cached is None) and stage.startswith('rte') and \
+               (self.path is not None):
+                cached = self._load_histories(stage, pars)
+                if cached is not None:
+                    self.caches[stage].put(key, cached)
+
+            if cached is None:
+                continue
+
+            if stage == 'hmf':
+                kwargs['hmf_instance'] = cached['product']
+            elif stage.startswith('src'):
+                kwargs['pop_src_instance{}'.format(stage[3:])] = \
+                    cached['product']
+            else:
+                kwargs['pop_rte_history{}'.format(stage[3:])] = \
+                    cached['product']
+
+        return kwargs
+
+    def update(self, pars, sim, PofD, blobs):
+        """
+        Save products of simulation `sim`, run with parameters `pars`.
+        """
+
+        self.caches['result'].put(self._key('result', pars),
+            {'PofD': PofD, 'blobs': copy.deepcopy(blobs)})
+
+        # Only bother with things the simulation actually loaded.
+        try:
+            pops = sim.pops
+        except AttributeError:
+            pops = []
+
+        for n, pop in enumerate(pops):
+            sid = '{{{}}}'.format(n) if self.multipop else ''
+
+            hmf = pop.__dict__.get('_halos', None)
+            if ('hmf' in self.stages) and isinstance(hmf, HaloMassFunction):
+                self.caches['hmf'].put(self._key('hmf', pars),
+                    {'product': hmf})
+
+            src = pop.__dict__.get('_src', None)
+            stage = 'src{}'.format(sid)
+            if (stage in self.stages) and isinstance(src, SynthesisModel):
+                self.caches[stage].put(self._key(stage, pars),
+                    {'product': src})
+
+        try:
+            histories = find_solver(sim).rte_histories
+        except AttributeError:
+            histories = {}
+
+        for n, hist in histories.items():
+            stage = 'rte{{{}}}'.format(n) if self.multipop else 'rte'
+
+            if (hist is None) or (stage not in self.stages):
+                continue
+
+            key = self._key(stage, pars)
+            if key in self.caches[stage]:
+                continue
+
+            self.caches[stage].put(key, {'product': hist})
+
+            if self.path is not None:
+                self._save_histories(stage, pars, hist)
+
+    def _save_histories(self, stage, pars, hist):
+        # Band j is stored as b<j> (or b<j>_<k> for sawtooth sub-bands),
+        # and `layout` records which is which.
+        arrays = {}
+        layout = []
+        for j, band in enumerate(hist):
+            if band is None:
+                layout.append(-1)
+            elif type(band) is list:
+                layout.append(len(band))
+                for k, sub in enumerate(band):
+                    arrays['b{}_{}'.format(j, k)] = sub
+            else:
+                layout.append(0)
+                arrays['b{}'.format(j)] = band
+
+        self.disk.save(self._disk_key(stage, pars), layout=np.array(layout),
+            **arrays)
+
+    def _load_histories(self, stage, pars):
+        key = self._disk_key(stage, pars)
+        data = self.disk.load(key, ['layout'], mmap_mode=None)
+
+        if data is None:
+            return None
+
+        layout = data['layout']
+
+        names = []
+        for j, num in enumerate(layout):
+            if num == 0:
+                names.append('b{}'.format(j))
+            elif num > 0:
+                names.extend(['b{}_{}'.format(j, k) for k in range(num)])
+
+        data = self.disk.load(key, names, mmap_mode=None)
+
+        if data is None:
+            return None
+
+        hist = []
+        for j, num in enumerate(layout):
+            if num < 0:
+                hist.append(None)
+            elif num == 0:
+                hist.append(data['b{}'.format(j)])
+            else:
+                hist.append([data['b{}_{}'.format(j, k)] \
+                    for k in range(num)])
+
+        return {'product': hist}
+
+    def stats(self):
+        """
+        Number of hits and misses for each stage (in this process).
+
+        Returns
+        -------
+        Dictionary of (hits, misses) tuples.
+
+        """
+        return {stage: (cache.hits, cache.misses) \
+            for stage, cache in self.caches.items()}
@@ -2,7 +2,7 @@ from ares.inference.ModelFit import ModelFit
 from ares.inference.ModelGrid import ModelGrid
 from ares.inference.ModelSample import ModelSample
 from ares.inference.FitGlobal21cm import FitGlobal21cm
-#from ares.inference.ModelEmulator import ModelEmulator
+from ares.inference.ModelEmulator import ModelEmulator
 from ares.inference.CalibrateModel import CalibrateModel
 #from ares.inference.OptimizeSpectrum import SpectrumOptimization
 from ares.inference.FitGalaxyPopulation import FitGalaxyPopulation
@@ -10,12 +10,15 @@ Description:
 
 """
 import os
+import math
+import numbers
 import numpy as np
 from scipy.misc import derivative
 from scipy.optimize import fsolve
 from scipy.integrate import quad, ode
 from ..util.Math import interp1d
 from ..util.ParameterFile import ParameterFile
+from .CosmologyTable import CosmologyTable
 from .InitialConditions import InitialConditions
 from .Constants import c, G, km_per_mpc, m_H, m_He, sigma_SB, g_per_msun, \
     cm_per_mpc, cm_per_kpc, k_B, m_p
@@ -30,6 +33,13 @@ _ares_to_planck = \
  'primordial_index': 'ns',
 }
 
+def _is_scalar(*args):
+    # Plain numbers can skip the overhead of numpy ufuncs.
+    for arg in args:
+        if not isinstance(arg, numbers.Real):
+            return False
+    return True
+
 class Cosmology(InitialConditions):
     def __init__(self, pf=None, **kwargs):
         if pf is not None:
@@ -270,10 +280,44 @@ class Cosmology(InitialConditions):
             self._inits = self.get_inits_rec()
         return self._inits
 
+    @property
+    def tables(self):
+        """
+        Tabulated time-redshift relations (if `cosmology_tables` is True),
+        shared by all Cosmology instances with the same parameters. See
+        `ares.physics.CosmologyTable` for details.
+        """
+        if not hasattr(self, '_tables'):
+            if self.pf['cosmology_tables']:
+                self._tables = CosmologyTable.get(self,
+                    zmax=self.pf['cosmology_table_zmax'],
+                    tol=self.pf['cosmology_table_tol'],
+                    path=self.pf['cosmology_table_path'])
+            else:
+                self._tables = None
+        return self._tables
+
+    @property
+    def _time_coeff(self):
+        # Constants in t(z) and z(t), in the order they're used.
+        if not hasattr(self, '_time_coeff_'):
+            root = math.sqrt(1. - self.omega_m_0)
+            self._time_coeff_ = (2. / 3. / root / self.hubble_0,
+                self.a_eq**-1.5, 1.5 * self.hubble_0 * root)
+        return self._time_coeff_
+
     def TimeToRedshiftConverter(self, t_i, t_f, z_i):
         """
         High redshift approximation under effect.
         """
+        if _is_scalar(t_i, t_f, z_i):
+            try:
+                u = math.pow(1. + z_i, -1.5) + 1.5 * self.hubble_0 \
+                    * math.sqrt(self.omega_m_0) * (t_f - t_i)
+                return np.float64(math.pow(u, -2. / 3.) - 1.)
+            except (ValueError, ZeroDivisionError, OverflowError):
+                pass
+
         return ((1. + z_i)**-1.5 + (3. * self.hubble_0 *
             np.sqrt(self.omega_m_0) * (t_f - t_i) / 2.))**(-2. / 3.) - 1.
 
@@ -304,6 +348,20 @@ class Cosmology(InitialConditions):
         Time since Big Bang in seconds.
 
         """
+
+        if _is_scalar(z):
+            try:
+                A, B, C = self._time_coeff
+                u = B * math.pow(1. + z, -1.5)
+                return np.float64(A * math.log(u + math.sqrt(1. + u**2)))
+            except (ValueError, ZeroDivisionError, OverflowError):
+                pass
+        elif self.tables is not None:
+            return self.tables.t_of_z(z)
+
+        return self._t_of_z(z)
+
+    def _t_of_z(self, z):
         #if self.approx_highz:
         #    pass
         #elif self.approx_lowz:
@@ -318,6 +376,24 @@ class Cosmology(InitialConditions):
         return t
 
     def z_of_t(self, t):
+        """
+        Inverse of `t_of_z`.
+        """
+
+        if _is_scalar(t):
+            try:
+                A, B, C = self._time_coeff
+                C = math.exp(C * t)
+                a = self.a_eq * math.pow((C**2 - 1.) / (2. * C), 2./3.)
+                return np.float64(1. / a - 1.)
+            except (ValueError, ZeroDivisionError, OverflowError):
+                pass
+        elif self.tables is not None:
+            return self.tables.z_of_t(t)
+
+        return self._z_of_t(t)
+
+    def _z_of_t(self, t):
         C = np.exp(1.5 * self.hubble_0 * t * np.sqrt(1. - self.omega_m_0))
 
         a = self.a_eq * (C**2 - 1.)**(2./3.) / (2. * C)**(2./3.)
@@ -561,6 +637,23 @@ class Cosmology(InitialConditions):
         return (3.0 * self.HubbleParameter(z)**2) / (8.0 * np.pi * G)
 
     def dtdz(self, z):
+        if _is_scalar(z):
+            try:
+                if self.approx_highz:
+                    H = self.hubble_0 * math.sqrt(self.omega_m_0) \
+                        * math.pow(1. + z, 1.5)
+                else:
+                    H = self.hubble_0 * math.sqrt(self.omega_m_0 \
+                        * (1. + z)**3 + self.omega_l_0)
+                return np.float64(1. / H / (1. + z))
+            except (ValueError, ZeroDivisionError, OverflowError):
+                pass
+        elif self.tables is not None:
+            return self.tables.dtdz(z)
+
+        return self._dtdz(z)
+
+    def _dtdz(self, z):
         return 1. / self.HubbleParameter(z) / (1. + z)
 
     def LuminosityDistance(self, z):
@@ -0,0 +1,239 @@
+"""
+
+CosmologyTable.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Mon Oct 19 05:08:44 PDT 2026
+
+Description: Tabulated time-redshift relations, for fast vectorized
+conversions between the two.
+
+"""
+
+import numpy as np
+from scipy.interpolate import PchipInterpolator
+from ..util.TableCache import TableCache
+
+# Tables already built in this process, one per cosmology.
+_tables = {}
+
+class CosmologyTable(object):
+    def __init__(self, cosm, zmax=1e4, tol=1e-8, Nmin=256, Nmax=2**20):
+        """
+        Monotone (PCHIP) splines for t(z), z(t), and dt/dz.
+
+        Each relation is tabulated on a uniform grid in log(1 + z) (or in
+        log t, for the inverse) from z=0 to `zmax`, and the number of
+        nodes doubled until the relative error of the interpolant, checked
+        at points between the nodes, is below `tol`. Inputs outside the
+        table are handed back to the analytic expressions.
+
+        Parameters
+        ----------
+        cosm : ares.physics.Cosmology instance
+            Supplies the exact relations (`_t_of_z`, `_z_of_t`, `_dtdz`).
+        zmax : int, float
+            Maximum redshift of the table.
+        tol : float
+            Maximum relative error of interpolated values.
+
+        """
+        self.cosm = cosm
+        self.zmax = zmax
+        self.tol = tol
+        self.Nmin = Nmin
+        self.Nmax = Nmax
+
+    @staticmethod
+    def get(cosm, zmax=1e4, tol=1e-8, path=None):
+        """
+        Retrieve table for cosmology `cosm`, building it if need be.
+
+        Tables are shared by all Cosmology instances with the same
+        parameters in a given process and, if `path` is supplied, saved to
+        (and retrieved from) disk.
+        """
+
+        pars = {'omega_m_0': cosm.omega_m_0, 'omega_l_0': cosm.omega_l_0,
+            'hubble_0': cosm.hubble_0, 'approx_highz': cosm.approx_highz,
+            'zmax': zmax, 'tol': tol}
+
+        key = TableCache(None).key('cosmology', **pars)
+
+        if key in _tables:
+            return _tables[key]
+
+        table = CosmologyTable(cosm, zmax=zmax, tol=tol)
+
+        names = ['x', 'lnt', 'lndtdz', 'lnt_inv', 'x_inv']
+
+        data = None
+        if path is not None:
+            disk = TableCache(path)
+            data = disk.load(key, names, mmap_mode=None)
+
+        if data is None:
+            data = table.build()
+            if path is not None:
+                try:
+                    disk.save(key, **data)
+                except (IOError, OSError):
+                    pass
+
+        table.load(data)
+
+        _tables[key] = table
+
+        return table
+
+    def _grid(self, lo, hi, f, N):
+        """
+        Tabulate f on a uniform grid in [lo, hi], refining until accurate.
+        """
+
+        while True:
+            x = np.linspace(lo, hi, N)
+            y = f(x)
+
+            # Check halfway (and a quarter of the way) between nodes.
+            dx = np.diff(x)
+            xc = np.concatenate([x[0:-1] + 0.25 * dx, x[0:-1] + 0.5 * dx])
+
+            spl = PchipInterpolator(x, y)
+            err = np.max(np.abs(np.expm1(spl(xc) - f(xc))))
+
+            if (err < self.tol) or (N >= self.Nmax):
+                return x, y, err
+
+            N *= 2
+
+    def build(self):
+        """
+        Tabulate everything.
+
+        Returns
+        -------
+        Dictionary of arrays: nodes in log(1 + z) (`x`), log t (`lnt`), and
+        log dt/dz (`lndtdz`) for the forward relations, and nodes in log t
+        (`lnt_inv`) and log(1 + z) (`x_inv`) for the inverse.
+
+        """
+
+        cosm = self.cosm
+
+        xmax = np.log1p(self.zmax)
+
+        self.errors = {}
+
+        # These we fit in log-space, so that errors are relative.
+        x, lnt, self.errors['t_of_z'] = self._grid(0., xmax,
+            lambda x: np.log(cosm._t_of_z(np.expm1(x))), self.Nmin)
+        x2, lndtdz, self.errors['dtdz'] = self._grid(0., xmax,
+            lambda x: np.log(cosm._dtdz(np.expm1(x))), self.Nmin)
+
+        # Interpolate log(1 + z) for the inverse, but require that z be
+        # accurate (not 1 + z).
+        tmin, tmax = np.log(cosm._t_of_z(self.zmax)), np.log(cosm._t_of_z(0.))
+        lnt_inv, x_inv, err = self._grid(tmin, tmax,
+            lambda lnt: np.log1p(cosm._z_of_t(np.exp(lnt))), self.Nmin)
+
+        self.errors['z_of_t'] = err
+
+        # Use the same nodes for t(z) and dt/dz.
+        if x2.size > x.size:
+            x, lnt = x2, np.log(cosm._t_of_z(np.expm1(x2)))
+        elif x.size > x2.size:
+            lndtdz = np.log(cosm._dtdz(np.expm1(x)))
+
+        return {'x': x, 'lnt': lnt, 'lndtdz': lndtdz, 'lnt_inv': lnt_inv,
+            'x_inv': x_inv}
+
+    def load(self, data):
+        """
+        Set up interpolants from tabulated values.
+        """
+        self.data = data
+
+        self._lnt = _UniformSpline(data['x'], data['lnt'])
+        self._lndtdz = _UniformSpline(data['x'], data['lndtdz'])
+        self._x_inv = _UniformSpline(data['lnt_inv'], data['x_inv'])
+
+    def _lookup(self, spl, u, exact, arg):
+        """
+        Evaluate spline `spl` at `u`, or `exact` at `arg` where out of range.
+        """
+        out, bad = spl(u)
+        if np.any(bad):
+            out[bad] = np.asarray(exact(np.asarray(arg)[bad]))
+        return out
+
+    def t_of_z(self, z):
+        z = np.asarray(z, dtype=float)
+        x = np.log1p(z)
+        lnt = self._lookup(self._lnt, x, lambda z: np.log(self.cosm._t_of_z(z)),
+            z)
+        return np.exp(lnt)
+
+    def dtdz(self, z):
+        z = np.asarray(z, dtype=float)
+        x = np.log1p(z)
+        lndtdz = self._lookup(self._lndtdz, x,
+            lambda z: np.log(self.cosm._dtdz(z)), z)
+        return np.exp(lndtdz)
+
+    def z_of_t(self, t):
+        t = np.asarray(t, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lnt = np.log(t)
+        x = self._lookup(self._x_inv, lnt,
+            lambda t: np.log1p(self.cosm._z_of_t(t)), t)
+        return np.expm1(x)
+
+class _UniformSpline(object):
+    def __init__(self, x, y):
+        """
+        PCHIP interpolant of y(x) for uniformly-spaced `x`.
+
+        Evaluated directly from the polynomial coefficients, since on a
+        uniform grid the interval containing each point is found by
+        arithmetic rather than a search.
+        """
+        self.x0 = x[0]
+        self.dx = (x[-1] - x[0]) / (x.size - 1.)
+        self.N = x.size - 1
+
+        # Build the cubic on each interval from the PCHIP slopes ourselves,
+        # since what PchipInterpolator stores as coefficients depends on the
+        # version of scipy (Bernstein, rather than power, basis in older
+        # versions).
+        d = PchipInterpolator(x, y).derivative()(x)
+        h = np.diff(x)
+        delta = np.diff(y) / h
+
+        # One row of coefficients per interval, so each lookup is one gather.
+        self.c = np.ascontiguousarray(np.array([
+            (d[:-1] + d[1:] - 2 * delta) / h**2,
+            (3 * delta - 2 * d[:-1] - d[1:]) / h,
+            d[:-1],
+            y[:-1]]).T)
+
+    def __call__(self, u):
+        """
+        Returns
+        -------
+        Tuple: interpolated values, and mask of points outside the grid.
+
+        """
+        s = (np.atleast_1d(u) - self.x0) / self.dx
+
+        with np.errstate(invalid='ignore'):
+            bad = np.logical_not(np.logical_and(s >= 0, s <= self.N))
+
+        i = np.clip(np.nan_to_num(s), 0, self.N - 1).astype(int)
+        h = (s - i) * self.dx
+
+        c = self.c[i]
+        out = ((c[:,0] * h + c[:,1]) * h + c[:,2]) * h + c[:,3]
+
+        return out.reshape(np.shape(u)), bad.reshape(np.shape(u))
@@ -12,6 +12,7 @@ formulae of Verner et al. 1996.
 
 import numpy as np
 from .Constants import E_LL
+from ..util.LRUCache import LRUCache, fingerprint
 
 sqrt = np.sqrt
 
@@ -63,9 +64,99 @@ def PhotoIonizationCrossSection(E, species=0):
     
 sigma0 = PhotoIonizationCrossSection(E_th[0])
 def ApproximatePhotoIonizationCrossSection(E, species=0):
+    if type(E) == np.ndarray:
+        return np.where(E >= E_th[species], sigma0 * (E_th[species] / E)**3,
+            0.0)
+    
     if E < E_th[species]:
         return 0.0
     return sigma0 * (E_th[species] / E)**3                         
     
+# Cross sections already computed in this process, keyed by (approx, 
+# energy grid fingerprint, species). Solvers only ever use a handful of
+# energy grids, so this is plenty.
+_cache = LRUCache(maxsize=64, maxbytes=2**28)
+
+# Number of times each entry has been re-used.
+_reuse = {}
+
+def CrossSectionTable(E, species=0, approx=False):
+    """
+    Cross section on an energy grid, computed only once per process.
+    
+    Solvers that tabulate cross sections on the same energies (e.g., the
+    optical depth tables, the global volume and the integral tables) all 
+    get the same array back, so it is neither re-computed nor duplicated.
+    
+    Parameters
+    ----------
+    E : np.ndarray
+        Photon energies (eV).
+    species : int
+        Species ID number. HI = 0 (default), HeI = 1, HeII = 2
+    approx : bool
+        If True, use ApproximatePhotoIonizationCrossSection.
+    
+    Returns
+    -------
+    Read-only array of cross sections in cm**2, with the same shape as `E`.
+    
+    """
+    
+    E = np.asarray(E, dtype=float)
+    key = (bool(approx), fingerprint(E), int(species))
+    
+    sigma = _cache.get(key)
+    
+    if sigma is None:
+        if approx:
+            sigma = ApproximatePhotoIonizationCrossSection(E, species)
+        else:
+            sigma = PhotoIonizationCrossSection(E, species)
+        
+        sigma = np.array(sigma, dtype=float)
+        sigma.setflags(write=False)
+        _cache.put(key, sigma)
+        _reuse[key] = 0
+        
+        # Forget about anything that's been evicted.
+        if len(_reuse) > len(_cache):
+            for old in list(_reuse.keys()):
+                if old not in _cache:
+                    del _reuse[old]
+    else:
+        _reuse[key] += 1
+    
+    return sigma.view()
+    
+def CrossSectionCacheInfo():
+    """
+    Summarize use of the cross section cache.
+    
+    Returns
+    -------
+    Dictionary containing the number of cache hits and misses, the number 
+    of arrays stored and their total size in bytes, and the number of bytes 
+    that would have been allocated (and computed) without the arrays still
+    in the cache.
+    
+    """
+    
+    saved = 0
+    for key, sigma in _cache.items():
+        saved += _reuse[key] * sigma.nbytes
+    
+    return {'hits': _cache.hits, 'misses': _cache.misses, 
+        'hit_rate': _cache.hit_rate, 'entries': len(_cache), 
+        'nbytes': _cache.nbytes, 'nbytes_saved': saved}
+        
+def ClearCrossSectionCache():
+    """
+    Empty the cross section cache and reset its counters.
+    """
+    _cache.clear()
+    _cache.hits = _cache.misses = _cache.evictions = 0
+    _reuse.clear()
+    _reuse.clear()
 
     
\ No newline at end of file
@@ -21,6 +21,8 @@ from ..util.Warnings import no_hmf
 from scipy.integrate import cumtrapz, simps
 from ..util.PrintInfo import print_hmf
 from ..util.ProgressBar import ProgressBar
+from ..util.TableCache import TableCache, UncacheableError
+from ..util.SharedArrays import get_shared_state, set_shared_state
 from ..util.ParameterFile import ParameterFile
 from ..util.Math import central_difference, smooth
 from ..util.Pickling import read_pickle_file, write_pickle_file
@@ -80,6 +82,17 @@ except ImportError:
 
 ARES = os.getenv("ARES")
 
+# Parameters (besides cosmology) that affect tables generated by TabulateHMF
+# and TabulateMAR.
+hmf_cache_pars = ['hmf_model', 'hmf_logMmin', 'hmf_logMmax', 'hmf_dlogM',
+    'hmf_zmin', 'hmf_zmax', 'hmf_dz', 'hmf_tmin', 'hmf_tmax', 'hmf_dt',
+    'hmf_dlna', 'hmf_dlnk', 'hmf_lnk_min', 'hmf_lnk_max',
+    'hmf_transfer_k_per_logint', 'hmf_transfer_kmax', 'hmf_window',
+    'hmf_wdm_mass', 'hmf_params', 'hmf_use_splined_growth', 'hmf_analytic']
+
+hmf_cache_tabs = ['tab_z', 'tab_M', 'tab_dndm', 'tab_ngtm', 'tab_mgtm',
+    'tab_k_lin', 'tab_ps_lin', 'tab_growth', 'tab_sigma', 'tab_dlnsdlnm']
+
 sqrt2 = np.sqrt(2.)
 
 tiny_fcoll = 1e-18
@@ -222,6 +235,8 @@ class HaloMassFunction(object):
         if self.tab_name is None:
             if have_hmf and have_pycamb:
                 pass
+            elif self._load_hmf_cache():
+                pass
             else:
                 no_hmf(self)
                 sys.exit()
@@ -253,13 +268,23 @@ class HaloMassFunction(object):
         return self._cosm
 
 
+    def __getstate__(self):
+        # hmf's MassFunction object is only needed to generate tables.
+        return get_shared_state(self, drop=['_MF_'])
+
+    def __setstate__(self, state):
+        set_shared_state(self, state)
+
     def __getattr__(self, name):
 
         if (name[0] == '_'):
             raise AttributeError('Should get caught by `hasattr` (#1).')
 
         if name not in self.__dict__.keys():
-            if self.pf['hmf_load']:
+            if self._load_hmf_cache():
+                pass
+            elif self.pf['hmf_load'] and \
+                ((self.tab_name is not None) or (self.table_cache is None)):
                 self._load_hmf()
             else:
                 # Can generate on the fly!
@@ -638,6 +663,85 @@ class HaloMassFunction(object):
         hist = [self.__getattribute__(key) for key in keys]
         return hist
 
+    @property
+    def table_cache(self):
+        """
+        On-disk cache for tables generated by TabulateHMF and TabulateMAR.
+
+        Only used when tables are generated, i.e., not when they come from
+        `hmf_table`, `hmf_pca`, or `hmf_cache`.
+        """
+        if not hasattr(self, '_table_cache'):
+            if (self.pf['hmf_cache_path'] is None) or \
+               (self.pf['hmf_table'] is not None) or \
+               (self.pf['hmf_pca'] is not None) or \
+               (self.pf['hmf_cache'] is not None):
+                self._table_cache = None
+            else:
+                self._table_cache = TableCache(self.pf['hmf_cache_path'],
+                    maxsize=self.pf['hmf_cache_maxsize'])
+
+                # e.g., if some parameter is a bound method
+                try:
+                    self.table_cache_key
+                except UncacheableError:
+                    self._table_cache = None
+
+        return self._table_cache
+
+    @property
+    def table_cache_key(self):
+        """
+        Hash of all parameters that affect the tabulated HMF.
+        """
+        if not hasattr(self, '_table_cache_key'):
+            kw = {par:self.pf[par] for par in hmf_cache_pars}
+            kw.update({par:self.pf[par] for par in CosmologyParameters() \
+                if not par.startswith('cosmorec')})
+
+            # In case cosmology is read from a file
+            kw['cosmology'] = [self.cosm.omega_m_0, self.cosm.omega_b_0,
+                self.cosm.omega_l_0, self.cosm.h70, self.cosm.sigma8,
+                self.cosm.primordial_index]
+            kw['hmf-version'] = hmf_vers
+
+            self._table_cache_key = self.table_cache.key(
+                prefix='hmf_{!s}'.format(self.hmf_func), **kw)
+
+        return self._table_cache_key
+
+    def _load_hmf_cache(self):
+        """
+        Retrieve tables from `table_cache`, if they're there.
+
+        Returns
+        -------
+        True if tables were found, False otherwise.
+
+        """
+
+        if self.table_cache is None:
+            return False
+
+        # Already done
+        if self.__dict__.get('_loaded_from_cache', False):
+            return True
+
+        data = self.table_cache.load(self.table_cache_key, hmf_cache_tabs)
+
+        if data is None:
+            return False
+
+        for tab in hmf_cache_tabs:
+            setattr(self, tab, data[tab])
+
+        self._loaded_from_cache = True
+
+        if self.pf['verbose'] and rank == 0:
+            print("# Loaded HMF from cache ({}).".format(self.table_cache_key))
+
+        return True
+
     @property
     def info(self):
         if rank == 0:
@@ -647,9 +751,15 @@ class HaloMassFunction(object):
         """
         Build a lookup table for the halo mass function / collapsed fraction.
 
-        Can be run in parallel.
+        Can be run in parallel. If `hmf_cache_path` is set, results are
+        retrieved from (or stored in) an on-disk cache.
         """
 
+        if self._load_hmf_cache():
+            if save_MAR:
+                self.TabulateMAR()
+            return
+
         # Initialize the MassFunction object.
         # Will setup an array of masses
         MF = self._MF
@@ -718,6 +828,11 @@ class HaloMassFunction(object):
             tmp7 = np.zeros_like(self.tab_growth)
             nothing = MPI.COMM_WORLD.Allreduce(self.tab_growth, tmp7)
             self.tab_growth = tmp7
+
+        if (self.table_cache is not None) and (rank == 0):
+            self.table_cache.save(self.table_cache_key,
+                **{tab:self.__getattribute__(tab) for tab in hmf_cache_tabs})
+
         ##
         # Done!
         ##
@@ -727,6 +842,13 @@ class HaloMassFunction(object):
         self.TabulateMAR()
 
     def TabulateMAR(self):
+
+        if self.table_cache is not None:
+            data = self.table_cache.load(self.table_cache_key, ['tab_MAR'])
+            if data is not None:
+                self._tab_MAR = data['tab_MAR']
+                return
+
         ##
         # Generate halo growth histories
         ##
@@ -827,6 +949,9 @@ class HaloMassFunction(object):
             nothing = MPI.COMM_WORLD.Allreduce(self.tab_MAR, tmp)
             self._tab_MAR = tmp
 
+        if (self.table_cache is not None) and (rank == 0):
+            self.table_cache.save(self.table_cache_key, tab_MAR=self._tab_MAR)
+
         ##
         # OK, *now* we're done.
         ##
@@ -834,7 +959,8 @@ class HaloMassFunction(object):
     @property
     def tab_MAR(self):
         if not hasattr(self, '_tab_MAR'):
-            if (not self._is_loaded) and self.pf['hmf_load']:
+            if (not self._is_loaded) and self.pf['hmf_load'] and \
+                ((self.tab_name is not None) or (self.table_cache is None)):
                 poke = self.tab_dndm
             else:
                 self.TabulateMAR()
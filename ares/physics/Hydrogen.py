@@ -511,10 +511,6 @@ class Hydrogen(object):
         """
         
         x_c = self.CollisionalCouplingCoefficient(z, Tk, xHII, ne)
-        x_a = self.RadiativeCouplingCoefficient(z, Ja, Tk, xHII)
-        Tc = Tk
-        
-        Tref = self.cosm.TCMB(z) + Tr
  
         if self.approx_S < 4:
             x_a = self.RadiativeCouplingCoefficient(z, Ja, Tk, xHII, Tr, ne)
@@ -544,6 +540,105 @@ class Hydrogen(object):
                             
         return np.maximum(Ts, self.Ts_floor(z=z))
     
+    def Ts_dTb(self, z, Tk, Ja, xHII, ne, xavg=None, Tr=0.0):
+        """
+        Short-hand for calling `SpinAndBrightnessTemperature`.
+        """
+        return self.SpinAndBrightnessTemperature(z, Tk, Ja, xHII, ne, xavg, Tr)
+
+    def SpinAndBrightnessTemperature(self, z, Tk, Ja, xHII, ne, xavg=None,
+        Tr=0.0):
+        """
+        Spin temperature and 21-cm brightness temperature for many models.
+
+        Equivalent to calling `SpinTemperature` and then
+        `DifferentialBrightnessTemperature`, but every input can be an
+        array, e.g., of shape (number of models, number of redshifts), with
+        `z` of shape (number of redshifts). Quantities that only depend on
+        redshift are computed once for all models, and if approx_Salpha=4,
+        the spin temperature is solved for analytically (it's the root of a
+        quadratic) rather than iteratively, element by element.
+
+        Parameters
+        ----------
+        z : float, np.ndarray
+            Redshift
+        Tk : float, np.ndarray
+            Gas kinetic temperature
+        Ja : float, np.ndarray
+            Lyman-alpha flux in units of [s**-1 cm**-2 Hz**-1 sr**-1]
+        xHII : float, np.ndarray
+            Hydrogen ionized fraction
+        ne : float, np.ndarray
+            Proper electron density in [cm**-3]
+        xavg : float, np.ndarray
+            Volume-averaged ionized fraction. If None, will use `xHII`.
+
+        Returns
+        -------
+        Tuple: (spin temperature [K], brightness temperature [mK]), each with
+        the broadcast shape of the inputs.
+
+        """
+
+        z = np.asarray(z, dtype=float)
+        Tk = np.asarray(Tk, dtype=float)
+        Ja = np.asarray(Ja, dtype=float)
+        xHII = np.asarray(xHII, dtype=float)
+
+        if xavg is None:
+            xavg = xHII
+
+        Tref = self.cosm.TCMB(z) + Tr
+
+        # As in `SpinTemperature`, only the iterative (approx_Salpha=4)
+        # solution normalizes the collisional coupling by Tcmb + Tr.
+        if self.approx_S < 4:
+            x_c = self.CollisionalCouplingCoefficient(z, Tk, xHII, ne)
+            x_a = self.xalpha_tilde(z) * self.Sa(z=z, Tk=Tk, xHII=xHII) * Ja
+            Ts = (1.0 + x_c + x_a) / \
+                (Tref**-1. + x_c * Tk**-1. + x_a * Tk**-1.)
+        elif self.approx_S == 4:
+            x_c = self.CollisionalCouplingCoefficient(z, Tk, xHII, ne, Tr)
+            Ts = self._Ts_Hirata(z, Tk, Ja, xHII, x_c, Tref)
+        else:
+            raise NotImplemented('approx_Salpha>4 not currently supported!')
+
+        Ts = np.maximum(Ts, self.Ts_floor(z=z))
+
+        dTb = self.DifferentialBrightnessTemperature(z, xavg, Ts, Tr)
+
+        return Ts, dTb
+
+    def _Ts_Hirata(self, z, Tk, Ja, xHII, x_c, Tref):
+        """
+        Spin temperature in the approximation of Hirata (2006).
+
+        Both S_alpha and the color temperature are linear in 1 / Ts, so the
+        equation solved iteratively in `RadiativeCouplingCoefficient` is a
+        quadratic in 1 / Ts.
+        """
+
+        xi = (1e-7 * self.tauGP(z, xHII=xHII))**(1./3.) * Tk**(-2./3.)
+        b = 1. + 2.98394 * xi + 1.53583 * xi**2 + 3.85289 * xi**3
+
+        # S_alpha = (A0 + A1 / Ts) / b, 1 / Tc = C0 + C1 / Ts
+        A0 = 1. - 0.0631789 / Tk + 0.115995 / Tk**2
+        A1 = -0.401403 / Tk + 0.336463 / Tk**2
+        C0 = (1. - 0.405535 / Tk) / Tk
+        C1 = 0.405535 / Tk
+
+        K = self.xalpha_tilde(z) * Ja / b
+
+        qa = K * A1 * (1. - C1)
+        qb = 1. + x_c + K * A0 - K * (A0 * C1 + A1 * C0)
+        qc = 1. / Tref + K * A0 * C0 + x_c / Tk
+
+        # Root that's continuous with qc / qb as qa -> 0.
+        Ts_inv = 2. * qc / (qb + np.sqrt(qb**2 + 4. * qa * qc))
+
+        return np.abs(1. / Ts_inv)
+
     def dTb(self, z, xavg, Ts, Tr=0.0):
         """
         Short-hand for calling `DifferentialBrightnessTemperature`.
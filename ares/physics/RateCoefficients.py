@@ -19,9 +19,28 @@ from ..util.Math import central_difference
 T = None
 rate_sources = ['fk94']
 
+# Rates (and species, if applicable) stored in each column of the tables.
+columns = \
+    [('CollisionalIonizationRate', i) for i in range(3)] \
+  + [('RadiativeRecombinationRate', i) for i in range(3)] \
+  + [('CollisionalIonizationCoolingRate', i) for i in range(3)] \
+  + [('CollisionalExcitationCoolingRate', i) for i in range(3)] \
+  + [('RecombinationCoolingRate', i) for i in range(3)] \
+  + [('DielectricRecombinationRate', None), 
+     ('DielectricRecombinationCoolingRate', None)]
+
+# Tables already built in this process, one per (rate_src, recombination).
+_tables = {}
+
+# Rates smaller than this are zero as far as the tables are concerned.
+tiny_rate = 1e-300
+
 class RateCoefficients(object):
+    columns = columns
+    
     def __init__(self, grid=None, rate_src='fk94', T=T, recombination='B',
-        interp_rc='linear'):
+        interp_rc='linear', rate_tables=False, logTmin=-1., logTmax=8., 
+        dlogT=1e-3):
         """
         Parameters
         ----------
@@ -29,11 +48,20 @@ class RateCoefficients(object):
         source : str
             fk94 (Fukugita & Kawasaki 1994)
             chianti
+        rate_tables : bool
+            If True, all rates and their derivatives are interpolated from
+            a table in log10(T) with spacing `dlogT`, spanning `logTmin` to
+            `logTmax`, rather than computed from the fits each time. Outside
+            this range, the fits are used.
         """
         
         self.grid = grid
         self.rate_src = rate_src
         self.interp_rc = interp_rc
+        self.rate_tables = rate_tables
+        self.logTmin = logTmin
+        self.logTmax = logTmax
+        self.dlogT = dlogT
         self.T = T
 
         self.rec = recombination
@@ -48,6 +76,8 @@ class RateCoefficients(object):
         """
         Collisional ionization rate which we denote elsewhere as Beta.
         """    
+        if self.rate_tables:
+            return self._lookup(T, 'CollisionalIonizationRate', species)
         
         if self.rate_src == 'fk94':
             if species == 0:  
@@ -78,6 +108,10 @@ class RateCoefficients(object):
         return self._dCollisionalIonizationRate_
             
     def dCollisionalIonizationRate(self, species, T):
+        if self.rate_tables:
+            return self._lookup(T, 'CollisionalIonizationRate', species,
+                deriv=True)
+
         if self.rate_src == 'fk94':
             return self._dCollisionalIonizationRate[species](T)
             #return derivative(lambda T: self.CollisionalIonizationRate(species, T), T)
@@ -90,6 +124,8 @@ class RateCoefficients(object):
         Coefficient for radiative recombination.  Here, species = 0, 1, 2
         refers to HII, HeII, and HeIII.
         """
+        if self.rate_tables:
+            return self._lookup(T, 'RadiativeRecombinationRate', species)
         
         if self.rec == 0:
             return np.zeros_like(T)
@@ -140,6 +176,10 @@ class RateCoefficients(object):
         return self._dRadiativeRecombinationRate_        
     
     def dRadiativeRecombinationRate(self, species, T):
+        if self.rate_tables:
+            return self._lookup(T, 'RadiativeRecombinationRate', species,
+                deriv=True)
+
         if self.rate_src == 'fk94':
             return self._dRadiativeRecombinationRate[species](T)
             #return derivative(lambda T: self.RadiativeRecombinationRate(species, T), T)        
@@ -151,6 +191,8 @@ class RateCoefficients(object):
         """
         Dielectric recombination coefficient for helium.
         """
+        if self.rate_tables:
+            return self._lookup(T, 'DielectricRecombinationRate', None)
         
         if self.rate_src == 'fk94':
             return 1.9e-3 * T**-1.5 * np.exp(-4.7e5 / T) * (1. + 0.3 * np.exp(-9.4e4 / T))
@@ -168,6 +210,10 @@ class RateCoefficients(object):
         return self._dDielectricRecombinationRate_
                     
     def dDielectricRecombinationRate(self, T):
+        if self.rate_tables:
+            return self._lookup(T, 'DielectricRecombinationRate', None,
+                deriv=True)
+
         if self.rate_src == 'fk94':
             return self._dDielectricRecombinationRate(T)
             #return derivative(self.DielectricRecombinationRate, T)
@@ -181,6 +227,8 @@ class RateCoefficients(object):
         
             units: erg cm^3 / s
         """
+        if self.rate_tables:
+            return self._lookup(T, 'CollisionalIonizationCoolingRate', species)
 
         if self.rate_src == 'fk94':
             if species == 0:
@@ -197,13 +245,17 @@ class RateCoefficients(object):
         if not hasattr(self, '_dCollisionalIonizationCoolingRate_'):
             self._dCollisionalIonizationCoolingRate_ = {}
             for i, absorber in enumerate(self.grid.absorbers):
-                tmp = derivative(lambda T: self.CollisionalExcitationCoolingRate(i, T), self.Tarr)
+                tmp = derivative(lambda T: self.CollisionalIonizationCoolingRate(i, T), self.Tarr)
                 self._dCollisionalIonizationCoolingRate_[i] = interp1d(self.Tarr, tmp, 
                     kind=self.interp_rc)
     
         return self._dCollisionalIonizationCoolingRate_
     
     def dCollisionalIonizationCoolingRate(self, species, T):
+        if self.rate_tables:
+            return self._lookup(T, 'CollisionalIonizationCoolingRate', species,
+                deriv=True)
+
         if self.rate_src == 'fk94':
             return self._dCollisionalIonizationCoolingRate[species](T)
             #return derivative(lambda T: self.CollisionalIonizationCoolingRate(species, T), T)        
@@ -217,6 +269,8 @@ class RateCoefficients(object):
         
             units: erg cm^3 / s
         """
+        if self.rate_tables:
+            return self._lookup(T, 'CollisionalExcitationCoolingRate', species)
         
         if self.rate_src == 'fk94':
             if species == 0: 
@@ -240,6 +294,10 @@ class RateCoefficients(object):
         return self._dCollisionalExcitationCoolingRate_
     
     def dCollisionalExcitationCoolingRate(self, species, T):
+        if self.rate_tables:
+            return self._lookup(T, 'CollisionalExcitationCoolingRate', species,
+                deriv=True)
+
         if self.rate_src == 'fk94':
             return self._dCollisionalExcitationCoolingRate[species](T)
             #return derivative(lambda T: self.CollisionalExcitationCoolingRate(species, T), T)        
@@ -253,6 +311,8 @@ class RateCoefficients(object):
         
             units: erg cm^3 / s
         """
+        if self.rate_tables:
+            return self._lookup(T, 'RecombinationCoolingRate', species)
         
         if self.rec == 0:
             return np.zeros_like(T)
@@ -279,6 +339,10 @@ class RateCoefficients(object):
         return self._dRecombinationCoolingRate_
 
     def dRecombinationCoolingRate(self, species, T):
+        if self.rate_tables:
+            return self._lookup(T, 'RecombinationCoolingRate', species,
+                deriv=True)
+
         if self.rate_src == 'fk94':
             return self._dRecombinationCoolingRate[species](T)
             #return derivative(lambda T: self.RecombinationCoolingRate(species, T), T)
@@ -291,6 +355,8 @@ class RateCoefficients(object):
         
             units: erg cm^3 / s
         """
+        if self.rate_tables:
+            return self._lookup(T, 'DielectricRecombinationCoolingRate', None)
         
         if self.rate_src == 'fk94':
             return 1.24e-13 * T**-1.5 * np.exp(-4.7e5 / T) * (1. + 0.3 * np.exp(-9.4e4 / T))
@@ -307,10 +373,185 @@ class RateCoefficients(object):
         return self._dDielectricRecombinationCoolingRate_        
             
     def dDielectricRecombinationCoolingRate(self, T):
+        if self.rate_tables:
+            return self._lookup(T, 'DielectricRecombinationCoolingRate', None,
+                deriv=True)
+
         if self.rate_src == 'fk94':
             return self._dDielectricRecombinationCoolingRate(T)
             #return derivative(self.DielectricRecombinationCoolingRate, T)
         else:
             raise NotImplementedError()
+
+    @property
+    def logT(self):
+        """
+        Nodes of the rate tables in log10(T).
+        """
+        if not hasattr(self, '_logT'):
+            N = int(round((self.logTmax - self.logTmin) / self.dlogT)) + 1
+            self._logT = np.linspace(self.logTmin, self.logTmax, N)
+        return self._logT
+            
+    @property
+    def table(self):
+        """
+        Rates and their derivatives on a uniform grid in log10(T).
+        
+        Array of shape (number of temperatures, number of rates, 2), 
+        containing ln(rate) and dln(rate) / dlog10(T) for each rate listed 
+        in `columns`. Derivatives are computed to machine precision with the
+        complex-step method. Built once per (rate_src, recombination) and
+        grid, and shared by all instances.
+        
+        """
+        if not hasattr(self, '_table'):
+            key = (self.rate_src, self.rec, self.logTmin, self.logTmax, 
+                self.dlogT)
+            
+            if key not in _tables:
+                table = self._build_table()
+                _tables[key] = table, self._hermite(table)
+            
+            self._table, self._coeff = _tables[key]
+            
+        return self._table
+        
+    @property
+    def coeff(self):
+        """
+        Cubic Hermite interpolant of ln(rate) between each pair of nodes.
+        
+        Single contiguous array of shape (number of intervals, 4, number of
+        rates), holding polynomial coefficients in the fractional position
+        within each interval, highest order first. Each interval is one 
+        contiguous row, so a lookup is a single gather.
+        """
+        if not hasattr(self, '_coeff'):
+            self.table
+        return self._coeff
+        
+    def _hermite(self, table):
+        dx = self.dlogT
+        y0, y1 = table[0:-1,:,0], table[1:,:,0]
+        d0, d1 = dx * table[0:-1,:,1], dx * table[1:,:,1]
+        
+        c = np.array([2. * (y0 - y1) + d0 + d1, 3. * (y1 - y0) - 2. * d0 - d1,
+            d0, y0])
+        
+        return np.ascontiguousarray(np.swapaxes(c, 0, 1))
+        
+    @property
+    def exact(self):
+        """
+        Instance that computes rates from the fits, used to build the
+        tables (and outside their bounds).
+        """
+        if not hasattr(self, '_exact'):
+            self._exact = RateCoefficients(grid=self.grid, 
+                rate_src=self.rate_src, recombination=self.rec, 
+                interp_rc=self.interp_rc)
+        return self._exact
+        
+    def _exact_rates(self, T, cols):
+        """
+        Rates in columns `cols`, and their derivatives, from the fits.
+        """
+        T = np.asarray(T, dtype=float)
+        
+        # Complex step: f(T + ih) = f(T) + ih f'(T) + O(h^2).
+        h = 1e-30 * T
+        Tc = T + 1j * h
+        
+        f = np.zeros((len(cols),) + T.shape)
+        df = np.zeros((len(cols),) + T.shape)
+        for k, col in enumerate(cols):
+            name, species = columns[col]
+            func = getattr(self.exact, name)
             
+            if species is None:
+                val = func(Tc)
+            else:
+                val = func(species, Tc)
+            
+            val = np.asarray(val) * np.ones_like(Tc)
+            f[k] = val.real
+            with np.errstate(divide='ignore', invalid='ignore'):
+                df[k] = np.where(h > 0, val.imag / h, 0.)
             
+        return f, df
+        
+    def _build_table(self):
+        T = 10**self.logT
+        
+        f, df = self._exact_rates(T, np.arange(len(columns)))
+        
+        ok = f > tiny_rate
+        
+        table = np.zeros((self.logT.size, len(columns), 2))
+        table[...,0] = np.log(np.maximum(f, tiny_rate)).T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            table[...,1] = np.where(ok, df * T * np.log(10.) / f, 0.).T
+        
+        return table
+            
+    def TabulatedRates(self, T, cols=None):
+        """
+        Interpolate all rates (and their derivatives) from the table.
+        
+        Uses cubic Hermite interpolation in log(rate) vs. log10(T). Since 
+        the nodes are uniformly spaced, no search is needed: each 
+        temperature is located with a single arithmetic operation, and the 
+        interpolating polynomials for all rates retrieved at once.
+        
+        Parameters
+        ----------
+        T : int, float, np.ndarray
+            Temperature(s) [K].
+        cols : list
+            Indices of columns (see `columns`) to return. Default: all.
+        
+        Returns
+        -------
+        Tuple: rates and their derivatives with respect to temperature, each 
+        an array of shape (number of rates,) + shape of `T`.
+        
+        """
+        
+        T = np.asarray(T, dtype=float)
+        shape = T.shape
+        T = T.ravel()
+        
+        N = self.coeff.shape[0]
+        
+        s = (np.log10(T) - self.logTmin) / self.dlogT
+        bad = np.logical_not(np.logical_and(s >= 0, s <= N))
+        
+        # fmax/fmin send NaNs to the first interval; they're in `bad` anyway.
+        i = np.fmin(np.fmax(s, 0), N - 1).astype(int)
+        t = (s - i)[:,None]
+        
+        c = self.coeff.take(i, axis=0)
+        if cols is not None:
+            c = c[...,cols]
+        
+        lnf = ((c[:,0] * t + c[:,1]) * t + c[:,2]) * t + c[:,3]
+        dlnf = ((3. * c[:,0] * t + 2. * c[:,1]) * t + c[:,2]) / self.dlogT
+        
+        f = np.where(lnf > np.log(tiny_rate), np.exp(lnf), 0.)
+        df = f * dlnf / T[:,None] / np.log(10.)
+        
+        f, df = f.T, df.T
+        
+        if np.any(bad):
+            if cols is None:
+                cols = np.arange(len(columns))
+            f[:,bad], df[:,bad] = self._exact_rates(T[bad], cols)
+        
+        return f.reshape((-1,) + shape), df.reshape((-1,) + shape)
+        
+    def _lookup(self, T, name, species=None, deriv=False):
+        col = columns.index((name, species))
+        f, df = self.TabulatedRates(T, cols=[col])
+        
+        return df[0] if deriv else f[0]
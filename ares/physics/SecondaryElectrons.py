@@ -39,6 +39,9 @@ prefix = os.path.join('input','secondary_electrons')
 # our spline will get screwed up since log(0) = inf
 tiny_number = 1e-20
 
+# Tables already built in this process, one per (method, channel).
+_tables = {}
+
 class SecondaryElectrons(object):
     def __init__(self, method=0):
         self.method = method
@@ -88,6 +91,9 @@ class SecondaryElectrons(object):
         self.fHeII = RectBivariateSpline(self.E, self.x, self.fionHeII_tab)
         self.fexc = RectBivariateSpline(self.E, self.x, self.fexc_tab)
         self.flya = RectBivariateSpline(self.E, self.x, self.flya_tab) 
+        
+        self._splines = {'heat': self.fh, 'h_1': self.fHI, 'he_1': self.fHeI,
+            'he_2': self.fHeII, 'lya': self.flya, 'exc': self.fexc}
             
     @property
     def logx(self):
@@ -101,6 +107,18 @@ class SecondaryElectrons(object):
             self._x = 10**self.logx
         return self._x    
         
+    @property
+    def logE(self):
+        """
+        Electron energies (log10, in eV) at which tables are evaluated.
+        """
+        if not hasattr(self, '_logE'):
+            if self.method == 3:
+                self._logE = np.log10(self.E)
+            else:
+                self._logE = np.linspace(1., 4., 301)
+        return self._logE
+        
     def DepositionFraction(self, xHII, E=None, channel='heat', method=None):
         """
         Return the fraction of secondary electron energy deposited as heat, or 
@@ -187,23 +205,141 @@ class SecondaryElectrons(object):
         
         # Furlanetto & Stoever (2010)
         if method == 3:
+            return self.DepositionFractionGrid(xHII, E, channel=channel, 
+                method=method)[0]
             
-            f = tiny_number * np.zeros_like(xHII)
+    def DepositionFractionGrid(self, xHII, E, channel='heat', method=None,
+        interp=False):
+        """
+        Deposition fractions for many ionized fractions and energies at once.
+        
+        Parameters
+        ----------
+        xHII : int, float, np.ndarray
+            Ionized fraction(s).
+        E : int, float, np.ndarray
+            Electron energies [eV].
+        channel : str
+            One of (heat, h_1, he_1, he_2, lya, exc); see DepositionFraction.
+        method : int
+            See DepositionFraction. Defaults to self.method.
+        interp : bool
+            If True, interpolate (bi-linearly in log xHII and log E) from
+            the table returned by `DepositionFractionTable`, rather than
+            evaluating the fits (or splines) exactly. Points outside the 
+            table take the value at its edge.
+        
+        Returns
+        -------
+        Array of shape (number of energies, number of ionized fractions).
+        
+        """
+        
+        if method is None:
+            method = self.method
             
-            for i, x in enumerate(xHII):
+        x = np.atleast_1d(np.array(xHII, dtype=float))
+        
+        if E is None:
+            E = tiny_number
             
+        E = np.atleast_1d(np.array(E, dtype=float))
+        
+        if interp:
+            return self._interpolate(self.DepositionFractionTable(channel, 
+                method), x, E)
+        
+        shape = (E.size, x.size)
+        x = x[None,:]
+        E = E[:,None]
+                
+        if method == 0:
+            if channel == 'heat':
+                return np.ones(shape)
+            else: 
+                return np.zeros(shape)
+        
+        # Independent of energy
+        if method == 1 and channel in ['heat', 'h_1', 'he_1', 'he_2', 'lya']:
+            f = self.DepositionFraction(x[0], channel=channel, method=1)
+            return np.repeat(f[None,:], shape[0], axis=0)
+        
+        # Same expressions as DepositionFraction, with the conditions on 
+        # energy applied element-wise.
+        if method == 2:
+            with np.errstate(divide='ignore', invalid='ignore'):
                 if channel == 'heat':
-                    f[i] = self.fh(E, x)
-                if channel == 'h_1': 
-                    f[i] = self.fHI(E, x)
-                if channel == 'he_1': 
-                    f[i] = self.fHeI(E, x)
-                if channel == 'he_2': 
-                    f[i] = self.fHeII(E, x)
-                if channel == 'lya':
-                    f[i] = self.flya(E, x)
-                if channel == 'exc':
-                    f[i] = self.fexc(E, x)
-            
-            return f
+                    hi = 3.9811 * (11. / E)**0.7 * pow(x, 0.4) \
+                        * (1. - pow(x, 0.34))**2 \
+                        + (1. - (1. - pow(x, 0.2663))**1.3163)
+                    f = np.where(E >= 11, hi, 1. - tiny_number)
+                    return np.where(x <= 1e-4, 0.15, f)
+                if channel == 'h_1':
+                    hi = np.maximum(-0.6941 * (28. / E)**0.4 * pow(x, 0.2) \
+                        * (1. - pow(x, 0.38))**2 \
+                        + 0.3908 * (1. - pow(x, 0.4092))**1.7592, tiny_number)
+                    return np.where(E >= 28, hi, 0.)
+                if channel == 'he_1':
+                    hi = np.maximum(-0.0984 * (28. / E)**0.4 * pow(x, 0.2) \
+                        * (1. - pow(x, 0.38))**2 \
+                        + 0.0554 * (1. - pow(x, 0.4614))**1.6660, tiny_number)
+                    return np.where(E >= 28, hi, 0.)
+                if channel == 'he_2':
+                    return np.zeros(shape)
+            
+        if method == 3 and channel in self._splines:
+            return self._splines[channel].ev(np.broadcast_to(E, shape),
+                np.broadcast_to(x, shape))
+            
+        raise ValueError(('No deposition fraction for channel ' +\
+            '\'{0!s}\' with method={1}.').format(channel, method))
+            
+    def DepositionFractionTable(self, channel='heat', method=None):
+        """
+        Deposition fractions on a regular (log xHII, log E) grid.
+        
+        Each table is built once per (method, channel), and shared by all 
+        SecondaryElectrons instances in this process.
+        
+        Returns
+        -------
+        Tuple containing (log10 xHII, log10 E, table), where the table has 
+        shape (number of ionized fractions, number of energies).
+        
+        """
+        
+        if method is None:
+            method = self.method
+            
+        key = (method, channel)
+        if key not in _tables:
+            logx, logE = self.logx, self.logE
+            
+            # Round-off can put the last node just above xHII=1.
+            x = np.minimum(10**logx, 1.)
+            f = self.DepositionFractionGrid(x, 10**logE, 
+                channel=channel, method=method)
+            _tables[key] = (logx, logE, np.ascontiguousarray(f.T))
+            
+        return _tables[key]
+        
+    def _interpolate(self, table, x, E):
+        logx, logE, tab = table
+                
+        with np.errstate(divide='ignore', invalid='ignore'):
+            i, a = _locate(logx, np.log10(x))
+            j, b = _locate(logE, np.log10(E))
+        
+        i, a = i[None,:], a[None,:]
+        j, b = j[:,None], b[:,None]
+        
+        return (1. - b) * ((1. - a) * tab[i,j] + a * tab[i+1,j]) \
+            + b * ((1. - a) * tab[i,j+1] + a * tab[i+1,j+1])
             
+def _locate(grid, u):
+    """
+    Interval of `grid` containing each `u`, and fractional position therein.
+    """
+    u = np.clip(u, grid[0], grid[-1])
+    i = np.clip(np.searchsorted(grid, u, side='right') - 1, 0, grid.size - 2)
+    return i, (u - grid[i]) / (grid[i+1] - grid[i])
@@ -7,4 +7,5 @@ from ares.physics.NebularEmission import NebularEmission
 from ares.physics.HaloMassFunction import HaloMassFunction
 from ares.physics.RateCoefficients import RateCoefficients
 from ares.physics.SecondaryElectrons import SecondaryElectrons
-from ares.physics.CrossSections import PhotoIonizationCrossSection
+from ares.physics.CrossSections import PhotoIonizationCrossSection, \
+    CrossSectionTable
@@ -19,6 +19,7 @@ from ..util import read_lit
 from ..util.Math import smooth
 from ..util import ProgressBar
 from ..util.Survey import Survey
+from ..util.HistoryStore import HistoryStore
 from .Halo import HaloPopulation
 from scipy.optimize import curve_fit
 from .GalaxyCohort import GalaxyCohort
@@ -363,8 +364,12 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
             any_viable = np.sum(is_viable, axis=1)
 
             # Cut out halos that never exist in our mass range of interest.
-            ilo = np.min(np.argwhere(any_viable > 0))
-            ihi = np.max(np.argwhere(any_viable > 0)) + 1
+            # (Possible to have none when streaming halos in chunks).
+            if np.any(any_viable > 0):
+                ilo = np.min(np.argwhere(any_viable > 0))
+                ihi = np.max(np.argwhere(any_viable > 0)) + 1
+            else:
+                ilo = ihi = 0
 
             # Also cut out some redshift range.
             zok = np.logical_and(zall >= self.pf['pop_synth_zmin'],
@@ -395,7 +400,8 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
         # Allow scatter in things
         ##
 
-        # Two potential kinds of scatter in MAR
+        # Two potential kinds of scatter in MAR. Always copy (tile does),
+        # since the histories must never alias the HMF's (or user's) MAR.
         mar = self.tile(mar_raw, thin)
         if sigma_env > 0:
             mar *= (1. + self.noise_normal(mar, sigma_env))
@@ -468,7 +474,7 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
     @histories.setter
     def histories(self, value):
 
-        assert type(value) is dict
+        assert isinstance(value, dict)
 
         must_flip = False
         if 'z' in value:
@@ -975,6 +981,9 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
         dt = np.abs(np.diff(t)) * 1e6
         dt_myr = dt / 1e6
 
+        # Everything we derive below gets filled in-place in here.
+        store = HistoryStore(Mh.shape, dtype=self.pf['pop_histories_dtype'])
+
         ##
         # OK. We've got a bunch of halo histories and we need to integrate them
         # to get things like stellar mass, metal mass, etc. This means we need
@@ -1018,7 +1027,8 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
         if 'SFR' in halos:
             SFR = halos['SFR'][:,-1::-1]
         else:
-            SFR = self.guide.SFE(z=z2d, Mh=Mh)
+            SFR = store.allocate('SFR')
+            SFR[:] = self.guide.SFE(z=z2d, Mh=Mh)
             np.multiply(SFR, MAR, out=SFR)
             SFR *= fb
 
@@ -1078,12 +1088,12 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
 
             SFR[off==True] = 0
 
-        # Never do this!
+        # Never do this! Use `pop_histories_dtype` instead.
         if self.pf['conserve_memory']:
             raise NotImplemented('this is deprecated')
             dtype = np.float32
         else:
-            dtype = np.float64
+            dtype = store.dtype
 
         zeros_like_Mh = np.zeros((Nhalos, 1), dtype=dtype)
 
@@ -1158,8 +1168,11 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
 
 
         # Stellar mass should have zeros padded at the 0th time index
-        Ms = np.hstack((zeros_like_Mh,
-            np.cumsum(SFR[:,0:-1] * dt * fml, axis=1)))
+        Ms = store.allocate('Ms')
+        Ms[:,0] = 0.0
+        np.multiply(SFR[:,0:-1], dt, out=Ms[:,1:])
+        Ms[:,1:] *= fml
+        np.cumsum(Ms[:,1:], axis=1, out=Ms[:,1:])
 
         #Ms = np.zeros_like(Mh)
 
@@ -1175,8 +1188,11 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
 
             if np.all(fg == 0):
                 if type(fd) in [int, float, np.float64] and delay == 0:
-                    Md = fd * fZy * Ms
+                    Md = store.allocate('Md')
+                    np.multiply(Ms, fd * fZy, out=Md)
                 else:
+                    Md = store.allocate('Md')
+                    Md[:,0] = 0.0
 
                     if delay > 0:
 
@@ -1188,14 +1204,16 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
                         # Need to fix so Mh-dep fd can still work.
                         assert type(fd) in [int, float, np.float64]
 
-                        DPR = np.roll(SFR, shift, axis=1)[:,0:-1] \
+                        # Dust production rate (times dt)
+                        Md[:,1:] = np.roll(SFR, shift, axis=1)[:,0:-1] \
                             * dt * fZy * fd
-                        DPR[:,0:shift] = 0.0
+                        Md[:,1:shift+1] = 0.0
                     else:
-                        DPR = SFR[:,0:-1] * dt * fZy * fd[:,0:-1]
+                        np.multiply(SFR[:,0:-1], dt, out=Md[:,1:])
+                        Md[:,1:] *= fZy
+                        Md[:,1:] *= fd[:,0:-1]
 
-                    Md = np.hstack((zeros_like_Mh,
-                        np.cumsum(DPR, axis=1)))
+                    np.cumsum(Md[:,1:], axis=1, out=Md[:,1:])
             else:
 
                 # Handle case where growth in ISM is included.
@@ -1205,7 +1223,7 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
                     fd = fd * np.ones_like(SFR)
 
                 # fg^-1 is like a rate coefficient [has units yr^-1]
-                Md = np.zeros_like(SFR)
+                Md = store.allocate('Md', fill=0)
                 for k, _t in enumerate(t[0:-1]):
 
                     # Dust production rate
@@ -1217,7 +1235,10 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
                     Md[:,k+1] = Md[:,k] + (Md_p + Md_g) * dt[k]
 
             # Dust surface density.
-            Sd = Md / 4. / np.pi / self.guide.dust_scale(z=z2d, Mh=Mh)**2
+            Sd = store.allocate('Sd')
+            np.divide(Md, 4., out=Sd)
+            Sd /= np.pi
+            Sd /= self.guide.dust_scale(z=z2d, Mh=Mh)**2
 
             # Can add scatter to surface density
             if self.pf['pop_dust_scatter'] is not None:
@@ -1248,11 +1269,16 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
             Mg = MZ = 0.0
         else:
             if self.pf['pop_enrichment']:
-                MZ = Ms * fZy
+                MZ = store.allocate('MZ')
+                np.multiply(Ms, fZy, out=MZ)
 
                 # Gas mass
-                Mg = np.hstack((zeros_like_Mh,
-                    np.cumsum((MAR[:,0:-1] * fb - SFR[:,0:-1]) * dt, axis=1)))
+                Mg = store.allocate('Mg')
+                Mg[:,0] = 0.0
+                np.multiply(MAR[:,0:-1], fb, out=Mg[:,1:])
+                Mg[:,1:] -= SFR[:,0:-1]
+                Mg[:,1:] *= dt
+                np.cumsum(Mg[:,1:], axis=1, out=Mg[:,1:])
 
                 if self.pf['pop_enrichment'] == 2:
                     Vd = 4. * np.pi * self.guide.dust_scale(z=z2d, Mh=Mh)**3 / 3.
@@ -1261,10 +1287,12 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
                     rho_g = Mg / Vg
                     Z = rho_Z / rho_g / self.pf['pop_fpoll']
                 else:
-                    Z = MZ / Mg / self.pf['pop_fpoll']
+                    Z = store.allocate('Z')
+                    np.divide(MZ, Mg, out=Z)
+                    Z /= self.pf['pop_fpoll']
 
                 Z[Mg==0] = 1e-3
-                Z = np.maximum(Z, 1e-3)
+                np.maximum(Z, 1e-3, out=Z)
 
             else:
                 MZ = Mg = Z = 0.0
@@ -1347,8 +1375,10 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
 
         del z2d
 
-        # Pack up
-        results = \
+        # Pack up. Fields that were re-assigned above (e.g., by selecting
+        # the main branch) replace what's in the store.
+        results = store
+        results.update(
         {
          'nh': nh,
          'Mh': Mh,
@@ -1371,7 +1401,10 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
          'pos': pos,
          #'imf': np.zeros((Mh.shape[0], self.tab_imf_mc.size)),
          'Nsn': zeros_like_Mh,
-        }
+        })
+
+        # Halo count may have changed
+        results.shape = Mh.shape
 
         if self.pf['pop_dust_yield'] is not None:
             results['rand'] = halos['rand'][:,-1::-1]
@@ -1441,12 +1474,15 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
             raise NotImplemented('help')
 
 
-        Mg = np.zeros((Nhalos, len(t)))
-        SFR = np.zeros((Nhalos, len(t)))
-        SNR = np.zeros((Nhalos, len(t)))
+        store = HistoryStore((Nhalos, len(t)),
+            dtype=self.pf['pop_histories_dtype'])
+
+        Mg = store.allocate('Mg', fill=0)
+        SFR = store.allocate('SFR', fill=0)
+        Ms = store.allocate('Ms', fill=0)
+
+        # Energy injection rate. Only needed while we're running.
         EIR = np.zeros((Nhalos, len(t)))
-        Ms = np.zeros((Nhalos, len(t)))
-        MZ = np.zeros((Nhalos, len(t)))
 
         vesc = self.halos.EscapeVelocity(z2d, Mh) # in cm/s
         # Some Mh = 0, need to prevent NaNs from muddying the waters.
@@ -1527,8 +1563,11 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
             Mg[:,i+1] = Mg_in - Mg_ej
 
 
+        del EIR
+
         # Pack up
-        results = \
+        results = store
+        results.update(
         {
          'nh': nh,
          'Mh': Mh,
@@ -1551,7 +1590,7 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
          #'pos': pos,
          #'imf': np.zeros((Mh.shape[0], self.tab_imf_mc.size)),
          'Nsn': zeros_like_Mh,
-        }
+        })
 
         return results
 
@@ -1559,29 +1598,32 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
     def Slice(self, z, slc):
         """
         slice format = {'field': (lo, hi)}
+
+        Returns views of the histories at redshift `z` if `slc` selects all
+        halos, copies otherwise.
         """
 
-        iz = np.argmin(np.abs(z - self.tab_z))
+        # Histories are in ascending time, unlike `tab_z`.
+        iz = np.argmin(np.abs(z - self.histories['z']))
         hist = self.histories
 
-        c = np.ones(hist['Mh'].shape[0], dtype=int)
+        if not isinstance(hist, HistoryStore):
+            hist = HistoryStore(hist['Mh'].shape)
+            hist.update(self.histories)
+
+        c = np.ones(hist['Mh'].shape[0], dtype=bool)
         for key in slc:
             lo, hi = slc[key]
 
-            ok = np.logical_and(hist[key][:,iz] >= lo, hist[key][:,iz] <= hi)
-            c *= ok
+            c &= hist[key][:,iz] >= lo
+            c &= hist[key][:,iz] <= hi
 
-        # Build output
-        to_return = {}
-        for key in self.histories:
-            if self.histories[key].ndim == 1:
-                to_return[key] = self.histories[key][c==1]
-            else:
-                to_return[key] = self.histories[key][c==1,iz]
-
-        return to_return
+        return hist.select(iz, c)
 
     def get_field(self, z, field):
+        """
+        Return (a view of) field `field` for all halos at redshift `z`.
+        """
         iz = np.argmin(np.abs(z - self.histories['z']))
         return self.histories[field][:,iz]
 
@@ -1631,7 +1673,29 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
 
         return self._cache_smf(z, bin_c)
 
+    def _xmhm_bins(self, Mh=None, Mbin=0.1):
+        if (Mh is None) or (type(Mh) is not np.ndarray):
+            bin_c = np.arange(6., 14.+Mbin, Mbin)
+        else:
+            dx = np.diff(np.log10(Mh))
+            assert np.allclose(np.diff(dx), 0)
+            Mbin = dx[0]
+            bin_c = np.log10(Mh)
+
+        return bin_c
+
     def XMHM(self, z, field='Ms', Mh=None, return_mean_only=False, Mbin=0.1):
+
+        bin_c = self._xmhm_bins(Mh, Mbin)
+
+        # May have been computed already in chunks, see `StreamSummaryStats`.
+        if hasattr(self, '_cache_xmhm_') and ((z, field) in self._cache_xmhm_):
+            x, y, std, N = self._cache_xmhm_[(z, field)]
+            if (x.size == bin_c.size) and np.allclose(x, bin_c):
+                if return_mean_only:
+                    return y
+                return x, y, std
+
         iz = np.argmin(np.abs(z - self.histories['z']))
 
         _Ms = self.histories[field][:,iz]
@@ -1640,14 +1704,6 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
 
         fstar_raw = _Ms / _Mh
 
-        if (Mh is None) or (type(Mh) is not np.ndarray):
-            bin_c = np.arange(6., 14.+Mbin, Mbin)
-        else:
-            dx = np.diff(np.log10(Mh))
-            assert np.allclose(np.diff(dx), 0)
-            Mbin = dx[0]
-            bin_c = np.log10(Mh)
-
         nh = self.get_field(z, 'nh')
         x, y, z, N = bin_samples(logMh, np.log10(fstar_raw), bin_c, weights=nh)
 
@@ -2040,6 +2096,28 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
         if cached_result is not None:
             return cached_result
 
+        MAB, w, Misok = self._get_mags_and_weights(z, wave=wave,
+            window=window, band=band)
+
+        # Always bin to setup cache, interpolate from then on.
+        _x = np.arange(-28, 5., self.pf['pop_mag_bin'])
+
+        hist, bin_edges = np.histogram(MAB[Misok==1],
+            weights=w[Misok==1], bins=bin_c2e(_x), density=True)
+
+        N = np.sum(w[Misok==1])
+        phi = hist * N
+
+        self._cache_lf_[(z, wave)] = _x, phi
+
+        return self._cache_lf(z, x, wave)
+
+    def _get_mags_and_weights(self, z, wave=1600., window=1, band=None):
+        """
+        Return absolute magnitudes of all galaxies, their abundances, and
+        a mask indicating which have a finite magnitude.
+        """
+
         # These are kept in descending redshift just to make life difficult.
         # [The last element corresponds to observation redshift.]
         raw = self.histories
@@ -2081,18 +2159,7 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
         # spikes where L==0, all L==0 elements should be a contiguous chunk.
         Misok = np.logical_and(L > 0, np.isfinite(L))
 
-        # Always bin to setup cache, interpolate from then on.
-        _x = np.arange(-28, 5., self.pf['pop_mag_bin'])
-
-        hist, bin_edges = np.histogram(MAB[Misok==1],
-            weights=w[Misok==1], bins=bin_c2e(_x), density=True)
-
-        N = np.sum(w[Misok==1])
-        phi = hist * N
-
-        self._cache_lf_[(z, wave)] = _x, phi
-
-        return self._cache_lf(z, x, wave)
+        return MAB, w, Misok
 
     def _cache_beta(self, kw_tup):
 
@@ -2722,9 +2789,9 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
 
         return mobs, ngtm
 
-    def load(self):
+    def _histories_filename(self):
         """
-        Load results from past run.
+        Figure out where halo histories live. Could also be a dictionary.
         """
 
         fn_hist = self.pf['pop_histories']
@@ -2747,6 +2814,38 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
             if self.pf['verbose']:
                 print("Should check that HMF parameters match!")
 
+        return fn_hist
+
+    def _slice_histories(self, hist, rows):
+        """
+        Extract halos `rows` from dictionary of raw halo histories.
+        """
+
+        N = hist['nh'].shape[0]
+
+        out = {}
+        for key in hist:
+            val = hist[key]
+            is_per_halo = isinstance(val, np.ndarray) and (val.ndim > 0) \
+                and (val.shape[0] == N) and (key not in ['t', 'z', 'zform'])
+
+            out[key] = val[rows] if is_per_halo else val
+
+        return out
+
+    def load(self):
+        """
+        Load results from past run.
+
+        If we're streaming halos (see `StreamSummaryStats`), only the
+        current chunk of halos is read.
+        """
+
+        fn_hist = self._histories_filename()
+
+        # Subset of halos to read, if we're working in chunks
+        rows = getattr(self, '_hist_rows', None)
+
         # Read output
         if type(fn_hist) is str:
             if fn_hist.endswith('.pkl'):
@@ -2762,22 +2861,28 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
                 f = h5py.File(fn_hist, 'r')
                 prefix = fn_hist.split('.hdf5')[0]
 
+                # Only read what we need, straight from disk.
+                hrows = slice(None) if rows is None else rows
+
                 if 'mask' in f:
-                    mask = np.array(f[('mask')])
+                    mask = np.array(f[('mask')][hrows])
                 else:
-                    mask = np.zeros_like(f[('Mh')])
+                    mask = np.zeros(f[('Mh')][hrows].shape)
 
                 hist = {}
                 for key in f.keys():
 
-                    if key not in ['cosmology', 't', 'z', 'children']:
+                    if key == 'children':
+                        hist[key] = np.array(f[(key)][hrows])
+                    elif key not in ['cosmology', 't', 'z']:
                         #hist[key] = np.ma.array(f[(key)], mask=mask,
                         #    fill_value=-np.inf)
 
                         # Oddly, masking causes a weird issue with a huge
                         # spike at log10(MAR) ~ 1. np.ma operations are
                         # also considerably slower.
-                        hist[key] = np.array(f[(key)]) * np.logical_not(mask)
+                        hist[key] = np.array(f[(key)][hrows]) \
+                            * np.logical_not(mask)
 
                         #else:
                         #    hist[key] = np.ma.array(f[(key)], mask=mask)
@@ -2805,17 +2910,247 @@ class GalaxyEnsemble(HaloPopulation,BlobFactory):
                 if self.pf['verbose']:
                     print("# Read `pop_histories` as dictionary")
 
+            # Already took care of this for hdf5
+            if (rows is not None) and (not fn_hist.endswith('.hdf5')):
+                hist = self._slice_histories(hist, rows)
+
             hist['zform'] = zall
             hist['zobs'] = np.array([zall] * hist['nh'].shape[0])
 
         elif type(self.pf['pop_histories']) is dict:
             hist = self.pf['pop_histories']
             # Assume you know what you're doing.
+
+            if rows is not None:
+                hist = self._slice_histories(hist, rows)
         else:
             hist = None
 
         return hist
 
+    def _count_halos(self):
+        """
+        Number of halo histories we'd read in `load`, without reading them.
+        """
+
+        fn_hist = self._histories_filename()
+
+        if type(fn_hist) is str and fn_hist.endswith('.hdf5'):
+            with h5py.File(fn_hist, 'r') as f:
+                N = f[('nh')].shape[0]
+        elif type(fn_hist) is dict:
+            N = fn_hist['nh'].shape[0]
+        else:
+            # Have to read the whole thing (pickles)
+            rows = getattr(self, '_hist_rows', None)
+            self._hist_rows = None
+            N = self.load()['nh'].shape[0]
+            self._hist_rows = rows
+
+        return N
+
+    def _reset_chunk(self):
+        """
+        Forget everything derived from the current chunk of halos.
+        """
+
+        for attr in ['_histories', '_cache_halos_', '_cache_L_', '_cache_lf_',
+            '_cache_smf_', '_cache_beta_', '_cache_mags_']:
+            if hasattr(self, attr):
+                delattr(self, attr)
+
+        if hasattr(self, '_synth'):
+            self._synth._lum_cache.clear()
+
+        gc.collect()
+
+    def iter_chunks(self, chunk=None):
+        """
+        Loop over halos in chunks, e.g., to process catalogs too big to fit
+        in memory.
+
+        At each iteration, `histories` (and everything derived from it)
+        refers to the current chunk only. Note that random numbers (e.g.,
+        for scatter in MARs) are re-seeded for each chunk.
+
+        Parameters
+        ----------
+        chunk : int
+            Number of halos per chunk. Defaults to `pop_histories_chunk`.
+
+        Returns
+        -------
+        Generator yielding the (start, stop) indices of halos in each chunk.
+
+        """
+
+        assert self.pf['pop_mergers'] <= 0, \
+            "Can't process halos in chunks if they merge with one another!"
+
+        if chunk is None:
+            chunk = self.pf['pop_histories_chunk']
+
+        N = self._count_halos()
+
+        if chunk is None:
+            chunk = N
+
+        chunk = int(chunk)
+
+        try:
+            for start in range(0, N, chunk):
+                stop = min(start + chunk, N)
+
+                self._reset_chunk()
+                self._hist_rows = slice(start, stop)
+
+                yield start, stop
+        finally:
+            self._reset_chunk()
+            self._hist_rows = None
+
+    def StreamSummaryStats(self, redshifts, Ms=None, Mh=None, MUV=None,
+        wave=1600., window=1, chunk=None):
+        """
+        Compute stellar mass functions, stellar-mass--halo-mass relations,
+        and UV luminosity functions without holding the whole ensemble in
+        memory.
+
+        Halo histories are read from disk (or `pop_histories`) in chunks,
+        each chunk is evolved with the SAM, and histograms (and the moments
+        needed for the SMHM) are accumulated as we go. The results are
+        cached so subsequent calls to `StellarMassFunction`, `SMHM`, and
+        `LuminosityFunction` at these redshifts are instantaneous.
+
+        Parameters
+        ----------
+        redshifts : int, float, list
+            Redshift(s) of interest.
+        Ms : np.ndarray
+            log10 stellar mass bin centers (as in `StellarMassFunction`).
+        Mh : np.ndarray
+            Halo mass bin centers (as in `SMHM`).
+        MUV : np.ndarray
+            Magnitudes at which to evaluate the LF. Binned internally the
+            same way as in `LuminosityFunction`.
+        wave : int, float
+            Rest wavelength for the LF [Angstrom].
+        window : int
+            Width of window to average over in LF [pixels].
+        chunk : int
+            Number of halos per chunk. Defaults to `pop_histories_chunk`.
+
+        Returns
+        -------
+        Dictionary with one entry per redshift, each containing 'smf',
+        'smhm', and 'uvlf' in the same form as returned by the corresponding
+        methods.
+
+        """
+
+        if type(redshifts) in num_types:
+            redshifts = [redshifts]
+
+        # Set up bins
+        if (Ms is None) or (type(Ms) is not np.ndarray):
+            binw = 0.5
+            Ms_c = np.arange(6., 13.+binw, binw)
+        else:
+            dx = np.diff(Ms)
+            assert np.allclose(np.diff(dx), 0)
+            binw = dx[0]
+            Ms_c = Ms
+
+        Mh_c = self._xmhm_bins(Mh)
+        Mh_e = bin_c2e(Mh_c)
+        M_c = np.arange(-28, 5., self.pf['pop_mag_bin'])
+
+        # Accumulators
+        acc = {}
+        for z in redshifts:
+            acc[z] = {'smf': np.zeros(Ms_c.size), 'lf': np.zeros(M_c.size),
+                'lf_Ntot': 0.0, 'n': np.zeros(Mh_c.size),
+                'w': np.zeros(Mh_c.size), 'wy': np.zeros(Mh_c.size),
+                'y': np.zeros(Mh_c.size), 'yy': np.zeros(Mh_c.size)}
+
+        for start, stop in self.iter_chunks(chunk):
+
+            # Some chunks may have no halos of interest
+            if self._cache_halos['Mh'].shape[0] == 0:
+                continue
+
+            for z in redshifts:
+
+                # SMF
+                acc[z]['smf'] += self.StellarMassFunction(z, bins=Ms_c)
+
+                # SMHM, i.e., sufficient statistics for the mean and scatter
+                # in log10(Ms / Mh) in each Mh bin.
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    logMh = np.log10(self.get_field(z, 'Mh'))
+                    y = np.log10(self.get_field(z, 'Ms')) - logMh
+
+                nh = self.get_field(z, 'nh')
+
+                ib = np.searchsorted(Mh_e, logMh, side='right') - 1
+                ok = np.logical_and(ib >= 0, ib < Mh_c.size)
+                ok = np.logical_and(ok, np.isfinite(y))
+
+                for key, wt in [('n', None), ('w', nh[ok]),
+                    ('wy', nh[ok] * y[ok]), ('y', y[ok]), ('yy', y[ok]**2)]:
+                    acc[z][key] += np.bincount(ib[ok], weights=wt,
+                        minlength=Mh_c.size)
+
+                # UVLF
+                if MUV is not None:
+                    MAB, w, Misok = self._get_mags_and_weights(z, wave=wave,
+                        window=window)
+                    hist, _ = np.histogram(MAB[Misok==1], weights=w[Misok==1],
+                        bins=bin_c2e(M_c))
+                    acc[z]['lf'] += hist
+                    acc[z]['lf_Ntot'] += np.sum(w[Misok==1])
+
+        # Wrap up, and save to caches
+        if not hasattr(self, '_cache_smf_'):
+            self._cache_smf_ = {}
+        if not hasattr(self, '_cache_lf_'):
+            self._cache_lf_ = {}
+        if not hasattr(self, '_cache_xmhm_'):
+            self._cache_xmhm_ = {}
+
+        results = {}
+        for z in redshifts:
+            a = acc[z]
+            empty = a['n'] == 0
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ymean = a['wy'] / a['w']
+                ystd = np.sqrt(np.maximum(a['yy'] / a['n'] \
+                    - (a['y'] / a['n'])**2, 0.))
+
+            ymean[empty] = -np.inf
+            ystd[empty] = -np.inf
+
+            self._cache_smf_[z] = Ms_c, a['smf']
+            self._cache_xmhm_[(z, 'Ms')] = Mh_c, ymean, ystd, a['n']
+
+            results[z] = {'smf': (Ms_c, a['smf']),
+                'smhm': (Mh_c, ymean, ystd)}
+
+            if MUV is None:
+                continue
+
+            # Same normalization as `LuminosityFunction`
+            dM = self.pf['pop_mag_bin']
+            with np.errstate(divide='ignore', invalid='ignore'):
+                phi = a['lf'] / np.sum(a['lf']) / dM * a['lf_Ntot']
+
+            self._cache_lf_[(z, wave)] = M_c, phi
+
+            results[z]['uvlf'] = (MUV, self._cache_lf(z, MUV, wave))
+
+        return results
+
     def save(self, prefix, clobber=False):
         """
         Output model (i.e., galaxy trajectories) to file.
@@ -74,8 +74,10 @@ class GasParcel(object):
         self.chem = Chemistry(self.grid, rt=self.pf['radiative_transfer'],
             recombination=self.pf['recombination'], 
             interp_rc=self.pf['interp_rc'], 
+            rate_tables=self.pf['rate_tables'],
             rtol=self.pf['solver_rtol'],
-            atol=self.pf['solver_atol'])
+            atol=self.pf['solver_atol'],
+            batch=self.pf['solver_batch'])
         
     def reset(self):
         del self.gen
@@ -173,6 +173,12 @@ class MetaGalacticBackground(AnalyzeMGB):
         if not hasattr(self, '_data_'):
             self._data_ = {}
 
+        # Optionally solve independent populations/bands in parallel.
+        # Subsequent calls to `run_pop` will then just read off the results.
+        if (self.pf['rte_nprocs'] is not None) and \
+           (not self.solver.approx_all_pops):
+            self.solver.precompute_fluxes(popids=include_pops)
+
         for i, popid in enumerate(include_pops):
             z, fluxes = self.run_pop(popid=popid, xe=xe)
             self._data_[popid] = fluxes
@@ -25,7 +25,8 @@ tiny_ion = 1e-12
 class Chemistry(object):
     """ Class for evolving chemical reaction equations. """
     def __init__(self, grid, rt=False, atol=1e-8, rtol=1e-8, rate_src='fk94',
-        recombination='B', interp_rc='linear'):
+        recombination='B', interp_rc='linear', batch=False, 
+        rate_tables=False):
         """
         Create a chemistry object.
         
@@ -35,14 +36,22 @@ class Chemistry(object):
             Need this!
         rt: bool
             Use radiative transfer?
+        batch : bool
+            If True, integrate all cells simultaneously as one block-diagonal
+            system rather than looping over cells.
+        rate_tables : bool
+            If True, interpolate rate coefficients from tables in log(T) 
+            rather than computing them from fitting formulae each time.
             
         """
 
         self.grid = grid
         self.rtON = rt
+        self.batch = batch
         
         self.chemnet = ChemicalNetwork(grid, rate_src=rate_src,
-            recombination=recombination, interp_rc=interp_rc)
+            recombination=recombination, interp_rc=interp_rc, 
+            rate_tables=rate_tables)
         
         # Only need to compute rate coefficients once for isothermal gas
         if self.grid.isothermal:
@@ -51,8 +60,17 @@ class Chemistry(object):
         else:
             self.rcs = {}
             
-        self.solver = ode(self.chemnet.RateEquations).set_integrator('lsoda',
-            nsteps=1e4, atol=atol, rtol=rtol)
+        if self.batch:
+            # Cells don't talk to each other, so the (finite-difference)
+            # Jacobian of the full system is banded with half-bandwidth
+            # (number of fields - 1).
+            Nev = len(self.grid.evolving_fields)
+            self.solver = ode(self.chemnet.RateEquationsBatch).set_integrator(
+                'lsoda', nsteps=1e4, atol=atol, rtol=rtol, lband=Nev-1, 
+                uband=Nev-1)
+        else:
+            self.solver = ode(self.chemnet.RateEquations).set_integrator(
+                'lsoda', nsteps=1e4, atol=atol, rtol=rtol)
         
         self.solver._integrator.iwork[2] = -1
             
@@ -98,6 +116,30 @@ class Chemistry(object):
         if not kwargs:
             kwargs = self.rcs.copy()
 
+        if self.batch:
+            self._evolve_all_cells(data, newdata, kwargs, t, dt)
+        else:
+            self._evolve_by_cell(data, newdata, kwargs, t, dt)
+
+        # Compute particle density
+        newdata['n'] = self.grid.particle_density(newdata, z - dz)
+        
+        # Fix helium fractions if approx_He==True.
+        if self.grid.pf['include_He']:
+            if self.grid.pf['approx_He']:
+                newdata['he_1'] = newdata['h_1']
+                newdata['he_2'] = newdata['h_2']
+                newdata['he_3'] = np.zeros_like(newdata['h_1'])
+
+        return newdata  
+
+    def _evolve_by_cell(self, data, newdata, kwargs, t, dt):
+        """
+        Loop over grid and solve chemistry one cell at a time.
+        
+        Results are written to `newdata` in place.
+        """
+        
         kwargs_by_cell = self._sort_kwargs_by_cell(kwargs)
 
         self.q_grid = np.zeros_like(self.zeros_gridxq)
@@ -124,7 +166,7 @@ class Chemistry(object):
                     self.grid.zeros_absorbers2, self.grid.zeros_absorbers, 
                     data['n'][cell], t)
 
-            self.solver.set_initial_value(q, 0.0).set_f_params(args).set_jac_params(args)
+            self.solver.set_initial_value(q, 0.0).set_f_params(args)
                         
             self.solver.integrate(dt)
 
@@ -134,17 +176,35 @@ class Chemistry(object):
             for i, value in enumerate(self.solver.y):
                 newdata[self.grid.evolving_fields[i]][cell] = self.solver.y[i]
 
-        # Compute particle density
-        newdata['n'] = self.grid.particle_density(newdata, z - dz)
+    def _evolve_all_cells(self, data, newdata, kwargs, t, dt):
+        """
+        Solve chemistry in all cells at once.
         
-        # Fix helium fractions if approx_He==True.
-        if self.grid.pf['include_He']:
-            if self.grid.pf['approx_He']:
-                newdata['he_1'] = newdata['h_1']
-                newdata['he_2'] = newdata['h_2']
-                newdata['he_3'] = np.zeros_like(newdata['h_1'])
-
-        return newdata  
+        Results are written to `newdata` in place.
+        """
+        
+        # Construct (cells x fields) q array
+        q = np.array([data[species] for species in self.grid.evolving_fields],
+            dtype=float).T
+        
+        if self.rtON:
+            args = (kwargs['k_ion'], kwargs['k_ion2'], kwargs['k_heat'], 
+                data['n'], t)
+        else:
+            args = (self.grid.zeros_grid_x_absorbers, 
+                self.grid.zeros_grid_x_absorbers2, 
+                self.grid.zeros_grid_x_absorbers, data['n'], t)
+        
+        self.solver.set_initial_value(q.ravel(), 0.0).set_f_params(args)
+        
+        self.solver.integrate(dt)
+        
+        self.q_grid = q.copy()
+        self.dqdt_grid = self.chemnet.dqdt.copy()
+        
+        y = self.solver.y.reshape(q.shape)
+        for i, species in enumerate(self.grid.evolving_fields):
+            newdata[species] = y[:,i].copy()
 
     def _sort_kwargs_by_cell(self, kwargs):
         """
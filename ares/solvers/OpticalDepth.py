@@ -11,7 +11,9 @@ Description:
 """
 
 import inspect
+import hashlib
 import numpy as np
+import multiprocessing
 import os, re, types, sys
 from ..util.Pickling import read_pickle_file, write_pickle_file
 from scipy.integrate import quad
@@ -23,7 +25,7 @@ from ..util.Math import interp1d
 from ..util.Warnings import no_tau_table
 from ..util import ProgressBar, ParameterFile
 from ..physics.CrossSections import PhotoIonizationCrossSection, \
-    ApproximatePhotoIonizationCrossSection
+    ApproximatePhotoIonizationCrossSection, CrossSectionTable, E_th
 from ..util.Warnings import tau_tab_z_mismatch, tau_tab_E_mismatch
 
 try:
@@ -65,6 +67,17 @@ defkwargs = \
 barn = 1e-24
 Mbarn = 1e-18
 
+# Set by OpticalDepth.TabulateOpticalDepth right before forking workers.
+_solver_for_workers = None
+
+def _tabulate_rows(rows):
+    """
+    Compute rows of the optical depth table.
+
+    .. note:: For use with multiprocessing only.
+    """
+    return _solver_for_workers._tabulate_rows(rows)
+
 class OpticalDepth(object):
     def __init__(self, **kwargs):
         self.pf = ParameterFile(**kwargs)
@@ -263,19 +276,33 @@ class OpticalDepth(object):
     
         return kw    
     
-    def TabulateOpticalDepth(self):
+    def TabulateOpticalDepth(self, nprocs=None):
         """
         Compute optical depth as a function of (redshift, photon energy).
     
         Parameters
         ----------
-        xavg : function
-            Mean ionized fraction as a function of redshift.
+        nprocs : int
+            Number of local processes to use. Defaults to `tau_nprocs`
+            parameter.
     
         Notes
         -----
         Assumes logarithmic grid in variable x = 1 + z. Corresponding 
         grid in photon energy determined in _init_xrb.    
+        
+        The line-of-sight integral over each redshift interval is done for
+        all photon energies at once using Gauss-Legendre quadrature, with
+        `tau_gauss_points` nodes between each pair of redshifts. Intervals
+        are split wherever the rest-frame photon energy crosses an
+        ionization threshold, so the integrand is smooth on each piece.
+        
+        Under MPI, redshift intervals are divided among processors, each of
+        which can farm its share out to `nprocs` local processes.
+        
+        If `tau_cache` is a directory, tables are saved there and re-used
+        whenever `tau_name` and a hash of the ionization history (and
+        cosmology) match.
     
         Returns
         -------
@@ -283,48 +310,238 @@ class OpticalDepth(object):
     
         """
         
-        xavg = self.ionization_history
+        global _solver_for_workers
+        
+        if nprocs is None:
+            nprocs = self.pf['tau_nprocs']
         
         if not hasattr(self, 'L'):
             self._set_xrb(use_tab=False)
-    
-        # Create array for each processor
-        tau_proc = np.zeros([self.L, self.N])
-    
-        pb = ProgressBar(self.L * self.N, 'tau')
-        pb.start()
-
-        # Loop over redshift, photon energy
-        for l in range(self.L):
-
-            for n in range(self.N):
-                m = l * self.N + n + 1
+            
+        fn = self.tau_cache_name()
+        if (fn is not None) and os.path.exists(fn):
+            with np.load(fn) as f:
+                self.tau = f['tau']
+            
+            if self.pf['verbose']:
+                print("# Loaded {}.".format(fn))
+                
+            return self.tau
+        
+        # Divide redshift intervals among MPI processors (if any), and this
+        # processor's intervals among local processes (if any).
+        rows = np.arange(self.L)
+        rows = rows[rows % size == rank]
 
-                if m % size != rank:
-                    continue
-    
-                # Compute optical depth
-                if l == (self.L - 1):
-                    tau_proc[l,n] = 0.0
-                else:
-                    tau_proc[l,n] = self.DiffuseOpticalDepth(self.z[l],
-                        self.z[l+1], self.E[n], xavg=xavg)
-    
-                pb.update(m)
-    
-        pb.finish()
-    
+        tau_proc = np.zeros([self.L, self.N])
+        
+        if (nprocs is None) or (nprocs < 2) or (rows.size < 2):
+            tau_proc[rows] = self._tabulate_rows(rows, 
+                progress_bar=(rank == 0))
+        else:
+            chunks = np.array_split(rows, min(4 * nprocs, rows.size))
+            
+            _solver_for_workers = self
+            pool = multiprocessing.get_context('fork').Pool(nprocs)
+            try:
+                results = pool.map(_tabulate_rows, chunks, chunksize=1)
+                pool.close()
+            except:
+                pool.terminate()
+                raise
+            finally:
+                pool.join()
+                _solver_for_workers = None
+                
+            tau_proc[rows] = np.concatenate(results, axis=0)
+            
         # Communicate results
         if size > 1:
-            tau = np.zeros_like(tau_proc)       
-            nothing = MPI.COMM_WORLD.Allreduce(tau_proc, tau)
+            tau = np.zeros_like(tau_proc)
+            MPI.COMM_WORLD.Allreduce(tau_proc, tau)
         else:
             tau = tau_proc
     
         self.tau = tau
+        
+        if (fn is not None) and (rank == 0):
+            if not os.path.exists(self.pf['tau_cache']):
+                os.makedirs(self.pf['tau_cache'])
+            
+            # Write to temporary file first so that readers never see a 
+            # partially written table.
+            tmp = '{0!s}.{1}.tmp.npz'.format(fn[0:fn.rfind('.')], os.getpid())
+            np.savez(tmp, tau=tau, z=self.z, E=self.E)
+            os.replace(tmp, fn)
     
         return tau
         
+    def _tabulate_rows(self, rows, progress_bar=False):
+        """
+        Compute optical depth between z[l] and z[l+1] for each l in rows.
+        
+        Returns
+        -------
+        Array of shape (len(rows), self.N).
+        
+        """
+        
+        tau = np.zeros([len(rows), self.N])
+        
+        pb = ProgressBar(len(rows), 'tau', use=progress_bar)
+        pb.start()
+        
+        for i, l in enumerate(rows):
+            if l < (self.L - 1):
+                tau[i] = self._tabulate_interval(self.z[l], self.z[l+1])
+            
+            pb.update(i)
+            
+        pb.finish()
+        
+        return tau
+    
+    def _tabulate_interval(self, z1, z2):
+        """
+        Compute optical depth between z1 and z2 for all energies at once.
+        
+        Parameters
+        ----------
+        z1 : float
+            observer redshift
+        z2 : float
+            emission redshift
+            
+        Returns
+        -------
+        Array of optical depths, one for each element of self.E.
+            
+        """
+        
+        xavg = self._vectorized_ionization_history
+        species = self._absorbers
+        
+        # Split interval where the rest-frame energy crosses each threshold.
+        E = self.E[:,None]
+        zth = np.array([E_th[i] for i in species])[None,:] * (1. + z1) / E - 1.
+        edges = np.concatenate([z1 * np.ones_like(E), np.clip(zth, z1, z2),
+            z2 * np.ones_like(E)], axis=1)
+        edges.sort(axis=1)
+        
+        # Map Gauss-Legendre nodes onto each piece: shape (N, pieces, nodes)
+        nodes, weights = self._gauss_legendre
+        hw = 0.5 * np.diff(edges, axis=1)[...,None]
+        mid = 0.5 * (edges[:,1:] + edges[:,:-1])[...,None]
+        z = mid + hw * nodes
+        w = hw * weights
+        
+        Erest = self.RestFrameEnergy(z1, self.E[:,None,None], z)
+        
+        # Number densities of everything
+        nHI = self.cosm.nH(z) * (1. - xavg(z))
+        if self.approx_He:
+            n = [nHI, nHI * self.cosm.y]
+        elif self.self_consistent_He:
+            n = [nHI, self.cosm.nHe(z) * (1. - xavg(z) - xavg(z)),
+                self.cosm.nHe(z) * xavg(z)]
+        else:
+            n = [nHI]
+            
+        integrand = 0.0    
+        for i, sp in enumerate(species):
+            integrand = integrand + n[i] * self._sigma_array(Erest, sp)
+            
+        integrand *= self.cosm.dldz(z)
+        
+        return np.sum(integrand * w, axis=(1, 2))
+        
+    @property
+    def _absorbers(self):
+        if self.approx_He:
+            return [0, 1]
+        elif self.self_consistent_He:
+            return [0, 1, 2]
+        else:
+            return [0]
+        
+    @property
+    def _gauss_legendre(self):
+        if not hasattr(self, '_gauss_legendre_'):
+            self._gauss_legendre_ = \
+                np.polynomial.legendre.leggauss(int(self.pf['tau_gauss_points']))
+        return self._gauss_legendre_
+    
+    def _sigma_array(self, E, species):
+        """
+        Cross section evaluated on an array of energies.
+        """
+        return self.sigma(np.asarray(E), species)
+        
+    @property
+    def _vectorized_ionization_history(self):
+        """
+        Version of `ionization_history` that accepts arrays of redshifts.
+        """
+        xavg = self.ionization_history
+        
+        def xavg_v(z):
+            try:
+                val = np.asarray(xavg(z), dtype=float)
+            except Exception:
+                val = None
+                
+            if (val is None) or (val.shape not in [(), z.shape]):
+                val = np.vectorize(xavg, otypes=[float])(z)
+                
+            return val    
+        
+        return xavg_v
+        
+    def tau_cache_name(self):
+        """
+        Return name of cached optical depth table.
+        
+        Tables are content-addressed: the filename is that returned by 
+        `tau_name`, plus a hash of everything else the table depends on, 
+        i.e., the exact redshift and energy grids, the absorbers and cross 
+        sections, the cosmology, and the ionization history evaluated on the
+        redshift grid and quadrature nodes.
+        
+        Returns
+        -------
+        Full path to table, or None if `tau_cache` parameter is None.
+        
+        """
+        
+        if self.pf['tau_cache'] is None:
+            return None
+        
+        if not hasattr(self, 'L'):
+            self._set_xrb(use_tab=False)
+        
+        fn, fn_func = self.tau_name(suffix='npz')
+        fn = os.path.basename(fn)
+        fn = fn[0:fn.rfind('.')]
+        
+        # Ionization history at all redshifts that matter
+        nodes, weights = self._gauss_legendre
+        hw = 0.5 * np.diff(self.z)[:,None]
+        mid = 0.5 * (self.z[1:] + self.z[:-1])[:,None]
+        z = np.concatenate([self.z, (mid + hw * nodes).ravel()])
+        xavg = self._vectorized_ionization_history(z) * np.ones_like(z)
+        
+        cosm = [self.cosm.omega_m_0, self.cosm.omega_l_0, self.cosm.hubble_0,
+            self.cosm.nH0, self.cosm.nHe0, self.cosm.y, 
+            float(self.cosm.approx_highz)]
+        
+        sha = hashlib.sha1()
+        for arr in [self.z, self.E, xavg, cosm, self._absorbers, 
+            [int(self.pf['approx_sigma']), int(self.pf['tau_gauss_points'])]]:
+            sha.update(np.ascontiguousarray(arr, dtype=float).tobytes())
+        
+        return '{0!s}/{1!s}_{2!s}.npz'.format(self.pf['tau_cache'], fn, 
+            sha.hexdigest()[0:16])
+        
     def RestFrameEnergy(self, z, E, zp):
         """
         Return energy of a photon observed at (z, E) and emitted at zp.
@@ -485,8 +702,8 @@ class OpticalDepth(object):
         self.dlogE = np.diff(self.logE)
     
         # Pre-compute cross-sections
-        self.sigma_E = np.array([np.array([self.sigma(E, i) for E in self.E]) \
-            for i in range(3)])
+        self.sigma_E = np.array([CrossSectionTable(self.E, i, 
+            approx=self.pf['approx_sigma']) for i in range(3)])
         self.log_sigma_E = np.log10(self.sigma_E)
     
     def load(self, fn):
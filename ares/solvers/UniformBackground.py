@@ -13,6 +13,7 @@ Description:
 import numpy as np
 from math import ceil
 import os, re, types, gc
+import multiprocessing
 from ..util import ParameterFile
 from ..static import GlobalVolume
 from ..util.Misc import num_freq_bins
@@ -52,6 +53,71 @@ log10 = np.log(10.)    # for when we integrate in log-space
 four_pi = 4. * np.pi
 c_over_four_pi = c / four_pi
 
+# Set just before forking worker processes in `precompute_fluxes`, so that
+# children inherit (rather than receive pickled copies of) the solver and
+# all its tables.
+_solver_for_workers = None
+
+def _solve_chain(chain):
+    """
+    Run a chain of flux generators to completion.
+
+    .. note:: For use with multiprocessing only.
+
+    Parameters
+    ----------
+    chain : list
+        (popid, band) pairs that must be solved together. They all belong to
+        the same population, and so share a redshift grid.
+
+    Returns
+    -------
+    Dictionary, with (popid, band) pairs as keys and lists of (z, flux)
+    pairs, in order of descending redshift, as values.
+
+    """
+
+    solver = _solver_for_workers
+
+    popid = chain[0][0]
+    gens = [solver.generators[_popid][j] for _popid, j in chain]
+
+    history = {link:[] for link in chain}
+    for ll in range(solver.redshifts[popid].size):
+        for i, gen in enumerate(gens):
+            history[chain[i]].append(next(gen))
+
+    return history
+
+def _freeze_history(history):
+    """
+    Make a pre-computed flux history (or list of them) read-only.
+
+    Histories are shared by every model that replays them (see
+    `UniformBackground.rte_histories`), so nothing may modify them in place.
+    """
+    if type(history) is list:
+        for flux in history:
+            flux.setflags(write=False)
+    else:
+        history.setflags(write=False)
+
+    return history
+
+def _replay_history(redshifts, history):
+    """
+    Generator that steps through a pre-computed flux history.
+
+    Yields (z, flux) pairs in order of descending redshift, just like the
+    flux generators. If `history` is a list (e.g., sawtooth sub-bands), the
+    flux is also a list. Fluxes are read-only views of `history`.
+    """
+    for ll in range(redshifts.size - 1, -1, -1):
+        if type(history) is list:
+            yield redshifts[ll], [flux[ll] for flux in history]
+        else:
+            yield redshifts[ll], history[ll]
+
 # Put this stuff in utils
 defkwargs = \
 {
@@ -565,7 +631,7 @@ class UniformBackground(object):
 
         # Generate it now if no file was found.
         if tau is None:
-            no_tau_table(self)
+            no_tau_table(tau_solver)
 
             if self.pf['tau_approx'] is 'neutral':
                 tau_solver.ionization_history = lambda z: 0.0
@@ -616,6 +682,118 @@ class UniformBackground(object):
 
         return self._generators
 
+    def _independent_chains(self, popids):
+        """
+        Group (popid, band) pairs into chains that can be solved separately.
+
+        Bands only exchange flux through `_fluxes_from`, which happens when
+        a band receives Ly-a photons from the band above it, or Ly-n cascade
+        photons from the sawtooth. Populations are always independent of
+        one another.
+
+        Returns
+        -------
+        List of chains, each of which is a list of (popid, band) pairs.
+
+        """
+
+        chains = []
+        for popid in popids:
+            if self.generators[popid] is None:
+                continue
+
+            pop = self.pops[popid]
+
+            links = []
+            coupled = False
+            for j, gen in enumerate(self.generators[popid]):
+                if gen is None:
+                    continue
+
+                links.append((popid, j))
+
+                E = self.energies[popid][j]
+
+                # Sawtooth bands are handled by a single generator
+                if type(E) is list:
+                    continue
+
+                if pop.pf['pop_lya_permeable'] and E[-1] < E_LyA \
+                    and abs(E_LyA - E[-1]) < 0.2:
+                    coupled = True
+                if (E[0] == E_LyA) and self.pf['include_injected_lya']:
+                    coupled = True
+
+            if coupled:
+                chains.append(links)
+            else:
+                chains.extend([[link] for link in links])
+
+        return chains
+
+    def precompute_fluxes(self, popids=None, nprocs=None):
+        """
+        Solve the RTE for many populations and bands in parallel.
+
+        Chains of (popid, band) pairs that don't exchange flux (see
+        `_independent_chains`) are distributed over a pool of `nprocs`
+        processes. Optical depth and emissivity tables are computed here
+        first, and worker processes are forked afterward so that they share
+        these arrays with the parent rather than receiving copies.
+
+        Once complete, the elements of `generators` for each population
+        simply replay the stored solutions, i.e., they return exactly what
+        the original generators would have.
+
+        .. note:: Relies on the 'fork' start method, so is only available on
+            POSIX systems. Does not use MPI.
+
+        Parameters
+        ----------
+        popids : list
+            Populations to solve for. By default, all of them.
+        nprocs : int
+            Number of processes to use. Defaults to `rte_nprocs` parameter.
+
+        Returns
+        -------
+        Nothing. Modifies `generators` attribute.
+
+        """
+
+        global _solver_for_workers
+
+        if popids is None:
+            popids = range(self.Npops)
+        if nprocs is None:
+            nprocs = self.pf['rte_nprocs']
+
+        # Tabulate tau and emissivities now, before forking.
+        generators = self.generators
+
+        chains = self._independent_chains(popids)
+
+        if (nprocs is None) or (nprocs < 2) or (len(chains) < 2):
+            return
+
+        _solver_for_workers = self
+        pool = multiprocessing.get_context('fork').Pool(
+            min(nprocs, len(chains)))
+        try:
+            results = pool.map(_solve_chain, chains, chunksize=1)
+            pool.close()
+        except:
+            # Don't leave workers behind if one of them failed.
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+            _solver_for_workers = None
+
+        for history in results:
+            for (popid, j), fluxes in history.items():
+                self._generators[popid][j] = iter(fluxes)
+
     def _set_integrator(self):
         """
         Initialize attributes pertaining to numerical integration.
@@ -1240,6 +1418,128 @@ class UniformBackground(object):
             if ll == -1:
                 break
 
+    def _flux_history_generic(self, energies, redshifts, ehat, tau=None,
+        my_id=None, cascade=None):
+        """
+        Solve for the flux at all redshifts and energies at once.
+
+        Non-generator equivalent of `_flux_generator_generic`, for use when
+        the emissivity and optical depth are known ahead of time. Each step of
+        the generator is a linear map from the (energy-shifted) flux at the
+        previous redshift to the flux at the current redshift, i.e.,
+
+            flux[ll,i] = S[ll,i] + T[ll,i] * flux[ll+1,i+1],
+
+        so all source terms S and transmission factors T can be computed
+        up front in a few vectorized operations. The remaining sweep over
+        redshift writes in-place into a pre-allocated table.
+
+        Parameters
+        ----------
+        energies : np.ndarray
+            1-D array of photon energies
+        redshifts : np.ndarray
+            1-D array of redshifts
+        ehat : np.ndarray
+            2-D array of tabulate emissivities (divided by H(z)).
+        tau : np.ndarray
+            2-D array of optical depths.
+        cascade : np.ndarray
+            Extra flux to add to the lowest energy bin at each redshift, e.g.,
+            from Ly-n cascades. Optional.
+
+        Returns
+        -------
+        2-D array of fluxes with shape (len(redshifts), len(energies)).
+
+        """
+
+        popid, bandid = my_id
+
+        x = 1. + redshifts
+        xsq = x**2
+        R = x[1] / x[0]
+        Rsq = R**2
+
+        if self.pops[popid].src.is_delta:
+            trapz_base = np.ones(redshifts.size - 1)
+        else:
+            trapz_base = 0.5 * np.diff(redshifts)
+
+        # Transmission factor. Bin i receives flux from bin i+1, so the
+        # pre-rolled tau from the generator is just the [:,1:] slice here.
+        T = np.exp(-tau[0:-1,1:])
+        
+        # Equivalent to Eq. 25 in Mirocha (2014). Last row (highest
+        # redshift) stays zero: no time for there to be flux yet.
+        flux = np.zeros(ehat.shape)
+        S = flux[0:-1]
+        np.multiply(c_over_four_pi * (xsq[0:-1] * trapz_base)[:,None],
+            ehat[0:-1], out=S)
+        S[:,0:-1] += T * (c_over_four_pi * (xsq[1:] * trapz_base)[:,None]) \
+            * ehat[1:,1:]
+        
+        # Same wrap-around as the generator's pre-rolled arrays in the
+        # highest energy bin (usually zeroed out below anyway).
+        S[:,-1] += np.exp(-tau[0:-1,0]) * c_over_four_pi \
+            * xsq[1:] * trapz_base * ehat[1:,0]
+        
+        T /= Rsq
+
+        if cascade is not None:
+            S[:,0] += cascade
+
+        # Can be no flux at highest energy, because SED is truncated and
+        # there's no where it could have come from.
+        if energies[-1] != E_LyA:
+            S[:,-1] = 0.0
+
+        # Sweep from high to low redshift: flux[ll] += T * flux[ll+1]
+        tmp = np.empty(T.shape[1])
+        for ll in range(redshifts.size - 2, -1, -1):
+            np.multiply(T[ll], flux[ll+1,1:], out=tmp)
+            flux[ll,0:-1] += tmp
+
+        return flux
+
+    def _flux_history_sawtooth(self, E, z, ehat, tau, my_id=None):
+        """
+        Solve for the flux in all Lyman-n bands at all redshifts at once.
+
+        Returns
+        -------
+        List of 2-D arrays, one per Lyman-n band.
+
+        """
+
+        popid, bandid = my_id
+
+        # Higher Ly-n bands don't receive any photons from other bands
+        hist = [None]
+        for i, nrg in enumerate(E):
+            if i == 0:
+                continue
+            hist.append(self._flux_history_generic(nrg, z, ehat[i], tau[i],
+                my_id=(popid, bandid+i)))
+
+        # Ly-a band receives photons from cascades, evaluated (as in the
+        # generator) using fluxes from the previous (higher) redshift.
+        receive_lyn = (E[0][0] == E_LyA) and self.pf['include_injected_lya']
+
+        if receive_lyn:
+            cascade = np.zeros(z.size - 1)
+            for i, n in enumerate(self.narr):
+                if n == 2:
+                    continue
+                cascade += self.grid.hydr.frec(n) * hist[i][1:,0]
+        else:
+            cascade = None
+
+        hist[0] = self._flux_history_generic(E[0], z, ehat[0], tau[0],
+            my_id=(popid, bandid), cascade=cascade)
+
+        return hist
+
     def _flux_generator_sawtooth(self, E, z, ehat, tau, my_id=None):
         """
         Create generators for the flux between all Lyman-n bands.
@@ -1284,28 +1584,87 @@ class UniformBackground(object):
         # List of all intervals in rest-frame photon energy
         bands = self.bands_by_pop[popid]
 
+        pop = self.pops[popid]
+        z = self.redshifts[popid]
+
+        # Flux histories from a previous calculation with the same
+        # parameters (see `rte_histories`)
+        cached = pop.pf['pop_rte_history']
+
         ct = 0
+        histories = []
         generators_by_band = []
         for i, band in enumerate(bands):
+            E = self.energies[popid][i]
+
+            # Can solve for entire history at once unless this band receives
+            # flux from other bands.
+            precompute = self.pf['rte_precompute_history']
+            if precompute and (type(E) is not list):
+                precompute = not (pop.pf['pop_lya_permeable'] \
+                    and E[-1] < E_LyA and abs(E_LyA - E[-1]) < 0.2)
+
+            hist = None
             if not self.solve_rte[popid][i]:
                 gen = None
                 ct += 1
-            elif type(self.energies[popid][i]) is list:
-                gen = self._flux_generator_sawtooth(E=self.energies[popid][i],
-                    z=self.redshifts[popid], ehat=self.emissivities[popid][i],
+            elif (cached is not None) and (cached[i] is not None):
+                hist = cached[i]
+                gen = _replay_history(z, hist)
+                ct += len(E) if type(E) is list else 1
+            elif type(E) is list and precompute:
+                hist = self._flux_history_sawtooth(E=E, z=z,
+                    ehat=self.emissivities[popid][i], tau=self.tau[popid][i],
+                    my_id=(popid,ct))
+                gen = _replay_history(z, hist)
+                ct += len(E)
+            elif type(E) is list:
+                gen = self._flux_generator_sawtooth(E=E, z=z,
+                    ehat=self.emissivities[popid][i],
                     tau=self.tau[popid][i], my_id=(popid,ct))
-                ct += len(self.energies[popid][i])
+                ct += len(E)
+            elif precompute:
+                hist = self._flux_history_generic(E, z,
+                    self.emissivities[popid][i], tau=self.tau[popid][i],
+                    my_id=(popid,ct))
+                gen = _replay_history(z, hist)
+                ct += 1
             else:
-
-                gen = self._flux_generator_generic(self.energies[popid][i],
-                    self.redshifts[popid], self.emissivities[popid][i],
-                    tau=self.tau[popid][i], my_id=(popid,ct))
+                gen = self._flux_generator_generic(E, z,
+                    self.emissivities[popid][i], tau=self.tau[popid][i],
+                    my_id=(popid,ct))
                 ct += 1
 
+            if hist is not None:
+                _freeze_history(hist)
+
+            histories.append(hist)
             generators_by_band.append(gen)
 
+        # Only complete if every band we solve for has a history
+        complete = np.all([(hist is not None) or (not solve) \
+            for hist, solve in zip(histories, self.solve_rte[popid])])
+
+        self.rte_histories[popid] = histories if complete else None
+
         return generators_by_band
 
+    @property
+    def rte_histories(self):
+        """
+        Pre-computed flux histories, one list (element per band) for each
+        population, or None for populations whose fluxes are computed one
+        redshift at a time.
+
+        Passing a population's list back in via `pop_rte_history` skips the
+        RTE solution for that population, as long as nothing it depends on
+        (its emissivity, the redshift and energy grids, or the optical
+        depth) has changed.
+        """
+        if not hasattr(self, '_rte_histories'):
+            self._rte_histories = {}
+        return self._rte_histories
+
     @property
     def _fluxes_from(self):
         """
@@ -23,6 +23,7 @@ from ..physics.Constants import erg_per_ev, E_LL, s_per_myr
 from ..util.SetDefaultParameterValues import SourceParameters, \
     CosmologyParameters
 from ..physics.CrossSections import PhotoIonizationCrossSection as sigma_E
+from ..physics.CrossSections import CrossSectionTable
 
 try:
     import h5py
@@ -345,7 +346,7 @@ class Source(object):
         if not self.discrete:
             return None
         if not hasattr(self, '_sigma_all'):
-            self._sigma_all = np.array(list(map(sigma_E, self.E)))
+            self._sigma_all = CrossSectionTable(self.E)
 
         return self._sigma_all
 
@@ -18,6 +18,7 @@ from scipy.optimize import minimize
 from ..util.ReadData import read_lit
 from ..physics import NebularEmission
 from ..util.ParameterFile import ParameterFile
+from ..util.SharedArrays import get_shared_state, set_shared_state
 from ares.physics.Constants import h_p, c, erg_per_ev, g_per_msun, s_per_yr, \
     s_per_myr, m_H, ev_per_hz
 
@@ -492,6 +493,13 @@ class SynthesisModel(SynthesisMaster):
     #def __init__(self, **kwargs):
     #    self.pf = ParameterFile(**kwargs)
 
+    def __getstate__(self):
+        # Modules can't be pickled, but this one is easy to re-import.
+        return get_shared_state(self, drop=['_litinst_'])
+
+    def __setstate__(self, state):
+        set_shared_state(self, state)
+
     @property
     def _litinst(self):
         if not hasattr(self, '_litinst_'):
@@ -22,19 +22,22 @@ rad_const = (8. * sigma_T / 3. / m_e / c)
 
 class ChemicalNetwork(object):
     def __init__(self, grid, rate_src='fk94', recombination='B',
-        interp_rc='linear'):
+        interp_rc='linear', rate_tables=False):
         """
         Initialize chemical network.
 
         grid: ares.static.Grid.Grid instance
         rate_src : str
+        rate_tables : bool
+            Interpolate rate coefficients (and derivatives) from tables?
 
         """
         self.grid = grid
         self.cosm = self.grid.cosm
 
         self.coeff = RateCoefficients(grid, rate_src=rate_src,
-            recombination=recombination, interp_rc=interp_rc)
+            recombination=recombination, interp_rc=interp_rc,
+            rate_tables=rate_tables)
 
         self.isothermal = self.grid.isothermal
         self.secondary_ionization = self.grid.secondary_ionization
@@ -638,6 +641,212 @@ class ChemicalNetwork(object):
 
         return J
 
+    def RateEquationsBatch(self, t, q, args):
+        """
+        Compute right-hand side of rate equation ODEs for all cells at once.
+
+        Same physics as `RateEquations`, but the cells are stacked into a
+        single (block-diagonal) system so that one ODE solve can evolve the
+        whole grid.
+
+        Parameters
+        ----------
+        t : float
+            Current time.
+        q : np.ndarray
+            Flattened array of dependent variables, i.e., an array of shape
+            (number of cells, number of rate equations) raveled in C order.
+        args : list
+            Extra information needed to compute rates. They are, in order:
+            [ionization rate coefficient (IRC), secondary IRC,
+             photo-heating rate coefficient, particle density, time], where
+            each of the first four has a leading dimension of length
+            `grid.dims`.
+
+        Returns
+        -------
+        Flattened array of time derivatives, same shape as `q`.
+
+        """
+
+        Q = q.reshape(self.grid.dims, self.Nev)
+        self.q = Q
+
+        k_ion, k_ion2, k_heat, ntot, time = args
+
+        to_temp = 1. / (1.5 * ntot * k_B)
+
+        if self.expansion:
+            z = self.cosm.TimeToRedshiftConverter(0., time, self.grid.zi)
+            n_H = self.cosm.nH(z)
+            CF = self.grid.clumping_factor(z)
+        else:
+            n_H = self.grid.n_H
+            CF = self.C
+            z = None
+
+        if self.include_He:
+            y = self.grid.element_abundances[1]
+            n_He = self.grid.element_abundances[1] * n_H
+        else:
+            y = 0.0
+            n_He = 0.0
+
+        # Read q vector quantities into dictionaries (of arrays)
+        x, n, n_e = self._parse_q(Q.T, n_H)
+
+        if self.is_cgm_patch:
+            CF = CF * (n_H * (1. + y) / n_e)
+
+        if self.include_He:
+            xi = self.xi
+            omega = self.omega
+
+        # Store results here
+        dqdt = {}
+
+        # Correct for H/He abundances
+        acorr = {'h_1': 1., 'he_1': y, 'he_2': y}
+
+        ##
+        # Secondary ionization (of hydrogen)
+        ##
+        gamma_HI = 0.0
+        if self.secondary_ionization > 0:
+            for j, donor in enumerate(self.absorbers):
+                gamma_HI = gamma_HI + k_ion2[:,0,j] * (x[donor] / x['h_1']) \
+                    * (acorr[donor] / acorr['h_1'])
+
+        ##
+        # Hydrogen rate equations
+        ##
+        dqdt['h_1'] = -(k_ion[:,0] + gamma_HI + self.Beta[:,0] * n_e) \
+                      * x['h_1'] \
+                      + self.alpha[:,0] * n_e * x['h_2'] * CF
+        dqdt['h_2'] = -dqdt['h_1']
+
+        ##
+        # Heating & cooling
+        ##
+        heat = 0.0
+        cool = 0.0
+        if not self.isothermal:
+
+            for i, sp in enumerate(self.neutrals):
+                elem = self.grid.parents_by_ion[sp]
+
+                heat = heat + k_heat[:,i] * x[sp] * n[elem]
+                cool = cool + self.zeta[:,i] * x[sp] * n[elem]
+                cool = cool + self.psi[:,i] * x[sp] * n[elem]
+
+            for i, sp in enumerate(self.ions):
+                elem = self.grid.parents_by_ion[sp]
+
+                cool = cool + self.eta[:,i] * x[sp] * n[elem]
+
+        ##
+        # Helium processes
+        ##
+        if self.include_He:
+
+            gamma_HeI = 0.0
+            gamma_HeII = 0.0
+            if self.secondary_ionization > 0:
+                for j, donor in enumerate(self.absorbers):
+                    gamma_HeI = gamma_HeI + k_ion2[:,1,j] \
+                        * (x[donor] / x['he_1']) \
+                        * (acorr[donor] / acorr['he_1'])
+                    gamma_HeII = gamma_HeII + k_ion2[:,2,j] \
+                        * (x[donor] / x['he_2']) \
+                        * (acorr[donor] / acorr['he_2'])
+
+            dqdt['he_1'] = \
+                - x['he_1'] * (k_ion[:,1] + gamma_HeI + self.Beta[:,1] * n_e) \
+                + x['he_2'] * (self.alpha[:,1] + xi) * n_e
+
+            dqdt['he_2'] = \
+                  x['he_1'] * (k_ion[:,1] + gamma_HeI + self.Beta[:,1] * n_e) \
+                - x['he_2'] * (k_ion[:,2] + gamma_HeII \
+                + (self.Beta[:,2] + self.alpha[:,1] + xi) * n_e) \
+                + x['he_3'] * self.alpha[:,2] * n_e
+
+            dqdt['he_3'] = \
+                  x['he_2'] * (k_ion[:,2] + gamma_HeII + self.Beta[:,2] * n_e) \
+                - x['he_3'] * self.alpha[:,2] * n_e
+
+            # Dielectronic recombination cooling
+            if not self.isothermal:
+                cool = cool + omega * x['he_2'] * n_He
+
+        ##
+        # Electrons
+        ##
+        dqdt['e'] = 1. * dqdt['h_2']
+
+        if self.include_He:
+            dqdt['e'] = dqdt['e'] + y * x['he_1'] \
+                * (k_ion[:,1] + gamma_HeI + self.Beta[:,1] * n_e)
+            dqdt['e'] = dqdt['e'] + y * x['he_2'] \
+                * (k_ion[:,2] + gamma_HeII + self.Beta[:,2] * n_e)
+            dqdt['e'] = dqdt['e'] - y * x['he_2'] \
+                * (self.alpha[:,1] + xi) * n_e
+            dqdt['e'] = dqdt['e'] - y * x['he_3'] * self.alpha[:,2] * n_e
+
+        # Finish heating and cooling
+        if not self.isothermal:
+            hubcool = 0.0
+            compton = 0.0
+
+            if self.expansion:
+                hubcool = 2. * self.cosm.HubbleParameter(z) * Q[:,-1]
+
+                if self.grid.compton_scattering:
+                    Tcmb = self.cosm.TCMB(z)
+                    ucmb = self.cosm.UCMB(z)
+
+                    compton = rad_const * ucmb * n_e * (Tcmb - Q[:,-1]) / ntot
+
+            if self.grid.cosm.pf['approx_thermal_history']:
+                dqdt['Tk'] = heat * to_temp \
+                    - self.cosm.cooling_rate(z, Q[:,-1]) / self.cosm.dtdz(z)
+            else:
+                dqdt['Tk'] = (heat - n_e * cool) * to_temp + compton \
+                    - hubcool - Q[:,-1] * n_H * dqdt['e'] / ntot
+
+        else:
+            dqdt['Tk'] = 0.0
+
+        ##
+        # Add in exotic heating
+        ##
+        if self.exotic_heating:
+            dqdt['Tk'] = dqdt['Tk'] + self.grid._exotic_func(z=z) * to_temp
+
+        # Can effectively turn off ionization equations once EoR is over.
+        if self.monotonic_EoR:
+            done = x['h_1'] <= self.monotonic_EoR
+            dqdt['h_1'] = np.where(done, 0.0, dqdt['h_1'])
+            dqdt['h_2'] = np.where(done, 0.0, dqdt['h_2'])
+            if self.include_He:
+                dqdt['he_1'] = np.where(x['he_1'] <= self.monotonic_EoR,
+                    0.0, dqdt['he_1'])
+                dqdt['he_2'] = np.where(x['he_2'] <= self.monotonic_EoR,
+                    0.0, dqdt['he_2'])
+
+        self.dqdt = np.zeros_like(Q)
+        for i, sp in enumerate(self.grid.qmap):
+            self.dqdt[:,i] = dqdt[sp]
+
+        if np.isnan(self.dqdt).sum():
+            err = 'NaN encountered in RateEquationsBatch! t={}, z={}'.format(time, z)
+            raise ValueError(err)
+        if (Q < 0).sum():
+            cell = np.argwhere(Q < 0)[0,0]
+            solver_error(self.grid, -1000, Q, self.dqdt, -1000, cell, -1000)
+            raise ValueError('Something < 0.')
+
+        return self.dqdt.ravel()
+
     def SourceIndependentCoefficients(self, T, z=None):
         """
         Compute values of rate coefficients which depend only on
@@ -661,6 +870,20 @@ class ChemicalNetwork(object):
             self.deta = np.zeros_like(self.grid.zeros_grid_x_absorbers)
             self.dpsi = np.zeros_like(self.grid.zeros_grid_x_absorbers)
 
+        if self.coeff.rate_tables:
+            self._TabulatedCoefficients(T)
+        else:
+            self._ExactCoefficients(T)
+
+        return {'Beta': self.Beta, 'alpha': self.alpha,
+                'zeta': self.zeta, 'eta': self.eta, 'psi': self.psi,
+                'xi': self.xi, 'omega': self.omega}
+
+    def _ExactCoefficients(self, T):
+        """
+        Compute rate coefficients (and derivatives) one by one from the fits.
+        """
+
         for i, absorber in enumerate(self.absorbers):
 
             if self.collisional_ionization:
@@ -693,6 +916,54 @@ class ChemicalNetwork(object):
                 self.omega = self.coeff.DielectricRecombinationCoolingRate(T)
                 self.domega = self.coeff.dDielectricRecombinationCoolingRate(T)
 
-        return {'Beta': self.Beta, 'alpha': self.alpha,
-                'zeta': self.zeta, 'eta': self.eta, 'psi': self.psi,
-                'xi': self.xi, 'omega': self.omega}
+    def _TabulatedCoefficients(self, T):
+        """
+        Interpolate all rate coefficients (and derivatives) at once.
+        """
+
+        f, df = self.coeff.TabulatedRates(T)
+
+        # Move the rate axis last, to match (grid dims, absorbers).
+        f = np.moveaxis(f, 0, -1)
+        df = np.moveaxis(df, 0, -1)
+
+        N = len(self.absorbers)
+
+        col = lambda name: self.coeff.columns.index((name, 0))
+
+        i = col('CollisionalIonizationRate')
+        if self.collisional_ionization:
+            self.Beta[...] = f[...,i:i+N]
+
+        i = col('RadiativeRecombinationRate')
+        self.alpha[...] = f[...,i:i+N]
+
+        if not self.isothermal:
+            self.dalpha[...] = df[...,i:i+N]
+
+            if self.collisional_ionization:
+                i = col('CollisionalIonizationCoolingRate')
+                self.zeta[...] = f[...,i:i+N]
+                self.dzeta[...] = df[...,i:i+N]
+                i = col('CollisionalIonizationRate')
+                self.dBeta[...] = df[...,i:i+N]
+
+            i = col('RecombinationCoolingRate')
+            self.eta[...] = f[...,i:i+N]
+            self.deta[...] = df[...,i:i+N]
+
+            i = col('CollisionalExcitationCoolingRate')
+            self.psi[...] = f[...,i:i+N]
+            self.dpsi[...] = df[...,i:i+N]
+
+        # Di-electric recombination
+        if self.include_He:
+            i = self.coeff.columns.index(('DielectricRecombinationRate', None))
+            self.xi = f[...,i]
+            self.dxi = df[...,i]
+
+            if not self.isothermal:
+                i = self.coeff.columns.index(
+                    ('DielectricRecombinationCoolingRate', None))
+                self.omega = f[...,i]
+                self.domega = df[...,i]
@@ -16,6 +16,7 @@ from ..util.Pickling import write_pickle_file
 from ..util.ProgressBar import ProgressBar
 from ..physics.Constants import erg_per_ev
 from ..physics.SecondaryElectrons import *
+from ..physics.CrossSections import CrossSectionTable
 import os, re, scipy, itertools, math, copy
 from scipy.integrate import quad, trapz, simps
 
@@ -495,9 +496,9 @@ class IntegralTable:
         if not hasattr(self, '_sigma_E'):
             self._sigma_E = {}
             for absorber in self.grid.absorbers:
+                species = ['h_1', 'he_1', 'he_2'].index(absorber)
                 self._sigma_E[absorber] = \
-                    np.array(list(map(self.grid.bf_cross_sections[absorber],
-                    self.E[absorber])))
+                    CrossSectionTable(self.E[absorber], species)
                 
         return self._sigma_E
         
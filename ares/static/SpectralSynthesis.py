@@ -16,6 +16,7 @@ from ..util import Survey
 from ..util import ProgressBar
 from ..phenom import Madau1995
 from ..util import ParameterFile
+from ..util.LRUCache import LRUCache, fingerprint
 from scipy.optimize import curve_fit
 from scipy.interpolate import interp1d
 from ..physics.Cosmology import Cosmology
@@ -48,6 +49,10 @@ class SpectralSynthesis(object):
     def src(self, value):
         self._src = value
 
+        # Kernels depend on the SSP luminosities
+        if hasattr(self, '_cache_kern_'):
+            del self._cache_kern_
+
     @property
     def oversampling_enabled(self):
         if not hasattr(self, '_oversampling_enabled'):
@@ -795,129 +800,177 @@ class SpectralSynthesis(object):
 
         return _ages, _SFR
 
-    @property
-    def _cache_lum_ctr(self):
-        if not hasattr(self, '_cache_lum_ctr_'):
-            self._cache_lum_ctr_ = 0
-        return self._cache_lum_ctr_
+    def _cache_kernel(self, key):
+        """
+        Return (possibly empty) synthesis kernel for given inputs.
 
-    def _cache_kappa(self, wave):
-        if not hasattr(self, '_cache_kappa_'):
-            self._cache_kappa_ = {}
+        Kernels are dictionaries whose keys are indices into the time array,
+        and whose values are (weights, offset) for that row, see
+        `_kernel_row`.
+        """
+        if not hasattr(self, '_cache_kern_'):
+            self._cache_kern_ = {}
 
-        if wave in self._cache_kappa_:
-            return self._cache_kappa_[wave]
+        if key in self._cache_kern_:
+            return self._cache_kern_[key]
 
-        return None
+        # Drop oldest kernel if we're at capacity
+        if len(self._cache_kern_) >= self.pf['pop_synth_kernel_max']:
+            del self._cache_kern_[next(iter(self._cache_kern_))]
 
-    def _cache_lum(self, kwds):
+        self._cache_kern_[key] = {}
+
+        return self._cache_kern_[key]
+
+    def _kernel_row(self, kern, i, tarr, dt, oversample, func, L_small_t):
         """
-        Cache object for spectral synthesis of stellar luminosity.
+        Compute weights that convert SFH into luminosity at time tarr[i].
+
+        This is the same trapezoidal integral over SSPs of all ages performed
+        in `Luminosity`, but with the SFH factored out, i.e.,
+
+            L(tarr[i]) = np.dot(sfh[0:i+1], weights) + offset
+
+        The offset is non-zero only when over-sampling, in which case a few
+        of the over-sampled SFRs are fixed to unity.
+
+        Parameters
+        ----------
+        kern : dict
+            Kernel from `_cache_kernel`. Will be updated in place.
+        i : int
+            Index of time of observation.
+        tarr : np.ndarray
+            Array of times in ascending order [Myr].
+        dt : np.ndarray
+            Time-steps [yr].
+        oversample : bool
+            Whether or not to over-sample young stellar populations.
+        func : function
+            Interpolant for log(L) as a function of log(age).
+        L_small_t : function
+            Extrapolant for L at ages < 1 Myr.
+
+        Returns
+        -------
+        Tuple containing weights (array of length i+1) and offset.
+
         """
-        if not hasattr(self, '_cache_lum_'):
-            self._cache_lum_ = {}
 
-        notok = -1
+        if i in kern:
+            return kern[i]
 
-        t1 = time.time()
+        ages = tarr[i] - tarr[0:i+1]
 
-        # If we set order by hand, it greatly speeds things up because
-        # more likely than not, the redshift and wavelength are the only
-        # things that change and that's an easy logical check to do.
-        # Checking that SFHs, histories, etc., is more expensive.
-        ok_keys = ('wave', 'zobs', 'tobs', 'idnum', 'sfh', 'tarr', 'zarr',
-            'window', 'band', 'hist', 'extras', 'load')
+        # Rather than SFRs, feed indices (offset by 1/2 so we can tell them
+        # apart from the unit SFRs `_oversample_sfh` uses as filler)
+        # through the same machinery, so we know which element of the SFH
+        # each over-sampled point came from.
+        probe = np.arange(i+1) + 0.5
 
-        ct = -1
+        if oversample and len(ages) > 1:
+            _ages, _SFR = self._oversample_sfh(ages, probe, i)
+            _dt = np.abs(np.diff(_ages) * 1e6)
+        else:
+            _ages, _SFR = ages, probe
+            _dt = dt[0:i]
 
-        # Loop through keys to do more careful comparison for unhashable types.
-        #all_waves = self._cache_lum_waves_
+        L_per_msun = np.exp(func(np.log(_ages)))
+        L_per_msun[_ages < 1] = L_small_t(_ages[_ages < 1])
 
-        all_keys = self._cache_lum_.keys()
+        # Trapezoidal weights
+        wt = np.zeros(_ages.size)
+        wt[0:-1] += 0.5 * _dt
+        wt[1:] += 0.5 * _dt
 
-        # Search in reverse order since we often the keys represent different
-        # wavelengths, which are generated in ascending order.
-        for keyset in all_keys:
+        Lwt = L_per_msun * wt
 
-            ct += 1
+        from_sfh = (_SFR % 1) == 0.5
 
-            # Remember: keyset is just a number.
-            kw, data = self._cache_lum_[keyset]
+        weights = np.bincount(np.floor(_SFR[from_sfh]).astype(int),
+            weights=Lwt[from_sfh], minlength=i+1)
+        offset = np.sum(Lwt[~from_sfh] * _SFR[~from_sfh])
 
-            # Check wavelength first. Most common thing.
+        kern[i] = weights, offset
 
-            # If we're not being as careful as possible, retrieve cached
-            # result so long as wavelength and zobs match requested values.
-            # This should only be used when SpectralSynthesis is summoned
-            # internally! Likely to lead to confusing behavior otherwise.
-            if (self.careful_cache == 0) and ('wave' in kw) and ('zobs' in kw):
-                if (kw['wave'] == kwds['wave']) and (kw['zobs'] == kwds['zobs']):
-                    notok = 0
-                    break
+        return kern[i]
 
-            notok = 0
-            # Loop over cached keywords, compare to those supplied.
-            for key in ok_keys:
+    def _kernel_matrix(self, kern, tarr, dt, oversample, func, L_small_t):
+        """
+        Assemble all rows of a kernel, so L(t) = np.dot(sfh, W.T) + b.
+        """
 
-                if key not in kwds:
-                    notok += 1
-                    break
+        if 'matrix' in kern:
+            return kern['matrix']
 
-                #if isinstance(kw[key], collections.Hashable):
-                #    if kwds[key] == kw[key]:
-                #        continue
-                #    else:
-                #        notok += 1
-                #        break
-                #else:
-                # For unhashable types, must work on case-by-case basis.
-                if type(kwds[key]) != type(kw[key]):
-                    notok += 1
-                    break
-                elif type(kwds[key]) == np.ndarray:
-                    if np.array_equal(kwds[key], kw[key]):
-                        continue
-                    else:
-                        # This happens when, e.g., we pass SFH by hand.
-                        notok += 1
-                        break
-                elif type(kwds[key]) == dict:
-                    if kwds[key] == kw[key]:
-                        continue
-                    else:
+        N = tarr.size
+        W = np.zeros((N, N))
+        b = np.zeros(N)
+        for i in range(N):
+            W[i,0:i+1], b[i] = self._kernel_row(kern, i, tarr, dt,
+                oversample, func, L_small_t)
 
-                        #for _key in kwds[key]:
-                        #    print(_key, kwds[key][_key] == kw[key][_key])
-                        #
-                        #raw_input('<enter>')
+        kern['matrix'] = W, b
 
-                        notok += 1
-                        break
-                else:
-                    if kwds[key] == kw[key]:
-                        continue
-                    else:
-                        notok += 1
-                        break
+        return kern['matrix']
 
-            if notok > 0:
-                #print(keyset, key)
-                continue
+    def _cache_kappa(self, wave):
+        if not hasattr(self, '_cache_kappa_'):
+            self._cache_kappa_ = {}
 
-            # If we're here, load this thing.
-            break
+        if wave in self._cache_kappa_:
+            return self._cache_kappa_[wave]
 
-        t2 = time.time()
+        return None
 
-        if notok < 0:
-            return kwds, None
-        elif notok == 0:
-            if (self.pf['verbose'] and self.pf['debug']):
-                print("Loaded from cache! Took N={} iterations, {} sec to find match".format(ct, t2 - t1))
-            # Recall that this is (kwds, data)
-            return self._cache_lum_[keyset]
-        else:
-            return kwds, None
+    @property
+    def _lum_cache(self):
+        if not hasattr(self, '_cache_lum_'):
+            self._cache_lum_ = LRUCache(
+                maxsize=self.pf['pop_synth_cache_size'],
+                maxbytes=self.pf['pop_synth_cache_bytes'])
+        return self._cache_lum_
+
+    def _cache_lum_key(self, kwds):
+        """
+        Hashable key for `Luminosity` inputs. Arrays are fingerprinted by
+        their contents, so equal inputs map to the same key.
+        """
+
+        # If we're not being as careful as possible, retrieve cached
+        # result so long as wavelength and zobs match requested values.
+        # This should only be used when SpectralSynthesis is summoned
+        # internally! Likely to lead to confusing behavior otherwise.
+        if self.careful_cache == 0:
+            return ('wave-zobs', fingerprint(kwds['wave']),
+                fingerprint(kwds['zobs']))
+
+        return fingerprint(kwds)
+
+    def _cache_lum(self, kwds):
+        """
+        Cache object for spectral synthesis of stellar luminosity.
+
+        Parameters
+        ----------
+        kwds : dict
+            Keyword arguments passed to `Luminosity`.
+
+        Returns
+        -------
+        Tuple containing the cache key for these inputs and the cached result
+        (None if there isn't one).
+
+        """
+
+        key = self._cache_lum_key(kwds)
+        data = self._lum_cache.get(key)
+
+        if (data is not None) and self.pf['verbose'] and self.pf['debug']:
+            print("Loaded from cache! hits={}, misses={}".format(
+                self._lum_cache.hits, self._lum_cache.misses))
+
+        return key, data
 
     def Luminosity(self, wave=1600., sfh=None, tarr=None, zarr=None, window=1,
         zobs=None, tobs=None, band=None, idnum=None, hist={}, extras={},
@@ -984,10 +1037,10 @@ class SpectralSynthesis(object):
             'extras':extras, 'window': window}
 
         if load:
-            _kwds, cached_result = self._cache_lum(kw)
+            cache_key, cached_result = self._cache_lum(kw)
         else:
-            self._cache_lum_ = {}
-            cached_result = None
+            self._lum_cache.clear()
+            cache_key, cached_result = None, None
 
         if cached_result is not None:
             return cached_result
@@ -1128,6 +1181,45 @@ class SpectralSynthesis(object):
         # zobs).
         ##
 
+        # If the SSP ages, the luminosity at each time is a weighted sum
+        # over the SFH, with weights that depend only on the SSP and the
+        # time grid. Tabulate those once, then every galaxy (and every
+        # subsequent call) is a dot product.
+        use_kernel = self.pf['pop_synth_kernel'] \
+            and (not self.pf['pop_enrichment']) \
+            and (self.src.pf['source_aging'] or self.src.pf['source_ssp'])
+
+        if use_kernel and (not do_all_time):
+            # First time at or after zobs. Will be the same element picked
+            # out by the loop below.
+            ilo = np.argwhere(zarr <= zobs)
+            if ilo.size == 0:
+                use_kernel = False
+            else:
+                i0 = int(ilo[0])
+
+        if use_kernel:
+            kern_key = (wave, window, None if band is None else tuple(band),
+                energy_units, tarr.tobytes(), oversample,
+                self.oversampling_below, self.pf['pop_synth_age_interp'])
+
+            kern = self._cache_kernel(kern_key)
+
+            if do_all_time:
+                W, b = self._kernel_matrix(kern, tarr, dt, oversample, _func,
+                    L_small_t)
+                # einsum rather than np.dot so that results for a given
+                # galaxy don't depend on how many others are in the batch.
+                Lhist = np.einsum('...j,ij->...i', sfh, W) + b
+            else:
+                w, b = self._kernel_row(kern, i0, tarr, dt, oversample,
+                    _func, L_small_t)
+                Lhist = np.einsum('...j,j->...', sfh[...,0:i0+1], w) + b
+
+            return self._finish_luminosity(Lhist, wave, zobs, izobs, idnum,
+                sfh, hist, extras, band, batch_mode,
+                Mh if 'Mh' in hist else None, use_cache, cache_key, kw)
+
         # Start from initial redshift and move forward in time, i.e., from
         # high redshift to low.
 
@@ -1294,6 +1386,17 @@ class SpectralSynthesis(object):
             if not do_all_time:
                 break
 
+        return self._finish_luminosity(Lhist, wave, zobs, izobs, idnum,
+            sfh, hist, extras, band, batch_mode,
+            Mh if 'Mh' in hist else None, use_cache, cache_key, kw)
+
+    def _finish_luminosity(self, Lhist, wave, zobs, izobs, idnum, sfh, hist,
+        extras, band, batch_mode, Mh, use_cache, cache_key, kw):
+        """
+        Apply dust reddening and mergers to luminosities from `Luminosity`,
+        and cache the result.
+        """
+
         ##
         # Redden spectra
         ##
@@ -1418,11 +1521,12 @@ class SpectralSynthesis(object):
                         pb.finish()
 
         ##
-        # Will be unhashable types so just save to a unique identifier
+        # Save for next time
         ##
         if use_cache:
-            self._cache_lum_[self._cache_lum_ctr] = kw, Lout
-            self._cache_lum_ctr_ += 1
+            if cache_key is None:
+                cache_key = self._cache_lum_key(kw)
+            self._lum_cache.put(cache_key, Lout)
 
         # Get outta here.
         return Lout
@@ -17,6 +17,7 @@ from ..physics.Constants import *
 import types, os, re, sys
 from ..util.Misc import num_freq_bins
 from ..physics import SecondaryElectrons
+from ..physics.CrossSections import CrossSectionTable
 from scipy.integrate import dblquad, romb, simps, quad, trapz
 
 try:
@@ -255,50 +256,37 @@ class GlobalVolume(object):
                 
                 # 
                 for k, species in enumerate(['h_1', 'he_1', 'he_2']):
-                    self._sigma_E[species][i][j] = \
-                        np.array([self.sigma(Eval, k) for Eval in E])
+                    self._sigma_E[species][i][j] = CrossSectionTable(E, k,
+                        approx=self.pf['approx_sigma'])
 
                 # Pre-compute secondary ionization and heating factors
                 if self.esec.method > 1:
                 
-                    # Don't worry: we'll fill these in in a sec!
-                    self.fheat[i][j] = np.ones([N, len(self.esec.x)])
+                    # Unless secondary_lya is on, flya and fexc stay at unity.
                     self.flya[i][j] = np.ones([N, len(self.esec.x)])
                     self.fexc[i][j] = np.ones([N, len(self.esec.x)])
                 
-                    # Must evaluate at ELECTRON energy, not photon energy
-                    for k, nrg in enumerate(E - E_th[0]):
-                        self.fheat[i][j][k] = \
-                            self.esec.DepositionFraction(self.esec.x, E=nrg, 
-                            channel='heat')
-                        self.fion['h_1'][i][j][k] = \
-                            self.esec.DepositionFraction(self.esec.x, E=nrg, 
-                            channel='h_1')
+                    # Must evaluate at ELECTRON energy, not photon energy.
+                    # Each is an array of shape (N, number of ionized fractions).
+                    self.fheat[i][j] = self.esec.DepositionFractionGrid(
+                        self.esec.x, E - E_th[0], channel='heat')
+                    self.fion['h_1'][i][j] = self.esec.DepositionFractionGrid(
+                        self.esec.x, E - E_th[0], channel='h_1')
                 
-                        if self.pf['secondary_lya']:
-                            self.flya[i][j][k] = \
-                                self.esec.DepositionFraction(self.esec.x, E=nrg, 
-                                channel='lya') 
-                            self.fexc[i][j][k] = \
-                                self.esec.DepositionFraction(self.esec.x, E=nrg, 
-                                channel='exc')    
+                    if self.pf['secondary_lya']:
+                        self.flya[i][j] = self.esec.DepositionFractionGrid(
+                            self.esec.x, E - E_th[0], channel='lya')
+                        self.fexc[i][j] = self.esec.DepositionFractionGrid(
+                            self.esec.x, E - E_th[0], channel='exc')
                 
                     # Helium
                     if self.pf['include_He'] and not self.pf['approx_He']:
-                
-                        # Don't worry: we'll fill these in in a sec!
-                        self.fion['he_1'][i][j] = np.ones([N, len(self.esec.x)])
-                        self.fion['he_2'][i][j] = np.ones([N, len(self.esec.x)])
-                
-                        for k, nrg in enumerate(E - E_th[1]):
-                            self.fion['he_1'][i][j][k] = \
-                                self.esec.DepositionFraction(self.esec.x, 
-                                E=nrg, channel='he_1')
-                
-                        for k, nrg in enumerate(E - E_th[2]):
-                            self.fion['he_2'][i][j][k] = \
-                                self.esec.DepositionFraction(self.esec.x, 
-                                E=nrg, channel='he_2')    
+                        self.fion['he_1'][i][j] = \
+                            self.esec.DepositionFractionGrid(self.esec.x, 
+                            E - E_th[1], channel='he_1')
+                        self.fion['he_2'][i][j] = \
+                            self.esec.DepositionFractionGrid(self.esec.x, 
+                            E - E_th[2], channel='he_2')
                 
                     else:
                         self.fion['he_1'][i][j] = np.zeros([N, len(self.esec.x)])
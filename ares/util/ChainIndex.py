@@ -0,0 +1,217 @@
+"""
+
+ChainIndex.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 21:03:48 PDT 2026
+
+Description: Convert pickled MCMC output (chain, logL, blobs) into .npy
+files that can be memory-mapped, so that it only needs to be unpickled once.
+
+"""
+
+import os
+import json
+import numpy as np
+from .Pickling import iter_pickle_file
+
+try:
+    from mpi4py import MPI
+    rank = MPI.COMM_WORLD.rank
+except ImportError:
+    rank = 0
+
+class ChainIndex(object):
+    def __init__(self, path, block_bytes=2**26):
+        """
+        Directory of memory-mappable copies of pickled outputs.
+
+        Each column (e.g., 'chain', 'logL', or a blob) is stored as a single
+        .npy file alongside a small manifest listing the pickle files it was
+        made from (with their sizes and modification times). If any of those
+        files change, e.g., because the MCMC that produced them is still
+        running, the column is re-built the next time it is requested.
+
+        Multi-dimensional columns are stored in Fortran order, so that
+        extracting a single parameter or blob element only touches the pages
+        on disk that hold it.
+
+        Parameters
+        ----------
+        path : str
+            Directory in which to store columns, generally <prefix>.index.
+            Created if necessary.
+        block_bytes : int
+            Maximum amount of data held in memory at once while building.
+
+        """
+        self.path = path
+        self.block_bytes = block_bytes
+
+    def _fn(self, name, suffix):
+        return '{0!s}/{1!s}.{2!s}'.format(self.path, name, suffix)
+
+    def _sources(self, fns):
+        src = []
+        for fn in fns:
+            st = os.stat(fn)
+            src.append([os.path.abspath(fn), st.st_size, st.st_mtime])
+        return src
+
+    def is_current(self, name, fns):
+        """
+        Is there an up-to-date copy of column `name` made from files `fns`?
+        """
+        try:
+            with open(self._fn(name, 'json'), 'r') as f:
+                manifest = json.load(f)
+            return manifest['sources'] == self._sources(fns)
+        except (IOError, OSError, ValueError, KeyError):
+            return False
+
+    def load(self, name, fns, ndim=None, mmap_mode='r'):
+        """
+        Retrieve column `name`, building it from pickle files if need be.
+
+        Parameters
+        ----------
+        name : str
+            Name of column, e.g., 'chain', 'logL', or 'blob_1d.<blob name>'.
+        fns : list
+            Pickle files containing the data, in order. Each should contain a
+            sequence of pickled arrays (e.g., one per checkpoint) whose first
+            dimension corresponds to elements of the chain.
+        ndim : int
+            Dimensionality of the result. If supplied, chunks with one more
+            dimension are assumed to be unflattened MCMC output, i.e., with
+            shape (steps, walkers, ...), and are flattened walker by walker
+            as in `ares.util.ReadData.flatten_chain`.
+        mmap_mode : str
+            Passed to `np.load`.
+
+        Returns
+        -------
+        Array (read-only memory map by default) containing the concatenation
+        of all chunks in all files.
+
+        """
+
+        if self.is_current(name, fns):
+            try:
+                return np.load(self._fn(name, 'npy'), mmap_mode=mmap_mode)
+            except (IOError, OSError, ValueError):
+                pass
+
+        try:
+            return self.build(name, fns, ndim=ndim, mmap_mode=mmap_mode)
+        except (IOError, OSError):
+            # e.g., read-only filesystem. Proceed without the index.
+            chunks = [chunk for chunk in self._chunks(fns, ndim)]
+            return np.concatenate(chunks, axis=0)
+
+    def _chunks(self, fns, ndim=None):
+        for fn in fns:
+            try:
+                for chunk in iter_pickle_file(fn):
+                    chunk = np.asarray(chunk, dtype=np.float64)
+
+                    # (steps, walkers, ...) -> (walkers, steps, ...) so that
+                    # each walker's steps end up contiguous.
+                    if (ndim is not None) and (chunk.ndim == ndim + 1):
+                        chunk = np.swapaxes(chunk, 0, 1)
+                        chunk = chunk.reshape((-1,) + chunk.shape[2:])
+
+                    yield chunk
+            except ValueError:
+                print("# Error loading {!s}.".format(fn))
+
+    def build(self, name, fns, ndim=None, mmap_mode='r'):
+        """
+        Copy data from pickle files into a single .npy file.
+
+        Chunks are streamed to disk one at a time, so memory use is limited
+        to roughly the size of the largest chunk (or `block_bytes`), rather
+        than several times the size of the whole dataset.
+        """
+
+        if not os.path.exists(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError:
+                pass
+
+        if rank == 0:
+            print("# Indexing {} file(s) for {!s}...".format(len(fns), name))
+
+        # Take note of sources *before* reading them, so that if they change
+        # in the meantime, we'll know to re-build next time.
+        sources = self._sources(fns)
+
+        tmp_raw = self._fn(name, '{}.tmp.raw'.format(os.getpid()))
+        tmp_npy = self._fn(name, '{}.tmp.npy'.format(os.getpid()))
+
+        try:
+            N, shape = self._build(name, fns, ndim, tmp_raw, tmp_npy)
+        finally:
+            for tmp in [tmp_raw, tmp_npy]:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+        if N == 0:
+            return np.zeros((0,) + (shape or ()))
+
+        tmp_json = self._fn(name, '{}.tmp.json'.format(os.getpid()))
+        with open(tmp_json, 'w') as f:
+            json.dump({'sources': sources, 'shape': [N] + list(shape)}, f)
+        os.replace(tmp_json, self._fn(name, 'json'))
+
+        return np.load(self._fn(name, 'npy'), mmap_mode=mmap_mode)
+
+    def _build(self, name, fns, ndim, tmp_raw, tmp_npy):
+        """
+        Write column `name` to `tmp_raw`, then into place via `tmp_npy`.
+
+        Returns
+        -------
+        Tuple: (number of rows, shape of each row).
+
+        """
+
+        # First, dump everything to disk in native (row-major) order.
+        N = 0
+        shape = None
+        with open(tmp_raw, 'wb') as f:
+            for chunk in self._chunks(fns, ndim):
+                if shape is None:
+                    shape = chunk.shape[1:]
+                assert chunk.shape[1:] == shape, \
+                    "Inconsistent shapes found for {!s}!".format(name)
+                f.write(np.ascontiguousarray(chunk).tobytes())
+                N += chunk.shape[0]
+
+        if N == 0:
+            return N, shape
+
+        # Then, copy (in blocks) into .npy file in desired order.
+        fortran_order = len(shape) > 0
+        out = np.lib.format.open_memmap(tmp_npy, mode='w+',
+            dtype=np.float64, shape=(N,) + shape,
+            fortran_order=fortran_order)
+
+        raw = np.memmap(tmp_raw, dtype=np.float64, mode='r',
+            shape=(N,) + shape)
+
+        rowbytes = 8 * max(int(np.prod(shape)), 1)
+        block = max(1, self.block_bytes // rowbytes)
+        for i in range(0, N, block):
+            out[i:i+block] = raw[i:i+block]
+
+        del raw
+
+        out.flush()
+        del out
+
+        os.replace(tmp_npy, self._fn(name, 'npy'))
+
+        return N, shape
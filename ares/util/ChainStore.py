@@ -0,0 +1,329 @@
+"""
+
+ChainStore.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 19:40:05 PDT 2026
+
+Description: Columnar, chunked HDF5 storage for MCMC chains, likelihoods,
+and blobs.
+
+"""
+
+import os
+import numpy as np
+
+try:
+    import h5py
+    have_h5py = True
+except ImportError:
+    have_h5py = False
+
+class ChainStore(object):
+    def __init__(self, fn, compression='gzip', chunk_bytes=2**20):
+        """
+        Append-only store for MCMC output, one resizable dataset per column.
+
+        Each checkpoint contributes `nwalkers * nsteps` rows to every dataset,
+        ordered walker by walker (i.e., the same ordering as
+        `ares.util.ReadData.flatten_chain`). The number of steps in each
+        checkpoint is recorded in the `checkpoints` dataset, so that the rows
+        corresponding to any set of walkers and steps can be computed without
+        reading anything else. Datasets are chunked along the row axis, so
+        appending a checkpoint only touches the chunks at the end of each
+        dataset, and reading a slice only decompresses the chunks it
+        overlaps.
+
+        The layout is compatible with that written by `ModelSet.save`, i.e.,
+        the chain lives in `chain` (with attributes `names` and `is_log`),
+        and blobs live in the `blobs` group (with attribute `ivar`).
+
+        Parameters
+        ----------
+        fn : str
+            Name of HDF5 file, generally <prefix>.hdf5.
+        compression : str, None
+            Passed to `h5py.File.create_dataset`.
+        chunk_bytes : int
+            Target size of each chunk in bytes.
+
+        """
+        self.fn = fn
+        self.compression = compression
+        self.chunk_bytes = chunk_bytes
+
+    @property
+    def exists(self):
+        return os.path.exists(self.fn)
+
+    def _open(self, mode='r'):
+        assert have_h5py, "h5py import failed."
+        return h5py.File(self.fn, mode)
+
+    def create(self, parameters, is_log, nwalkers, clobber=False):
+        """
+        Initialize file, recording some basic info about the run.
+        """
+        if self.exists and clobber:
+            os.remove(self.fn)
+
+        with self._open('a') as f:
+            f.attrs['names'] = [str(par) for par in parameters]
+            f.attrs['is_log'] = [bool(val) for val in is_log]
+            f.attrs['nwalkers'] = int(nwalkers)
+
+    @property
+    def attrs(self):
+        with self._open() as f:
+            return dict(f.attrs)
+
+    @property
+    def nwalkers(self):
+        if not hasattr(self, '_nwalkers'):
+            self._nwalkers = int(self.attrs['nwalkers'])
+        return self._nwalkers
+
+    def _chunks(self, shape, dtype):
+        rowbytes = int(np.prod(shape[1:])) * np.dtype(dtype).itemsize
+        rows = max(1, self.chunk_bytes // max(rowbytes, 1))
+        return (int(rows),) + tuple(shape[1:])
+
+    def _append(self, f, name, data, attrs=None):
+        data = np.asarray(data)
+
+        if data.dtype.hasobject:
+            raise TypeError(("Can't store {!s} in HDF5: elements have " +\
+                "inconsistent shapes.").format(name))
+
+        if name not in f:
+            ds = f.create_dataset(name, shape=(0,) + data.shape[1:],
+                maxshape=(None,) + data.shape[1:], dtype=data.dtype,
+                chunks=self._chunks(data.shape, data.dtype),
+                compression=self.compression)
+
+            if attrs is not None:
+                for key, val in attrs.items():
+                    if val is None:
+                        continue
+                    ds.attrs[key] = val
+        else:
+            ds = f[name]
+
+        N = ds.shape[0]
+        ds.resize(N + data.shape[0], axis=0)
+        ds[N:] = data
+
+        return ds
+
+    def append(self, name, data, attrs=None):
+        """
+        Add rows to dataset `name`, creating it if need be.
+
+        Parameters
+        ----------
+        name : str
+            Name of dataset, e.g., 'chain', 'logL', or 'blobs/<blob name>'.
+        data : np.ndarray
+            New rows. First dimension is the row axis.
+        attrs : dict
+            Attributes to attach to the dataset when it is created.
+
+        """
+        with self._open('a') as f:
+            self._append(f, name, data, attrs)
+
+    def write_checkpoint(self, nsteps, chain, logL, facc=None, blobs=None,
+        blob_attrs=None):
+        """
+        Append all output from a single checkpoint.
+
+        Parameters
+        ----------
+        nsteps : int
+            Number of steps taken since the last checkpoint.
+        chain : np.ndarray
+            Walker positions, shape (nwalkers * nsteps, number of parameters).
+        logL : np.ndarray
+            Log-likelihood, shape (nwalkers * nsteps).
+        facc : np.ndarray
+            Acceptance fraction of each walker.
+        blobs : dict
+            Each element is an array with first dimension nwalkers * nsteps.
+        blob_attrs : dict
+            Attributes (e.g., independent variables) of each blob.
+
+        """
+
+        with self._open('a') as f:
+            self._truncate(f)
+            self._append(f, 'chain', chain, attrs={'names': f.attrs['names'],
+                'is_log': f.attrs['is_log']})
+            self._append(f, 'logL', logL)
+
+            if facc is not None:
+                self._append(f, 'facc', np.atleast_2d(facc))
+
+            if blobs is not None:
+                for name, data in blobs.items():
+                    attrs = None if blob_attrs is None else blob_attrs[name]
+                    self._append(f, 'blobs/{!s}'.format(name), data, attrs)
+
+            # Do this last: if we crash part way through writing a
+            # checkpoint, it never happened.
+            self._append(f, 'checkpoints', np.array([nsteps], dtype=int))
+
+    @property
+    def checkpoints(self):
+        """ Number of steps in each checkpoint. """
+        with self._open() as f:
+            if 'checkpoints' not in f:
+                return np.zeros(0, dtype=int)
+            return f['checkpoints'][()]
+
+    @property
+    def nsteps(self):
+        return int(np.sum(self.checkpoints))
+
+    def names(self, group=None):
+        with self._open() as f:
+            if group is None:
+                return list(f.keys())
+            elif group not in f:
+                return []
+            return list(f[group].keys())
+
+    def __contains__(self, name):
+        if (not have_h5py) or (not self.exists):
+            return False
+        with self._open() as f:
+            return name in f
+
+    def nrows(self, name='chain'):
+        """
+        Number of complete rows in `name`, i.e., those belonging to
+        checkpoints that were written in full.
+        """
+        with self._open() as f:
+            # e.g., files written by ModelSet.save
+            if 'checkpoints' not in f:
+                return f[name].shape[0]
+
+            if name in ['facc', 'checkpoints']:
+                return f['checkpoints'].shape[0]
+
+            return int(np.sum(f['checkpoints'][()])) \
+                * int(f.attrs['nwalkers'])
+
+    def _truncate(self, f):
+        """
+        Discard rows left behind by a checkpoint that was never completed.
+        """
+        Nc = f['checkpoints'].shape[0] if 'checkpoints' in f else 0
+        N = 0 if Nc == 0 else \
+            int(np.sum(f['checkpoints'][()])) * int(f.attrs['nwalkers'])
+
+        names = ['chain', 'logL', 'facc']
+        if 'blobs' in f:
+            names.extend(['blobs/{!s}'.format(name) for name in f['blobs']])
+
+        for name in names:
+            if name not in f:
+                continue
+            end = Nc if name == 'facc' else N
+            if f[name].shape[0] > end:
+                f[name].resize(end, axis=0)
+
+    def rows(self, walkers=None, steps=None):
+        """
+        Figure out which rows correspond to a set of walkers and steps.
+
+        Parameters
+        ----------
+        walkers : int, slice, np.ndarray
+            Walker ID number(s). If None, all walkers.
+        steps : int, slice, np.ndarray
+            Step number(s), counting from the start of the run. Negative
+            numbers and slices count from the end, as usual. If None, all
+            steps.
+
+        Returns
+        -------
+        Integer array of row numbers with shape (number of walkers,
+        number of steps), i.e., ordered walker by walker.
+
+        """
+
+        nsteps = self.checkpoints
+        W = self.nwalkers
+
+        wall = np.arange(W)
+        sall = np.arange(nsteps.sum())
+
+        w = wall if walkers is None else np.atleast_1d(wall[walkers])
+        s = sall if steps is None else np.atleast_1d(sall[steps])
+
+        # Find checkpoint each step belongs to.
+        edges = np.concatenate(([0], np.cumsum(nsteps)))
+        c = np.searchsorted(edges, s, side='right') - 1
+
+        return edges[c][None,:] * W + w[:,None] * nsteps[c][None,:] \
+            + (s - edges[c])[None,:]
+
+    def read(self, name='chain', rows=None):
+        """
+        Read rows of dataset `name`.
+
+        Parameters
+        ----------
+        name : str
+            Name of dataset, e.g., 'chain', 'logL', or 'blobs/<blob name>'.
+        rows : int, slice, np.ndarray
+            Row number(s) to read. If None, all of them. Arrays needn't be
+            sorted or unique.
+
+        """
+
+        N = self.nrows(name)
+
+        if rows is None:
+            rows = slice(None)
+        if isinstance(rows, slice):
+            rows = np.arange(N)[rows]
+
+        rows = np.array(rows, dtype=int)
+        shape = rows.shape
+        rows = rows.ravel()
+        rows[rows < 0] += N
+
+        with self._open() as f:
+            ds = f[name]
+
+            # h5py wants increasing indices without repeats.
+            uniq, inv = np.unique(rows, return_inverse=True)
+
+            if uniq.size == 0:
+                data = ds[0:0]
+            elif uniq.size == uniq[-1] - uniq[0] + 1:
+                data = ds[uniq[0]:uniq[-1]+1]
+            else:
+                data = ds[uniq]
+
+            return data[inv].reshape(shape + data.shape[1:])
+
+    def read_walkers(self, name='chain', walkers=None, steps=None):
+        """
+        Read dataset `name` for some walkers and steps.
+
+        Returns
+        -------
+        Array with shape (number of walkers, number of steps, ...).
+
+        """
+        return self.read(name, self.rows(walkers, steps))
+
+    def last_position(self):
+        """
+        Position of all walkers at the final step.
+        """
+        return self.read_walkers('chain', steps=-1)[:,0]
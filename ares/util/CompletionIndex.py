@@ -0,0 +1,148 @@
+"""
+
+CompletionIndex.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 23:24:52 PDT 2026
+
+Description: Record of which models in a grid (or sample) have been run,
+so that restarts needn't read in all previous outputs to find out.
+
+"""
+
+import os
+import re
+import glob
+import numpy as np
+
+class CompletionIndex(object):
+    def __init__(self, prefix):
+        """
+        Bitmap of completed models plus append-only journals.
+
+        The bitmap, <prefix>.done.npz, has one bit per model (in the order of
+        `GridND.all_kwargs`), and is only ever re-written in full, by a
+        single processor, before any models are run. While running, each
+        processor appends the indices of models it has finished (and written
+        to disk) to its own journal, <prefix>.<processor ID>.done.log. The
+        set of completed models is the union of the bitmap and all journals,
+        no matter how many processors wrote them.
+
+        Writing a journal entry is the last step of each checkpoint, so a
+        crash can only result in a model being run twice, never in one
+        being skipped. Entries truncated mid-write are ignored.
+
+        Parameters
+        ----------
+        prefix : str
+            Prefix for output files.
+
+        """
+        self.prefix = prefix
+
+    @property
+    def fn(self):
+        return '{!s}.done.npz'.format(self.prefix)
+
+    def journal(self, procid):
+        return '{0!s}.{1!s}.done.log'.format(self.prefix, str(procid).zfill(3))
+
+    @property
+    def journals(self):
+        # Only this prefix's, not those of a run whose prefix merely starts
+        # with ours (e.g., <prefix>.big.000.done.log).
+        pattern = re.compile(re.escape(self.prefix) + r'\.\d{3,}\.done\.log$')
+        fns = glob.glob('{!s}.*.done.log'.format(glob.escape(self.prefix)))
+        return sorted([fn for fn in fns if pattern.match(fn)])
+
+    @property
+    def exists(self):
+        return os.path.exists(self.fn)
+
+    def read(self):
+        """
+        Determine which models have been run.
+
+        Returns
+        -------
+        Dictionary containing `done`, a boolean array with one element per
+        model, as well as the `axes` (list of (name, values) tuples) or
+        `signature` supplied to `write` to describe the set of models.
+
+        """
+
+        with np.load(self.fn) as f:
+            N = int(f['N'])
+            done = np.unpackbits(f['bits'])[0:N].astype(bool)
+            names = list(f['names'])
+            axes = [(str(name), f['axis_{}'.format(i)]) \
+                for i, name in enumerate(names)] if f['structured'] else None
+            signature = str(f['signature'])
+
+        for fn in self.journals:
+            i = np.fromfile(fn, dtype='<i8',
+                count=os.path.getsize(fn) // 8)
+            done[i[np.logical_and(i >= 0, i < N)]] = True
+
+        return {'done': done, 'axes': axes, 'signature': signature}
+
+    def write(self, done, axes=None, signature=''):
+        """
+        Write bitmap and discard journals, whose contents it supersedes.
+
+        Parameters
+        ----------
+        done : np.ndarray
+            Has each model been run? Flattened if need be.
+        axes : list
+            For grids, list of (name, values) tuples, one per axis.
+        signature : str
+            For other sets of models, something that uniquely identifies
+            them, e.g., a hash of their parameters.
+
+        """
+
+        done = np.ravel(done).astype(bool)
+
+        data = {'N': done.size, 'bits': np.packbits(done),
+            'structured': axes is not None, 'signature': signature}
+
+        if axes is None:
+            data['names'] = []
+        else:
+            data['names'] = [name for name, vals in axes]
+            for i, (name, vals) in enumerate(axes):
+                data['axis_{}'.format(i)] = np.array(vals)
+
+        tmp = '{0!s}.{1}.tmp'.format(self.fn, os.getpid())
+        with open(tmp, 'wb') as f:
+            np.savez(f, **data)
+        os.replace(tmp, self.fn)
+
+        # Only now is it safe to get rid of these.
+        for fn in self.journals:
+            os.remove(fn)
+
+    def mark(self, indices, procid):
+        """
+        Record that models `indices` have been run (and saved) by processor
+        `procid`.
+        """
+        indices = np.array(indices, dtype='<i8')
+
+        if indices.size == 0:
+            return
+
+        with open(self.journal(procid), 'ab') as f:
+            f.write(indices.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def reset(self):
+        """
+        Delete bitmap and journals.
+        """
+        for fn in [self.fn] + self.journals:
+            if os.path.exists(fn):
+                os.remove(fn)
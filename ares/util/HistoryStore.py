@@ -0,0 +1,131 @@
+"""
+
+HistoryStore.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 18:31:12 PDT 2026
+
+Description: Container for galaxy histories, i.e., a set of 2-D arrays with
+shape (number of halos, number of times), one per field.
+
+"""
+
+import numpy as np
+
+class HistoryStore(dict):
+    def __init__(self, shape, dtype=np.float64):
+        """
+        Dictionary of galaxy histories in struct-of-arrays form.
+
+        Each field is a single contiguous block of memory with shape
+        (number of halos, number of redshifts), allocated once up front so
+        that the semi-analytic model can fill it in place (e.g., with `out=`
+        arguments to numpy functions) rather than building a chain of
+        temporary arrays. Other entries (1-D time/redshift arrays, scalars,
+        etc.) can be stored too, just like in a normal dictionary.
+
+        Parameters
+        ----------
+        shape : tuple
+            (number of halos, number of redshifts)
+        dtype : str, type
+            Data type of newly-allocated fields.
+
+        """
+        dict.__init__(self)
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def Nhalos(self):
+        return self.shape[0]
+
+    def allocate(self, name, fill=None, dtype=None):
+        """
+        Create new field `name`, filled with `fill` if supplied.
+
+        Returns
+        -------
+        The new (writable) array.
+
+        """
+        dtype = self.dtype if dtype is None else dtype
+
+        if fill is None:
+            arr = np.empty(self.shape, dtype=dtype)
+        elif fill == 0:
+            arr = np.zeros(self.shape, dtype=dtype)
+        else:
+            arr = np.full(self.shape, fill, dtype=dtype)
+
+        self[name] = arr
+
+        return arr
+
+    @property
+    def nbytes(self):
+        """ Memory footprint of all array-valued entries [bytes]. """
+        return sum([arr.nbytes for arr in self.values() \
+            if isinstance(arr, np.ndarray)])
+
+    def is_field(self, name):
+        """
+        Is `name` a per-halo quantity, i.e., one whose first dimension
+        indexes halos?
+        """
+        arr = self[name]
+        if not isinstance(arr, np.ndarray):
+            return False
+        return (arr.ndim > 0) and (arr.shape[0] == self.Nhalos)
+
+    def column(self, name, iz):
+        """
+        Return view of field `name` at redshift index `iz`.
+        """
+        return self[name][:,iz]
+
+    def select(self, iz, mask=None):
+        """
+        Extract all fields at redshift index `iz` for a subset of halos.
+
+        Parameters
+        ----------
+        iz : int
+            Index of redshift of interest.
+        mask : np.ndarray, None
+            Boolean array of length Nhalos. If None, or if it selects all
+            halos, the results are views rather than copies.
+
+        Returns
+        -------
+        Dictionary of 1-D arrays of length Nhalos (or mask.sum()).
+
+        """
+
+        if (mask is not None) and np.all(mask):
+            mask = None
+
+        if mask is not None:
+            ind = np.flatnonzero(mask)
+
+        out = {}
+        for name in self:
+            if not self.is_field(name):
+                continue
+
+            arr = self[name]
+
+            if arr.ndim == 1:
+                out[name] = arr if mask is None else arr[ind]
+                continue
+
+            # Per-halo quantities that don't evolve, stored as (Nhalos, 1).
+            col = arr[:,iz] if arr.shape[1] > 1 else arr[:,0]
+
+            if mask is None:
+                out[name] = col
+            else:
+                out[name] = col[ind]
+
+        return out
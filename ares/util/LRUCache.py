@@ -0,0 +1,353 @@
+"""
+
+LRUCache.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 17:20:36 PDT 2026
+
+Description: Bounded, in-memory cache with least-recently-used eviction.
+
+"""
+
+import sys
+import types
+import hashlib
+import numbers
+import functools
+import numpy as np
+from collections import OrderedDict
+
+try:
+    # this runs with no issues in python 2 but raises error in python 3
+    basestring
+except:
+    # this try/except allows for python 2/3 compatible string type checking
+    basestring = str
+
+def _content(value, seen):
+    """
+    String representation of `value` that depends only on its contents, or
+    None if there isn't one (e.g., for class instances).
+    """
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            return None
+        digest = hashlib.blake2b(np.ascontiguousarray(value).view(np.uint8),
+            digest_size=16).hexdigest()
+        return 'ndarray({},{},{})'.format(value.dtype.str, value.shape, digest)
+    elif isinstance(value, np.generic):
+        return _content(value.item(), seen)
+    elif (value is None) or isinstance(value, (bool, numbers.Number, 
+        basestring, bytes)):
+        return '{}:{!r}'.format(type(value).__name__, value)
+    elif isinstance(value, dict):
+        items = sorted(value.items(), key=lambda kv: str(kv[0]))
+        parts = [(_content(k, seen), _content(v, seen)) for k, v in items]
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        if isinstance(value, (set, frozenset)):
+            value = sorted(value, key=repr)
+        parts = [_content(v, seen) for v in value]
+    elif isinstance(value, types.ModuleType):
+        return 'module:{}'.format(value.__name__)
+    elif callable(value):
+        return code_digest(value, seen)
+    else:
+        return None
+
+    flat = [p for part in parts \
+        for p in (part if isinstance(part, tuple) else (part,))]
+    if None in flat:
+        return None
+
+    return '{}({})'.format(type(value).__name__, ','.join(flat))
+
+def _code(code, seen):
+    """
+    Contents of code object `code` (including any nested code objects), and
+    the names of the globals it uses.
+    """
+    consts = []
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            sub, subnames = _code(const, seen)
+            consts.append(sub)
+            names |= subnames
+        else:
+            consts.append(_content(const, seen))
+
+    if None in consts:
+        return None, names
+
+    digest = hashlib.blake2b(code.co_code, digest_size=16)
+    for item in [code.co_names, code.co_varnames, code.co_freevars]:
+        digest.update(repr(item).encode('utf-8'))
+    digest.update(','.join(consts).encode('utf-8'))
+
+    return digest.hexdigest(), names
+
+def code_digest(func, seen=None):
+    """
+    Digest of a function that depends only on what it computes.
+
+    Functions are identified by their byte code and constants, default
+    arguments, the contents of any variables they close over, and the
+    values of the globals they refer to, so that, e.g., two different
+    lambdas never share a digest (but two copies of the same one do).
+    Partial functions, built-in functions, and classes are handled too.
+
+    Parameters
+    ----------
+    func : callable
+
+    Returns
+    -------
+    String, or None if `func` depends on something that can't be compared by
+    value (e.g., a class instance, as is the case for bound methods).
+
+    """
+
+    if seen is None:
+        seen = set()
+
+    # Recursive functions (or ones that refer to each other)
+    if id(func) in seen:
+        return 'recursive:{}'.format(getattr(func, '__qualname__', ''))
+
+    seen = seen | set([id(func)])
+
+    if isinstance(func, functools.partial):
+        parts = [code_digest(func.func, seen), _content(func.args, seen),
+            _content(func.keywords or {}, seen)]
+    elif isinstance(func, types.FunctionType):
+        code, names = _code(func.__code__, seen)
+
+        closure = [cell.cell_contents for cell in (func.__closure__ or [])]
+
+        glob = {}
+        for name in sorted(names):
+            if name in func.__globals__:
+                glob[name] = func.__globals__[name]
+
+        # Names don't matter, so the same lambda defined in two places
+        # gets the same digest.
+        parts = [code, _content(func.__defaults__, seen),
+            _content(func.__kwdefaults__, seen),
+            _content(closure, seen), _content(glob, seen)]
+    elif isinstance(func, (types.BuiltinFunctionType, np.ufunc, type)):
+        # Bound to a module, or importable.
+        owner = getattr(func, '__self__', None)
+        if (owner is not None) and not isinstance(owner, types.ModuleType):
+            return None
+        module = 'numpy' if isinstance(func, np.ufunc) else func.__module__
+        return 'builtin:{}.{}'.format(module,
+            getattr(func, '__qualname__', func.__name__))
+    else:
+        return None
+
+    if None in parts:
+        return None
+
+    return hashlib.blake2b(','.join(parts).encode('utf-8'),
+        digest_size=16).hexdigest()
+
+class _Reference(object):
+    """
+    Hashable stand-in for an object that can only be compared by identity.
+
+    Holds on to the object, so its `id` can't be recycled by the garbage
+    collector (and given to some other object) while the key is in use.
+    """
+    __slots__ = ['value']
+
+    def __init__(self, value):
+        self.value = value
+
+    def __hash__(self):
+        return id(self.value)
+
+    def __eq__(self, other):
+        return isinstance(other, _Reference) and (other.value is self.value)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+def fingerprint(value):
+    """
+    Convert `value` into something hashable that can serve as a cache key.
+
+    Arrays are reduced to their dtype, shape, and a digest of their contents,
+    so that equal arrays have equal fingerprints regardless of identity.
+    Dictionaries, lists, and tuples are fingerprinted recursively, and
+    functions by their contents (see `code_digest`). Anything else we don't
+    know how to compare by value (e.g., class instances) is identified by
+    identity, with a reference held in the fingerprint, so an entry keyed
+    on it can never be retrieved using some other object.
+
+    Parameters
+    ----------
+    value : anything
+
+    Returns
+    -------
+    Hashable object (generally a tuple).
+
+    """
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            return ('ref', _Reference(value))
+        digest = hashlib.blake2b(np.ascontiguousarray(value).view(np.uint8),
+            digest_size=16).hexdigest()
+        return ('ndarray', value.dtype.str, value.shape, digest)
+    elif isinstance(value, dict):
+        items = sorted(value.items(), key=lambda kv: str(kv[0]))
+        return ('dict',) + tuple([(k, fingerprint(v)) for k, v in items])
+    elif isinstance(value, (list, tuple)):
+        return (type(value).__name__,) + tuple([fingerprint(v) for v in value])
+    elif isinstance(value, np.generic):
+        return fingerprint(value.item())
+    elif (value is None) or isinstance(value, (bool, numbers.Number, basestring)):
+        return value
+    elif callable(value):
+        digest = code_digest(value)
+        if digest is not None:
+            return ('function', digest)
+
+    return ('ref', _Reference(value))
+
+def sizeof(value, seen=None):
+    """
+    Approximate size of `value` in bytes, including everything it contains.
+
+    Numpy arrays count their data (and, for object arrays, the objects they
+    hold), dictionaries, lists, tuples, and sets count their members, and
+    anything else counts as `sys.getsizeof`. Objects that appear more than
+    once are only counted once.
+    """
+
+    if seen is None:
+        seen = set()
+
+    if id(value) in seen:
+        return 0
+
+    seen.add(id(value))
+
+    if isinstance(value, np.ndarray):
+        nbytes = value.nbytes
+        if value.dtype == object:
+            nbytes += sum([sizeof(element, seen) for element in value.flat])
+        return nbytes
+
+    nbytes = sys.getsizeof(value)
+
+    if isinstance(value, dict):
+        for k, v in value.items():
+            nbytes += sizeof(k, seen) + sizeof(v, seen)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        nbytes += sum([sizeof(element, seen) for element in value])
+
+    return nbytes
+
+class LRUCache(object):
+    def __init__(self, maxsize=None, maxbytes=None):
+        """
+        Dictionary-like cache that holds at most `maxsize` items, or
+        `maxbytes` bytes (see `sizeof`), whichever limit is hit first.
+
+        Once full, the least recently used items are evicted. Lookups,
+        insertions, and evictions are all O(1).
+
+        Parameters
+        ----------
+        maxsize : int
+            Maximum number of items. If None, no limit.
+        maxbytes : int, float
+            Maximum total size of cached values in bytes. If None, no limit.
+
+        """
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.clear()
+
+    def clear(self):
+        self._data = OrderedDict()
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def items(self):
+        """
+        List of (key, value) pairs, least recently used first.
+
+        Doesn't count as using any of them.
+        """
+        return [(key, value[0]) for key, value in self._data.items()]
+
+    def get(self, key, default=None):
+        """
+        Retrieve item `key`, or `default` if it's not in the cache.
+        """
+        if key not in self._data:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self._data.move_to_end(key)
+
+        return self._data[key][0]
+
+    def put(self, key, value, nbytes=None):
+        """
+        Add item to the cache, evicting old ones if need be.
+
+        Parameters
+        ----------
+        key : hashable
+            Key for this item, e.g., from `fingerprint`.
+        value : object
+            Item to be cached.
+        nbytes : int
+            Size of `value` in bytes. If None, will use `sizeof(value)`.
+
+        """
+
+        if key in self._data:
+            self.nbytes -= self._data.pop(key)[1]
+
+        if nbytes is None:
+            nbytes = sizeof(value)
+
+        # Don't flush the whole cache for something that won't fit anyway.
+        if (self.maxbytes is not None) and (nbytes > self.maxbytes):
+            return
+
+        self._data[key] = value, nbytes
+        self.nbytes += nbytes
+
+        while self._full():
+            k, (v, nb) = self._data.popitem(last=False)
+            self.nbytes -= nb
+            self.evictions += 1
+
+    def _full(self):
+        if (self.maxsize is not None) and (len(self._data) > self.maxsize):
+            return True
+        if (self.maxbytes is not None) and (self.nbytes > self.maxbytes):
+            return True
+        return False
+
+    @property
+    def hit_rate(self):
+        tot = self.hits + self.misses
+        return self.hits / float(tot) if tot > 0 else 0.0
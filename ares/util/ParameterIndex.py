@@ -0,0 +1,306 @@
+"""
+
+ParameterIndex.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Mon Oct 19 04:12:36 PDT 2026
+
+Description: Index of samples in parameter space, for fast range, polygon,
+and nearest-neighbor queries of large chains.
+
+"""
+
+import numpy as np
+from .TableCache import TableCache
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    pass
+
+class ParameterIndex(object):
+    def __init__(self, points, path=None):
+        """
+        Index of a set of points (e.g., MCMC samples) in N-D space.
+
+        Each axis gets a sorted copy of its values (and the ordering that
+        produces it), so range queries reduce to a binary search per axis.
+        Only the candidates along the most selective axis are then checked
+        against the remaining constraints. Nearest-neighbor queries use a
+        KD-tree, built upon first request. Non-finite values never satisfy
+        any query.
+
+        Parameters
+        ----------
+        points : np.ndarray
+            Array of shape (number of points, number of dimensions). Can be a
+            memory map.
+        path : str
+            If supplied, the sorted axes are saved to (and retrieved from)
+            this directory, keyed by the contents of `points`, so the index
+            is built only once per chain.
+
+        """
+        self.points = points
+        self.path = path
+
+        if points.ndim == 1:
+            self.points = points[:,None]
+
+        self.N, self.Nd = self.points.shape
+
+    @property
+    def disk(self):
+        if not hasattr(self, '_disk'):
+            self._disk = TableCache(self.path)
+        return self._disk
+
+    def _load(self):
+        key = None
+        if self.path is not None:
+            key = self.disk.key('pindex', points=np.asarray(self.points))
+            data = self.disk.load(key, ['order', 'values'], mmap_mode='r')
+            if data is not None:
+                return data['order'], data['values']
+
+        # NaNs are sorted to the end, so never found by searchsorted.
+        order = np.zeros((self.N, self.Nd), dtype=np.int64, order='F')
+        values = np.zeros((self.N, self.Nd), order='F')
+        for i in range(self.Nd):
+            col = np.array(self.points[:,i], dtype=float)
+            col[~np.isfinite(col)] = np.nan
+            order[:,i] = np.argsort(col, kind='stable')
+            values[:,i] = col[order[:,i]]
+
+        if key is not None:
+            try:
+                self.disk.save(key, order=order, values=values)
+            except (IOError, OSError):
+                pass
+
+        return order, values
+
+    @property
+    def order(self):
+        """
+        Indices that sort each axis, shape (number of points, dimensions).
+        """
+        if not hasattr(self, '_order'):
+            self._order, self._values = self._load()
+        return self._order
+
+    @property
+    def values(self):
+        """
+        Sorted values along each axis.
+        """
+        if not hasattr(self, '_values'):
+            self._order, self._values = self._load()
+        return self._values
+
+    def limits(self, axis):
+        """
+        Minimum and maximum (finite) value along `axis`.
+        """
+        vals = self.values[:,axis]
+        n = np.searchsorted(vals, np.inf, side='right')
+        if n == 0:
+            return np.nan, np.nan
+        return vals[0], vals[n-1]
+
+    def _candidates(self, axis, lo, hi):
+        vals = self.values[:,axis]
+        lo = -np.inf if lo is None else lo
+        hi = np.inf if hi is None else hi
+        i1 = np.searchsorted(vals, lo, side='left')
+        i2 = np.searchsorted(vals, hi, side='right')
+        return i1, i2
+
+    def range(self, bounds, axes=None):
+        """
+        Find points within a (hyper-)rectangle.
+
+        Parameters
+        ----------
+        bounds : list
+            (lo, hi) pair for each axis, inclusive. Either element (or the
+            whole pair) can be None to leave that side unconstrained.
+        axes : list
+            Axes to which `bounds` apply, if not all of them in order.
+
+        Returns
+        -------
+        Sorted array of indices of points satisfying all constraints.
+
+        """
+        if axes is None:
+            axes = list(range(len(bounds)))
+
+        cons = []
+        for axis, bnds in zip(axes, bounds):
+            if bnds is None:
+                bnds = (None, None)
+            i1, i2 = self._candidates(axis, *bnds)
+            cons.append((i2 - i1, axis, bnds, i1, i2))
+
+        if len(cons) == 0:
+            return np.arange(self.N)
+
+        # Start with the most selective axis, check candidates against rest.
+        cons.sort(key=lambda con: con[0])
+        n, axis, bnds, i1, i2 = cons[0]
+        elements = np.sort(self.order[i1:i2,axis])
+
+        for n, axis, bnds, i1, i2 in cons[1:]:
+            if elements.size == 0:
+                break
+
+            # Constraint satisfied by everything.
+            if n == self.N:
+                continue
+
+            lo, hi = bnds
+            vals = np.asarray(self.points[elements,axis])
+            ok = np.isfinite(vals)
+            if lo is not None:
+                ok &= vals >= lo
+            if hi is not None:
+                ok &= vals <= hi
+
+            elements = elements[ok]
+
+        return elements
+
+    def polygon(self, vertices, axes=(0, 1), holes=None):
+        """
+        Find points within a polygon (or on its boundary).
+
+        Parameters
+        ----------
+        vertices : np.ndarray
+            Array of shape (number of vertices, 2).
+        axes : tuple
+            Axes defining the plane of the polygon.
+        holes : list
+            Vertices of any holes in the polygon.
+
+        Returns
+        -------
+        Sorted array of indices of points inside the polygon.
+
+        """
+        vertices = np.asarray(vertices, dtype=float)
+
+        bounds = [(vertices[:,0].min(), vertices[:,0].max()),
+            (vertices[:,1].min(), vertices[:,1].max())]
+        elements = self.range(bounds, axes=axes)
+
+        x = np.asarray(self.points[elements,axes[0]])
+        y = np.asarray(self.points[elements,axes[1]])
+
+        ok = points_in_polygon(x, y, vertices)
+
+        for hole in (holes or []):
+            ok &= np.logical_not(points_in_polygon(x, y, np.asarray(hole),
+                boundary=False))
+
+        return elements[ok]
+
+    @property
+    def scale(self):
+        """
+        Scale of each axis (its standard deviation), used to normalize
+        distances in nearest-neighbor queries.
+        """
+        if not hasattr(self, '_scale'):
+            self._scale = np.ones(self.Nd)
+            for i in range(self.Nd):
+                lo, hi = self.limits(i)
+                col = np.asarray(self.points[:,i])
+                std = np.std(col[np.isfinite(col)]) if hi > lo else 0.
+                if std > 0:
+                    self._scale[i] = std
+        return self._scale
+
+    @scale.setter
+    def scale(self, value):
+        self._scale = np.array(value, dtype=float)
+        if hasattr(self, '_tree'):
+            del self._tree
+
+    @property
+    def tree(self):
+        """
+        KD-tree of (finite) points, with axes normalized by `scale`.
+        """
+        if not hasattr(self, '_tree'):
+            pts = np.asarray(self.points, dtype=float)
+            ok = np.all(np.isfinite(pts), axis=1)
+            self._tree_elements = np.flatnonzero(ok)
+            self._tree = cKDTree(pts[ok] / self.scale[None,:],
+                balanced_tree=False)
+        return self._tree
+
+    def nearest(self, point, k=1):
+        """
+        Find the `k` points nearest `point`.
+
+        Returns
+        -------
+        Tuple containing (distances, indices), with distances in units of
+        `scale` along each axis.
+
+        """
+        dist, loc = self.tree.query(np.asarray(point) / self.scale, k=k)
+        return dist, self._tree_elements[loc]
+
+def points_in_polygon(x, y, vertices, boundary=True):
+    """
+    Determine which points (x, y) lie inside a polygon.
+
+    Uses the crossing-number test, vectorized over points, so the cost is
+    (number of points) x (number of vertices).
+
+    Parameters
+    ----------
+    x, y : np.ndarray
+        Coordinates of points.
+    vertices : np.ndarray
+        Array of shape (number of vertices, 2). Needn't be closed.
+    boundary : bool
+        Count points on edges (to machine precision) as inside?
+
+    Returns
+    -------
+    Boolean array.
+
+    """
+
+    xv, yv = vertices[:,0], vertices[:,1]
+    inside = np.zeros(x.shape, dtype=bool)
+    on_edge = np.zeros(x.shape, dtype=bool)
+
+    tol = 1e-12 * max(np.ptp(xv), np.ptp(yv), 1e-300)
+
+    for i in range(len(xv)):
+        x1, y1 = xv[i-1], yv[i-1]
+        x2, y2 = xv[i], yv[i]
+
+        crosses = (y1 > y) != (y2 > y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            xc = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= np.logical_and(crosses, x < xc)
+
+        if boundary:
+            # Distance to segment
+            dx, dy = x2 - x1, y2 - y1
+            L2 = dx**2 + dy**2
+            if L2 == 0:
+                t = 0.
+            else:
+                t = np.clip(((x - x1) * dx + (y - y1) * dy) / L2, 0, 1)
+            d = np.hypot(x - x1 - t * dx, y - y1 - t * dy)
+            on_edge |= d <= tol
+
+    return inside | on_edge
@@ -141,6 +141,24 @@ def read_pickle_file(file_name, nloads=1, verbose=False):
             raise err
 
 
+def iter_pickle_file(file_name):
+    """
+    Generator that yields the objects pickled in the file located at the
+    given file name one at a time, i.e., without holding them all in memory.
+    
+    file_name: the name of the file which is assumed to be a sequence of
+               pickled objects, e.g., one per checkpoint of an MCMC
+    """
+    with open(file_name, 'rb') as pickle_file:
+        while True:
+            try:
+                if is_python3:
+                    yield pickle.load(pickle_file, encoding='latin1')
+                else:
+                    yield pickle.load(pickle_file)
+            except EOFError:
+                break
+
 def delete_file_if_clobber(file_name, clobber=False, verbose=True):
     """
     Deletes the given file if it exists and clobber is set to True.
@@ -0,0 +1,260 @@
+"""
+
+ProcessPool.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Mon Oct 19 00:21:44 PDT 2026
+
+Description: Pool of local worker processes with the same interface as
+MPIPool, for running MCMC on a single node without MPI.
+
+"""
+
+import gc
+import time
+import atexit
+import traceback
+import multiprocessing
+from multiprocessing.connection import wait
+
+# ID number of this worker (1, 2, ..., nprocs), or 0 in the main process.
+_worker_id = 0
+
+def worker_id():
+    """
+    ID number of the current worker process, or 0 if not in a worker.
+
+    Workers are numbered 1 through `nprocs`, like the worker processors in
+    an MPIPool, and a worker that replaces another takes its number.
+    """
+    return _worker_id
+
+def _work(conn, function, wid):
+    """
+    Evaluate `function` for arguments sent through `conn` until told to stop.
+
+    .. note:: For use with multiprocessing only.
+    """
+    global _worker_id
+    _worker_id = wid
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+
+        if task is None:
+            break
+
+        taskid, arg = task
+
+        try:
+            result = (taskid, True, function(arg))
+        except Exception:
+            result = (taskid, False, traceback.format_exc())
+
+        conn.send(result)
+
+        del result, arg
+        gc.collect()
+
+    conn.close()
+
+class _Worker(object):
+    def __init__(self, ctx, function, wid):
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_work, args=(child, function, wid))
+        self.proc.start()
+        child.close()
+
+        self.wid = wid
+        self.ntasks = 0
+        self.task = None
+        self.t0 = None
+
+    def send(self, taskid, arg):
+        self.conn.send((taskid, arg))
+        self.task = taskid
+        self.t0 = time.time()
+
+    def stop(self, kill=False):
+        if kill:
+            self.proc.terminate()
+        else:
+            try:
+                self.conn.send(None)
+            except (OSError, IOError):
+                pass
+
+        self.proc.join()
+        self.conn.close()
+
+class ProcessPool(object):
+
+    def __init__(self, nprocs, start_method='fork', maxtasks=None,
+        timeout=None, timeout_value=None, preload=None):
+        """
+        Initialize a ProcessPool object.
+
+        Workers are started the first time `map` is called, and re-started
+        whenever it's called with a different function. Under `fork`, they
+        inherit the function (and anything it refers to, e.g., tables held
+        in the `base_kwargs` of a ModelFit) from the main process, so nothing
+        big is ever pickled. Under `forkserver`, the function is pickled
+        once per worker, rather than once per task as in MPIPool.
+
+        Parameters
+        ----------
+        nprocs : int
+            Number of worker processes.
+        start_method : str
+            'fork' or 'forkserver' (or 'spawn'). See `multiprocessing`.
+        maxtasks : int
+            Number of tasks each worker completes before it is replaced with
+            a fresh one, which caps any growth in memory use (like `reboot`
+            in `ModelFit.run`, but without interrupting anything). If None,
+            workers live until `stop` is called.
+        timeout : int, float
+            Maximum time (in seconds) for any one task. Workers that exceed
+            it are killed (and replaced), and the result for that task is
+            `timeout_value`.
+        timeout_value : object
+            Result for tasks that time out (or whose worker dies).
+        preload : list
+            Modules imported by the forkserver process (if used), so that
+            workers needn't import them each time they start. If None,
+            will use ['ares'].
+
+        """
+        self.nprocs = int(nprocs)
+        self.maxtasks = maxtasks
+        self.timeout = timeout
+        self.timeout_value = timeout_value
+
+        self.ctx = multiprocessing.get_context(start_method)
+
+        if preload is None:
+            preload = ['ares']
+
+        if (start_method == 'forkserver') and preload:
+            self.ctx.set_forkserver_preload(preload)
+
+        self.workers = []
+        self.function = None
+
+        self.nrecycled = 0
+        self.ntimeouts = 0
+
+        atexit.register(self.stop)
+
+    def is_master(self):
+        return True
+
+    def is_worker(self):
+        return False
+
+    def start(self, function=None):
+        """
+        (Re-)start all workers.
+        """
+        self.stop()
+
+        self.function = function
+        self.workers = [_Worker(self.ctx, function, wid) \
+            for wid in range(1, self.nprocs + 1)]
+
+    def _replace(self, worker, kill=False):
+        worker.stop(kill=kill)
+        i = self.workers.index(worker)
+        self.workers[i] = _Worker(self.ctx, self.function, worker.wid)
+
+    def map(self, function, iterable):
+        """
+        Evaluate `function` for each element of `iterable`.
+
+        Returns
+        -------
+        List of results, in the same order as `iterable`.
+
+        """
+
+        if (function is not self.function) or (not self.workers):
+            self.start(function)
+
+        tasks = list(enumerate(iterable))[-1::-1]
+        results = [None] * len(tasks)
+        pending = len(tasks)
+
+        while pending:
+
+            # Hand out tasks to idle workers
+            for worker in self.workers:
+                if (worker.task is None) and tasks:
+                    taskid, arg = tasks.pop()
+                    worker.send(taskid, arg)
+
+            busy = [worker for worker in self.workers \
+                if worker.task is not None]
+
+            if self.timeout is None:
+                dt = None
+            else:
+                t0 = min([worker.t0 for worker in busy])
+                dt = max(0., t0 + self.timeout - time.time())
+
+            ready = wait([worker.conn for worker in busy], timeout=dt)
+
+            for worker in busy:
+                if worker.conn in ready:
+                    try:
+                        taskid, ok, result = worker.conn.recv()
+                    except EOFError:
+                        # Worker died, e.g., killed for using too much memory
+                        print(("# WARNING: worker #{} died during task " +\
+                            "{}.").format(worker.wid, worker.task))
+                        results[worker.task] = self.timeout_value
+                        pending -= 1
+                        self._replace(worker, kill=True)
+                        continue
+
+                    if not ok:
+                        self.stop()
+                        raise RuntimeError(("Error in worker #{}:\n" +\
+                            "{!s}").format(worker.wid, result))
+
+                    results[taskid] = result
+                    pending -= 1
+
+                    worker.task = None
+                    worker.ntasks += 1
+
+                    if (self.maxtasks is not None) and \
+                       (worker.ntasks >= self.maxtasks):
+                        self._replace(worker)
+                        self.nrecycled += 1
+
+                elif (self.timeout is not None) and \
+                     (time.time() - worker.t0 >= self.timeout):
+                    print(("# WARNING: worker #{} timed out on task " +\
+                        "{}.").format(worker.wid, worker.task))
+                    results[worker.task] = self.timeout_value
+                    pending -= 1
+                    self._replace(worker, kill=True)
+                    self.ntimeouts += 1
+
+        return results
+
+    def stop(self):
+        """
+        Shut down all workers.
+        """
+        for worker in self.workers:
+            worker.stop(kill=worker.task is not None)
+
+        self.workers = []
+        self.function = None
+
+    def close(self):
+        self.stop()
@@ -241,6 +241,7 @@ def PhysicsParameters():
     "lya_nmax": 23,
 
     "rate_source": 'fk94', # fk94, option for development here
+    "rate_tables": False,  # Interpolate rate coefficients from log(T) table
 
     # Feedback parameters
 
@@ -673,8 +674,14 @@ def PopulationParameters():
     "pop_synth_Mmax": 1e14,
     "pop_synth_minimal": False,  # Can turn off for testing (so we don't need MF)
     "pop_synth_cache_level": 1, # Bigger = more careful
+    "pop_synth_cache_size": 1024, # Max number of cached luminosities
+    "pop_synth_cache_bytes": 2**29, # Max memory for cached luminosities
     "pop_synth_age_interp": 'cubic',
     "pop_synth_cache_phot": {},
+    # Tabulate (and cache) the weights that map a SFH onto L(t), so that
+    # repeated calls at the same wavelength and times are a dot product.
+    "pop_synth_kernel": True,
+    "pop_synth_kernel_max": 64, # Max number of cached kernels
 
     # Need to avoid doing synthesis in super duper detail for speed.
     # Still need to implement 'full' method.
@@ -691,6 +698,10 @@ def PopulationParameters():
     "pop_dlogM": 0.1,
 
     "pop_histories": None,
+    # Data type for SAM output (e.g., set to 'float32' to halve memory use)
+    "pop_histories_dtype": 'float64',
+    # Number of halos to process at once in `StreamSummaryStats`
+    "pop_histories_chunk": None,
     "pop_guide_pop": None,
     "pop_thin_hist": False,
     "pop_scatter_mar": 0.0,
@@ -883,6 +894,9 @@ def PopulationParameters():
     "pop_solve_rte": False,
     "pop_lya_permeable": False,
 
+    # Pre-computed flux histories (see UniformBackground.rte_histories)
+    "pop_rte_history": None,
+
     # Pre-created splines
     "pop_fcoll": None,
     "pop_dfcolldz": None,
@@ -1133,6 +1147,9 @@ def HaloMassFunctionParameters():
     "hmf_instance": None,
     "hmf_load": True,
     "hmf_cache": None,
+    # On-disk cache of generated tables, and its size limit in bytes
+    "hmf_cache_path": None,
+    "hmf_cache_maxsize": None,
     "hmf_load_ps": True,
     "hmf_load_growth": False,
     "hmf_use_splined_growth": True,
@@ -1256,6 +1273,13 @@ def CosmologyParameters():
     "primordial_index": 0.9667,
     'relativistic_species': 3.04,
     "approx_highz": False,
+    # Tabulate time-redshift relations for fast vectorized lookups, to
+    # relative precision `cosmology_table_tol` up to `cosmology_table_zmax`,
+    # and optionally cache them on disk.
+    "cosmology_tables": False,
+    "cosmology_table_tol": 1e-8,
+    "cosmology_table_zmax": 1e4,
+    "cosmology_table_path": None,
     "cosmology_id": 'best',
     "cosmology_name": 'planck_TTTEEE_lowl_lowE',  # Can pass 'named cosmologies'
     "cosmology_number": None,
@@ -1328,6 +1352,7 @@ def ControlParameters():
     # Solvers
     "solver_rtol": 1e-8,
     "solver_atol": 1e-8,
+    "solver_batch": False,   # Evolve all grid cells as one ODE system
     "interp_tab": 'cubic',
     "interp_cc": 'linear',
     "interp_rc": 'linear',
@@ -1375,6 +1400,9 @@ def ControlParameters():
     "blob_ivars": None,
     "blob_funcs": None,
     "blob_kwargs": {},
+    # Call blob functions with whole arrays of independent variables? Must
+    # opt in: True/False for all blobs, or one entry per blob group.
+    "blob_vectorized": False,
 
     # Real-time optical depth calculation once EoR begins
     "EoR_xavg": 1.0,        # ionized fraction indicating start of EoR (OFF by default)
@@ -1394,6 +1422,17 @@ def ControlParameters():
     "tau_Emin": 2e2,
     "tau_Emax": 3e4,
     "tau_Emin_pin": True,
+    # Tabulating tau: Gauss-Legendre points per redshift interval, number
+    # of local processes, and directory for cached tables (None = no cache)
+    "tau_gauss_points": 8,
+    "tau_nprocs": None,
+    "tau_cache": None,
+
+    # Solve independent (population, band) RTE chains in a process pool
+    "rte_nprocs": None,
+    # Solve for the whole (z, E) flux history at once, rather than one
+    # redshift at a time (only if emissivities/tau are fixed in advance)
+    "rte_precompute_history": False,
 
     "sam_dt": 1., # Myr
     "sam_dz": None, # Usually good enough!
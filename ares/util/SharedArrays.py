@@ -0,0 +1,157 @@
+"""
+
+SharedArrays.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 15:10:44 PDT 2026
+
+Description: Share large lookup tables between processes via memory-mapped
+files, e.g., in /dev/shm (i.e., POSIX shared memory) or on a filesystem
+visible to all nodes.
+
+"""
+
+import os
+import atexit
+import tempfile
+import numpy as np
+
+# Files created by this process, removed when it exits.
+_owned = {}
+
+def _cleanup():
+    for fn, pid in list(_owned.items()):
+        # Forked children inherit this, but don't own the files.
+        if pid != os.getpid():
+            continue
+        try:
+            os.remove(fn)
+        except OSError:
+            pass
+        del _owned[fn]
+
+atexit.register(_cleanup)
+
+class SharedArrayRef(object):
+    """
+    Stand-in for a memory-mapped array when pickling.
+    """
+    def __init__(self, filename, shape, dtype):
+        self.filename = filename
+        self.shape = shape
+        self.dtype = dtype
+
+    def attach(self):
+        arr = np.load(self.filename, mmap_mode='r')
+        assert (arr.shape == self.shape) and (arr.dtype == self.dtype), \
+            "Shared array {} has changed!".format(self.filename)
+        return arr
+
+def share_arrays(obj, path, min_bytes=2**20):
+    """
+    Move large array attributes of `obj` into memory-mapped files.
+
+    Each array is written to a uniquely named .npy file in `path`, and the
+    attribute is replaced with a read-only memory map of that file. Files
+    are deleted when the process that created them exits (processes
+    still attached to them keep their memory maps). If the class of
+    `obj` implements `__getstate__` and `__setstate__` with
+    `get_shared_state` and `set_shared_state`, then pickling `obj` only
+    records the filenames, and unpickling re-attaches to the same files, so
+    every process sees the same physical pages rather than its own copy.
+
+    Parameters
+    ----------
+    obj : object
+        Instance whose arrays to share, e.g., a HaloMassFunction.
+    path : str
+        Directory in which to put arrays. Must be visible to all processes
+        that will unpickle `obj`. Use, e.g., /dev/shm for processes on the
+        same node.
+    min_bytes : int
+        Arrays smaller than this are left alone.
+
+    Returns
+    -------
+    List of names of attributes that are now shared.
+
+    """
+
+    if not os.path.exists(path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            pass
+
+    shared = obj.__dict__.get('_shared_arrays', {})
+
+    for name, val in list(obj.__dict__.items()):
+        if name in shared:
+            continue
+        if (type(val) is not np.ndarray) or (val.nbytes < min_bytes):
+            continue
+        if val.dtype.hasobject:
+            continue
+
+        fd, fn = tempfile.mkstemp(suffix='.npy', dir=os.path.abspath(path),
+            prefix='{0!s}.{1!s}.'.format(obj.__class__.__name__, name))
+        _owned[fn] = os.getpid()
+
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, val)
+
+        obj.__dict__[name] = np.load(fn, mmap_mode='r')
+        shared[name] = (fn, obj.__dict__[name])
+
+    obj.__dict__['_shared_arrays'] = shared
+
+    return list(shared.keys())
+
+def get_shared_state(obj, drop=[]):
+    """
+    Return copy of obj.__dict__ with shared arrays replaced by references.
+
+    Parameters
+    ----------
+    drop : list
+        Attributes to leave out, e.g., objects that can't be pickled but are
+        easily re-generated.
+
+    """
+
+    state = obj.__dict__.copy()
+
+    for name in drop:
+        if name in state:
+            del state[name]
+
+    shared = {}
+    for name, (fn, arr) in state.get('_shared_arrays', {}).items():
+
+        # Attribute may have been replaced (or sliced) since it was shared
+        if state.get(name) is not arr:
+            continue
+
+        state[name] = SharedArrayRef(fn, arr.shape, arr.dtype)
+        shared[name] = (fn, None)
+
+    if '_shared_arrays' in state:
+        state['_shared_arrays'] = shared
+
+    return state
+
+def set_shared_state(obj, state):
+    """
+    Restore obj.__dict__ from `state`, attaching to shared arrays.
+    """
+
+    for name, val in state.items():
+        if isinstance(val, SharedArrayRef):
+            state[name] = val.attach()
+
+    if '_shared_arrays' in state:
+        state['_shared_arrays'] = {name: (fn, state[name]) \
+            for name, (fn, arr) in state['_shared_arrays'].items()}
+
+    obj.__dict__.update(state)
@@ -230,49 +230,38 @@ def _error_2D_crude(L, nu=[0.95, 0.68]):
     peak = float(L.max())
     tot = float(L.sum())
 
-    # Counts per bin in descending order
-    Ldesc = np.sort(L.ravel())[-1::-1]
+    # Counts per bin in ascending and descending order
+    Lasc = np.sort(L.ravel())
+    Ldesc = Lasc[-1::-1]
 
-    Lencl_prev = 0.0
-
-    # Will correspond to whatever contour we're on
-    j = 0
+    # Fraction of total enclosed in bins at or above each level, i.e., the
+    # total minus everything below it (ties are all enclosed together).
+    below = np.concatenate(([0.], np.cumsum(Lasc)))
+    Lencl = (tot - below[np.searchsorted(Lasc, Ldesc, side='left')]) / tot
 
     # Some preliminaries
     contours = [1.0]
-    Lencl_running = []
-
-    # Iterate from high likelihood to low
-    for i in range(1, Ldesc.size):
-
-        # How much area (fractional) is contained in bins at or above the current level?
-        Lencl_now = L[L >= Ldesc[i]].sum() / tot
-
-        # Keep running list of enclosed (integrated) likelihoods
-        Lencl_running.append(Lencl_now)
-
-        # What contour are we on?
-        Lnow = Ldesc[i]
 
-        # Haven't hit next contour yet
-        if Lencl_now < nu[j]:
-            pass
-        # Just passed a contour
-        else:
+    # Iterate from high likelihood to low, stopping each time we pass the
+    # next contour.
+    i = 1
+    for j in range(len(nu)):
+        k = i + np.searchsorted(Lencl[i:], nu[j], side='left')
 
-            # Interpolate to find contour more precisely
-            Linterp = np.interp(nu[j], [Lencl_prev, Lencl_now],
-                [Ldesc[i-1], Ldesc[i]])
+        # Never got there
+        if k >= Ldesc.size:
+            break
 
-            # Save relative to peak
-            contours.append(Linterp / peak)
+        Lencl_prev = 0.0 if k == 1 else Lencl[k-1]
 
-            j += 1
+        # Interpolate to find contour more precisely
+        Linterp = np.interp(nu[j], [Lencl_prev, Lencl[k]],
+            [Ldesc[k-1], Ldesc[k]])
 
-            if j == len(nu):
-                break
+        # Save relative to peak
+        contours.append(Linterp / peak)
 
-        Lencl_prev = Lencl_now
+        i = k + 1
 
     # Return values that match up to inputs
     return nu[-1::-1], np.array(contours[-1::-1])
@@ -329,8 +318,279 @@ def kurtosis(data):
 _dist_opts = ['normal', 'lognormal', 'skewnormal',
     'normal-pars', 'lognormal-pars', 'skewnormal-pars', 'pdf', 'cdf']
 
+def bin_index(x, xbin_e, inclusive=False):
+    """
+    Find the bin each element of `x` belongs to.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Values to bin.
+    xbin_e : np.ndarray
+        Bin edges. Bins include their lower edge but not their upper edge.
+    inclusive : bool
+        Put values below (above) the first (last) bin in that bin.
+
+    Returns
+    -------
+    Array of bin indices, with -1 for values outside all bins (or not
+    finite).
+
+    """
+    nb = len(xbin_e) - 1
+
+    i = np.searchsorted(xbin_e, x, side='right') - 1
+
+    if inclusive:
+        i = np.clip(i, 0, nb - 1)
+    else:
+        i[i >= nb] = -1
+
+    i[~np.isfinite(x)] = -1
+
+    return i
+
+def _segment_sum(values, starts, counts):
+    # Sum of contiguous segments (some possibly empty)
+    out = np.zeros(counts.size)
+    ok = counts > 0
+    if np.any(ok):
+        out[ok] = np.add.reduceat(values, starts[ok])
+    return out
+
+def bin_statistics(x, y, xbin_e, weights=None, percentiles=None,
+    weighted_scatter=True, inclusive=False):
+    """
+    Compute statistics of `y` in bins of `x`, for all bins at once.
+
+    Samples are sorted (by bin, then by `y`) just once, after which counts,
+    sums, and percentiles all come from contiguous segments of the sorted
+    arrays. Non-finite values of `y` are ignored.
+
+    Parameters
+    ----------
+    x, y : np.ndarray
+        Samples.
+    xbin_e : np.ndarray
+        Bin edges for `x`.
+    weights : np.ndarray
+        Weight of each sample. If None, all samples are weighted equally.
+    percentiles : float, list
+        Percentiles of `y` to compute in each bin, as fractions, e.g.,
+        (0.16, 0.5, 0.84).
+    weighted_scatter : bool
+        If True, the standard deviation and percentiles are weighted.
+        Otherwise, weights only affect the mean and sum.
+    inclusive : bool
+        Include samples below (above) the first (last) bin in that bin.
+
+    Returns
+    -------
+    Dictionary containing, for each bin, the number of samples (`N`), sum
+    of weights (`sumw`), weighted sum (`sum`) and mean (`avg`), standard
+    deviation (`std`), extrema (`min` and `max`), and percentiles
+    (`percentiles`, with shape (number of percentiles, number of bins)),
+    as well as the sorted samples and where each bin's segment starts
+    (`y_sorted`, `w_sorted`, `starts`).
+
+    """
+
+    x = np.asarray(x).ravel()
+    y = np.asarray(y, dtype=float).ravel()
+    nb = len(xbin_e) - 1
+
+    if weights is None:
+        w = np.ones_like(y)
+    else:
+        w = np.asarray(weights, dtype=float).ravel()
+
+    i = bin_index(x, xbin_e, inclusive=inclusive)
+    keep = np.logical_and(i >= 0, np.isfinite(y))
+
+    i, y, w = i[keep], y[keep], w[keep]
+
+    # Sort once: by bin, then by value
+    order = np.lexsort((y, i))
+    i, y, w = i[order], y[order], w[order]
+
+    N = np.bincount(i, minlength=nb)
+    starts = np.searchsorted(i, np.arange(nb))
+    stops = starts + N - 1
+
+    sumw = _segment_sum(w, starts, N)
+    tot = _segment_sum(w * y, starts, N)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg = tot / sumw
+
+        # Two passes, for precision.
+        if weighted_scatter:
+            dy2 = (y - avg[i])**2
+            std = np.sqrt(_segment_sum(w * dy2, starts, N) / sumw)
+        else:
+            mu = _segment_sum(y, starts, N) / N
+            dy2 = (y - mu[i])**2
+            std = np.sqrt(_segment_sum(dy2, starts, N) / N)
+
+    ymin = np.full(nb, np.nan)
+    ymax = np.full(nb, np.nan)
+    ok = N > 0
+    ymin[ok] = y[starts[ok]]
+    ymax[ok] = y[stops[ok]]
+
+    data = {'N': N, 'sumw': sumw, 'sum': tot, 'avg': avg, 'std': std,
+        'min': ymin, 'max': ymax, 'y_sorted': y, 'w_sorted': w,
+        'starts': starts}
+
+    if percentiles is None:
+        return data
+
+    q = np.atleast_1d(percentiles).astype(float)
+    pct = np.full((q.size, nb), np.nan)
+
+    if not np.any(ok):
+        data['percentiles'] = pct
+        return data
+
+    if weighted_scatter:
+        # Centered cumulative weight within each bin, in [0, 1], offset by
+        # bin number so that it increases monotonically across all bins.
+        cw = np.cumsum(w)
+        offset = np.zeros(nb)
+        offset[ok] = cw[starts[ok]] - w[starts[ok]]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            key = i + (cw - 0.5 * w - offset[i]) / sumw[i]
+
+        b = np.flatnonzero(np.logical_and(ok, sumw > 0))
+        for k, qq in enumerate(q):
+            hi = np.searchsorted(key, b + qq)
+            hi = np.clip(hi, starts[b], stops[b])
+            lo = np.clip(hi - 1, starts[b], stops[b])
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                frac = (b + qq - key[lo]) / (key[hi] - key[lo])
+            frac = np.where(hi == lo, 0., np.clip(frac, 0., 1.))
+            frac[~np.isfinite(frac)] = 1.
+
+            pct[k,b] = y[lo] + frac * (y[hi] - y[lo])
+    else:
+        # Same as np.percentile (linear interpolation)
+        b = np.flatnonzero(ok)
+        for k, qq in enumerate(q):
+            pos = starts[b] + qq * (N[b] - 1)
+            lo = np.floor(pos).astype(int)
+            hi = np.minimum(lo + 1, stops[b])
+            pct[k,b] = y[lo] + (pos - lo) * (y[hi] - y[lo])
+
+    data['percentiles'] = pct
+
+    return data
+
+class BinnedStatistics(object):
+    def __init__(self, xbin_e, ybin_e=None, inclusive=False):
+        """
+        Accumulate statistics of `y` in bins of `x` one chunk at a time,
+        for sets of samples too big to hold in memory.
+
+        Counts, sums, means, and standard deviations are exact (chunks are
+        combined with the parallel algorithm of Chan et al. 1979).
+        Percentiles are computed from a histogram of `y` in each bin, so are
+        only as accurate as `ybin_e` allows.
+
+        Parameters
+        ----------
+        xbin_e : np.ndarray
+            Bin edges for `x`.
+        ybin_e : np.ndarray
+            Bin edges for `y`, used for percentiles. If None, percentiles
+            are unavailable.
+        inclusive : bool
+            Include samples below (above) the first (last) bin in that bin.
+
+        """
+        self.xbin_e = np.array(xbin_e)
+        self.ybin_e = None if ybin_e is None else np.array(ybin_e)
+        self.inclusive = inclusive
+
+        nb = self.xbin_e.size - 1
+
+        self.N = np.zeros(nb, dtype=int)
+        self.sumw = np.zeros(nb)
+        self.avg = np.zeros(nb)
+        self.M2 = np.zeros(nb)
+        self.min = np.full(nb, np.inf)
+        self.max = np.full(nb, -np.inf)
+
+        if self.ybin_e is not None:
+            self.hist = np.zeros((nb, self.ybin_e.size - 1))
+
+    def update(self, x, y, weights=None):
+        """
+        Add a chunk of samples.
+        """
+
+        new = bin_statistics(x, y, self.xbin_e, weights=weights,
+            inclusive=self.inclusive)
+
+        ok = new['N'] > 0
+        n1, n2 = self.sumw[ok], new['sumw'][ok]
+        n = n1 + n2
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = new['avg'][ok] - self.avg[ok]
+            avg = np.where(n > 0, self.avg[ok] + delta * n2 / n, 0.)
+            M2 = self.M2[ok] + new['std'][ok]**2 * n2 \
+                + np.where(n > 0, delta**2 * n1 * n2 / n, 0.)
+
+        self.avg[ok] = avg
+        self.M2[ok] = np.nan_to_num(M2)
+        self.sumw[ok] = n
+        self.N += new['N']
+        self.min[ok] = np.minimum(self.min[ok], new['min'][ok])
+        self.max[ok] = np.maximum(self.max[ok], new['max'][ok])
+
+        if self.ybin_e is None:
+            return
+
+        # Samples come back sorted by bin, so this is cheap.
+        ys, ws = new['y_sorted'], new['w_sorted']
+        ib = np.repeat(np.arange(new['N'].size), new['N'])
+        jb = np.searchsorted(self.ybin_e, ys, side='right') - 1
+        jb = np.clip(jb, 0, self.ybin_e.size - 2)
+        np.add.at(self.hist, (ib, jb), ws)
+
+    @property
+    def std(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.sqrt(self.M2 / self.sumw)
+
+    def percentile(self, q):
+        """
+        Percentiles (as fractions) of `y` in each bin.
+
+        Returns
+        -------
+        Array with shape (number of percentiles, number of bins).
+
+        """
+        q = np.atleast_1d(q)
+        cdf = np.cumsum(self.hist, axis=1)
+
+        pct = np.full((q.size, cdf.shape[0]), np.nan)
+        for b in np.flatnonzero(cdf[:,-1] > 0):
+            c = np.concatenate(([0.], cdf[b] / cdf[b,-1]))
+            pct[:,b] = np.interp(q, c, self.ybin_e)
+
+        return pct
+
+def _chunks(x, y, weights, chunksize):
+    for lo in range(0, len(x), chunksize):
+        w = None if weights is None else np.asarray(weights[lo:lo+chunksize])
+        yield np.asarray(x[lo:lo+chunksize]), np.asarray(y[lo:lo+chunksize]), w
+
 def quantify_scatter(x, y, xbin_c, weights=None, inclusive=False,
-    method_avg='avg', method_std='std', cdf_lim=0.7, pdf_bins=50):
+    method_avg='avg', method_std='std', cdf_lim=0.7, pdf_bins=50,
+    weighted_scatter=False, chunksize=None, ybin_e=None):
     """
     Quantify the scatter in some relationship between two variables, x and y.
 
@@ -348,7 +608,7 @@ def quantify_scatter(x, y, xbin_c, weights=None, inclusive=False,
         Include samples above or below bounding bins in said bins.
     method_avg : str
         How to quantify the average y value in each x bin.
-        Options: 'avg', 'median', 'mode'
+        Options: 'avg', 'median'
     method_std : str, float
         How to quantify the spread in y in each x bin.
         Options: 'std', 'normal', 'lognormal', 'bounds', 'pdf', float
@@ -360,6 +620,17 @@ def quantify_scatter(x, y, xbin_c, weights=None, inclusive=False,
         bin, include the PDF up until this value of the CDF when fitting the
         distribution. Essentially a kludge to exclude long tails in fit, to
         better capture peak and width of (main part of) the distribution.
+    weighted_scatter : bool
+        If True, apply `weights` to the standard deviation and percentiles
+        (and median) too, not just the average.
+    chunksize : int
+        If supplied, read `x`, `y`, and `weights` this many samples at a
+        time, e.g., if they're memory-mapped arrays or h5py datasets too big
+        to hold in memory. Percentiles are then approximate, computed from a
+        histogram of `y` in each bin with edges `ybin_e`.
+    ybin_e : np.ndarray
+        Bin edges for `y`, only needed if `chunksize` is supplied and
+        percentiles are requested.
 
     """
 
@@ -373,7 +644,7 @@ def quantify_scatter(x, y, xbin_c, weights=None, inclusive=False,
         else:
             have_weights = True
 
-    if not have_weights:
+    if (not have_weights) and (chunksize is None):
 
         if method_std in ['std', 'sum'] and method_avg == 'avg':
 
@@ -388,126 +659,152 @@ def quantify_scatter(x, y, xbin_c, weights=None, inclusive=False,
 
             return xbin_c, yavg, ysca, N
 
+    # Percentiles we'll need
+    if type(method_std) in [int, float, np.float64]:
+        q1 = 0.5 * (1. - method_std)
+        q = [q1, method_std + q1]
+    elif type(method_std) in [list, tuple]:
+        q = list(method_std[0:2])
+    else:
+        q = []
+
+    if method_avg == 'median':
+        q.append(0.5)
+
+    if chunksize is not None:
+        if (method_std in _dist_opts):
+            raise ValueError("Can't fit distributions in chunks.")
+        if q and (ybin_e is None):
+            raise ValueError("Must supply `ybin_e` to get percentiles in chunks.")
+
+        stats = BinnedStatistics(xbin_e, ybin_e if q else None, inclusive)
+
+        # Unweighted scatter needs its own accumulator.
+        if (weights is not None) and (not weighted_scatter) and \
+           (method_std != 'sum'):
+            scat = BinnedStatistics(xbin_e, ybin_e if q else None, inclusive)
+        else:
+            scat = stats
+
+        for _x, _y, _w in _chunks(x, y, weights, chunksize):
+            stats.update(_x, _y, _w)
+            if scat is not stats:
+                scat.update(_x, _y)
+
+        data = {'N': stats.N, 'sumw': stats.sumw, 'avg': stats.avg,
+            'sum': stats.avg * stats.sumw, 'std': scat.std,
+            'min': stats.min, 'max': stats.max}
+        if q:
+            data['percentiles'] = scat.percentile(q)
+    else:
+        data = bin_statistics(x, y, xbin_e, weights=weights,
+            percentiles=q if q else None,
+            weighted_scatter=weighted_scatter or (weights is None),
+            inclusive=inclusive)
+
+    # What to do when there aren't any samples in a bin?
+    # Move on, that's what. Add masked elements.
+    empty = np.logical_or(data['N'] == 0, data['sumw'] == 0)
+
+    # If we made it here, we've got some samples.
+    # Record the number of samples in this bin, the average value,
+    # and some measure of the scatter.
+    N = np.where(empty, 0, data['N'])
+
+    if method_avg == 'median':
+        yavg = data['percentiles'][-1].copy()
+    else:
+        yavg = data['avg'].copy()
+
+    yavg[empty] = -np.inf
+
+    if method_std == 'std':
+        ysca = data['std'].copy()
+    elif method_std == 'sum':
+        ysca = data['sum'].copy()
+    elif method_std == 'bounds':
+        ysca = np.array([data['min'], data['max']]).T
+    elif len(q) >= 2:
+        ysca = data['percentiles'][0:2].T.copy()
+    elif method_std in _dist_opts:
+        ysca = _fit_scatter(data, empty, method_std, cdf_lim, pdf_bins)
+    else:
+        raise NotImplemented('help')
+
+    if method_std not in _dist_opts:
+        ysca[empty] = -np.inf
+
+    return np.array(xbin_c), yavg, ysca, N
+
+def _fit_scatter(data, empty, method_std, cdf_lim, pdf_bins):
+    """
+    Fit the distribution of samples in each bin.
+    """
+
     ysca = []
-    yavg = []
-    N = []
-    for i, lo in enumerate(xbin_e):
-        if i == len(xbin_e) - 1:
-            break
+    for i, start in enumerate(data['starts']):
 
-        # Upper edge of bin
-        hi = xbin_e[i+1]
+        if empty[i]:
+            ysca.append(-np.inf)
+            continue
 
-        if inclusive and i == 0:
-            ok = x < hi
-            ok = np.logical_and(ok, np.isfinite(y))
-        elif inclusive and i == len(xbin_e) - 1:
-            ok = x >= lo
-            ok = np.logical_and(ok, np.isfinite(y))
+        f = data['y_sorted'][start:start+data['N'][i]]
+        w = data['w_sorted'][start:start+data['N'][i]]
+
+        if method_std.startswith('lognormal'):
+            pdf, ye = np.histogram(np.log10(f), density=1, weights=w,
+                bins=pdf_bins)
         else:
-            ok = np.logical_and(x >= lo, x < hi)
-            ok = np.logical_and(ok, np.isfinite(y))
+            pdf, ye = np.histogram(f, density=1, weights=w, bins=pdf_bins)
 
-        f = y[ok==1]
+        yc = bin_e2c(ye)
 
-        # What to do when there aren't any samples in a bin?
-        # Move on, that's what. Add masked elements.
-        if (f.size == 0) or (weights[ok==1].sum() == 0):
+        if method_std == 'pdf':
+            ysca.append((yc, pdf))
+            continue
 
-            yavg.append(-np.inf)
-            if method_std == 'bounds' or type(method_std) in [int, float, np.float64]:
-                ysca.append((-np.inf, -np.inf))
-            elif type(method_std) in [list, tuple]:
-                ysca.append((-np.inf, -np.inf))
-            else:
-                ysca.append(-np.inf)
+        cdf = np.cumsum(pdf) / np.sum(pdf)
 
-            N.append(0)
+        if method_std == 'cdf':
+            ysca.append((yc, cdf))
             continue
 
-        # If we made it here, we've got some samples.
-        # Record the number of samples in this bin, the average value,
-        # and some measure of the scatter.
-        N.append(sum(ok==1))
-
-        yavg.append(np.average(f, weights=weights[ok==1]))
-
-        if method_std == 'std':
-            ysca.append(np.std(f))
-        elif method_std == 'sum':
-            ysca.append(np.sum(f * weights[ok==1]))
-        elif method_std in _dist_opts:
-
-            if method_std.startswith('lognormal'):
-                pdf, ye = np.histogram(np.log10(y[ok==1]), density=1,
-                    weights=weights[ok==1], bins=pdf_bins)
-            else:
-                pdf, ye = np.histogram(y[ok==1], density=1,
-                    weights=weights[ok==1], bins=pdf_bins)
-
-            yc = bin_e2c(ye)
-
-            if method_std == 'pdf':
-                ysca.append((yc, pdf))
-                continue
-
-            cdf = np.cumsum(pdf) / np.sum(pdf)
-
-            if method_std == 'cdf':
-                ysca.append((yc, cdf))
-                continue
-
-            # Compute median to use as initial guess
-            med = np.interp(0.5, cdf, yc)
-            std = np.nanstd(y[ok==1]) if method_std.startswith('norm') \
-                else np.nanstd(np.log10(y[ok==1]))
-
-            # Make sure we go a little past the peak in the fit.
-            yc_fit = yc[cdf <= cdf_lim]
-            pdf_fit = pdf[cdf <= cdf_lim]
-
-            # If CDF very sharp, just use all of it.
-            if len(pdf_fit) < 3 + int('skewnormal' in method_std):
-                yc_fit = yc
-                pdf_fit = pdf
-
-            if 'skew' in method_std:
-                _model = _normal_skew
-                p0 = [pdf.max(), med, std, 1.1]
-            else:
-                _model = _normal
-                p0 = [pdf.max(), med, std]
-
-            print("guesses: {}".format(p0))
-
-            try:
-                pval, pcov = curve_fit(_model, yc_fit, pdf_fit,
-                    p0=p0, maxfev=100000)
-            except RuntimeError:
-                print("Gaussian fit failed!")
-                pval = [-np.inf] * (3 + int('skewnormal' in method_std))
-
-            if '-pars' in method_std:
-                ysca.append(pval)
-            else:
-                ysca.append(pval[2])
-
-        elif method_std == 'bounds':
-            ysca.append((np.min(f), np.max(f)))
-        elif type(method_std) in [int, float, np.float64]:
-            q1 = 0.5 * 100 * (1. - method_std)
-            q2 = 100 * method_std + q1
-            lo, hi = np.percentile(f, (q1, q2))
-            ysca.append((lo, hi))
-        elif type(method_std) in [list, tuple]:
-            q1 = 100 * method_std[0]
-            q2 = 100 * method_std[1]
-            lo, hi = np.percentile(f, (q1, q2))
-            ysca.append((lo, hi))
+        # Compute median to use as initial guess
+        med = np.interp(0.5, cdf, yc)
+        std = np.nanstd(f) if method_std.startswith('norm') \
+            else np.nanstd(np.log10(f))
+
+        # Make sure we go a little past the peak in the fit.
+        yc_fit = yc[cdf <= cdf_lim]
+        pdf_fit = pdf[cdf <= cdf_lim]
+
+        # If CDF very sharp, just use all of it.
+        if len(pdf_fit) < 3 + int('skewnormal' in method_std):
+            yc_fit = yc
+            pdf_fit = pdf
+
+        if 'skew' in method_std:
+            _model = _normal_skew
+            p0 = [pdf.max(), med, std, 1.1]
+        else:
+            _model = _normal
+            p0 = [pdf.max(), med, std]
+
+        print("guesses: {}".format(p0))
+
+        try:
+            pval, pcov = curve_fit(_model, yc_fit, pdf_fit,
+                p0=p0, maxfev=100000)
+        except RuntimeError:
+            print("Gaussian fit failed!")
+            pval = [-np.inf] * (3 + int('skewnormal' in method_std))
+
+        if '-pars' in method_std:
+            ysca.append(pval)
         else:
-            raise NotImplemented('help')
+            ysca.append(pval[2])
 
-    return np.array(xbin_c), np.array(yavg), np.array(ysca), np.array(N)
+    return np.array(ysca)
 
 def bin_samples(x, y, xbin_c, weights=None, limits=False, percentile=None,
     return_N=False, inclusive=False):
@@ -0,0 +1,248 @@
+"""
+
+TableCache.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 14:02:19 PDT 2026
+
+Description: Content-addressed, on-disk cache for lookup tables.
+
+"""
+
+import os
+import shutil
+import hashlib
+import numpy as np
+from .LRUCache import code_digest
+
+try:
+    # this runs with no issues in python 2 but raises error in python 3
+    basestring
+except:
+    # this try/except allows for python 2/3 compatible string type checking
+    basestring = str
+
+class UncacheableError(TypeError):
+    """
+    Raised when a key can't be computed, because some input can't be
+    compared by value.
+    """
+    pass
+
+def _canonical(value):
+    """
+    Convert `value` to a string that doesn't depend on dict ordering,
+    container type, or numpy vs. Python scalar types.
+
+    Functions are represented by a digest of their contents (see
+    `LRUCache.code_digest`), so that, e.g., two lambdas only share a key if
+    they compute the same thing. Anything that can only be compared by
+    identity raises an UncacheableError, since identity doesn't survive
+    between processes.
+    """
+    if isinstance(value, dict):
+        items = sorted(value.items(), key=lambda kv: str(kv[0]))
+        return '{' + ','.join(['{}:{}'.format(_canonical(k), _canonical(v)) \
+            for k, v in items]) + '}'
+    elif isinstance(value, (list, tuple)):
+        return '[' + ','.join([_canonical(v) for v in value]) + ']'
+    elif isinstance(value, np.ndarray):
+        return 'array({},{},{})'.format(value.dtype.str, value.shape,
+            hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest())
+    elif isinstance(value, np.generic):
+        return _canonical(value.item())
+    elif isinstance(value, bool) or value is None:
+        return repr(value)
+    elif isinstance(value, (int, float)):
+        # So that, e.g., 4 and 4.0 hash the same way
+        return repr(float(value))
+    elif isinstance(value, basestring):
+        return repr(str(value))
+    elif callable(value):
+        digest = code_digest(value)
+        if digest is None:
+            raise UncacheableError("Can't compute key for {!r}.".format(value))
+        return 'function({})'.format(digest)
+    elif ' at 0x' in repr(value):
+        raise UncacheableError("Can't compute key for {!r}.".format(value))
+    else:
+        return repr(value)
+
+class TableCache(object):
+    def __init__(self, path, maxsize=None):
+        """
+        Store sets of numpy arrays on disk, keyed by a hash of the inputs
+        that determined them.
+
+        Each entry is a directory containing one .npy file per array, so
+        arrays can be read back as read-only memory maps and shared by many
+        processes. Arrays are written to temporary files and moved into
+        place, so readers never see partially written arrays. Entries are
+        evicted in least-recently-used order once the total size of the cache
+        exceeds `maxsize`.
+
+        Parameters
+        ----------
+        path : str
+            Directory in which to store entries. Created if necessary.
+        maxsize : int, float
+            Disk budget in bytes. If None, entries are never evicted.
+
+        """
+        self.path = path
+        self.maxsize = maxsize
+
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, prefix='', **kwargs):
+        """
+        Compute key for a cache entry from the inputs that determine it.
+
+        Parameters
+        ----------
+        prefix : str
+            Human-readable prefix, e.g., the name a table would otherwise
+            have on disk.
+
+        Returns
+        -------
+        String that is unique to this combination of inputs. Raises an
+        UncacheableError if some input can only be compared by identity
+        (e.g., a bound method), in which case the caller should just
+        re-compute whatever it was going to cache.
+
+        """
+        sha = hashlib.sha1(_canonical(kwargs).encode('utf-8'))
+
+        if prefix:
+            return '{0!s}_{1!s}'.format(prefix, sha.hexdigest())
+
+        return sha.hexdigest()
+
+    def entry(self, key):
+        return '{0!s}/{1!s}'.format(self.path, key)
+
+    def load(self, key, names, mmap_mode='r'):
+        """
+        Retrieve arrays from the cache.
+
+        Parameters
+        ----------
+        key : str
+            Cache key, from `key`.
+        names : list
+            Names of arrays to retrieve. If any are missing, nothing is
+            returned.
+        mmap_mode : str, None
+            Passed to `np.load`. By default, arrays are read-only memory maps.
+
+        Returns
+        -------
+        Dictionary of arrays, or None if not all of them are in the cache.
+
+        """
+
+        entry = self.entry(key)
+
+        data = {}
+        for name in names:
+            fn = '{0!s}/{1!s}.npy'.format(entry, name)
+
+            # Another process may evict this entry while we're reading it.
+            # Memory maps that are already open remain valid.
+            try:
+                data[name] = np.load(fn, mmap_mode=mmap_mode)
+            except (IOError, OSError, ValueError):
+                self.misses += 1
+                return None
+
+        # Mark entry as recently used
+        try:
+            os.utime(entry, None)
+        except OSError:
+            pass
+
+        self.hits += 1
+
+        return data
+
+    def save(self, key, **arrays):
+        """
+        Add arrays to the cache entry `key` (creating it if need be).
+        """
+
+        entry = self.entry(key)
+
+        if not os.path.exists(entry):
+            try:
+                os.makedirs(entry)
+            except OSError:
+                # Someone else got there first.
+                pass
+
+        for name, arr in arrays.items():
+            fn = '{0!s}/{1!s}.npy'.format(entry, name)
+            tmp = '{0!s}/.{1!s}.{2}.tmp.npy'.format(entry, name, os.getpid())
+            np.save(tmp, np.asarray(arr))
+            os.replace(tmp, fn)
+
+        os.utime(entry, None)
+
+        self.evict(keep=key)
+
+    def entries(self):
+        """
+        Return list of (last access time, size in bytes, key) for all
+        entries, least recently used first.
+        """
+
+        if not os.path.exists(self.path):
+            return []
+
+        info = []
+        for key in os.listdir(self.path):
+            entry = self.entry(key)
+            if not os.path.isdir(entry):
+                continue
+
+            try:
+                size = sum([os.path.getsize('{0!s}/{1!s}'.format(entry, fn)) \
+                    for fn in os.listdir(entry)])
+                info.append((os.path.getmtime(entry), size, key))
+            except OSError:
+                continue
+
+        return sorted(info)
+
+    @property
+    def size(self):
+        return sum([element[1] for element in self.entries()])
+
+    def evict(self, keep=None):
+        """
+        Remove least recently used entries until cache fits in `maxsize`.
+
+        Parameters
+        ----------
+        keep : str
+            Key of an entry that should never be removed, e.g., the one just
+            written.
+
+        """
+
+        if self.maxsize is None:
+            return
+
+        entries = self.entries()
+        total = sum([element[1] for element in entries])
+
+        for t, size, key in entries:
+            if total <= self.maxsize:
+                break
+            if key == keep:
+                continue
+
+            shutil.rmtree(self.entry(key), ignore_errors=True)
+            total -= size
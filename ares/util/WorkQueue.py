@@ -0,0 +1,282 @@
+"""
+
+WorkQueue.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 22:31:09 PDT 2026
+
+Description: Queue of models to be run, ordered by their predicted cost,
+where costs are predicted using timings of the models that have already
+been run.
+
+"""
+
+import os
+import numpy as np
+from .Pickling import write_pickle_file, iter_pickle_file
+
+class CostModel(object):
+    def __init__(self, parameters, min_samples=None, regularization=1e-2):
+        """
+        Predict how long models will take to run, given their parameters.
+
+        The logarithm of the run-time is modeled as a quadratic function of
+        each parameter (no cross terms), fit by regularized least squares.
+        This is crude, but run-times of models in a grid can easily differ by
+        orders of magnitude, and getting those differences right to within
+        a factor of a few is all we need to decide what to run first.
+
+        Parameters
+        ----------
+        parameters : list
+            Names of parameters, i.e., labels for the columns of the `x`
+            arrays supplied to `add` and `predict`.
+        min_samples : int
+            Number of timings required before we trust the fit. By default,
+            twice the number of coefficients in the model.
+        regularization : float
+            Ridge penalty applied to all coefficients except the constant.
+
+        """
+        self.parameters = list(parameters)
+        self.regularization = regularization
+
+        if min_samples is None:
+            min_samples = 2 * self.Ncoeff
+        self.min_samples = min_samples
+
+        self._x = []
+        self._dt = []
+        self._unsaved = 0
+
+    @property
+    def Nd(self):
+        return len(self.parameters)
+
+    @property
+    def Ncoeff(self):
+        return 1 + 2 * self.Nd
+
+    @property
+    def Nsamples(self):
+        return len(self._dt)
+
+    @property
+    def x(self):
+        return np.reshape(np.array(self._x, dtype=float), (-1, self.Nd))
+
+    @property
+    def dt(self):
+        return np.array(self._dt, dtype=float)
+
+    def add(self, x, dt):
+        """
+        Record that the model with parameters `x` took `dt` seconds to run.
+        """
+        self._x.append(np.array(x, dtype=float).ravel())
+        self._dt.append(float(dt))
+        self._unsaved += 1
+
+    def _features(self, x):
+        z = (np.atleast_2d(x) - self._mu) / self._sigma
+        return np.hstack((np.ones((z.shape[0], 1)), z, z**2))
+
+    @property
+    def is_fitted(self):
+        return hasattr(self, '_coeff')
+
+    def fit(self):
+        """
+        Fit log(run-time) to the timings gathered so far.
+
+        Returns
+        -------
+        True if there were enough timings to do so, False otherwise.
+
+        """
+
+        if self.Nsamples < self.min_samples:
+            return False
+
+        x = self.x
+        y = np.log(np.maximum(self.dt, 1e-6))
+
+        self._mu = np.mean(x, axis=0)
+        self._sigma = np.std(x, axis=0)
+        self._sigma[self._sigma == 0] = 1.
+
+        A = self._features(x)
+
+        reg = self.regularization * np.ones(self.Ncoeff)
+        reg[0] = 0.0
+
+        self._coeff = np.linalg.solve(np.dot(A.T, A) + np.diag(reg),
+            np.dot(A.T, y))
+
+        return True
+
+    def predict(self, x):
+        """
+        Predicted run-time (in seconds) of models with parameters `x`.
+
+        Parameters
+        ----------
+        x : np.ndarray
+            Array of shape (number of models, number of parameters).
+
+        Returns
+        -------
+        Array of length number of models. If the model hasn't been fit yet,
+        every model is assigned the same cost (the median timing so far, or
+        unity if there are none).
+
+        """
+
+        x = np.atleast_2d(x)
+
+        if not self.is_fitted:
+            dt = 1. if self.Nsamples == 0 else np.median(self.dt)
+            return dt * np.ones(x.shape[0])
+
+        return np.exp(np.dot(self._features(x), self._coeff))
+
+    def save(self, fn):
+        """
+        Append timings that haven't yet been saved to file `fn`.
+        """
+        if self._unsaved == 0:
+            return
+
+        write_pickle_file({'parameters': self.parameters,
+            'x': self.x[-self._unsaved:], 'dt': self.dt[-self._unsaved:]},
+            fn, ndumps=1, open_mode='a', safe_mode=False, verbose=False)
+
+        self._unsaved = 0
+
+    def load(self, fn):
+        """
+        Read timings from file `fn`, e.g., from a previous run.
+
+        Only the columns corresponding to our parameters are used, so the
+        previous run needn't have varied exactly the same parameters. Entries
+        missing one or more of our parameters are ignored.
+
+        Returns
+        -------
+        Number of timings read.
+
+        """
+
+        if not os.path.exists(fn):
+            return 0
+
+        N = 0
+        for entry in iter_pickle_file(fn):
+            names = list(entry['parameters'])
+            if not set(self.parameters).issubset(names):
+                continue
+
+            cols = [names.index(par) for par in self.parameters]
+            x = np.reshape(entry['x'], (-1, len(names)))[:,cols]
+
+            self._x.extend(list(x))
+            self._dt.extend(list(np.ravel(entry['dt'])))
+            N += len(entry['dt'])
+
+        return N
+
+class WorkQueue(object):
+    def __init__(self, x, todo=None, cost_model=None, parameters=None):
+        """
+        Queue of models to be handed out one at a time, most expensive first.
+
+        Running the longest jobs first is a classic heuristic for minimizing
+        the time it takes a set of workers to finish a list of jobs: the
+        cheap models left at the end fill in the gaps. Initially, models are
+        handed out in the order supplied. Each time the number of timings
+        reported grows by 50% (once there are enough to fit), the cost model
+        is re-fit and the models still in the queue are re-ordered, so the
+        total overhead of re-sorting is O(N log N) per decade of timings.
+
+        Parameters
+        ----------
+        x : np.ndarray
+            Parameters of all models, shape (number of models, number of
+            parameters).
+        todo : np.ndarray
+            Indices (into first axis of `x`) of models that need to be run.
+            By default, all of them.
+        cost_model : CostModel
+            Optionally, a cost model that already has some timings, e.g.,
+            from a previous run.
+        parameters : list
+            Names of parameters. Only used to create a new cost model if
+            `cost_model` is None.
+
+        """
+        self.x = np.reshape(np.array(x, dtype=float), (len(x), -1))
+
+        if cost_model is None:
+            if parameters is None:
+                parameters = list(range(self.x.shape[1]))
+            cost_model = CostModel(parameters)
+
+        self.cost_model = cost_model
+
+        if todo is None:
+            todo = np.arange(self.x.shape[0])
+
+        self._queue = np.array(todo, dtype=int)
+        self._ptr = 0
+
+        self._next_fit = self.cost_model.min_samples
+        self._update()
+
+    def __len__(self):
+        return self._queue.size - self._ptr
+
+    def __iter__(self):
+        while True:
+            i = self.next()
+            if i is None:
+                break
+            yield i
+
+    @property
+    def remaining(self):
+        """ Indices of models still to be handed out, in order. """
+        return self._queue[self._ptr:]
+
+    def next(self):
+        """
+        Index of the next model to be run, or None if there are none left.
+        """
+        if self._ptr >= self._queue.size:
+            return None
+
+        i = int(self._queue[self._ptr])
+        self._ptr += 1
+        return i
+
+    def report(self, i, dt):
+        """
+        Record that model `i` took `dt` seconds to run.
+        """
+        self.cost_model.add(self.x[i], dt)
+
+        if self.cost_model.Nsamples >= self._next_fit:
+            self._update()
+
+    def _update(self):
+        if not self.cost_model.fit():
+            return
+
+        self._next_fit = int(np.ceil(1.5 * self.cost_model.Nsamples))
+
+        todo = self.remaining
+        if todo.size < 2:
+            return
+
+        cost = self.cost_model.predict(self.x[todo])
+        self._queue[self._ptr:] = todo[np.argsort(-cost, kind='stable')]
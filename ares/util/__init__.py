@@ -8,6 +8,14 @@ from ares.util.Aesthetics import labels
 from ares.util.WriteData import CheckPoints
 from ares.util.BlobBundles import BlobBundle
 from ares.util.ProgressBar import ProgressBar
+from ares.util.LRUCache import LRUCache
+from ares.util.TableCache import TableCache
+from ares.util.ChainIndex import ChainIndex
+from ares.util.ChainStore import ChainStore
+from ares.util.ParameterIndex import ParameterIndex
+from ares.util.CompletionIndex import CompletionIndex
+from ares.util.HistoryStore import HistoryStore
+from ares.util.WorkQueue import WorkQueue, CostModel
 from ares.util.ParameterFile import ParameterFile
 from ares.util.ReadData import read_lit, lit_options
 from ares.util.MagnitudeSystem import MagnitudeSystem
@@ -0,0 +1,131 @@
+"""
+
+test_analysis_blob_plan.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Mon Oct 19 02:41:18 PDT 2026
+
+Description: Test compiled blob specifications, including evaluation of
+blob functions declared vectorized over all independent variables at once.
+
+"""
+
+import numpy as np
+from ares.util import ParameterFile
+from ares.analysis.BlobFactory import BlobFactory, get_accessor
+
+class Thing(object):
+    def __init__(self, a):
+        self.a = a
+    def scale(self, z):
+        return self.a * z
+
+class Sim(BlobFactory):
+    def __init__(self, a, **kwargs):
+        self.pf = ParameterFile(**kwargs)
+        self.a = a
+        self.things = [Thing(a), Thing(2 * a)]
+        self.ncalls = 0
+        z = np.linspace(30, 5, 50)
+        self.history = {'z': z, 'x': a * (z + 1.)}
+
+    def vec(self, z):
+        self.ncalls += 1
+        return self.a * np.exp(-z / 10.)
+
+    def scalar(self, z):
+        # Only works element-wise.
+        self.ncalls += 1
+        if z > 10:
+            return self.a
+        return 2. * self.a
+
+    def tricky(self, z):
+        # Vectorizes properly for some models, but not all.
+        self.ncalls += 1
+        if self.a > 4:
+            return self.a * np.max(z) * np.ones_like(z)
+        return self.a * z
+
+    def surface(self, x, y, c=0.):
+        self.ncalls += 1
+        return self.a * x + y + c
+
+    def power(self, n):
+        return self.a**n
+
+z = np.arange(6, 20.)
+x = np.arange(3.)
+y = np.arange(4.)
+
+blob_pars = \
+{
+ 'blob_names': [['a', 'a2'], ['x', 'vec', 'scalar', 'thing'], ['surface']],
+ 'blob_ivars': [None, [('z', z)], [('x', x), ('y', y)]],
+ 'blob_funcs': [[None, 'power(2.0)'], [None, 'vec', 'scalar', 'things[1].scale'],
+    ['surface']],
+ 'blob_kwargs': [None, None, [{'c': 1.}]],
+ 'blob_vectorized': [None, [False, True, True, True], True],
+}
+
+def test():
+
+    get = get_accessor('things[1].scale')
+    assert get_accessor('things[1].scale') is get
+    assert get(Sim(2.))(3.) == 12.
+
+    for a in [1., 2., 3.]:
+        sim = Sim(a, **blob_pars)
+        blobs = sim.blobs
+
+        assert np.array_equal(blobs[0], [a, a**2])
+
+        assert blobs[1].shape == (4, z.size)
+        assert np.allclose(blobs[1][0], a * (z + 1.))
+        assert np.allclose(blobs[1][1], a * np.exp(-z / 10.))
+        assert np.array_equal(blobs[1][2], np.where(z > 10, a, 2 * a))
+        assert np.allclose(blobs[1][3], 2 * a * z)
+
+        assert blobs[2].shape == (1, x.size, y.size)
+        assert np.allclose(blobs[2][0], a * x[:,None] + y[None,:] + 1.)
+
+        # Same plan for all models
+        if a == 1.:
+            plan = sim.blob_plan
+            first = sim.ncalls
+        else:
+            assert sim.blob_plan is plan
+
+            # Vectorized functions called once each. `scalar` is declared
+            # vectorized but fails on arrays, so it's called once more for
+            # each element.
+            assert sim.ncalls == 3 + z.size
+
+    entries = plan.entries[1]
+    assert entries[1]['vectorized'] is True
+    assert entries[2]['vectorized'] is True
+    assert plan.entries[2][0]['vectorized'] is True
+
+    # Nothing to check against, so it's the same from the start.
+    assert first == sim.ncalls
+
+    # Not vectorized unless we say so, even if a function seems to be for
+    # the first few models.
+    pars = {'blob_names': [['tricky']], 'blob_ivars': [[('z', z)]],
+        'blob_funcs': [['tricky']], 'blob_kwargs': [None]}
+    for a in range(1, 14):
+        sim = Sim(float(a), **pars)
+        assert np.allclose(sim.blobs[0][0], a * z)
+        assert sim.ncalls == z.size
+
+    assert sim.blob_plan.entries[0][0]['vectorized'] is False
+
+    # A function declared vectorized is trusted.
+    pars['blob_vectorized'] = True
+    sim = Sim(2., **pars)
+    assert np.allclose(sim.blobs[0][0], 2 * z)
+    assert sim.ncalls == 1
+
+if __name__ == '__main__':
+    test()
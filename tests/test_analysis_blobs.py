@@ -12,6 +12,7 @@ Description:
 
 import os
 import ares
+import shutil
 import numpy as np
 import matplotlib.pyplot as pl
 from ares.util.Pickling import write_pickle_file
@@ -168,6 +169,8 @@ def test(Ns=500, Nd=4, prefix='test'):
     
         for blob in blob_grp:
             os.remove('{0!s}.blob_{1}d.{2!s}.pkl'.format(prefix, nd, blob))
+
+    shutil.rmtree('{!s}.index'.format(prefix), ignore_errors=True)
     
     assert True
     
@@ -0,0 +1,143 @@
+"""
+
+test_analysis_model_set_index.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 21:47:15 PDT 2026
+
+Description: Test memory-mapped reading of pickled MCMC output, and
+`skip`/`stop` in ModelSet.
+
+"""
+
+import os
+import glob
+import ares
+import shutil
+import numpy as np
+from ares.util.ChainStore import ChainStore
+from ares.util.Pickling import write_pickle_file
+from ares.util.ReadData import flatten_chain, flatten_logL
+
+def _cleanup(prefix):
+    for fn in glob.glob('{!s}.*'.format(prefix)):
+        if os.path.isdir(fn):
+            shutil.rmtree(fn)
+        else:
+            os.remove(fn)
+
+def test():
+
+    prefix = 'test_model_set_index'
+    _cleanup(prefix)
+
+    nwalkers = 4
+
+    write_pickle_file((['x', 'y'], [False, False]),
+        '{!s}.pinfo.pkl'.format(prefix), open_mode='w')
+    write_pickle_file((nwalkers, 3, 6), '{!s}.rinfo.pkl'.format(prefix),
+        open_mode='w')
+    write_pickle_file({'blob_names': [['b']],
+        'blob_ivars': [[('z', np.arange(5.))]], 'blob_funcs': [None]},
+        '{!s}.binfo.pkl'.format(prefix), open_mode='w')
+
+    # Two checkpoints
+    store = ChainStore('{!s}.hdf5'.format(prefix))
+    store.create(['x', 'y'], [False, False], nwalkers)
+    for i in range(2):
+        pos = np.random.rand(3, nwalkers, 2)
+        chain = np.array(flatten_chain(pos))
+        logL = np.array(flatten_logL(pos[:,:,1]))
+        blob = np.outer(chain[:,0], np.arange(5.))
+        write_pickle_file(chain, '{!s}.chain.pkl'.format(prefix),
+            open_mode='a')
+        write_pickle_file(logL, '{!s}.logL.pkl'.format(prefix),
+            open_mode='a')
+        write_pickle_file(blob, '{!s}.blob_1d.b.pkl'.format(prefix),
+            open_mode='a')
+
+        store.write_checkpoint(3, chain, logL, blobs={'b': blob})
+
+    # Read the old-fashioned way
+    anl = ares.analysis.ModelSet(prefix, verbose=False)
+    anl.use_index = False
+    chain = np.array(anl.chain)
+    logL = np.array(anl.logL)
+    blob = np.array(anl.get_blob('b'))
+
+    assert chain.shape == (6 * nwalkers, 2)
+
+    # Via index: first time builds it, second time just memory-maps it.
+    for i in range(2):
+        anl = ares.analysis.ModelSet(prefix, verbose=False)
+        assert isinstance(anl.chain.data, np.memmap)
+        assert np.array_equal(anl.chain, chain)
+        assert np.array_equal(anl.logL, logL)
+        assert np.array_equal(anl.get_blob('b'), blob)
+        assert np.array_equal(anl.get_blob('b', ivar=2.), blob[:,2])
+
+    assert os.path.exists('{!s}.index/chain.npy'.format(prefix))
+
+    # Re-build if outputs change
+    write_pickle_file(chain[0:nwalkers], '{!s}.chain.pkl'.format(prefix),
+        open_mode='a')
+    anl = ares.analysis.ModelSet(prefix, verbose=False)
+    assert anl.chain.shape == (7 * nwalkers, 2)
+
+    # skip and stop
+    anl = ares.analysis.ModelSet(prefix, verbose=False)
+    anl.skip = 5
+    anl.stop = 20
+    assert np.array_equal(anl.chain, chain[5:20])
+    assert np.array_equal(anl.logL, logL[5:20])
+    assert np.array_equal(anl.get_blob('b'), blob[5:20])
+
+    # Masks survive changes to skip and stop
+    mask = np.zeros((15, 2), dtype=bool)
+    mask[7] = True
+    anl.mask = mask
+    anl.skip = 6
+    assert anl.mask.shape == (14, 2)
+    assert np.array_equal(np.flatnonzero(anl.logL.mask), [6])
+
+    # Same for HDF5 outputs
+    for suffix in ['chain.pkl', 'logL.pkl', 'blob_1d.b.pkl']:
+        os.remove('{!s}.{!s}'.format(prefix, suffix))
+
+    anl = ares.analysis.ModelSet(prefix, verbose=False)
+    anl.skip = 5
+    anl.stop = 20
+    assert np.array_equal(anl.chain, chain[5:20])
+    assert np.array_equal(anl.logL, logL[5:20])
+    assert np.array_equal(anl.get_blob('b'), blob[5:20])
+
+    _cleanup(prefix)
+
+    # Chunks that weren't flattened, i.e., with shape (steps, walkers, ...),
+    # come out walker by walker, like flattened ones.
+    fn = '{!s}.chain.pkl'.format(prefix)
+    chunks = [np.random.rand(3, nwalkers, 2) for i in range(2)]
+    for chunk in chunks:
+        write_pickle_file(chunk, fn, open_mode='a')
+
+    index = ares.util.ChainIndex('{!s}.index'.format(prefix))
+    chain = index.load('chain', [fn], ndim=2)
+    assert np.array_equal(chain,
+        np.concatenate([flatten_chain(chunk) for chunk in chunks]))
+
+    # Temporary files are removed even if the build fails.
+    write_pickle_file(np.random.rand(3, nwalkers, 3), fn, open_mode='a')
+    try:
+        index.build('chain', [fn], ndim=2)
+    except AssertionError:
+        pass
+    else:
+        raise AssertionError('Inconsistent shapes should be caught!')
+
+    assert glob.glob('{!s}.index/*.tmp.*'.format(prefix)) == []
+
+    _cleanup(prefix)
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,105 @@
+"""
+
+test_analysis_model_set_slice.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Mon Oct 19 04:40:22 PDT 2026
+
+Description: Test parameter-space index, and slicing of ModelSets with it.
+
+"""
+
+import os
+import glob
+import ares
+import shutil
+import numpy as np
+from ares.util.Pickling import write_pickle_file
+from ares.util.ParameterIndex import ParameterIndex, points_in_polygon
+
+def _cleanup(prefix):
+    for fn in glob.glob('{!s}.*'.format(prefix)):
+        if os.path.isdir(fn):
+            shutil.rmtree(fn)
+        else:
+            os.remove(fn)
+
+def test():
+
+    rng = np.random.RandomState(123)
+
+    # Index on its own
+    pts = rng.rand(5000, 3)
+    pts[::50,1] = np.nan
+    pts[1,0:2] = 0.5
+    index = ParameterIndex(pts)
+
+    bounds = [(0.2, 0.4), (None, 0.5), (0.9, None)]
+    ok = (pts[:,0] >= 0.2) & (pts[:,0] <= 0.4) & (pts[:,1] <= 0.5) \
+       & (pts[:,2] >= 0.9)
+    assert np.array_equal(index.range(bounds), np.flatnonzero(ok))
+    assert np.array_equal(index.range([(0.5, 0.6)], axes=[2]),
+        np.flatnonzero((pts[:,2] >= 0.5) & (pts[:,2] <= 0.6)))
+
+    # Triangle (with a point on an edge)
+    tri = np.array([[0., 0.], [1., 0.], [0., 1.]])
+    elements = index.polygon(tri, axes=(0, 1))
+    x, y = pts[:,0], pts[:,1]
+    assert np.array_equal(elements, np.flatnonzero(x + y <= 1))
+    assert 1 in elements
+    assert np.array_equal(points_in_polygon(np.array([0.1, 0.9, -0.1]),
+        np.array([0.1, 0.9, 0.5]), tri), [True, False, False])
+
+    dist, loc = index.nearest([0.5, 0.5, 0.5], k=3)
+    d = np.sqrt(np.sum(((pts - 0.5) / index.scale)**2, axis=1))
+    d[np.isnan(d)] = np.inf
+    assert np.array_equal(loc, np.argsort(d)[0:3])
+
+    # Now within a ModelSet
+    prefix = 'test_model_set_slice'
+    _cleanup(prefix)
+
+    chain = rng.normal(size=(4000, 2))
+    write_pickle_file((['x', 'y'], [False, False]),
+        '{!s}.pinfo.pkl'.format(prefix), open_mode='w')
+    write_pickle_file((4, 1000, 1), '{!s}.rinfo.pkl'.format(prefix),
+        open_mode='w')
+    write_pickle_file(chain, '{!s}.chain.pkl'.format(prefix), open_mode='w')
+    write_pickle_file(-np.sum(chain**2, axis=1),
+        '{!s}.logL.pkl'.format(prefix), open_mode='w')
+
+    anl = ares.analysis.ModelSet(prefix, verbose=False)
+
+    sub = anl.Slice((-0.5, 1., 0., 2.), ['x', 'y'])
+    ok = (chain[:,0] >= -0.5) & (chain[:,0] <= 1.) & (chain[:,1] >= 0.) \
+       & (chain[:,1] <= 2.)
+    assert np.array_equal(sub.elements, np.flatnonzero(ok))
+    assert np.array_equal(np.flatnonzero(~sub.mask[:,0]), np.flatnonzero(ok))
+
+    # Index saved next to the chain, and re-used.
+    assert glob.glob('{!s}.index/parameters/*/order.npy'.format(prefix))
+    anl = ares.analysis.ModelSet(prefix, verbose=False)
+    assert isinstance(anl.parameter_index.order, np.memmap)
+
+    # Slices of slices
+    sub2 = sub.Slice((0.5, 3.), ['y'])
+    assert np.array_equal(sub2.elements,
+        np.flatnonzero(ok & (chain[:,1] >= 0.5)))
+
+    # Slice by quantities other than parameters
+    sub = anl.Slice((-1., -0.5), ['logL'])
+    ok = (-np.sum(chain**2, axis=1) >= -1.) & (-np.sum(chain**2, axis=1) <= -0.5)
+    assert np.array_equal(sub.elements, np.flatnonzero(ok))
+
+    sub = anl.SliceByPolygon(['x', 'y'], tri)
+    assert np.array_equal(sub.elements,
+        np.flatnonzero(points_in_polygon(chain[:,0], chain[:,1], tri)))
+
+    sub = anl.SliceByParameters([{'x': chain[7,0], 'y': chain[7,1]}])
+    assert np.array_equal(sub.elements, [7])
+
+    _cleanup(prefix)
+
+if __name__ == '__main__':
+    test()
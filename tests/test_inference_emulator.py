@@ -0,0 +1,124 @@
+"""
+
+test_inference_emulator.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Mon Oct 19 03:22:50 PDT 2026
+
+Description: Test active-learning emulator, and its use as a stand-in for
+a simulation class.
+
+"""
+
+import numpy as np
+from ares.inference.ModelEmulator import ModelEmulator, GaussianProcessPCA
+
+class FakeSimulation(object):
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+    def run(self):
+        z = np.linspace(40, 5, 200)
+        A, z0 = self.kwargs['A'], self.kwargs['z0']
+        self.history = {'z': z, 'dTb': -A * np.exp(-0.5 * (z - z0)**2 / 9.)}
+
+def test(tol=3.):
+
+    # GP on its own: interpolates training data, error grows away from it.
+    X = np.linspace(0, 1, 8)[:,None]
+    Y = np.sin(np.outer(X[:,0], np.arange(1, 4)))
+    gp = GaussianProcessPCA(nmodes=3)
+    gp.fit(X, Y)
+    recon, err, cov, w, werr = gp.predict(X)
+    assert np.allclose(recon, Y, atol=1e-3)
+    assert np.all(gp.predict([[2.]])[1] > err.max())
+
+    z = np.arange(6, 30, 0.5)
+
+    emu = ModelEmulator()
+    nsim = emu.learn(FakeSimulation, ['A', 'z0'], [(1., 3.), (12., 20.)],
+        is_log=[True, False], ivars=z, tol=tol, Nmax=80, Ncand=500, seed=1,
+        verbose=False)
+
+    assert nsim < 80
+    assert emu.max_err[-1] < tol
+
+    # Check predictions against the real thing. The predicted error is
+    # only an estimate, so allow some slack.
+    rng = np.random.RandomState(2)
+    for i in range(10):
+        x = np.array([1. + 2. * rng.rand(), 12. + 8. * rng.rand()])
+        sim = FakeSimulation(A=10**x[0], z0=x[1])
+        sim.run()
+        assert np.allclose(emu.predict(x), emu._extract(sim), atol=2 * tol)
+
+    # Drop-in simulator
+    defaults = {'A': 100., 'z0': 15.}
+    simulator = emu.create_simulator(defaults, tol=tol, update_every=1)
+
+    sim = simulator(z0=16.)
+    sim.run()
+    assert sim.emulated
+    assert sim.history['z'][0] > sim.history['z'][-1]
+
+    true = FakeSimulation(A=100., z0=16.)
+    true.run()
+    assert np.allclose(sim.history['dTb'], emu._extract(true)[-1::-1],
+        atol=2 * tol)
+
+    # Out of tolerance: runs the real thing (and learns from it).
+    N = emu.X.shape[0]
+    simulator.tol = 1e-8
+    sim = simulator(z0=16.)
+    sim.run()
+    assert not sim.emulated
+    assert np.array_equal(sim.history['dTb'], true.history['dTb'])
+    assert (simulator.nemulated, simulator.nfallback) == (1, 1)
+    assert emu.X.shape[0] == N + 1
+
+    # Once frozen (i.e., sampling), the emulator stops learning.
+    simulator.freeze()
+    sim = simulator(z0=17.)
+    sim.run()
+    assert not sim.emulated
+    assert emu.X.shape[0] == N + 1
+
+    # Emulator trained on models we ran ourselves, i.e., without `learn`.
+    emu = ModelEmulator()
+    emu.parameters = ['A', 'z0']
+    emu.ivar_arr = z
+
+    try:
+        emu.create_simulator(defaults)
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError('Untrained emulator should raise an error.')
+
+    X = np.array([(A, z0) for A in [10., 100., 1000.] \
+        for z0 in np.linspace(12., 20., 9)])
+    Y = []
+    for A, z0 in X:
+        true = FakeSimulation(A=A, z0=z0)
+        true.run()
+        Y.append(emu._extract(true))
+
+    emu.add(X, np.array(Y))
+    assert emu.is_log == [False, False]
+
+    simulator = emu.create_simulator(defaults, tol=1e-8,
+        fallback=FakeSimulation)
+    sim = simulator(z0=16.)
+    sim.run()
+    assert not sim.emulated
+    assert simulator.pending[0][0][1] == 16.
+
+    simulator.tol = None
+    sim = simulator(z0=16.)
+    sim.run()
+    assert sim.emulated
+    assert 'dTb_err' in sim.history
+
+if __name__ == '__main__':
+    test()
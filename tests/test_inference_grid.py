@@ -13,6 +13,7 @@ Description:
 import os
 import glob
 import ares
+import shutil
 import numpy as np
 
 def test():
@@ -73,7 +74,10 @@ def test():
     # Iterate over the list of filepaths & remove each file.
     for fn in mcmc_files:
         try:
-            os.remove(fn)
+            if os.path.isdir(fn):
+                shutil.rmtree(fn)
+            else:
+                os.remove(fn)
         except:
             print("Error while deleting file : ", filePath)
 
@@ -0,0 +1,159 @@
+"""
+
+test_inference_grid_dynamic.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 22:58:41 PDT 2026
+
+Description: Test dynamic load-balancing of model grids, i.e., handing out
+models most-expensive-first using a cost model fit to timings.
+
+"""
+
+import os
+import glob
+import ares
+import shutil
+import numpy as np
+from ares.util.WorkQueue import CostModel, WorkQueue
+
+class FakeSimulation(object):
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+    def run(self):
+        self.blobs = [[self.kwargs['x'] * self.kwargs['y']]]
+
+class FlakySimulation(FakeSimulation):
+    def __init__(self, **kwargs):
+        # Fails before `run`, so it isn't caught by ModelGrid._run_sim.
+        if kwargs['x'] == 3:
+            raise ValueError('Bad model!')
+        FakeSimulation.__init__(self, **kwargs)
+
+def _cleanup(prefix):
+    for fn in glob.glob('{!s}.*'.format(prefix)):
+        if os.path.isdir(fn):
+            shutil.rmtree(fn)
+        else:
+            os.remove(fn)
+
+def test():
+
+    ##
+    # Cost model and queue
+    ##
+    x = np.random.rand(200, 2)
+    cost = lambda x: np.exp(5 * x[:,0] + x[:,1]**2)
+
+    queue = WorkQueue(x, parameters=['x', 'y'])
+
+    # Until there are enough timings, models come out in the order supplied.
+    first = [queue.next() for i in range(queue.cost_model.min_samples)]
+    assert first == list(range(queue.cost_model.min_samples))
+
+    for i in first:
+        queue.report(i, cost(x[i:i+1])[0])
+
+    # Now, most expensive first.
+    assert queue.cost_model.is_fitted
+    rest = queue.remaining
+    assert np.all(np.diff(queue.cost_model.predict(x[rest])) <= 0)
+    assert np.corrcoef(np.log(cost(x[rest])),
+        np.log(queue.cost_model.predict(x[rest])))[0,1] > 0.99
+
+    assert len(queue) == 200 - len(first)
+    assert sorted(first + [i for i in queue]) == list(range(200))
+    assert queue.next() is None
+
+    # Timings can be saved and used to warm-start a new run, even if it
+    # only varies some of the same parameters.
+    fn = 'test_work_queue.timing.pkl'
+    if os.path.exists(fn):
+        os.remove(fn)
+
+    queue.cost_model.save(fn)
+    assert queue.cost_model._unsaved == 0
+
+    cm = CostModel(['x'])
+    assert cm.load(fn) == len(first)
+    assert np.array_equal(cm.x[:,0], x[first,0])
+
+    os.remove(fn)
+
+    ##
+    # Grid: serial, via local processes, and upon restart.
+    ##
+    base_pars = \
+    {
+     'blob_names': [['xy']],
+     'blob_ivars': [None],
+     'blob_funcs': [None],
+    }
+
+    xx = np.arange(1, 6)
+    yy = np.arange(1, 4)
+
+    for nprocs in [None, 2]:
+        prefix = 'test_grid_dynamic'
+        _cleanup(prefix)
+
+        mg = ares.inference.ModelGrid(**base_pars)
+        mg._simulator = FakeSimulation
+        mg.reuse_splines = False
+        mg.axes = {'x': xx, 'y': yy}
+        mg.LoadBalance(4)
+        mg.nprocs = nprocs
+        mg.run(prefix, clobber=True, save_freq=4, use_pb=False)
+
+        assert os.path.exists('{!s}.timing.pkl'.format(prefix))
+        assert not os.path.exists('{!s}.load.pkl'.format(prefix))
+
+        mg = ares.inference.ModelGrid(**base_pars)
+        mg._simulator = FakeSimulation
+        mg.reuse_splines = False
+        mg.axes = {'x': xx, 'y': np.arange(1, 6)}
+        mg.LoadBalance(4)
+        mg.nprocs = nprocs
+        mg.run(prefix, restart=True, save_freq=4, use_pb=False)
+
+        # Timings from the first run were used.
+        assert mg.cost_model.Nsamples == xx.size * 5
+
+        anl = ares.analysis.ModelSet(prefix, verbose=False)
+        chain = np.array(anl.chain)
+
+        assert chain.shape == (xx.size * 5, 2)
+        assert len(set(map(tuple, chain))) == chain.shape[0]
+        assert np.array_equal(anl.get_blob('xy'), chain[:,0] * chain[:,1])
+
+        _cleanup(prefix)
+
+    # With local processes, a failure is recorded and the grid carries on.
+    mg = ares.inference.ModelGrid(**base_pars)
+    mg._simulator = FlakySimulation
+    mg.reuse_splines = False
+    mg.axes = {'x': xx, 'y': yy}
+    mg.LoadBalance(4)
+    mg.nprocs = 2
+    mg.run(prefix, clobber=True, save_freq=4, use_pb=False)
+
+    # Each worker had its own checkpoint file.
+    assert not os.path.exists('{!s}.000.checkpt.txt'.format(prefix))
+    assert len(glob.glob('{!s}.000.*.checkpt.txt'.format(prefix))) == 2
+    assert os.path.exists('{!s}.000.fail.pkl'.format(prefix))
+
+    anl = ares.analysis.ModelSet(prefix, verbose=False)
+    chain = np.array(anl.chain)
+    xy = anl.get_blob('xy')
+
+    assert chain.shape == (xx.size * yy.size, 2)
+    assert np.all(np.ma.getmaskarray(xy)[chain[:,0] == 3])
+    assert np.array_equal(xy[chain[:,0] != 3],
+        (chain[:,0] * chain[:,1])[chain[:,0] != 3])
+
+    _cleanup(prefix)
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,155 @@
+"""
+
+test_inference_grid_restart.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 23:51:07 PDT 2026
+
+Description: Test restarting model grids via the completion index.
+
+"""
+
+import os
+import glob
+import ares
+import shutil
+import numpy as np
+from ares.util.CompletionIndex import CompletionIndex
+
+class FakeSimulation(object):
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+    def run(self):
+        self.blobs = [[self.kwargs['x'] * self.kwargs['y']]]
+
+def _cleanup(prefix):
+    for fn in glob.glob('{!s}.*'.format(prefix)):
+        if os.path.isdir(fn):
+            shutil.rmtree(fn)
+        else:
+            os.remove(fn)
+
+def _grid(prefix, **kwargs):
+    mg = ares.inference.ModelGrid(blob_names=[['xy']], blob_ivars=[None],
+        blob_funcs=[None])
+    mg._simulator = FakeSimulation
+    mg.reuse_splines = False
+
+    if 'models' in kwargs:
+        mg.set_models(kwargs['models'])
+        mg.is_log = [False] * 2
+    else:
+        mg.axes = kwargs
+
+    return mg
+
+def test():
+
+    prefix = 'test_grid_restart'
+    _cleanup(prefix)
+
+    ##
+    # Index itself: bitmap + journals from any number of processors.
+    ##
+    index = CompletionIndex(prefix)
+    index.write(np.arange(20) < 3, signature='abc')
+    index.mark([5, 6], 0)
+    index.mark([19], 7)
+
+    # A journal entry cut off mid-write is ignored
+    with open(index.journal(7), 'ab') as f:
+        f.write(b'\x01\x02\x03')
+
+    info = index.read()
+    assert info['signature'] == 'abc'
+    assert np.array_equal(np.flatnonzero(info['done']), [0, 1, 2, 5, 6, 19])
+
+    # Journals of a run whose prefix merely starts with ours don't count
+    other = CompletionIndex(prefix + '.big')
+    other.mark([10, 11], 1)
+    assert other.journal(1) not in index.journals
+    assert not np.any(index.read()['done'][[10, 11]])
+    other.reset()
+
+    index.write(info['done'], signature='abc')
+    assert index.journals == []
+    assert np.array_equal(index.read()['done'], info['done'])
+
+    index.reset()
+    assert not index.exists
+
+    ##
+    # Grid, interrupted after the first checkpoint
+    ##
+    xx = np.arange(1, 6)
+
+    mg = _grid(prefix, x=xx, y=np.arange(1, 4))
+    mg.run(prefix, clobber=True, save_freq=4, use_pb=False, exit_after=1)
+
+    assert np.sum(index.read()['done']) == 4
+
+    # Restart doesn't need the outputs to know what's been done.
+    mg = _grid(prefix, x=xx, y=np.arange(1, 4))
+    mg.run(prefix, restart=True, save_freq=4, use_pb=False)
+
+    assert np.all(mg.done[np.unravel_index(np.arange(4), mg.grid.shape)])
+    assert np.all(index.read()['done'])
+
+    # Change grid: new models only
+    mg = _grid(prefix, x=xx, y=np.arange(1, 6))
+    mg.run(prefix, restart=True, save_freq=4, use_pb=False)
+
+    assert mg.done.sum() == 15
+    assert np.all(index.read()['done'])
+
+    anl = ares.analysis.ModelSet(prefix, verbose=False)
+    chain = np.array(anl.chain)
+    assert chain.shape == (25, 2)
+    assert len(set(map(tuple, chain))) == 25
+    assert np.array_equal(anl.get_blob('xy'), chain[:,0] * chain[:,1])
+
+    _cleanup(prefix)
+
+    ##
+    # Same for models set by hand.
+    ##
+    models = [{'x': float(x), 'y': float(x)**2} for x in range(10)]
+
+    mg = _grid(prefix, models=models)
+    mg.run(prefix, clobber=True, save_freq=3, use_pb=False, exit_after=1)
+
+    mg = _grid(prefix, models=models)
+    mg.run(prefix, restart=True, save_freq=3, use_pb=False)
+
+    assert mg.done.sum() == 3
+
+    anl = ares.analysis.ModelSet(prefix, verbose=False)
+    assert np.array(anl.chain).shape == (10, 2)
+
+    # Outputs from before the index existed: seed it from the chains.
+    _cleanup(prefix)
+    mg = _grid(prefix, models=models)
+    mg.run(prefix, clobber=True, save_freq=3, use_pb=False, exit_after=1)
+    index.reset()
+
+    mg = _grid(prefix, models=models)
+    mg.run(prefix, restart=True, save_freq=3, use_pb=False)
+
+    assert mg.done.sum() == 3
+    assert np.all(index.read()['done'])
+
+    anl = ares.analysis.ModelSet(prefix, verbose=False)
+    chain = np.array(anl.chain)
+    assert chain.shape == (10, 2)
+    assert len(set(map(tuple, chain))) == 10
+
+    # Different models: index doesn't apply.
+    mg = _grid(prefix, models=models[::-1])
+    assert mg._read_restart_index(prefix) is None
+
+    _cleanup(prefix)
+
+if __name__ == '__main__':
+    test()
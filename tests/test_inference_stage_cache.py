@@ -0,0 +1,153 @@
+"""
+
+test_inference_stage_cache.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Mon Oct 19 02:04:33 PDT 2026
+
+Description: Test re-use of simulation products between likelihood
+evaluations, e.g., the UV background when only X-ray parameters change.
+
+"""
+
+import os
+import ares
+import shutil
+import numpy as np
+from ares.inference.ModelFit import loglikelihood
+from ares.inference.StageCache import StageCache
+
+pars = \
+{
+ 'num_populations': 2,
+
+ # UV population
+ 'pop_sfr_model{0}': 'sfrd-func',
+ 'pop_sfrd{0}': lambda z: 0.1 * (1. + z)**-6.,
+ 'pop_sfrd_units{0}': 'msun/yr/mpc^3',
+ 'pop_sed{0}': 'pl',
+ 'pop_alpha{0}': 0.,
+ 'pop_Emin{0}': 1.,
+ 'pop_Emax{0}': 1e2,
+ 'pop_EminNorm{0}': 13.6,
+ 'pop_EmaxNorm{0}': 1e2,
+ 'pop_rad_yield{0}': 1e57,
+ 'pop_rad_yield_units{0}': 'photons/msun',
+ 'pop_solve_rte{0}': True,
+
+ # X-ray population
+ 'pop_sfr_model{1}': 'sfrd-func',
+ 'pop_sfrd{1}': lambda z: 0.1 * (1. + z)**-6.,
+ 'pop_sfrd_units{1}': 'msun/yr/mpc^3',
+ 'pop_sed{1}': 'pl',
+ 'pop_alpha{1}': -2.,
+ 'pop_Emin{1}': 2e2,
+ 'pop_Emax{1}': 3e4,
+ 'pop_EminNorm{1}': 2e2,
+ 'pop_EmaxNorm{1}': 3e4,
+ 'pop_logN{1}': -np.inf,
+ 'pop_solve_rte{1}': True,
+
+ "lya_nmax": 8,
+ 'tau_redshift_bins': 100,
+ 'initial_redshift': 40.,
+ 'final_redshift': 10.,
+ 'rte_precompute_history': True,
+}
+
+class Background(ares.simulations.MetaGalacticBackground):
+    def run(self):
+        ares.simulations.MetaGalacticBackground.run(self)
+        self.blobs = [[self.get_history(popid=i, flatten=True)[2].sum() \
+            for i in range(2)]]
+
+class Prior(object):
+    params = []
+    def log_value(self, point):
+        return 0.0
+
+class Fitter(object):
+    def loglikelihood(self, sim):
+        return -np.log10(sim.blobs[0][1])
+
+def _evaluate(p, memo):
+    return loglikelihood(p, 'test_stage_cache', parameters, [True, True],
+        Prior(), Prior(), [[np.nan, np.nan]], base_kwargs, False, Background,
+        [Fitter()], False, memo)
+
+parameters = ['pop_rad_yield{0}', 'pop_rad_yield{1}']
+base_kwargs = {key: pars[key] for key in pars if key not in parameters}
+
+def test():
+
+    path = 'test_stage_cache.tmp'
+    if os.path.exists(path):
+        shutil.rmtree(path)
+
+    memo = StageCache(parameters, base_kwargs, maxsize=4, path=path)
+    assert set(memo.stages.keys()) == \
+        set(['result', 'hmf', 'src{0}', 'src{1}', 'rte{0}', 'rte{1}'])
+
+    # Only pop #1 depends on pop #1's parameters.
+    assert memo.stages['rte{0}'] == [0]
+    assert memo.stages['rte{1}'] == [1]
+
+    p0 = np.array([57., 39.])
+    p1 = np.array([57., 40.])
+
+    PofD0, blobs0 = _evaluate(p0, memo)
+    assert memo.stats()['rte{0}'] == (0, 1)
+
+    # Cached histories are shared, so they're read-only.
+    for key, cached in memo.caches['rte{0}'].items():
+        for hist in cached['product']:
+            for flux in (hist if type(hist) is list else [hist]):
+                assert (flux is None) or (not flux.flags.writeable)
+
+    # X-ray change: UV background re-used, and results are identical to a
+    # calculation from scratch.
+    PofD1, blobs1 = _evaluate(p1, memo)
+    assert memo.stats()['rte{0}'] == (1, 1)
+    assert memo.stats()['rte{1}'] == (0, 2)
+
+    PofD, blobs = _evaluate(p1, None)
+    assert PofD == PofD1
+    assert np.allclose(blobs, blobs1, rtol=1e-12, atol=0)
+    assert np.isclose(blobs1[0][1], 10 * blobs0[0][1], rtol=1e-6)
+    assert blobs1[0][0] == blobs0[0][0]
+
+    # Repeated proposals don't re-run anything.
+    hits = memo.stats()['rte{0}'][0]
+    assert _evaluate(p0, memo) == (PofD0, blobs0)
+    assert memo.stats()['result'][0] == 1
+    assert memo.stats()['rte{0}'][0] == hits
+
+    # Fresh cache (e.g., on another processor) can use histories on disk.
+    memo = StageCache(parameters, base_kwargs, maxsize=4, path=path)
+    assert memo.inject(p1)['pop_rte_history{1}'] is not None
+
+    PofD, blobs = _evaluate(p1, memo)
+    assert PofD == PofD1
+    assert np.allclose(blobs, blobs1, rtol=1e-12, atol=0)
+
+    # ...but not those of a run with a different (fixed) SFRD function.
+    kw = base_kwargs.copy()
+    kw['pop_sfrd{1}'] = lambda z: 0.2 * (1. + z)**-6.
+    memo = StageCache(parameters, kw, maxsize=4, path=path)
+    assert 'pop_rte_history{1}' not in memo.inject(p1)
+
+    # Same goes for an identical lambda defined elsewhere.
+    kw['pop_sfrd{1}'] = lambda z: 0.1 * (1. + z)**-6.
+    memo = StageCache(parameters, kw, maxsize=4, path=path)
+    assert memo.inject(p1)['pop_rte_history{1}'] is not None
+
+    # Fixed parameters that can't be compared by value disable the disk cache.
+    kw['pop_sfrd{1}'] = Prior().log_value
+    memo = StageCache(parameters, kw, maxsize=4, path=path)
+    assert memo.path is None
+
+    shutil.rmtree(path)
+
+if __name__ == '__main__':
+    test()
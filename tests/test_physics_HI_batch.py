@@ -0,0 +1,55 @@
+"""
+
+test_physics_HI_batch.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Mon Oct 19 05:58:26 PDT 2026
+
+Description: Test spin and brightness temperatures computed for many models
+at once against model-by-model (and redshift-by-redshift) calculations.
+
+"""
+
+import itertools
+import numpy as np
+from ares.physics import Hydrogen
+
+def test():
+
+    rng = np.random.RandomState(8)
+
+    # 20 models, 30 redshifts
+    z = np.linspace(6, 40, 30)
+    Tk = 10**rng.uniform(0.5, 3.5, (20, 30))
+    Ja = 10**rng.uniform(-24, -18, (20, 30))
+    xHII = 10**rng.uniform(-4, -1, (20, 30))
+    ne = 1e-4 * xHII * (1. + z)**3
+    xavg = np.minimum(2 * xHII, 1.)
+
+    # With and without an excess radio background
+    for approx, Tr in itertools.product([1, 2, 3, 3.5, 4], [0., 50.]):
+        hydr = Hydrogen(approx_Salpha=approx, cosmology_name='user')
+
+        Ts, dTb = hydr.Ts_dTb(z, Tk, Ja, xHII, ne, xavg=xavg, Tr=Tr)
+
+        assert Ts.shape == dTb.shape == (20, 30)
+
+        for i in [0, 7]:
+            if approx < 4:
+                ref = hydr.Ts(z, Tk[i], Ja[i], xHII[i], ne[i], Tr=Tr)
+            else:
+                ref = [hydr.Ts(z[j], Tk[i,j], Ja[i,j], xHII[i,j], ne[i,j],
+                    Tr=Tr) for j in range(z.size)]
+
+            rtol = 1e-12 if approx < 4 else 1e-6
+            assert np.allclose(Ts[i], ref, rtol=rtol, atol=0), (approx, Tr)
+            assert np.allclose(dTb[i], hydr.dTb(z, xavg[i], Ts[i], Tr),
+                rtol=1e-12)
+
+    # Scalars still fine
+    Ts, dTb = hydr.Ts_dTb(z[0], Tk[0,0], Ja[0,0], xHII[0,0], ne[0,0])
+    assert np.ndim(Ts) == 0
+
+if __name__ == '__main__':
+    test()
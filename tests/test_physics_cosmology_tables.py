@@ -0,0 +1,85 @@
+"""
+
+test_physics_cosmology_tables.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Mon Oct 19 05:31:12 PDT 2026
+
+Description: Test tabulated time-redshift relations against the analytic
+ones, and fast path for scalar inputs.
+
+"""
+
+import os
+import shutil
+import numpy as np
+from scipy.interpolate import PchipInterpolator
+from ares.physics import Cosmology
+from ares.physics import CosmologyTable as ct
+
+def test(tol=1e-8):
+
+    # Spline agrees with scipy's, whatever basis scipy uses internally.
+    x = np.linspace(0., 3., 41)
+    y = np.sin(2 * x) + x**2
+    u = np.linspace(0., 3., 1000)
+    spl = ct._UniformSpline(x, y)
+    assert np.allclose(spl(u)[0], PchipInterpolator(x, y)(u), rtol=1e-12,
+        atol=1e-12)
+
+    cosm = Cosmology(cosmology_name='user')
+
+    # Scalars (of any type) give the same answers as arrays.
+    for z in [0, 0.5, 6., np.float64(20.), 1e4]:
+        for func in ['t_of_z', 'dtdz']:
+            val = getattr(cosm, func)(z)
+            assert type(val) is np.float64
+            assert np.isclose(val, getattr(cosm, func)(np.array([z]))[0],
+                rtol=1e-13, atol=0)
+
+        t = cosm.t_of_z(z)
+        assert np.isclose(cosm.z_of_t(t), cosm.z_of_t(np.array([t]))[0],
+            rtol=1e-12, atol=1e-12)
+
+    assert np.isclose(cosm.TimeToRedshiftConverter(0., 1e14, 60.),
+        cosm.TimeToRedshiftConverter(0., np.array([1e14]), 60.)[0], rtol=1e-13)
+
+    # Tabulated
+    path = 'test_cosmology_tables.tmp'
+    if os.path.exists(path):
+        shutil.rmtree(path)
+
+    ct._tables.clear()
+
+    kw = {'cosmology_name': 'user', 'cosmology_tables': True,
+        'cosmology_table_tol': tol, 'cosmology_table_path': path}
+
+    cosm_t = Cosmology(**kw)
+    assert max(cosm_t.tables.errors.values()) < tol
+
+    # Includes redshifts outside of table.
+    rng = np.random.RandomState(10)
+    z = np.concatenate([10**rng.uniform(-4, 4, 10000), [0., 1e4, 5e4]])
+
+    assert np.allclose(cosm_t.t_of_z(z), cosm.t_of_z(z), rtol=tol, atol=0)
+    assert np.allclose(cosm_t.dtdz(z), cosm.dtdz(z), rtol=tol, atol=0)
+    assert np.allclose(1 + cosm_t.z_of_t(cosm.t_of_z(z)), 1 + z, rtol=tol,
+        atol=0)
+    assert np.allclose(cosm_t.LookbackTime(z, 2 * z),
+        cosm.LookbackTime(z, 2 * z), rtol=0, atol=tol * cosm.t_of_z(0.))
+
+    # Shared with other instances, and with other processes via disk.
+    assert Cosmology(**kw).tables is cosm_t.tables
+    assert Cosmology(cosmology_name='user', omega_m_0=0.3,
+        omega_l_0=0.7, cosmology_tables=True).tables is not cosm_t.tables
+
+    ct._tables.clear()
+    table = Cosmology(**kw).tables
+    assert not hasattr(table, 'errors')
+    assert np.array_equal(table.t_of_z(z), cosm_t.t_of_z(z))
+
+    shutil.rmtree(path)
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,71 @@
+"""
+
+test_physics_cross_section_cache.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Mon Oct 19 06:55:17 PDT 2026
+
+Description: Test that cross sections tabulated on an energy grid are
+computed once, shared, and protected from modification.
+
+"""
+
+import numpy as np
+from ares.physics.CrossSections import PhotoIonizationCrossSection, \
+    ApproximatePhotoIonizationCrossSection, CrossSectionTable, \
+    CrossSectionCacheInfo, ClearCrossSectionCache
+
+def test():
+
+    ClearCrossSectionCache()
+
+    E = np.logspace(1, 4, 200)
+
+    for approx in [False, True]:
+        func = ApproximatePhotoIonizationCrossSection if approx \
+            else PhotoIonizationCrossSection
+        for species in range(3):
+            sigma = CrossSectionTable(E, species, approx=approx)
+            ref = [func(nrg, species) for nrg in E]
+            assert np.allclose(sigma, ref, rtol=1e-14, atol=0)
+
+    info = CrossSectionCacheInfo()
+    assert info['misses'] == info['entries'] == 6
+    assert info['hits'] == info['nbytes_saved'] == 0
+    assert info['nbytes'] == 6 * E.nbytes
+
+    # Same values (not the same object) for the energies still a hit.
+    s1 = CrossSectionTable(E)
+    s2 = CrossSectionTable(E.copy())
+    assert np.shares_memory(s1, s2)
+
+    info = CrossSectionCacheInfo()
+    assert info['hits'] == 2 and info['entries'] == 6
+    assert info['nbytes_saved'] == 2 * E.nbytes
+
+    # Read-only
+    try:
+        s1[0] = 0.
+    except ValueError:
+        pass
+    else:
+        assert False, "Cached cross sections should be read-only!"
+
+    # Different grid, different entry.
+    s3 = CrossSectionTable(E[::2])
+    assert not np.shares_memory(s1, s3)
+    assert CrossSectionCacheInfo()['entries'] == 7
+
+    # Bounded, however many grids come along.
+    for i in range(100):
+        CrossSectionTable(np.logspace(1, 4, 10 + i))
+
+    info = CrossSectionCacheInfo()
+    assert info['entries'] <= 64 and info['misses'] == 107
+
+    ClearCrossSectionCache()
+    assert CrossSectionCacheInfo()['entries'] == 0
+
+if __name__ == '__main__':
+    test()
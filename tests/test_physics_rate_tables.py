@@ -0,0 +1,94 @@
+"""
+
+test_physics_rate_tables.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Mon Oct 19 06:37:50 PDT 2026
+
+Description: Test tabulated rate coefficients (and their derivatives)
+against the fitting formulae.
+
+"""
+
+import ares
+import numpy as np
+from ares.physics import RateCoefficients
+
+def test(rtol=1e-8):
+
+    # Extends past both ends of the table. Avoid the discontinuity in the
+    # case B HeIII recombination rate at T=2.2e4 K.
+    T = np.logspace(-1.5, 8.5, 3001)
+    T = T[np.abs(T / 2.2e4 - 1) > 1e-2]
+
+    for rec in ['A', 'B']:
+        coeff = RateCoefficients(recombination=rec, rate_tables=True)
+        exact = RateCoefficients(recombination=rec)
+
+        f, df = coeff.TabulatedRates(T)
+        assert f.shape == df.shape == (len(coeff.columns), T.size)
+
+        for k, (name, species) in enumerate(coeff.columns):
+            if species is None:
+                ref = getattr(exact, name)(T)
+                assert np.allclose(getattr(coeff, name)(T), f[k], rtol=1e-14)
+                assert np.allclose(getattr(coeff, 'd' + name)(T), df[k],
+                    rtol=1e-14)
+            else:
+                ref = getattr(exact, name)(species, T)
+
+            ok = ref > 1e-250
+            assert np.allclose(f[k][ok], ref[ok], rtol=rtol, atol=0), name
+            assert np.all(f[k][~ok] < 1e-250)
+
+        # Derivatives, compared to finite differences.
+        T2 = np.logspace(1, 7, 50)
+        for k, (name, species) in enumerate(coeff.columns):
+            func = getattr(exact, name)
+            if species is not None:
+                func = lambda T, func=func, species=species: func(species, T)
+
+            h = T2 * 1e-6
+            fd = (func(T2 + h) - func(T2 - h)) / 2. / h
+
+            df = coeff.TabulatedRates(T2, cols=[k])[1][0]
+            ok = np.abs(func(T2)) > 1e-250
+            assert np.allclose(df[ok], fd[ok], rtol=1e-5,
+                atol=1e-6 * np.max(np.abs(fd))), name
+
+    # Scalars
+    val = coeff.CollisionalIonizationRate(0, 2e4)
+    assert np.ndim(val) == 0
+    assert np.isclose(val, exact.CollisionalIonizationRate(0, 2e4), rtol=rtol)
+
+    # Tables shared by all instances.
+    assert RateCoefficients(rate_tables=True).table is coeff.table
+
+    # Solutions unchanged.
+    pf = \
+    {
+     'grid_cells': 8,
+     'isothermal': True,
+     'stop_time': 1e2,
+     'radiative_transfer': False,
+     'density_units': 1.0,
+     'initial_timestep': 1,
+     'max_timestep': 1e2,
+     'restricted_timestep': None,
+     'initial_temperature': np.logspace(3, 5, 8),
+     'initial_ionization': [1.-1e-8, 1e-8],
+    }
+
+    sim1 = ares.simulations.GasParcel(**pf)
+    sim1.run()
+
+    sim2 = ares.simulations.GasParcel(rate_tables=True, **pf)
+    sim2.run()
+
+    for field in ['h_1', 'h_2']:
+        assert np.allclose(sim1.history[field], sim2.history[field],
+            rtol=1e-5, atol=1e-8)
+
+if __name__ == '__main__':
+    test()
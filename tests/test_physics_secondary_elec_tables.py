@@ -0,0 +1,66 @@
+"""
+
+test_physics_secondary_elec_tables.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Mon Oct 19 06:14:03 PDT 2026
+
+Description: Test vectorized (and tabulated) deposition fractions against
+energy-by-energy calculations.
+
+"""
+
+import numpy as np
+from ares.physics import SecondaryElectrons
+
+def test():
+
+    xHII = np.logspace(-5, 0, 41)
+    E = np.concatenate([[-5., 0., 11., 28.], np.logspace(0.5, 4, 50)])
+
+    for method in [0, 1, 2]:
+        esec = SecondaryElectrons(method=method)
+
+        for channel in ['heat', 'h_1', 'he_1', 'he_2', 'lya']:
+            if method == 2 and channel == 'lya':
+                continue
+
+            f = esec.DepositionFractionGrid(xHII, E, channel=channel)
+            assert f.shape == (E.size, xHII.size)
+
+            for k, nrg in enumerate(E):
+                ref = esec.DepositionFraction(xHII, E=nrg, channel=channel)
+                assert np.allclose(f[k], ref, rtol=1e-14, atol=0, 
+                    equal_nan=True), \
+                    (method, channel, nrg)
+
+            # Tables reproduce exact values at nodes, and are shared.
+            logx, logE, tab = esec.DepositionFractionTable(channel)
+            assert tab.shape == (logx.size, logE.size)
+            assert np.all(np.isfinite(tab))
+            assert esec.DepositionFractionTable(channel) is \
+                SecondaryElectrons(method=method).DepositionFractionTable(channel)
+
+            fi = esec.DepositionFractionGrid(10**logx[0:-1], 10**logE[::7], 
+                channel=channel, interp=True)
+            assert np.allclose(fi, tab[0:-1,::7].T, rtol=1e-12, atol=1e-14)
+
+    # Interpolation is accurate away from discontinuities.
+    esec = SecondaryElectrons(method=2)
+    x = np.logspace(-3.5, -0.05, 30)
+    E = np.logspace(1.5, 4, 30)
+    f = esec.DepositionFractionGrid(x, E, channel='heat')
+    fi = esec.DepositionFractionGrid(x, E, channel='heat', interp=True)
+    assert np.allclose(fi, f, rtol=1e-2)
+
+    # No fit for this channel
+    try:
+        esec.DepositionFractionGrid(x, E, channel='lya')
+    except ValueError as err:
+        assert 'lya' in str(err) and 'method=2' in str(err)
+    else:
+        raise AssertionError("method=2 has no fit for lya!")
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,87 @@
+"""
+
+test_populations_ensemble_store.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 19:12:40 PDT 2026
+
+Description: Check that galaxy histories are stored in preallocated
+blocks, and that the SAM gives the same answers in single precision.
+
+"""
+
+import ares
+import numpy as np
+from ares.physics.Constants import s_per_myr
+
+def test():
+
+    pars = ares.util.ParameterBundle('mirocha2020:univ')
+    pars['pop_sed'] = 'sps-toy'
+    pars['pop_thin_hist'] = 0
+    pars['pop_scatter_mar'] = 0
+    pars['pop_Tmin'] = None # So we don't have to read in HMF table for Mmin
+    pars['pop_Mmin'] = 1e8
+    pars['pop_synth_minimal'] = False
+    pars['pop_enrichment'] = 1
+    pars['tau_clumpy'] = None
+    pars['pop_sed_degrade'] = None
+
+    np.random.seed(10)
+
+    N = 100
+    tarr = np.arange(50, 1000, 5.)[-1::-1]
+    cosm = ares.physics.Cosmology(**pars)
+    zarr = cosm.z_of_t(tarr * s_per_myr)
+    dlogM = np.random.uniform(0, 0.02, size=(N, tarr.size))
+    Mh = 1e9 * 10**np.cumsum(dlogM, axis=1)[:,-1::-1]
+
+    pars['pop_histories'] = {'t': tarr, 'z': zarr, 'Mh': Mh,
+        'MAR': np.random.uniform(1, 10, size=(N, tarr.size)),
+        'nh': np.ones((N, tarr.size))}
+
+    pop = ares.populations.GalaxyPopulation(**pars)
+    hist = pop.histories
+
+    assert isinstance(hist, ares.util.HistoryStore)
+
+    # Fields are contiguous blocks filled in place
+    for key in ['SFR', 'Ms', 'MZ', 'Mg', 'Z']:
+        assert hist[key].shape == (N, tarr.size)
+        assert hist[key].flags['C_CONTIGUOUS']
+        assert np.all(hist[key][:,0] == 0) or key in ['SFR', 'Z']
+
+    # Stellar mass is integrated SFR
+    dt = np.diff(hist['t']) * 1e6
+    fml = 1. - pop.pf['pop_mass_yield']
+    Ms = np.cumsum(hist['SFR'][:,0:-1] * dt * fml, axis=1)
+    assert np.allclose(hist['Ms'][:,1:], Ms, rtol=1e-12)
+
+    # MAR is copied, never aliased to the input histories
+    assert not np.shares_memory(hist['MAR'], pars['pop_histories']['MAR'])
+
+    # Views, not copies
+    z = hist['z'][hist['z'].size // 2]
+    Ms_z = pop.get_field(z, 'Ms')
+    assert np.shares_memory(Ms_z, hist['Ms'])
+
+    gals = pop.Slice(z, {})
+    assert np.shares_memory(gals['Ms'], hist['Ms'])
+    assert np.all(gals['Ms'] == Ms_z)
+
+    cut = {'Ms': (np.median(Ms_z), np.inf)}
+    gals = pop.Slice(z, cut)
+    assert gals['Ms'].size == np.sum(Ms_z >= np.median(Ms_z))
+    assert gals['Mh'].size == gals['Ms'].size
+
+    # Single precision
+    pars['pop_histories_dtype'] = 'float32'
+    pop32 = ares.populations.GalaxyPopulation(**pars)
+
+    assert pop32.histories['Ms'].dtype == np.float32
+    assert pop32.histories.nbytes < hist.nbytes
+    assert np.allclose(pop32.histories['Ms'], hist['Ms'], rtol=1e-5)
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,100 @@
+"""
+
+test_populations_ensemble_stream.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 20:03:55 PDT 2026
+
+Description: Make sure processing halos in chunks gives the same summary
+statistics as processing them all at once.
+
+"""
+
+import os
+import ares
+import h5py
+import numpy as np
+from ares.physics.Constants import s_per_myr
+
+def test():
+
+    pars = ares.util.ParameterBundle('mirocha2020:univ')
+    pars['pop_sed'] = 'sps-toy'
+    pars['pop_toysps_beta'] = -2.
+    pars['pop_dust_yield'] = 0
+    pars['pop_lmin'] = 1000
+    pars['pop_lmax'] = 3000
+    pars['pop_dlam'] = 10.
+    pars['pop_thin_hist'] = 0
+    pars['pop_scatter_mar'] = 0
+    pars['pop_Tmin'] = None # So we don't have to read in HMF table for Mmin
+    pars['pop_Mmin'] = 1e8
+    pars['pop_synth_minimal'] = False
+    pars['tau_clumpy'] = None
+    pars['pop_sed_degrade'] = None
+
+    # Make a fake halo catalog
+    np.random.seed(1234)
+
+    N = 500
+    cosm = ares.physics.Cosmology(**pars)
+    t = np.arange(50, 1000, 5.)[-1::-1]
+    z = cosm.z_of_t(t * s_per_myr)
+    dlogM = np.random.uniform(0, 0.02, size=(N, t.size))
+
+    hist = {'t': t, 'z': z,
+        'Mh': 1e8 * 10**np.cumsum(dlogM, axis=1)[:,-1::-1],
+        'MAR': np.random.uniform(0.1, 10, size=(N, t.size)),
+        'nh': np.random.uniform(0.5, 1, size=(N, t.size))}
+
+    fn = 'test_halo_catalog.hdf5'
+    with h5py.File(fn, 'w') as f:
+        for key in hist:
+            f.create_dataset(key, data=hist[key])
+
+    pars['pop_histories'] = fn
+
+    redshifts = [6., 8.]
+    MUV = np.arange(-24, -10, 0.5)
+
+    # All at once
+    pop = ares.populations.GalaxyPopulation(**pars)
+    ref = {}
+    for _z_ in redshifts:
+        ref[_z_] = {'smf': pop.StellarMassFunction(_z_),
+            'smhm': pop.SMHM(_z_), 'uvlf': pop.LuminosityFunction(_z_, MUV)}
+
+    # In chunks that don't divide evenly into N
+    pars['pop_histories_chunk'] = 150
+    pop_s = ares.populations.GalaxyPopulation(**pars)
+    res = pop_s.StreamSummaryStats(redshifts, MUV=MUV)
+
+    # Never hold the whole ensemble
+    assert not hasattr(pop_s, '_histories')
+
+    for _z_ in redshifts:
+        assert np.allclose(res[_z_]['smf'][1], ref[_z_]['smf'])
+        assert np.allclose(res[_z_]['smhm'][1], ref[_z_]['smhm'][1])
+        assert np.allclose(res[_z_]['smhm'][2], ref[_z_]['smhm'][2])
+        assert np.allclose(res[_z_]['uvlf'][1], ref[_z_]['uvlf'])
+
+        # Results are cached
+        assert np.all(pop_s.SMHM(_z_)[1] == res[_z_]['smhm'][1])
+        assert np.all(pop_s.LuminosityFunction(_z_, MUV) == res[_z_]['uvlf'][1])
+        assert not hasattr(pop_s, '_histories')
+
+    # Same thing with histories supplied by hand
+    pars['pop_histories'] = hist
+    pop_d = ares.populations.GalaxyPopulation(**pars)
+    sizes = [stop - start for start, stop in pop_d.iter_chunks()]
+    assert sizes == [150, 150, 150, 50]
+
+    res_d = pop_d.StreamSummaryStats(redshifts)
+    for _z_ in redshifts:
+        assert np.allclose(res_d[_z_]['smf'][1], ref[_z_]['smf'])
+
+    os.remove(fn)
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,60 @@
+"""
+
+test_solvers_crte_history.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 12:20:15 PDT 2026
+
+Description: Make sure solving for the whole flux history at once gives the
+same background as the flux generators.
+
+"""
+
+import ares
+import numpy as np
+
+# One population emitting from the Lyman series up to X-rays, so the
+# sawtooth, ionizing, and X-ray bands are all solved for.
+pars = \
+{
+ 'pop_sfr_model': 'sfrd-func',
+ 'pop_sfrd': lambda z: 0.1 * (1. + z)**-6.,
+ 'pop_sfrd_units': 'msun/yr/mpc^3',
+ 'pop_sed': 'pl',
+ 'pop_alpha': -1.,
+ 'pop_Emin': 1.,
+ 'pop_Emax': 3e4,
+ 'pop_EminNorm': 13.6,
+ 'pop_EmaxNorm': 1e2,
+ 'pop_rad_yield': 1e57,
+ 'pop_rad_yield_units': 'photons/msun',
+ 'pop_solve_rte': True,
+
+ "lya_nmax": 8,
+ 'tau_redshift_bins': 100,
+ 'initial_redshift': 40.,
+ 'final_redshift': 10.,
+}
+
+def test(rtol=1e-10):
+
+    mgb1 = ares.simulations.MetaGalacticBackground(**pars)
+    mgb1.run()
+
+    mgb2 = ares.simulations.MetaGalacticBackground(rte_precompute_history=True,
+        **pars)
+    mgb2.run()
+
+    z1, E1, flux1 = mgb1.get_history(popid=0, flatten=True)
+    z2, E2, flux2 = mgb2.get_history(popid=0, flatten=True)
+
+    # Sawtooth, ionizing and X-ray bands all there.
+    assert (E1.min() < 13.6) and (E1.max() > 2e2)
+
+    assert np.array_equal(E1, E2)
+    assert np.allclose(flux1, flux2, rtol=rtol, atol=0), \
+        "Pre-computed flux history differs from generator solution!"
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,71 @@
+"""
+
+test_solvers_crte_parallel.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 11:02:47 PDT 2026
+
+Description: Make sure solving independent populations/bands in a process
+pool gives exactly the same background as solving them serially.
+
+"""
+
+import ares
+import numpy as np
+
+pars = \
+{
+ 'num_populations': 2,
+
+ # UV population: sawtooth + ionizing bands
+ 'pop_sfr_model{0}': 'sfrd-func',
+ 'pop_sfrd{0}': lambda z: 0.1 * (1. + z)**-6.,
+ 'pop_sfrd_units{0}': 'msun/yr/mpc^3',
+ 'pop_sed{0}': 'pl',
+ 'pop_alpha{0}': 0.,
+ 'pop_Emin{0}': 1.,
+ 'pop_Emax{0}': 1e2,
+ 'pop_EminNorm{0}': 13.6,
+ 'pop_EmaxNorm{0}': 1e2,
+ 'pop_rad_yield{0}': 1e57,
+ 'pop_rad_yield_units{0}': 'photons/msun',
+ 'pop_solve_rte{0}': True,
+
+ # X-ray population
+ 'pop_sfr_model{1}': 'sfrd-func',
+ 'pop_sfrd{1}': lambda z: 0.1 * (1. + z)**-6.,
+ 'pop_sfrd_units{1}': 'msun/yr/mpc^3',
+ 'pop_sed{1}': 'pl',
+ 'pop_alpha{1}': -2.,
+ 'pop_Emin{1}': 2e2,
+ 'pop_Emax{1}': 3e4,
+ 'pop_EminNorm{1}': 2e2,
+ 'pop_EmaxNorm{1}': 3e4,
+ 'pop_logN{1}': -np.inf,
+ 'pop_solve_rte{1}': True,
+
+ "lya_nmax": 8,
+ 'tau_redshift_bins': 100,
+ 'initial_redshift': 40.,
+ 'final_redshift': 10.,
+}
+
+def test():
+
+    mgb1 = ares.simulations.MetaGalacticBackground(**pars)
+    mgb1.run()
+
+    mgb2 = ares.simulations.MetaGalacticBackground(rte_nprocs=2, **pars)
+    mgb2.run()
+
+    for popid in range(2):
+        z1, E1, flux1 = mgb1.get_history(popid=popid, flatten=True)
+        z2, E2, flux2 = mgb2.get_history(popid=popid, flatten=True)
+
+        assert np.array_equal(E1, E2)
+        assert np.array_equal(flux1, flux2), \
+            "Parallel RTE solution differs from serial solution!"
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,66 @@
+"""
+
+test_solvers_tau_cache.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 13:05:12 PDT 2026
+
+Description: Compare the vectorized optical depth tabulator to explicit
+line-of-sight integrals, and make sure tables are re-used from the cache
+only when the ionization history is the same.
+
+"""
+
+import os
+import glob
+import shutil
+import ares
+import numpy as np
+
+def test(tmp_path, rtol=1e-5):
+    
+    pars = \
+    {
+     'include_He': 1,
+     'approx_He': 1,
+     'tau_redshift_bins': 20,
+     'first_light_redshift': 15.,
+     'final_redshift': 10.,
+     'tau_Emin': 10.,
+     'tau_Emax': 1e3,
+     'tau_cache': os.path.join(str(tmp_path), 'tau_cache_test'),
+    }
+    
+    xavg = lambda z: 0.5 * (1. + np.tanh((12. - z) / 1.))
+    
+    igm = ares.solvers.OpticalDepth(**pars)
+    igm.ionization_history = xavg
+    tau = igm.TabulateOpticalDepth()
+    
+    # Compare to quad, including cells spanning the HI and HeI edges
+    for l in range(0, igm.L - 1, 4):
+        for n in range(0, igm.N, 5):
+            ref = igm.DiffuseOpticalDepth(igm.z[l], igm.z[l+1], igm.E[n],
+                xavg=xavg)
+            assert np.allclose(tau[l,n], ref, rtol=rtol, atol=0)
+    
+    assert np.all(tau[-1] == 0)
+    
+    # Should be loaded from cache this time, unless history changes.
+    fn = igm.tau_cache_name()
+    assert os.path.exists(fn)
+    assert np.array_equal(igm.TabulateOpticalDepth(), tau)
+    
+    igm.ionization_history = lambda z: 0.0
+    assert igm.tau_cache_name() != fn
+    tau_neutral = igm.TabulateOpticalDepth(nprocs=2)
+    
+    assert np.all(tau_neutral >= tau)
+    assert len(glob.glob('{}/*.npz'.format(pars['tau_cache']))) == 2
+    
+    shutil.rmtree(pars['tau_cache'])
+    
+if __name__ == '__main__':
+    import tempfile
+    test(tempfile.mkdtemp())
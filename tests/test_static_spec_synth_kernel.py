@@ -0,0 +1,64 @@
+"""
+
+test_static_spec_synth_kernel.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 16:41:07 PDT 2026
+
+Description: Make sure tabulated synthesis kernels reproduce brute-force
+integration over the SFH.
+
+"""
+
+import ares
+import numpy as np
+from ares.physics.Constants import s_per_myr
+
+def test():
+
+    toy = ares.sources.SynthesisModelToy(source_dlam=10., source_lmin=1e3,
+        source_lmax=3e3, source_toysps_beta=-2, source_toysps_alpha=8.,
+        source_ssp=True, source_aging=True)
+
+    np.random.seed(42)
+
+    # Uniform fine grid, coarse grid (triggers over-sampling), and
+    # irregular grid.
+    for tarr in [np.arange(1, 500, 1.), np.arange(0, 1000, 10),
+        np.sort(np.random.uniform(1, 1000, size=200))]:
+
+        sfh = np.random.uniform(0.5, 2, size=(5, tarr.size))
+        tobs = tarr[tarr.size // 2]
+
+        L = {}
+        for kern in [True, False]:
+            ss = ares.static.SpectralSynthesis(pop_synth_kernel=kern)
+            ss.src = toy
+
+            L[kern] = [ss.Luminosity(sfh=sfh, tarr=tarr, load=False),
+                ss.Luminosity(sfh=sfh[0], tarr=tarr, load=False),
+                ss.Luminosity(sfh=sfh, tarr=tarr, tobs=tobs, load=False),
+                ss.Luminosity(sfh=sfh, tarr=tarr, tobs=tobs, wave=2000.,
+                    band=None, load=False)]
+
+        for L1, L2 in zip(L[True], L[False]):
+            assert np.allclose(L1, L2, rtol=1e-10, atol=0)
+
+        # Results for one galaxy don't depend on the rest of the batch
+        assert np.all(L[True][0][0] == L[True][1])
+
+        # Re-use kernel
+        assert not hasattr(ss, '_cache_kern_')
+        ss = ares.static.SpectralSynthesis()
+        ss.src = toy
+        ss.Luminosity(sfh=sfh, tarr=tarr, tobs=tobs, load=False)
+        ss.Luminosity(sfh=sfh * 2, tarr=tarr, tobs=tobs, load=False)
+        assert len(ss._cache_kern_) == 1
+
+        # New source -> new kernels
+        ss.src = toy
+        assert not hasattr(ss, '_cache_kern_')
+
+if __name__ == '__main__':
+    test()
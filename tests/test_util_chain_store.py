@@ -0,0 +1,101 @@
+"""
+
+test_util_chain_store.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 20:12:37 PDT 2026
+
+Description: Test columnar HDF5 storage of MCMC output.
+
+"""
+
+import os
+import ares
+import numpy as np
+from ares.util.ChainStore import ChainStore
+from ares.util.ReadData import flatten_chain, flatten_logL
+
+def test():
+
+    prefix = 'test_chain_store'
+    fn = '{!s}.hdf5'.format(prefix)
+
+    nwalkers = 4
+
+    store = ChainStore(fn, chunk_bytes=64)
+    store.create(['x', 'y'], [False, True], nwalkers, clobber=True)
+
+    # Checkpoints needn't all be the same length
+    pos_all = []
+    for nsteps in [3, 2, 1]:
+        pos = np.random.rand(nsteps, nwalkers, 2)
+        chain = np.array(flatten_chain(pos))
+        logL = np.array(flatten_logL(pos[:,:,0]))
+        store.write_checkpoint(nsteps, chain, logL,
+            facc=np.ones(nwalkers), blobs={'b': 2 * chain})
+        pos_all.append(pos)
+
+    # Shape (steps, walkers, parameters)
+    pos_all = np.concatenate(pos_all)
+
+    assert store.nsteps == 6
+    assert store.read().shape == (6 * nwalkers, 2)
+    assert store.read('facc').shape == (3, nwalkers)
+
+    # Read walkers and steps without reading everything
+    assert np.array_equal(store.read_walkers(walkers=2)[0], pos_all[:,2])
+    assert np.array_equal(store.read_walkers(steps=slice(2, 5)),
+        pos_all[2:5].swapaxes(0, 1))
+    assert np.array_equal(store.read_walkers('blobs/b', walkers=[3, 1],
+        steps=-2), 2 * pos_all[-2:-1,[3, 1]].swapaxes(0, 1))
+    assert np.array_equal(store.last_position(), pos_all[-1])
+
+    # Rows from an incomplete checkpoint are ignored, then overwritten.
+    store.append('chain', np.zeros((5, 2)))
+    assert store.read().shape == (6 * nwalkers, 2)
+    store.write_checkpoint(1, np.ones((nwalkers, 2)), np.ones(nwalkers))
+    assert store.read().shape == (7 * nwalkers, 2)
+    assert np.all(store.read_walkers(steps=-1) == 1)
+
+    os.remove(fn)
+
+    # Write via ModelFit and read back via ModelSet
+    fitter = ares.inference.ModelFit(blob_names=[['b']], blob_ivars=[None],
+        blob_funcs=[None])
+    fitter.parameters = ['x', 'y']
+    fitter.is_log = [False, False]
+    fitter.nwalkers = nwalkers
+    fitter.prefix = prefix
+    fitter.output_backend = 'hdf5'
+    fitter.save_freq = 2
+    fitter.steps = 4
+
+    class FakeSampler(object):
+        acceptance_fraction = 0.5 * np.ones(nwalkers)
+
+    fitter.sampler = FakeSampler()
+
+    fitter._prep_from_scratch(clobber=True)
+
+    pos = np.random.rand(2, nwalkers, 2)
+    blobs = [[[[pos[i,j,0]]] for j in range(nwalkers)] for i in range(2)]
+    data = [flatten_chain(pos), flatten_logL(pos[:,:,1]), blobs, None]
+    fitter._write_checkpoint(data, 'dd0000', 2, prefix, 2)
+
+    assert fitter._have_output(prefix)
+    assert np.array_equal(fitter._prep_from_restart(), pos[-1])
+
+    anl = ares.analysis.ModelSet(prefix, verbose=False)
+
+    assert anl.is_mcmc
+    assert anl.chain.shape == (2 * nwalkers, 2)
+    assert np.array_equal(anl.logL, anl.chain[:,1])
+    assert np.array_equal(anl.get_blob('b'), anl.chain[:,0])
+
+    for suffix in ['hdf5', 'fail.pkl', 'pinfo.pkl', 'rinfo.pkl', 'binfo.pkl',
+        'rstate.pkl']:
+        os.remove('{!s}.{!s}'.format(prefix, suffix))
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,115 @@
+"""
+
+test_util_lru_cache.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 17:48:52 PDT 2026
+
+Description: Test in-memory cache and its use in spectral synthesis.
+
+"""
+
+import ares
+import numpy as np
+from ares.util.LRUCache import LRUCache, fingerprint, sizeof
+
+def test():
+
+    # Fingerprints depend on contents, not identity
+    x = np.arange(10.)
+    assert fingerprint(x) == fingerprint(x.copy())
+    assert fingerprint(x) != fingerprint(x + 1)
+    assert fingerprint(x) != fingerprint(x.astype(np.float32))
+    assert fingerprint({'a': x, 'b': 1}) == fingerprint({'b': 1, 'a': x.copy()})
+
+    # Functions are compared by what they compute, not by id or name
+    f1 = lambda z: 1e-2 * z
+    f2 = lambda z: 2e-2 * z
+    f3 = lambda z: 1e-2 * z
+    assert fingerprint(f1) != fingerprint(f2)
+    assert fingerprint(f1) == fingerprint(f3)
+
+    scale = lambda a: (lambda z: a * z)
+    assert fingerprint(scale(1.)) != fingerprint(scale(2.))
+
+    # Anything else is compared by identity, and kept alive by the key so
+    # that its id can't be recycled.
+    class Thing(object):
+        pass
+
+    cache = LRUCache()
+    cache.put(fingerprint(Thing()), 1)
+    for i in range(100):
+        assert cache.get(fingerprint(Thing())) is None
+
+    # Size limit
+    cache = LRUCache(maxsize=3)
+    for i in range(3):
+        cache.put(i, np.ones(10) * i)
+
+    assert cache.get(0) is not None  # 0 is now most recently used
+    cache.put(3, np.ones(10))
+    assert 1 not in cache
+    assert (0 in cache) and (3 in cache)
+    assert cache.get(1) is None
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 1, 1)
+
+    # Byte limit
+    cache = LRUCache(maxbytes=600)
+    cache.put('a', np.ones(50))
+    cache.put('b', np.ones(50))
+    assert 'a' not in cache and 'b' in cache
+    assert cache.nbytes == 400
+    cache.put('c', np.ones(1000))
+    assert 'c' not in cache and 'b' in cache
+
+    # Containers count what they hold, and ragged ones are fine.
+    cache = LRUCache(maxbytes=20000)
+    cache.put('d', {'product': np.ones(1000)})
+    assert 8000 < cache.nbytes < 9000
+    cache.put('t', (np.ones(1000), np.ones(10), 'abc'))
+    assert 'd' in cache and 't' in cache
+    assert 16000 < cache.nbytes < 18000
+
+    obj = np.empty(1, dtype=object)
+    obj[0] = {'product': np.ones(1000)}
+    cache.put('o', obj)
+    assert 'd' not in cache and 'o' in cache
+    assert 16000 < cache.nbytes < 18000
+
+    cache.put('n', np.ones(1000), nbytes=1)
+    assert 'n' in cache and 't' in cache and 'o' in cache
+
+    # Shared members only count once
+    x = np.ones(1000)
+    assert sizeof((x, x)) < 2 * x.nbytes
+
+    ##
+    # Use in spectral synthesis
+    ##
+    toy = ares.sources.SynthesisModelToy(source_dlam=10., source_lmin=1e3,
+        source_lmax=3e3, source_toysps_beta=-2, source_toysps_alpha=8.,
+        source_ssp=True, source_aging=True)
+
+    ss = ares.static.SpectralSynthesis(pop_synth_cache_size=4)
+    ss.src = toy
+
+    tarr = np.arange(1, 500, 1.)
+    sfh = np.ones((3, tarr.size))
+
+    L1 = ss.Luminosity(sfh=sfh, tarr=tarr, tobs=400.)
+    L2 = ss.Luminosity(sfh=sfh.copy(), tarr=tarr, tobs=400.)
+    L3 = ss.Luminosity(sfh=2 * sfh, tarr=tarr, tobs=400.)
+
+    assert L2 is L1
+    assert np.allclose(L3, 2 * L1)
+    assert ss._lum_cache.hits == 1
+
+    for wave in np.arange(1200., 2000., 100.):
+        ss.Luminosity(wave=wave, sfh=sfh, tarr=tarr, tobs=400.)
+
+    assert len(ss._lum_cache) == 4
+
+if __name__ == '__main__':
+    test()
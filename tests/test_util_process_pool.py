@@ -0,0 +1,80 @@
+"""
+
+test_util_process_pool.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Mon Oct 19 00:52:10 PDT 2026
+
+Description: Test pool of local worker processes used by ModelFit when
+running without MPI.
+
+"""
+
+import os
+import time
+import numpy as np
+from ares.util.ProcessPool import ProcessPool, worker_id
+from ares.inference.ModelFit import _procid
+
+def info(x):
+    return x**2, worker_id(), os.getpid(), _procid()
+
+def slow(x):
+    if x == 3:
+        time.sleep(60)
+    return x
+
+def broken(x):
+    if x == 2:
+        raise ValueError('oops')
+    return x
+
+def test():
+
+    pool = ProcessPool(2, maxtasks=3)
+
+    results = pool.map(info, range(12))
+
+    # Results in order, computed by workers #1 and #2 (not the main process)
+    assert [res[0] for res in results] == [x**2 for x in range(12)]
+    assert set([res[1] for res in results]) == set([1, 2])
+    assert set([res[3] for res in results]) == set(['001', '002'])
+    assert os.getpid() not in [res[2] for res in results]
+    assert worker_id() == 0
+
+    # Workers are replaced after 3 tasks each.
+    assert len(set([res[2] for res in results])) == 4
+    assert pool.nrecycled == 4
+
+    # Models that take too long get `timeout_value`; others are unaffected.
+    pool.stop()
+    pool = ProcessPool(2, timeout=1, timeout_value=(-np.inf, None))
+
+    t1 = time.time()
+    results = pool.map(slow, range(6))
+    assert time.time() - t1 < 30
+
+    assert results == [0, 1, 2, (-np.inf, None), 4, 5]
+    assert pool.ntimeouts == 1
+
+    # Still usable afterwards, and a new function means new workers.
+    assert pool.map(info, [3])[0][0] == 9
+
+    # Errors are raised in the main process.
+    try:
+        pool.map(broken, range(4))
+    except RuntimeError as err:
+        assert 'oops' in str(err)
+    else:
+        raise AssertionError('Error in worker should propagate!')
+
+    pool.stop()
+
+    # Workers needn't be forked directly from this process.
+    pool = ProcessPool(2, start_method='forkserver', preload=None)
+    assert pool.map(abs, [-1, -2, 3]) == [1, 2, 3]
+    pool.stop()
+
+if __name__ == '__main__':
+    test()
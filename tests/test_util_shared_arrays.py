@@ -0,0 +1,80 @@
+"""
+
+test_util_shared_arrays.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 15:48:27 PDT 2026
+
+Description: Make sure pickled objects with shared arrays only carry 
+references to them, and re-attach to the same files when unpickled.
+
+"""
+
+import os
+import sys
+import pickle
+import shutil
+import subprocess
+import numpy as np
+from ares.util.SharedArrays import share_arrays, get_shared_state, \
+    set_shared_state
+
+class Tables(object):
+    def __init__(self):
+        self.tab_big = np.random.rand(500, 500)
+        self.tab_small = np.arange(10)
+        
+    def __getstate__(self):
+        return get_shared_state(self)
+
+    def __setstate__(self, state):
+        set_shared_state(self, state)
+
+def test(tmp_path):
+    
+    path = os.path.join(str(tmp_path), 'shared_arrays_test')
+    
+    tabs = Tables()
+    copy = tabs.tab_big.copy()
+    
+    size = len(pickle.dumps(tabs))
+    
+    names = share_arrays(tabs, path)
+    assert names == ['tab_big']
+    assert isinstance(tabs.tab_big, np.memmap)
+    assert not tabs.tab_big.flags.writeable
+    
+    s = pickle.dumps(tabs)
+    assert len(s) < 0.01 * size
+    
+    new = pickle.loads(s)
+    assert np.array_equal(new.tab_big, copy)
+    assert np.array_equal(new.tab_small, tabs.tab_small)
+    assert new.tab_big.filename == tabs.tab_big.filename
+    
+    # Should survive being pickled again
+    new2 = pickle.loads(pickle.dumps(new))
+    assert np.array_equal(new2.tab_big, copy)
+    
+    # Replaced arrays are pickled the usual way
+    new2.tab_big = new2.tab_big[0:10] * 2
+    new3 = pickle.loads(pickle.dumps(new2))
+    assert np.array_equal(new3.tab_big, 2 * copy[0:10])
+    
+    # Files are cleaned up when the process that created them exits.
+    code = ("from ares.util.SharedArrays import share_arrays; "
+        "from test_util_shared_arrays import Tables; "
+        "t = Tables(); share_arrays(t, {!r}); print(t.tab_big.filename)")
+    out = subprocess.check_output([sys.executable, '-c',
+        code.format(os.path.abspath(path))],
+        cwd=os.path.dirname(os.path.abspath(__file__)))
+    fn = out.decode().strip().splitlines()[-1]
+    assert os.path.dirname(fn) == os.path.abspath(path)
+    assert not os.path.exists(fn)
+    
+    shutil.rmtree(path)
+    
+if __name__ == '__main__':
+    import tempfile
+    test(tempfile.mkdtemp())
@@ -0,0 +1,105 @@
+"""
+
+test_util_stats_binning.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Mon Oct 19 03:51:07 PDT 2026
+
+Description: Test binned statistics computed for all bins at once (and in
+chunks) against bin-by-bin calculations.
+
+"""
+
+import numpy as np
+from ares.util.Stats import bin_statistics, quantify_scatter, \
+    BinnedStatistics, bin_samples, bin_c2e
+
+def _weighted_percentile(y, w, q):
+    s = np.argsort(y)
+    y, w = y[s], w[s]
+    c = (np.cumsum(w) - 0.5 * w) / w.sum()
+    return np.interp(q, c, y)
+
+def test():
+    rng = np.random.RandomState(42)
+
+    N = 20000
+    x = rng.uniform(8, 12, size=N)
+    y = 0.5 * x + rng.normal(scale=0.3, size=N)
+    w = rng.uniform(0, 1, size=N)
+    y[::97] = np.nan
+
+    xbin_c = np.arange(8.25, 12, 0.5)
+    xbin_e = bin_c2e(xbin_c)
+
+    data = bin_statistics(x, y, xbin_e, weights=w, percentiles=[0.16, 0.84])
+
+    for i in range(xbin_c.size):
+        ok = (x >= xbin_e[i]) & (x < xbin_e[i+1]) & np.isfinite(y)
+        f, ww = y[ok], w[ok]
+        avg = np.average(f, weights=ww)
+
+        assert data['N'][i] == ok.sum()
+        assert np.isclose(data['avg'][i], avg)
+        assert np.isclose(data['std'][i],
+            np.sqrt(np.average((f - avg)**2, weights=ww)))
+        assert np.isclose(data['min'][i], f.min())
+        assert np.isclose(data['max'][i], f.max())
+        assert np.allclose(data['percentiles'][:,i],
+            _weighted_percentile(f, ww, [0.16, 0.84]))
+
+    # Default behavior of quantify_scatter unchanged: weighted mean,
+    # unweighted scatter.
+    _x, yavg, ysca, Nb = quantify_scatter(x, y, xbin_c, weights=w,
+        method_std=0.68)
+    _x, yavg2, ylim, Nb = bin_samples(x, y, xbin_c, weights=w, limits=True)
+    _x, yavg3, ystd, Nb = bin_samples(x, y, xbin_c, weights=w)
+    for i in range(xbin_c.size):
+        ok = (x >= xbin_e[i]) & (x < xbin_e[i+1]) & np.isfinite(y)
+        f = y[ok]
+        assert np.isclose(yavg[i], np.average(f, weights=w[ok]))
+        assert np.allclose(ysca[i], np.percentile(f, (16., 84.)))
+        assert np.allclose(ylim[i], (f.min(), f.max()))
+        assert np.isclose(ystd[i], np.std(f))
+
+    # Empty bins are masked, and samples outside of the bins can be counted
+    # in the first or last bin.
+    _x, yavg, ysca, Nb = quantify_scatter(x, y, np.arange(7.25, 14, 0.5),
+        weights=w, method_std=[0.1, 0.9])
+    assert Nb[0] == Nb[-1] == 0
+    assert yavg[0] == -np.inf and np.all(ysca[-1] == -np.inf)
+
+    _x, yavg, ysca, Nb = quantify_scatter(x, y, xbin_c[1:-1], weights=w,
+        inclusive=True)
+    assert Nb.sum() == np.isfinite(y).sum()
+
+    # Out-of-core version gives the same answers (percentiles roughly).
+    stats = BinnedStatistics(xbin_e, np.linspace(3, 7, 2001))
+    for lo in range(0, N, 3000):
+        stats.update(x[lo:lo+3000], y[lo:lo+3000], w[lo:lo+3000])
+
+    assert np.array_equal(stats.N, data['N'])
+    assert np.allclose(stats.avg, data['avg'])
+    assert np.allclose(stats.std, data['std'])
+    assert np.allclose(stats.min, data['min'])
+    assert np.allclose(stats.percentile([0.16, 0.84]), data['percentiles'],
+        atol=0.01)
+
+    res1 = quantify_scatter(x, y, xbin_c, weights=w, method_std=0.68)
+    res2 = quantify_scatter(x, y, xbin_c, weights=w, method_std=0.68,
+        chunksize=5000, ybin_e=np.linspace(3, 7, 2001))
+    assert np.allclose(res1[1], res2[1])
+    assert np.allclose(res1[2], res2[2], atol=0.01)
+    assert np.array_equal(res1[3], res2[3])
+
+    # Bad options are bad input
+    try:
+        quantify_scatter(x, y, xbin_c, method_std='normal', chunksize=5000)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Should not fit distributions in chunks!")
+
+if __name__ == '__main__':
+    test()
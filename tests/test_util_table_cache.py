@@ -0,0 +1,80 @@
+"""
+
+test_util_table_cache.py
+
+Author: Jordan Mirocha
+Affiliation: UCLA
+Created on: Sun Oct 18 14:41:03 PDT 2026
+
+Description: Check keys, memory-mapped reads, and LRU eviction of on-disk
+lookup table cache.
+
+"""
+
+import os
+import time
+import shutil
+import numpy as np
+from ares.util.TableCache import TableCache, UncacheableError
+
+def test():
+    
+    path = 'table_cache_test'
+    
+    # Each array is ~8 kB, so this fits three of them.
+    cache = TableCache(path, maxsize=3e4)
+    
+    # Keys shouldn't care about ordering or int vs. float
+    k1 = cache.key(prefix='test', a=1, b={'x': None, 'y': [1, 2.]})
+    assert k1 == cache.key(prefix='test', b={'y': (1., 2), 'x': None}, a=1.)
+    assert k1 != cache.key(prefix='test', a=1, b={'x': None, 'y': [1, 3]})
+    
+    # Functions are keyed by what they compute, not their names
+    k_f = cache.key(f=lambda z: 1e-2 * z)
+    assert k_f == cache.key(f=lambda z: 1e-2 * z)
+    assert k_f != cache.key(f=lambda z: 2e-2 * z)
+    
+    # Things that can only be compared by identity can't be keyed at all
+    try:
+        cache.key(f=cache.key)
+    except UncacheableError:
+        pass
+    else:
+        raise AssertionError('Bound method should be uncacheable.')
+    
+    assert cache.load(k1, ['arr']) is None
+    
+    arr = np.random.rand(1000)
+    cache.save(k1, arr=arr)
+    
+    data = cache.load(k1, ['arr'])
+    assert isinstance(data['arr'], np.memmap)
+    assert np.array_equal(data['arr'], arr)
+    assert not data['arr'].flags.writeable
+    
+    # Add to existing entry
+    cache.save(k1, arr2=2 * arr)
+    assert np.array_equal(cache.load(k1, ['arr', 'arr2'])['arr2'], 2 * arr)
+    assert (cache.hits, cache.misses) == (2, 1)
+    
+    # k1 is now the oldest entry: adding two more should evict it.
+    time.sleep(0.01)
+    k2 = cache.key(a=2)
+    cache.save(k2, arr=arr)
+    time.sleep(0.01)
+    
+    # Touching k1 makes k2 the least recently used entry
+    assert cache.load(k1, ['arr']) is not None
+    time.sleep(0.01)
+    
+    k3 = cache.key(a=3)
+    cache.save(k3, arr=arr)
+    
+    assert cache.size <= cache.maxsize
+    assert cache.load(k2, ['arr']) is None
+    assert cache.load(k3, ['arr']) is not None
+    
+    shutil.rmtree(path)
+    
+if __name__ == '__main__':
+    test()